@@ -21,6 +21,7 @@ from app.api.v1.endpoints import characters
 from app.api.v1.endpoints import content_blocks
 from app.api.v1.endpoints import ai
 from app.api.v1.endpoints import chat_history
+from app.api.v1.endpoints import jobs
 # --- ADDED: Import notes router ---
 from app.api.v1.endpoints import notes
 # --- END ADDED ---
@@ -69,6 +70,13 @@ api_router.include_router(
     tags=["AI"]
 )
 
+# --- Background job routes ---
+api_router.include_router(
+    jobs.router,
+    prefix="/jobs",
+    tags=["Jobs"]
+)
+
 # --- Chat History & Session routes ---
 # Mount the chat_history router under the project ID prefix
 # The endpoints within chat_history.py define the rest of the path
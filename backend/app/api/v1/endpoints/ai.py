@@ -14,22 +14,34 @@
 
 from fastapi import APIRouter, HTTPException, status, Body, Path, Depends
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+import time
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request
+from typing import List, Optional
 from app.services.ai_service import AIService, get_ai_service
 from app.models.ai import (
     AIQueryRequest, AIQueryResponse, AISceneGenerationRequest, AISceneGenerationResponse,
     AIRephraseRequest, AIRephraseResponse, AIChapterSplitRequest, AIChapterSplitResponse,
-    RebuildIndexResponse
+    RebuildIndexResponse, IndexGCResponse, SourceNodeModel
 )
 from app.models.common import MessageResponse
+from app.core.config import settings
+from app.core.timing import record_stage
+from app.core.cancellation import cancel_on_disconnect
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def shape_source_nodes(nodes: Optional[List[SourceNodeModel]], source_mode: Optional[str]) -> Optional[List[SourceNodeModel]]:
+    """Returns the nodes as they are ("full") or as lean references, per the request's source_mode or AI_SOURCE_NODE_MODE."""
+    if not nodes or (source_mode or settings.AI_SOURCE_NODE_MODE) != "lean":
+        return nodes
+    return [node.lean(settings.AI_SOURCE_SNIPPET_CHARS) for node in nodes]
+
 @router.post("/query/{project_id}", response_model=AIQueryResponse)
 async def query_project(
     project_id: str,
     request: AIQueryRequest,
+    http_request: Request,
     ai_service: AIService = Depends(get_ai_service)
 ):
     """
@@ -38,7 +50,7 @@ async def query_project(
     """
     try:
         logger.info(f"Received query for project {project_id}: '{request.query}'")
-        answer, sources, direct_sources = await ai_service.query_project(project_id, request.query)
+        answer, sources, direct_sources = await cancel_on_disconnect(http_request, ai_service.query_project(project_id, request.query), "query")
         
         # Enhanced logging for direct sources debugging
         if direct_sources:
@@ -51,21 +63,27 @@ async def query_project(
         logger.info(f"Successfully generated query response for project {project_id}")
         
         # Convert NodeWithScore objects to the format expected by SourceNodeModel
+        serialize_started = time.perf_counter()
         formatted_sources = []
         for node in sources:
-            formatted_sources.append({
-                "id": node.node.id_,
-                "text": node.node.text,
-                "score": node.score,
-                "metadata": node.node.metadata
-            })
+            formatted_sources.append(SourceNodeModel(
+                id=node.node.id_,
+                text=node.node.text,
+                score=node.score,
+                metadata=node.node.metadata
+            ))
+        formatted_sources = shape_source_nodes(formatted_sources, request.source_mode)
         
         # Log what we're returning to the client
         logger.info(f"API returning to client: answer length={len(answer) if answer else 0}, sources={len(formatted_sources)}, direct_sources={len(direct_sources) if direct_sources else 0}")
         if direct_sources:
             logger.info(f"API direct_sources being returned: {direct_sources}")
             
-        return AIQueryResponse(answer=answer, source_nodes=formatted_sources, direct_sources=direct_sources)
+        response = AIQueryResponse(answer=answer, source_nodes=formatted_sources, direct_sources=direct_sources)
+        record_stage("api.serialize", serialize_started, source_nodes=len(formatted_sources))
+        return response
+    except HTTPException as http_exc:
+        raise http_exc
     except FileNotFoundError as e:
         logger.warning(f"Project not found during query: {project_id}. Error: {e}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project '{project_id}' not found.")
@@ -77,6 +95,7 @@ async def query_project(
 async def generate_scene(
     project_id: str,
     chapter_id: str,
+    http_request: Request,
     request_data: AISceneGenerationRequest = Body(...), # Expects request body matching the model
     ai_service: AIService = Depends(get_ai_service)
 ):
@@ -94,9 +113,13 @@ async def generate_scene(
         direct_sources_info = f", Direct sources: {request_data.direct_sources}" if request_data.direct_sources else ""
         logger.info(f"Received scene generation request for project {project_id}, chapter {chapter_id}. Summary: '{request_data.prompt_summary}', Prev Scenes: {request_data.previous_scene_order}{direct_sources_info}")
         # Pass the validated request data object to the service
-        result = await ai_service.generate_scene_draft(project_id, chapter_id, request_data)
+        result = await cancel_on_disconnect(http_request, ai_service.generate_scene_draft(project_id, chapter_id, request_data), "generate_scene")
         logger.info(f"Successfully generated scene draft for project {project_id}, chapter {chapter_id}")
-        return AISceneGenerationResponse(**result)
+        response = AISceneGenerationResponse(**result)
+        response.source_nodes = shape_source_nodes(response.source_nodes, request_data.source_mode)
+        return response
+    except HTTPException as http_exc:
+        raise http_exc
     except FileNotFoundError as e:
         logger.warning(f"Project or chapter not found during scene generation: {project_id}/{chapter_id}. Error: {e}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project '{project_id}' or Chapter '{chapter_id}' not found.")
@@ -112,6 +135,7 @@ async def generate_scene(
 async def rephrase_selection(
     project_id: str,
     request: AIRephraseRequest,
+    http_request: Request,
     ai_service: AIService = Depends(get_ai_service)
 ):
     """
@@ -119,16 +143,11 @@ async def rephrase_selection(
     """
     try:
         logger.info(f"Received rephrase request for project {project_id}. Context Path: {request.context_path}")
-        suggestions = await ai_service.rephrase_text(
-            project_id=project_id,
-            text_to_rephrase=request.text_to_rephrase,
-            context_before=request.context_before,
-            context_after=request.context_after,
-            context_path=request.context_path,
-            n_suggestions=request.n_suggestions
-        )
+        suggestions = await cancel_on_disconnect(http_request, ai_service.rephrase_text(project_id=project_id, request_data=request), "rephrase")
         logger.info(f"Successfully generated rephrasing suggestions for project {project_id}")
         return AIRephraseResponse(suggestions=suggestions)
+    except HTTPException as http_exc:
+        raise http_exc
     except FileNotFoundError as e:
         logger.warning(f"Project or context file not found during rephrase: {project_id}/{request.context_path}. Error: {e}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project '{project_id}' or context file not found.")
@@ -141,6 +160,7 @@ async def rephrase_selection(
 async def split_chapter(
     project_id: str,
     chapter_id: str,
+    http_request: Request,
     request_data: AIChapterSplitRequest = Body(...),
     ai_service: AIService = Depends(get_ai_service)
 ):
@@ -152,13 +172,15 @@ async def split_chapter(
         if not request_data.chapter_content:
              raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="chapter_content cannot be empty.")
 
-        proposed_scenes = await ai_service.split_chapter_into_scenes(
+        proposed_scenes = await cancel_on_disconnect(http_request, ai_service.split_chapter_into_scenes(
             project_id=project_id,
             chapter_id=chapter_id,
             request_data=request_data
-        )
+        ), "split_chapter")
         logger.info(f"Successfully proposed scene splits for project {project_id}, chapter {chapter_id}")
         return AIChapterSplitResponse(proposed_scenes=proposed_scenes)
+    except HTTPException as http_exc:
+        raise http_exc
     except FileNotFoundError as e:
         logger.warning(f"Project or chapter not found during chapter split: {project_id}/{chapter_id}. Error: {e}")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project '{project_id}' or Chapter '{chapter_id}' not found.")
@@ -194,4 +216,34 @@ async def rebuild_index(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Project '{project_id}' not found.")
     except Exception as e:
         logger.exception(f"Error rebuilding index for project {project_id}: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to rebuild index: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to rebuild index: {str(e)}")
+
+
+# --- ADDED: Index garbage collection ---
+@router.post("/index_gc/{project_id}", response_model=IndexGCResponse)
+async def collect_index_garbage(
+    project_id: str,
+    dry_run: bool = Query(True, description="Only report orphaned/duplicate nodes, don't delete them"),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Finds index nodes of the project whose source file no longer exists or that duplicate another chunk,
+    and deletes them unless dry_run is set (the default).
+    """
+    logger.info(f"Received request to collect index garbage for project {project_id} (dry_run={dry_run})")
+    return await ai_service.collect_index_garbage(project_id, dry_run=dry_run)
+# --- END ADDED ---
+
+# --- ADDED: Source node lookup ---
+@router.get("/source_node/{project_id}/{node_id}", response_model=SourceNodeModel)
+async def get_source_node(
+    project_id: str,
+    node_id: str,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Full text and metadata of an indexed chunk, for source nodes returned as lean references
+    (AI responses with source_mode "lean", chat history).
+    """
+    return await ai_service.get_source_node(project_id, node_id)
+# --- END ADDED ---
@@ -22,6 +22,7 @@ from app.models.ai import (
 from app.models.common import Message, generate_uuid
 # --- END MODIFIED ---
 from app.services.file_service import file_service
+from app.core.config import settings
 from app.api.v1.endpoints.content_blocks import get_project_dependency
 import logging
 
@@ -232,6 +233,11 @@ async def update_chat_history(
              logger.warning(f"Attempting to update history for session {session_id} which has no metadata in project {project_id}")
              # Allow updating history even if metadata is missing
 
+        if settings.CHAT_HISTORY_SOURCE_REFERENCES:
+            # Store references to the source nodes, not copies of the chunks (full text: GET /ai/source_node/...)
+            for entry in history_in.history:
+                if entry.response and entry.response.source_nodes:
+                    entry.response.source_nodes = [node.lean(settings.AI_SOURCE_SNIPPET_CHARS) for node in entry.response.source_nodes]
         history_to_write = [entry.model_dump() for entry in history_in.history]
         file_service.write_chat_session_history(project_id, session_id, history_to_write)
         logger.info(f"Successfully updated chat history for session {session_id}, project {project_id}")
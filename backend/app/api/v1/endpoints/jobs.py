@@ -0,0 +1,176 @@
+# Copyright 2025 Antimortine
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, status, Body, Depends, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.models.ai import AIChapterSplitRequest, AIChapterSplitResponse, RebuildIndexResponse
+from app.models.job import Job, JobList, JobStatus, ExportJobRequest
+from app.services.ai_service import AIService, get_ai_service
+from app.services.export_service import export_service
+from app.services.job_service import job_service, JobContext
+from app.services.project_service import project_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Long-running operations as background jobs: submit (202 + job), then poll GET /jobs/{job_id} or follow
+# GET /jobs/{job_id}/events (Server-Sent Events), cancel with POST /jobs/{job_id}/cancel. The result of a
+# succeeded job has the same shape as the corresponding synchronous endpoint's response.
+
+EXPORT_PROGRESS_EVERY_BYTES = 1024 * 1024
+
+
+# --- Submission ---
+
+@router.post("/rebuild_index/{project_id}", response_model=Job, status_code=status.HTTP_202_ACCEPTED, summary="Rebuild Project Index (Job)")
+async def submit_rebuild_index(project_id: str, ai_service: AIService = Depends(get_ai_service)):
+    """
+    Background version of POST /ai/rebuild_index/{project_id}. Progress advances file by file; cancelling stops
+    the rebuild before the next file. Refused (409) while another rebuild of the project is queued or running.
+    """
+    project_service.get_by_id(project_id) # 404 before queueing
+
+    async def run(context: JobContext):
+        def on_file(done: int, total: int):
+            # Called from the rebuild's worker thread between files
+            context.raise_if_cancelled()
+            context.report(0.05 + 0.95 * done / total, f"Indexed {done} of {total} files")
+
+        context.report(0.05, "Rebuilding index")
+        deleted_count, indexed_count = await ai_service.rebuild_project_index(project_id, progress=on_file)
+        return RebuildIndexResponse(
+            success=True,
+            message=f"Successfully rebuilt index for project {project_id}.",
+            documents_deleted=deleted_count,
+            documents_indexed=indexed_count,
+        ).model_dump()
+
+    return job_service.submit("rebuild_index", run, project_id=project_id, cooperative_cancel=True, exclusive=True)
+
+
+@router.post("/split_chapter/{project_id}/{chapter_id}", response_model=Job, status_code=status.HTTP_202_ACCEPTED, summary="Split Chapter (Job)")
+async def submit_split_chapter(project_id: str, chapter_id: str, request_data: AIChapterSplitRequest = Body(...), ai_service: AIService = Depends(get_ai_service)):
+    """Background version of POST /ai/split/chapter/{project_id}/{chapter_id}."""
+    if not request_data.chapter_content:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="chapter_content cannot be empty.")
+    project_service.get_by_id(project_id)
+
+    async def run(context: JobContext):
+        context.report(0.05, "Splitting chapter")
+        proposed_scenes = await ai_service.split_chapter_into_scenes(project_id=project_id, chapter_id=chapter_id, request_data=request_data)
+        return AIChapterSplitResponse(proposed_scenes=proposed_scenes).model_dump()
+
+    return job_service.submit("split_chapter", run, project_id=project_id, params={"chapter_id": chapter_id, "chapter_chars": len(request_data.chapter_content)})
+
+
+@router.post("/export/{project_id}", response_model=Job, status_code=status.HTTP_202_ACCEPTED, summary="Export Manuscript (Job)")
+async def submit_export(project_id: str, request_data: ExportJobRequest = Body(ExportJobRequest())):
+    """
+    Background version of GET /projects/{project_id}/export: the manuscript is written to a file
+    that is downloaded from GET /jobs/{job_id}/download once the job has succeeded.
+    """
+    project_service.get_by_id(project_id)
+
+    def write_export(context: JobContext) -> dict:
+        if request_data.format == "zip":
+            chunks = export_service.stream_zip(project_id, include_titles=request_data.include_titles, separator=request_data.separator)
+            media_type, suffix = "application/zip", ".zip"
+        else:
+            chunks = export_service.stream_markdown(project_id, include_titles=request_data.include_titles, separator=request_data.separator)
+            media_type, suffix = "text/markdown; charset=utf-8", ".md"
+        output_path = context.output_path(suffix)
+        written = reported = 0
+        with open(output_path, "wb") as output:
+            for chunk in chunks:
+                context.raise_if_cancelled()
+                output.write(chunk)
+                written += len(chunk)
+                if written - reported >= EXPORT_PROGRESS_EVERY_BYTES:
+                    context.report(message=f"Written {written // 1024} KiB")
+                    reported = written
+        return {
+            "filename": export_service.get_export_filename(project_id, request_data.format),
+            "media_type": media_type,
+            "size_bytes": written,
+            "file": output_path.name,
+            "download_url": f"/api/v1/jobs/{context.job_id}/download",
+        }
+
+    async def run(context: JobContext):
+        context.report(0.05, "Exporting manuscript")
+        return await asyncio.to_thread(write_export, context)
+
+    return job_service.submit("export", run, project_id=project_id, params=request_data.model_dump(), cooperative_cancel=True)
+
+
+# --- Status, results and control ---
+
+@router.get("/", response_model=JobList, summary="List Jobs")
+async def list_jobs(project_id: Optional[str] = Query(None), kind: Optional[str] = Query(None)):
+    return JobList(jobs=job_service.list_jobs(project_id=project_id, kind=kind))
+
+
+@router.get("/{job_id}", response_model=Job, summary="Get Job")
+async def get_job(job_id: str):
+    return job_service.get(job_id)
+
+
+@router.get("/{job_id}/events", summary="Follow Job (Server-Sent Events)")
+async def job_events(job_id: str, request: Request):
+    """Streams the job as a `job` event after every status/progress change and closes when it has finished."""
+    updates = job_service.subscribe(job_id)
+    first = await updates.__anext__() # Raises the 404 before the stream starts
+
+    async def stream():
+        try:
+            job = first
+            while True:
+                yield f"event: job\ndata: {job.model_dump_json()}\n\n"
+                if job.status.finished or await request.is_disconnected():
+                    break
+                job = await updates.__anext__()
+        except StopAsyncIteration:
+            pass
+        finally:
+            await updates.aclose()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.post("/{job_id}/cancel", response_model=Job, summary="Cancel Job")
+async def cancel_job(job_id: str):
+    return job_service.cancel(job_id)
+
+
+@router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete Finished Job")
+async def delete_job(job_id: str):
+    job_service.delete(job_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{job_id}/download", summary="Download Job Output")
+async def download_job_output(job_id: str):
+    """The file produced by a succeeded export job."""
+    job = job_service.get(job_id)
+    if job.status != JobStatus.SUCCEEDED or not isinstance(job.result, dict) or "file" not in job.result:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} has no downloadable output (status: {job.status.value})")
+    path = job_service.directory / job.result["file"]
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=f"Output of job {job_id} is no longer available")
+    return FileResponse(path, media_type=job.result["media_type"], filename=job.result["filename"])
@@ -12,12 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from fastapi import APIRouter, HTTPException, status, Body, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Body, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Literal
+import re
+import unicodedata
+from urllib.parse import quote, unquote
 from app.models.project import ProjectCreate, ProjectUpdate, ProjectRead, ProjectList
 from app.models.common import Message
 # Import the specific service instance
 from app.services.project_service import project_service
+# --- ADDED: Import export_service ---
+from app.services.export_service import export_service
+# --- END ADDED ---
 import logging # Import logging
 
 router = APIRouter()
@@ -156,4 +163,61 @@ async def delete_project(project_id: str):
         raise e
     except Exception as e:
         logger.error(f"Unexpected error deleting project {project_id}: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal error deleting project {project_id}: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal error deleting project {project_id}: {e}")
+
+# --- ADDED: Manuscript Export Endpoint ---
+@router.get(
+    "/{project_id}/export",
+    tags=["Projects", "Compilation"],
+    summary="Export Manuscript",
+    description="Streams the whole manuscript (all chapters and scenes in order) as Markdown, or as a zip with one Markdown file per chapter.",
+    response_class=StreamingResponse,
+)
+async def export_project(
+    project_id: str,
+    export_format: Literal["markdown", "zip"] = Query("markdown", alias="format", description="'markdown' for a single file, 'zip' for one file per chapter."),
+    include_titles: bool = Query(True, description="Include scene titles as headings."),
+    separator_raw: str = Query("\n\n---\n\n", alias="separator", description="Separator string between scene blocks (URL-encoded newlines as %0A)."),
+):
+    """
+    Streams a project's manuscript. Scene files are read lazily while the response is sent,
+    so large projects are never assembled in memory.
+    Raises 404 if the project is not found.
+
+    - **project_id**: The UUID of the project to export.
+    - **format**: 'markdown' (default) or 'zip'.
+    - **include_titles**: Query parameter to control inclusion of scene titles.
+    - **separator**: Query parameter to control the separator between scenes. Use %0A for newlines.
+    """
+    separator = unquote(separator_raw)
+    logger.info(f"Received request to export project {project_id} as {export_format}")
+    try:
+        # Outline and project checks run before streaming starts, so 404s are still proper responses
+        if export_format == "zip":
+            body = export_service.stream_zip(project_id, include_titles=include_titles, separator=separator)
+            media_type = "application/zip"
+        else:
+            body = export_service.stream_markdown(project_id, include_titles=include_titles, separator=separator)
+            media_type = "text/markdown; charset=utf-8"
+        filename = export_service.get_export_filename(project_id, export_format)
+    except HTTPException as e:
+        logger.warning(f"HTTPException exporting project {project_id}: {e.status_code} - {e.detail}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error exporting project {project_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal error exporting project {project_id}: {e}")
+
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": content_disposition(filename)})
+
+def content_disposition(filename: str) -> str:
+    """
+    Attachment header for filename. Headers are latin-1, so a non-ASCII name is sent as an ASCII
+    fallback plus the UTF-8 name in filename* (RFC 6266 / RFC 5987).
+    """
+    if filename.isascii():
+        return f'attachment; filename="{filename}"'
+    stem, dot, extension = filename.rpartition(".")
+    ascii_stem = unicodedata.normalize("NFKD", stem).encode("ascii", "ignore").decode("ascii")
+    ascii_stem = re.sub(r"[^A-Za-z0-9_-]+", "-", ascii_stem).strip("-") or "manuscript"
+    return f"attachment; filename=\"{ascii_stem}{dot}{extension}\"; filename*=UTF-8''{quote(filename, safe='')}"
+# --- END ADDED ---
@@ -14,7 +14,7 @@
 
 from fastapi import APIRouter, HTTPException, status, Body, Path, Depends
 from typing import List
-from app.models.scene import SceneCreate, SceneUpdate, SceneRead, SceneList
+from app.models.scene import SceneCreate, SceneUpdate, SceneRead, SceneList, SceneBatchCreate
 from app.models.common import Message
 # Import the specific service instance
 from app.services.scene_service import scene_service
@@ -70,6 +70,32 @@ async def create_scene(
     return scene_service.create(project_id=project_id, chapter_id=chapter_id, scene_in=scene_in)
 
 
+# --- ADDED: Batch creation ---
+@router.post(
+    "/batch",
+    response_model=SceneList,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create Scenes (Batch)",
+    description="Creates several scenes within the specified chapter in one request, e.g. when accepting AI chapter split proposals."
+)
+async def create_scenes_batch(
+    batch_in: SceneBatchCreate = Body(...),
+    ids: tuple[str, str] = Depends(get_chapter_dependency) # Ensures project & chapter exist
+):
+    """
+    Creates several scenes for a given chapter. Chapter metadata is written once and
+    all new scenes are indexed in a single batch.
+    Raises 409 if an explicit order conflicts with an existing scene or another scene in the batch.
+
+    - **project_id**: The UUID of the parent project (in path).
+    - **chapter_id**: The UUID of the parent chapter (in path).
+    - **batch_in**: SceneBatchCreate model containing the list of scenes to create.
+    """
+    project_id, chapter_id = ids
+    return scene_service.create_batch(project_id=project_id, chapter_id=chapter_id, batch_in=batch_in)
+# --- END ADDED ---
+
+
 @router.get(
     "/",
     response_model=SceneList,
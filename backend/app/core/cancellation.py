@@ -0,0 +1,75 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.core.metrics import AI_REQUESTS_CANCELLED
+
+logger = logging.getLogger(__name__)
+
+# Cancellation of AI requests whose client went away. FastAPI keeps awaiting an endpoint after the client
+# disconnects, so a closed tab would still pay for retrieval, every retry (with its backoff sleeps) and the
+# LLM call. cancel_on_disconnect() runs the service call as a task next to a listener for the ASGI
+# "http.disconnect" message; once the client is gone the task is cancelled. The CancelledError unwinds the
+# tenacity retry loop (it is not retryable) and the pending LLM HTTP request. Work a pipeline has handed to
+# a thread (file reads, vector search) finishes in the background, but nothing is awaited after it.
+#
+# The listener awaits request.receive() rather than polling request.is_disconnected(): the endpoint has
+# already read the body, so the next message is the disconnect, and the polling check never sees it through
+# BaseHTTPMiddleware (the metrics/timing middleware in app/main.py).
+
+# Non-standard status (nginx's "Client Closed Request"); nobody receives it, it only shows up in logs and metrics
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+
+async def _wait_for_disconnect(request: Request):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], operation: str) -> T:
+    """Awaits the service call, cancelling it and raising HTTPException(499) if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+    if not settings.AI_CANCEL_ON_DISCONNECT:
+        return await task
+    listener = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, listener}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        listener.cancel()
+    if task.done():
+        return task.result()
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e: # Finished with an error while being cancelled; the client is gone either way
+        logger.debug("Cancelled %s request ended with %s", operation, type(e).__name__)
+    AI_REQUESTS_CANCELLED.inc(operation=operation)
+    logger.info("Client disconnected; cancelled %s request %s %s", operation, request.method, request.url.path)
+    raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
@@ -16,6 +16,7 @@ from pydantic_settings import BaseSettings
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
 
 load_dotenv() # Loads variables from .env file
 
@@ -25,21 +26,161 @@ BASE_PROJECT_DIR: Path = Path(os.getenv("BASE_PROJECT_DIR", "user_projects"))
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Codex AI"
     API_V1_STR: str = "/api/v1"
-    GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
+    GOOGLE_API_KEY: Optional[str] = os.getenv("GOOGLE_API_KEY") # Only required with LLM_PROVIDER=google
 
     # --- RAG Configuration ---
     RAG_QUERY_SIMILARITY_TOP_K: int = int(os.getenv("RAG_QUERY_SIMILARITY_TOP_K", 7))
     RAG_GENERATION_SIMILARITY_TOP_K: int = int(os.getenv("RAG_GENERATION_SIMILARITY_TOP_K", 7))
     RAG_REPHRASE_SUGGESTION_COUNT: int = int(os.getenv("RAG_REPHRASE_SUGGESTION_COUNT", 3))
     RAG_GENERATION_PREVIOUS_SCENE_COUNT: int = int(os.getenv("RAG_GENERATION_PREVIOUS_SCENE_COUNT", 3))
+    # Indexed files are split into content-defined chunks of whole paragraphs (see app/rag/chunking.py),
+    # so an edit only re-embeds the chunks it touches.
+    RAG_CHUNK_MIN_CHARS: int = int(os.getenv("RAG_CHUNK_MIN_CHARS", 400))
+    RAG_CHUNK_MAX_CHARS: int = int(os.getenv("RAG_CHUNK_MAX_CHARS", 1500))
+    # Fuse BM25 keyword results (per-project inverted index) with dense results via reciprocal rank fusion.
+    RAG_HYBRID_RETRIEVAL: bool = os.getenv("RAG_HYBRID_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+    RAG_HYBRID_RRF_K: int = int(os.getenv("RAG_HYBRID_RRF_K", 60))
+    # Optional rerank stage: over-retrieve RAG_RERANK_CANDIDATES nodes, score them with a local cross-encoder
+    # and keep the best RAG_RERANK_TOP_N, scoring in batches until RAG_RERANK_BUDGET_MS is spent.
+    RAG_RERANK_ENABLED: bool = os.getenv("RAG_RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+    RAG_RERANK_MODEL: str = os.getenv("RAG_RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+    RAG_RERANK_CANDIDATES: int = int(os.getenv("RAG_RERANK_CANDIDATES", 20))
+    RAG_RERANK_TOP_N: int = int(os.getenv("RAG_RERANK_TOP_N", 4))
+    RAG_RERANK_BATCH_SIZE: int = int(os.getenv("RAG_RERANK_BATCH_SIZE", 8))
+    RAG_RERANK_BUDGET_MS: int = int(os.getenv("RAG_RERANK_BUDGET_MS", 300))
 
     # --- LLM Configuration ---
     LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", 0.7))
+    # "google" (Gemini, needs GOOGLE_API_KEY) or "stub" (local offline StubLLM for load tests and benchmarks,
+    # see app/rag/stub_models.py; answers in the expected formats but without meaning).
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "google").lower()
+    # StubLLM behaviour: first-token latency (median, ms) drawn from STUB_LLM_LATENCY_DISTRIBUTION (fixed,
+    # uniform, normal, lognormal, exponential) with STUB_LLM_LATENCY_JITTER_MS spread, generation speed
+    # (0 = instant), and the probabilities of failing with a 500 or a 429.
+    STUB_LLM_LATENCY_MS: float = float(os.getenv("STUB_LLM_LATENCY_MS", 0))
+    STUB_LLM_LATENCY_DISTRIBUTION: str = os.getenv("STUB_LLM_LATENCY_DISTRIBUTION", "fixed").lower()
+    STUB_LLM_LATENCY_JITTER_MS: float = float(os.getenv("STUB_LLM_LATENCY_JITTER_MS", 0))
+    STUB_LLM_TOKENS_PER_SECOND: float = float(os.getenv("STUB_LLM_TOKENS_PER_SECOND", 0))
+    STUB_LLM_ERROR_RATE: float = float(os.getenv("STUB_LLM_ERROR_RATE", 0))
+    STUB_LLM_RATE_LIMIT_RATE: float = float(os.getenv("STUB_LLM_RATE_LIMIT_RATE", 0))
+    STUB_LLM_SEED: int = int(os.getenv("STUB_LLM_SEED", 0)) # Same seed, same sequence of latencies and failures
     # --- ADDED: Max Context Length ---
     # Max characters for truncating context elements (RAG nodes, project plan/synopsis, prev scenes)
     # Chapter plan/synopsis are currently NOT truncated by this.
     MAX_CONTEXT_LENGTH: int = int(os.getenv("MAX_CONTEXT_LENGTH", 15000))
     # --- END ADDED ---
+    # Concurrent identical AI requests (same operation, project, payload and index state) share one LLM call.
+    AI_COALESCE_REQUESTS: bool = os.getenv("AI_COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+    # AI endpoints cancel the pipeline (retries and the pending LLM call included) when the client disconnects.
+    AI_CANCEL_ON_DISCONNECT: bool = os.getenv("AI_CANCEL_ON_DISCONNECT", "true").lower() in ("1", "true", "yes")
+    # "full" source nodes carry the chunk text and metadata; "lean" ones only id, score, title and a snippet
+    # (full text via GET /ai/source_node/{project_id}/{node_id}). Requests can override it with source_mode.
+    AI_SOURCE_NODE_MODE: str = os.getenv("AI_SOURCE_NODE_MODE", "full").lower()
+    AI_SOURCE_SNIPPET_CHARS: int = int(os.getenv("AI_SOURCE_SNIPPET_CHARS", 200))
+    # Chat history stores lean references to the source nodes of its answers instead of copies of the chunks.
+    CHAT_HISTORY_SOURCE_REFERENCES: bool = os.getenv("CHAT_HISTORY_SOURCE_REFERENCES", "true").lower() in ("1", "true", "yes")
+
+    # --- Vector Store Configuration ---
+    # "none" (one shared collection), "project" (one collection per project) or "bucket" (projects hashed into
+    # CHROMA_SHARD_BUCKETS collections). Migrate an existing store with: python -m app.rag.sharding --mode <mode>
+    CHROMA_SHARDING: str = os.getenv("CHROMA_SHARDING", "none").lower()
+    CHROMA_SHARD_BUCKETS: int = int(os.getenv("CHROMA_SHARD_BUCKETS", 16))
+    # HNSW parameters for new collections (empty/0 = Chroma default). Existing collections keep theirs until
+    # compacted offline with: python -m app.rag.vector_maintenance compact
+    CHROMA_HNSW_SPACE: str = os.getenv("CHROMA_HNSW_SPACE", "").lower() # "l2", "cosine" or "ip"
+    CHROMA_HNSW_M: int = int(os.getenv("CHROMA_HNSW_M", 0))
+    CHROMA_HNSW_CONSTRUCTION_EF: int = int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", 0))
+    CHROMA_HNSW_SEARCH_EF: int = int(os.getenv("CHROMA_HNSW_SEARCH_EF", 0))
+
+    # Background cleanup of orphaned/duplicate index nodes for every project (0 = disabled; also: POST /ai/index_gc/{project_id}).
+    INDEX_GC_INTERVAL_HOURS: float = float(os.getenv("INDEX_GC_INTERVAL_HOURS", 0))
+    INDEX_GC_DRY_RUN: bool = os.getenv("INDEX_GC_DRY_RUN", "false").lower() in ("1", "true", "yes") # Only log what would be deleted
+
+    # --- Embedding Backend Configuration ---
+    EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    # "torch" (HuggingFaceEmbedding), "onnx" (same model exported to ONNX Runtime, CPU only) or "stub"
+    # (offline hashed bag-of-words StubEmbedding; its vectors differ, so keep its ./chroma_db apart).
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    EMBEDDING_ONNX_DIR: str = os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx")
+    EMBEDDING_ONNX_QUANTIZE: bool = os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes")
+    EMBEDDING_ONNX_THREADS: int = int(os.getenv("EMBEDDING_ONNX_THREADS", 0)) # 0 = ONNX Runtime default
+    # Startup check that ONNX vectors match torch closely enough for existing indexes (result cached per model file).
+    EMBEDDING_ONNX_SELF_CHECK: bool = os.getenv("EMBEDDING_ONNX_SELF_CHECK", "true").lower() in ("1", "true", "yes")
+    EMBEDDING_ONNX_MIN_COSINE: float = float(os.getenv("EMBEDDING_ONNX_MIN_COSINE", 0.98))
+
+    # --- Embedding Pool Configuration ---
+    # Use the shared embedding worker pool (python -m app.rag.embedding_pool) instead of loading the model per API worker.
+    EMBEDDING_POOL_ENABLED: bool = os.getenv("EMBEDDING_POOL_ENABLED", "false").lower() in ("1", "true", "yes")
+    EMBEDDING_POOL_HOST: str = os.getenv("EMBEDDING_POOL_HOST", "127.0.0.1")
+    EMBEDDING_POOL_PORT: int = int(os.getenv("EMBEDDING_POOL_PORT", 8765))
+    # Required with the pool: secret shared by the pool and the API workers (the connection can run code in the pool).
+    EMBEDDING_POOL_AUTHKEY: str = os.getenv("EMBEDDING_POOL_AUTHKEY", "")
+    EMBEDDING_POOL_WORKERS: int = int(os.getenv("EMBEDDING_POOL_WORKERS", 2))
+    EMBEDDING_POOL_BATCH_SIZE: int = int(os.getenv("EMBEDDING_POOL_BATCH_SIZE", 32))
+    EMBEDDING_POOL_MAX_WAIT_MS: int = int(os.getenv("EMBEDDING_POOL_MAX_WAIT_MS", 10)) # Micro-batching window
+    EMBEDDING_POOL_TIMEOUT_S: float = float(os.getenv("EMBEDDING_POOL_TIMEOUT_S", 120))
+
+    # --- Embedding Cache Configuration ---
+    # Persistent cache of chunk embeddings keyed by (model, text hash), so unchanged chunks are never re-embedded.
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./chroma_db/embedding_cache.sqlite3")
+    EMBEDDING_CACHE_MAX_MB: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", 512))
+
+    # --- File I/O Configuration ---
+    # Number of decoded text files kept in memory (keyed by path, mtime and size). 0 disables the cache.
+    FILE_CONTENT_CACHE_SIZE: int = int(os.getenv("FILE_CONTENT_CACHE_SIZE", 0))
+    # Convert UTF-16 project files (detected by BOM) to UTF-8 once at startup, before requests are served
+    # (or run python -m app.services.file_service). Saves always write UTF-8.
+    FILE_NORMALIZE_LEGACY_ENCODINGS: bool = os.getenv("FILE_NORMALIZE_LEGACY_ENCODINGS", "false").lower() in ("1", "true", "yes")
+
+    # --- Logging Configuration (see app/core/logging_config.py) ---
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    # Per-logger levels, e.g. "app.rag=DEBUG,chromadb=WARNING,httpx=WARNING"
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower() # text | json
+    # Write log records from a background thread instead of the calling (request) thread.
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+    # Keep only every N-th DEBUG/INFO record per call site of the chatty AI pipeline loggers (1 = keep all).
+    LOG_SAMPLE_EVERY: int = int(os.getenv("LOG_SAMPLE_EVERY", 1))
+    LOG_SAMPLED_LOGGERS: str = os.getenv("LOG_SAMPLED_LOGGERS", "app.services.ai_service,app.rag.query_processor,app.rag.scene_generator,app.rag.rephraser,app.rag.chapter_splitter,app.rag.engine")
+    # Log full prompts, retrieved context and note contents; otherwise only their hash and size are logged.
+    LOG_PROMPT_BODIES: bool = os.getenv("LOG_PROMPT_BODIES", "false").lower() in ("1", "true", "yes")
+
+    # --- Observability Configuration ---
+    # Per-stage timings of each request (see app/core/timing.py) in a Server-Timing response header.
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+    # The same stages as OpenTelemetry spans: "console" prints them to stdout, "otlp" sends them to the
+    # collector configured by the standard OTEL_EXPORTER_OTLP_ENDPOINT variable.
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "console").lower()
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "codex-ai-backend")
+    # Prometheus text-format metrics (request latency per route, LLM calls, embeddings, indexing, caches) at GET /metrics.
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Opt-in profiling of single requests (see app/core/profiling.py): requests sent with the PROFILING_HEADER
+    # header are profiled and the slowest PROFILING_KEEP_SLOWEST profiles are kept in PROFILING_DIR.
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILING_HEADER: str = os.getenv("PROFILING_HEADER", "X-Codex-Profile")
+    PROFILING_MODE: str = os.getenv("PROFILING_MODE", "sampling").lower() # sampling | cprofile
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", "./diagnostics/profiles")
+    PROFILING_KEEP_SLOWEST: int = int(os.getenv("PROFILING_KEEP_SLOWEST", 20))
+
+    # --- Background Job Configuration (see app/services/job_service.py) ---
+    # Job state and result files; relative paths are resolved against the working directory (like ./chroma_db).
+    JOBS_DIR: str = os.getenv("JOBS_DIR", "./jobs")
+    JOBS_MAX_WORKERS: int = int(os.getenv("JOBS_MAX_WORKERS", 2))
+    # Finished jobs and their results are deleted after this many hours.
+    JOBS_RETENTION_HOURS: float = float(os.getenv("JOBS_RETENTION_HOURS", 168))
+
+    # --- Export Configuration ---
+    # Max scene files read ahead (concurrently) while streaming a manuscript export.
+    EXPORT_READ_AHEAD: int = int(os.getenv("EXPORT_READ_AHEAD", 4))
+
+    # --- HTTP Caching Configuration (see app/core/http_cache.py) ---
+    # ETags / 304 responses on GETs and If-Match preconditions on updates of the project content API.
+    HTTP_CONDITIONAL_REQUESTS: bool = os.getenv("HTTP_CONDITIONAL_REQUESTS", "true").lower() in ("1", "true", "yes")
+    # gzip responses larger than this many bytes to clients that accept it; 0 disables compression.
+    HTTP_GZIP_MIN_BYTES: int = int(os.getenv("HTTP_GZIP_MIN_BYTES", 0))
 
 
 settings = Settings()
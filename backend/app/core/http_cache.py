@@ -0,0 +1,180 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import json
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import Request, status
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+from fastapi.responses import JSONResponse, Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Conditional requests for the project content API (everything under /api/v1/projects: project, chapter,
+# scene, note, character and chat listings and documents, plan/synopsis/world blocks):
+#   - 200 JSON responses to GET get an ETag, the hash of the body, and "Cache-Control: no-cache" (clients keep
+#     the copy but revalidate it). A GET whose If-None-Match matches gets an empty 304 instead of the body;
+#     representations with a "last_modified" timestamp (notes) also get Last-Modified / If-Modified-Since.
+#   - PUT/PATCH/DELETE with If-Match are only applied if the resource's current ETag (that of a GET of the
+#     same URL, made in-process through the router, so it is not logged or counted as a request) strongly
+#     matches; otherwise 412, so an editor never overwrites a newer version saved from another tab
+#     or device. Check and write happen under a per-URL lock; the response to an applied update carries the
+#     resource's new ETag for the next If-Match.
+# Responses the GZipMiddleware will compress (HTTP_GZIP_MIN_BYTES) get the ETag with a "-gzip" suffix: each
+# content coding needs its own strong validator (RFC 9110 8.8.3), or a shared cache could answer a 304 with a copy
+# in the wrong coding. Comparisons ignore the suffix, so an ETag from either coding works for If-Match/If-None-Match.
+
+CACHED_PATH_PREFIX = f"{settings.API_V1_STR}/projects"
+WRITE_METHODS = ("PUT", "PATCH", "DELETE")
+_LOCK_STRIPES = 64
+_locks = [asyncio.Lock() for _ in range(_LOCK_STRIPES)]
+# Request headers the GET of an If-Match check doesn't inherit from the write
+_SUBREQUEST_DROPPED_HEADERS = {b"content-length", b"content-type", b"if-match", b"if-none-match", b"if-modified-since", b"transfer-encoding"}
+GZIP_ETAG_SUFFIX = "-gzip"
+
+
+def compute_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip-coded representation of the response with ETag etag."""
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"'
+
+
+def _strip_coding(tag: str) -> str:
+    return tag[:-len(GZIP_ETAG_SUFFIX) - 1] + '"' if tag.endswith(f'{GZIP_ETAG_SUFFIX}"') else tag
+
+
+def _parse_etags(header: str, weak: bool) -> List[str]:
+    tags = [tag.strip() for tag in header.split(",") if tag.strip()]
+    return [_strip_coding(tag.removeprefix("W/") if weak else tag) for tag in tags]
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """
+    Whether an If-None-Match (weak comparison) or If-Match (weak=False: strong comparison, RFC 9110 13.1.1,
+    so W/ tags never match) header value lists etag (or is "*"), ignoring content-coding suffixes.
+    """
+    if not header:
+        return False
+    tags = _parse_etags(header, weak)
+    return "*" in tags or _strip_coding(etag) in tags
+
+
+def _will_be_gzipped(request: Request, body: bytes) -> bool:
+    """Whether the GZipMiddleware (main.py) will compress this response; mirrors its Accept-Encoding and size checks."""
+    return 0 < settings.HTTP_GZIP_MIN_BYTES <= len(body) and "gzip" in request.headers.get("accept-encoding", "")
+
+
+def _last_modified(body: bytes) -> Optional[float]:
+    if not body.startswith(b"{") or b'"last_modified"' not in body:
+        return None
+    try:
+        value = json.loads(body).get("last_modified")
+    except ValueError:
+        return None
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def _not_modified_since(header: Optional[str], last_modified: float) -> bool:
+    if not header:
+        return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+async def _current_etag(request: Request) -> Optional[str]:
+    """
+    ETag of a GET of the request's URL, run in-process through the router (not the middleware stack, so the
+    check is not logged, profiled or counted as a request); None if there is no such resource.
+    """
+    dropped = _SUBREQUEST_DROPPED_HEADERS | {settings.PROFILING_HEADER.lower().encode("latin-1")}
+    scope = dict(request.scope)
+    scope["method"] = "GET"
+    scope["headers"] = [(name, value) for name, value in request.scope["headers"] if name not in dropped]
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    try:
+        # The router needs the exit stack FastAPI's innermost middleware normally provides
+        await AsyncExitStackMiddleware(request.app.router)(scope, receive, send)
+    except StarletteHTTPException:
+        return None
+    start = next((message for message in messages if message["type"] == "http.response.start"), None)
+    if start is None or start["status"] != status.HTTP_200_OK:
+        return None
+    etag = dict(start.get("headers", [])).get(b"etag")
+    if etag is not None:
+        return etag.decode("latin-1")
+    return compute_etag(b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body"))
+
+
+async def conditional_requests(request: Request, call_next):
+    """HTTP middleware (registered in app/main.py when HTTP_CONDITIONAL_REQUESTS is enabled)."""
+    if not request.url.path.startswith(CACHED_PATH_PREFIX):
+        return await call_next(request)
+
+    if request.method in WRITE_METHODS and "if-match" in request.headers:
+        async with _locks[hash(request.url.path) % _LOCK_STRIPES]:
+            current = await _current_etag(request)
+            if current is None or not etag_matches(request.headers["if-match"], current, weak=False):
+                logger.info("Precondition failed for %s %s: If-Match %s, current %s", request.method, request.url.path, request.headers["if-match"], current)
+                return JSONResponse(
+                    status_code=status.HTTP_412_PRECONDITION_FAILED,
+                    content={"detail": "The resource was changed (or removed) since it was loaded. Reload it and try again."},
+                    headers={"ETag": current} if current else None,
+                )
+            response = await call_next(request)
+            if request.method != "DELETE" and 200 <= response.status_code < 300:
+                new_etag = await _current_etag(request) # Lets the client chain the next update without a GET
+                if new_etag is not None:
+                    response.headers["ETag"] = new_etag
+            return response
+
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != status.HTTP_200_OK or not response.headers.get("content-type", "").startswith("application/json"):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = compute_etag(body)
+    if _will_be_gzipped(request, body):
+        etag = gzip_etag(etag)
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    headers["ETag"] = etag
+    headers["Cache-Control"] = "no-cache"
+    last_modified = _last_modified(body)
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (if_none_match is None and last_modified is not None
+                                             and _not_modified_since(request.headers.get("if-modified-since"), last_modified)):
+        not_modified_headers = {name: value for name, value in headers.items() if name.lower() not in ("content-type", "content-encoding")}
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=not_modified_headers)
+    return Response(content=body, status_code=response.status_code, headers=headers)
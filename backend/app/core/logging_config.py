@@ -0,0 +1,149 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+# Logging setup of the backend (called once from app/main.py):
+#   - root level LOG_LEVEL, per-logger overrides from LOG_LEVELS ("app.rag=DEBUG,chromadb=WARNING")
+#   - "text" or "json" (one object per line) output on stderr
+#   - LOG_ASYNC: records are put on a queue and written by a background thread, so request handlers never
+#     wait on the log I/O
+#   - LOG_SAMPLE_EVERY: DEBUG/INFO records of the LOG_SAMPLED_LOGGERS (the chatty per-entity/per-node logs
+#     of the AI pipeline) are kept once every N times per call site; warnings and errors are never dropped
+#   - prompts, retrieved context and note contents are logged through loggable_text(), which is replaced by
+#     a hash and the size unless LOG_PROMPT_BODIES is set
+# Hot-path modules log with %-style arguments, so messages below the effective level are never formatted.
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+# Attributes every LogRecord has; anything else on a record came from `extra=` and goes into the JSON output
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class LoggableText:
+    """Lazily rendered stand-in for a large or sensitive text (prompt, context, note content) in log arguments."""
+    __slots__ = ("text",)
+
+    def __init__(self, text: Optional[str]):
+        self.text = text or ""
+
+    def __str__(self) -> str:
+        if settings.LOG_PROMPT_BODIES:
+            return self.text
+        digest = hashlib.sha256(self.text.encode("utf-8", errors="replace")).hexdigest()[:12]
+        return f"<redacted sha256:{digest} chars={len(self.text)}>"
+
+    __repr__ = __str__
+
+
+def loggable_text(text: Optional[str]) -> LoggableText:
+    return LoggableText(text)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class CallSiteSampler(logging.Filter):
+    """Keeps the first and then every n-th DEBUG/INFO record of each call site (file and line); higher levels pass."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """"app.rag=DEBUG, chromadb=warning" -> {"app.rag": 10, "chromadb": 30}; invalid entries are ignored."""
+    levels = {}
+    for entry in spec.split(","):
+        name, _, level = entry.partition("=")
+        level_number = logging.getLevelName(level.strip().upper())
+        if name.strip() and isinstance(level_number, int):
+            levels[name.strip()] = level_number
+    return levels
+
+
+def configure_logging():
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    for name, level in parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(_TEXT_FORMAT))
+
+    if settings.LOG_SAMPLE_EVERY > 1:
+        sampler = CallSiteSampler(settings.LOG_SAMPLE_EVERY)
+        for name in filter(None, (name.strip() for name in settings.LOG_SAMPLED_LOGGERS.split(","))):
+            logging.getLogger(name).addFilter(sampler)
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    if settings.LOG_ASYNC:
+        # Unbounded queue: a slow sink delays the output, never the request
+        log_queue: queue.Queue = queue.Queue(-1)
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        root.addHandler(_queue_handler)
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        root.addHandler(stream_handler)
+
+
+def shutdown_logging():
+    """Writes out the queued records and switches to synchronous output (called on application shutdown)."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener, _queue_handler = None, None
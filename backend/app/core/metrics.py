@@ -0,0 +1,263 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from google.api_core.exceptions import GoogleAPICallError, ResourceExhausted
+
+# In-process metrics in the Prometheus text exposition format (version 0.0.4), served by GET /metrics.
+# Counters, gauges and histograms with labels; values live in this process only (with several uvicorn
+# workers, each worker is a separate scrape target). No client library or external service needed.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROMPT_CHAR_BUCKETS = (1000, 2500, 5000, 10000, 20000, 40000, 80000, 160000, 320000)
+PROMPT_TOKEN_BUCKETS = tuple(chars // 4 for chars in PROMPT_CHAR_BUCKETS) # Same estimate as the processors' logs: 4 chars per token
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items()) or ([((), 0.0)] if not self.label_names else [])
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip([*self.buckets, math.inf], counts):
+                cumulative += bucket_count
+                labels = _format_labels((*self.label_names, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- HTTP ---
+HTTP_REQUESTS = registry.register(Counter("codex_http_requests_total", "HTTP requests by route template and status.", ["method", "route", "status"]))
+HTTP_REQUEST_DURATION = registry.register(Histogram("codex_http_request_duration_seconds", "HTTP request latency by route template.", ["method", "route"]))
+
+# --- Pipeline stages (app/core/timing.py); rag.vector_search is the Chroma query ---
+STAGE_DURATION = registry.register(Histogram("codex_stage_duration_seconds", "Duration of request pipeline stages (context loading, embedding, vector search, prompt, LLM, ...).", ["stage"]))
+
+# --- LLM (one call per attempt of the processors' tenacity-wrapped _execute_llm_complete) ---
+LLM_CALLS = registry.register(Counter("codex_llm_calls_total", "LLM call attempts by operation and outcome (ok, error, rate_limited, cancelled).", ["operation", "outcome"]))
+LLM_CALL_DURATION = registry.register(Histogram("codex_llm_call_duration_seconds", "LLM call attempt latency.", ["operation"]))
+LLM_RETRIES = registry.register(Counter("codex_llm_retries_total", "LLM calls retried after a retryable error.", ["operation"]))
+LLM_RATE_LIMITED = registry.register(Counter("codex_llm_rate_limited_total", "LLM call attempts rejected with a rate limit (HTTP 429).", ["operation"]))
+LLM_PROMPT_CHARS = registry.register(Histogram("codex_llm_prompt_chars", "Prompt size in characters.", ["operation"], buckets=PROMPT_CHAR_BUCKETS))
+LLM_PROMPT_TOKENS = registry.register(Histogram("codex_llm_prompt_estimated_tokens", "Estimated prompt size in tokens (characters / 4).", ["operation"], buckets=PROMPT_TOKEN_BUCKETS))
+
+# --- Embeddings (model calls only; embedding cache hits are counted in codex_cache_lookups_total) ---
+EMBEDDING_BATCH_SIZE = registry.register(Histogram("codex_embedding_batch_size", "Texts per embedding model call.", ["kind"], buckets=BATCH_SIZE_BUCKETS))
+EMBEDDING_BATCH_DURATION = registry.register(Histogram("codex_embedding_batch_duration_seconds", "Embedding model call latency.", ["kind"]))
+EMBEDDED_TEXTS = registry.register(Counter("codex_embedded_texts_total", "Texts embedded by the model (throughput: rate of this over rate of the duration sum).", ["kind"]))
+
+# --- Indexing ---
+INDEX_FILES_IN_PROGRESS = registry.register(Gauge("codex_index_files_in_progress", "Files queued in or undergoing an index_file/index_files call."))
+INDEXED_FILES = registry.register(Counter("codex_indexed_files_total", "Files passed to indexing."))
+
+# --- Caches ---
+CACHE_LOOKUPS = registry.register(Counter("codex_cache_lookups_total", "Cache lookups by cache (embedding, file_content) and result (hit, miss).", ["cache", "result"]))
+
+# --- AI request coalescing (app/core/singleflight.py) ---
+AI_REQUESTS_COALESCED = registry.register(Counter("codex_ai_requests_coalesced_total", "AI requests that joined an identical in-flight request instead of computing again.", ["operation"]))
+
+# --- AI requests abandoned by the client (app/core/cancellation.py) ---
+AI_REQUESTS_CANCELLED = registry.register(Counter("codex_ai_requests_cancelled_total", "AI requests cancelled because the client disconnected before the response.", ["operation"]))
+
+
+def is_rate_limit_error(exception: BaseException) -> bool:
+    """Same classification as the processors' retry predicates: a Google API 429 / ResourceExhausted."""
+    if not isinstance(exception, GoogleAPICallError):
+        return False
+    return (isinstance(exception, ResourceExhausted) or getattr(exception, "status_code", None) == 429
+            or "429" in str(getattr(exception, "message", "")))
+
+
+@contextmanager
+def track_llm_call(operation: str, prompt_chars: int):
+    """Records one LLM call attempt: prompt size, latency and outcome (ok, error, rate_limited, cancelled)."""
+    LLM_PROMPT_CHARS.observe(prompt_chars, operation=operation)
+    LLM_PROMPT_TOKENS.observe(prompt_chars // 4, operation=operation)
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        outcome = "rate_limited" if is_rate_limit_error(e) else "error"
+        if outcome == "rate_limited":
+            LLM_RATE_LIMITED.inc(operation=operation)
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        LLM_CALL_DURATION.observe(time.perf_counter() - start, operation=operation)
+        LLM_CALLS.inc(operation=operation, outcome=outcome)
+
+
+def llm_retry_hook(operation: str) -> Callable:
+    """tenacity before_sleep callback counting retries of an operation's LLM call."""
+    def _before_sleep(retry_state):
+        LLM_RETRIES.inc(operation=operation)
+    return _before_sleep
+
+
+def observe_cache_lookups(cache: str, hits: int, misses: int):
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=cache, result="miss")
+
+
+def route_label(scope: Optional[dict]) -> str:
+    """Route template of a request (e.g. /api/v1/projects/{project_id}), so label cardinality stays bounded."""
+    route = (scope or {}).get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,188 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Opt-in profiling of single requests. With PROFILING_ENABLED, a request carrying the PROFILING_HEADER
+# header (any value but "0"/"false") is run under a profiler and the profile is written to PROFILING_DIR:
+#   - "sampling" (default): a background thread samples the Python stacks of the process every
+#     PROFILING_INTERVAL_MS and writes them in the folded format ("frame;frame;frame count" lines) read by
+#     flamegraph.pl, speedscope and inferno. Includes the worker threads the request offloads to.
+#   - "cprofile": deterministic cProfile of the event loop thread, written as .prof (snakeviz, flameprof,
+#     pstats). Higher overhead, and work done in worker threads is not seen.
+# Only the PROFILING_KEEP_SLOWEST slowest profiles are kept; faster ones are deleted. One request is profiled
+# at a time: the profilers are process-wide, so overlapping profiles would mix requests.
+
+MODE_SAMPLING = "sampling"
+MODE_CPROFILE = "cprofile"
+_EXTENSIONS = {MODE_SAMPLING: ".folded", MODE_CPROFILE: ".prof"}
+_DURATION_PATTERN = re.compile(r"-(\d+)ms\.(folded|prof)$")
+# Leaf frames of threads that are just waiting for work; their samples are dropped (the event loop thread is always kept)
+_IDLE_LEAF_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py")
+
+
+class StackSampler:
+    """Samples the stacks of all Python threads (except its own) in a daemon thread and counts folded stacks."""
+
+    def __init__(self, interval_s: float, main_thread_id: int):
+        self.interval_s = interval_s
+        self.main_thread_id = main_thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != self.main_thread_id and frame.f_code.co_filename.endswith(_IDLE_LEAF_FILES):
+                    continue
+                self.stacks[self._fold(names.get(thread_id, str(thread_id)), frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _fold(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{getattr(code, 'co_qualname', code.co_name)} ({Path(code.co_filename).name}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    def __init__(self, directory: Path, keep_slowest: int, mode: str = MODE_SAMPLING, interval_ms: float = 5.0):
+        self.directory = directory
+        self.keep_slowest = max(1, keep_slowest)
+        self.mode = mode if mode in _EXTENSIONS else MODE_SAMPLING
+        self.interval_s = max(interval_ms, 0.5) / 1000
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._profiles: Optional[List[Dict]] = None # Kept profiles, slowest first; loaded from the directory on first use
+
+    def requested(self, headers) -> bool:
+        value = headers.get(settings.PROFILING_HEADER)
+        return value is not None and value.lower() not in ("0", "false", "no")
+
+    @contextmanager
+    def profile(self, method: str, path: str):
+        """
+        Profiles the enclosed block. Yields a dict that is filled with the profile's "file" name (or None if
+        the profile was not kept) when the block exits. If another request is being profiled, the block runs
+        unprofiled and "skipped" is set.
+        """
+        result: Dict = {"file": None, "skipped": False}
+        if not self._busy.acquire(blocking=False):
+            logger.warning(f"Profiling of {method} {path} skipped: another request is being profiled.")
+            result["skipped"] = True
+            yield result
+            return
+        start = time.perf_counter()
+        sampler = profiler = None
+        try:
+            if self.mode == MODE_CPROFILE:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                sampler = StackSampler(self.interval_s, threading.get_ident())
+                sampler.start()
+            try:
+                yield result
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                if sampler is not None:
+                    sampler.stop()
+                duration_ms = (time.perf_counter() - start) * 1000
+                try:
+                    result["file"] = self._store(method, path, duration_ms, profiler, sampler)
+                except Exception as e:
+                    logger.error(f"Failed to save profile of {method} {path}: {e}", exc_info=True)
+        finally:
+            self._busy.release()
+
+    def _store(self, method: str, path: str, duration_ms: float, profiler: Optional[cProfile.Profile], sampler: Optional[StackSampler]) -> Optional[str]:
+        with self._lock:
+            profiles = self._load()
+            if len(profiles) >= self.keep_slowest and duration_ms <= profiles[-1]["duration_ms"]:
+                logger.info(f"Profile of {method} {path} ({duration_ms:.0f} ms) discarded: faster than the {self.keep_slowest} kept.")
+                return None
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:80] or "root"
+            name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{method}-{slug}-{int(duration_ms)}ms{_EXTENSIONS[self.mode]}"
+            self.directory.mkdir(parents=True, exist_ok=True)
+            file_path = self.directory / name
+            if profiler is not None:
+                profiler.dump_stats(str(file_path))
+            else:
+                file_path.write_text(sampler.folded(), encoding="utf-8")
+            profiles.append({"file": name, "method": method, "path": path, "duration_ms": round(duration_ms, 1)})
+            profiles.sort(key=lambda entry: entry["duration_ms"], reverse=True)
+            for evicted in profiles[self.keep_slowest:]:
+                (self.directory / evicted["file"]).unlink(missing_ok=True)
+            del profiles[self.keep_slowest:]
+        logger.info(f"Saved profile of {method} {path} ({duration_ms:.0f} ms) to {file_path}")
+        return name
+
+    def _load(self) -> List[Dict]:
+        if self._profiles is None:
+            self._profiles = []
+            if self.directory.is_dir():
+                for file_path in self.directory.iterdir():
+                    match = _DURATION_PATTERN.search(file_path.name)
+                    if match:
+                        self._profiles.append({"file": file_path.name, "method": None, "path": None, "duration_ms": float(match.group(1))})
+            self._profiles.sort(key=lambda entry: entry["duration_ms"], reverse=True)
+        return self._profiles
+
+    def slowest(self) -> List[Dict]:
+        """The kept profiles, slowest first (method/path are None for profiles found on disk at startup)."""
+        with self._lock:
+            return [dict(entry) for entry in self._load()]
+
+
+request_profiler = RequestProfiler(
+    Path(settings.PROFILING_DIR),
+    keep_slowest=settings.PROFILING_KEEP_SLOWEST,
+    mode=settings.PROFILING_MODE,
+    interval_ms=settings.PROFILING_INTERVAL_MS,
+)
@@ -0,0 +1,70 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.core.metrics import AI_REQUESTS_COALESCED
+
+logger = logging.getLogger(__name__)
+
+# In-flight request coalescing ("singleflight"): concurrent calls with the same key share one computation
+# and all get its result (or exception). Nothing is cached: the key is forgotten as soon as the computation
+# finishes, so a later identical call computes again. The computation runs as its own task and is only
+# cancelled once every caller waiting for it has been cancelled.
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Tuple[Hashable, ...], compute: Callable[[], Awaitable[T]]) -> T:
+        """Runs compute() unless an identical call (same key) is already running, in which case its result is shared."""
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        if flight is not None and flight.task.get_loop() is loop and not flight.task.done():
+            AI_REQUESTS_COALESCED.inc(operation=str(key[0]))
+            logger.info("Coalescing %s request with an identical in-flight one.", key[0])
+        else:
+            flight = _Flight(loop.create_task(compute()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel() # Last caller gone: nobody needs the result anymore
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,171 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import inspect
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Per-stage latency of a request (entity list, context loading, query embedding, vector search, prompt
+# assembly, LLM call, ...). Stages are recorded in the request's RequestTimings (returned to the client
+# as a Server-Timing header by the middleware in app/main.py) and, when TRACING_ENABLED, as OpenTelemetry
+# spans nested under one span per request. Every stage is also observed in the codex_stage_duration_seconds histogram.
+#
+# Usage: `with stage("rag.vector_search"): ...` around a block, @timed("ai.load_context") on a function,
+# or record_stage(name, started_at) for a long inline section that started at time.perf_counter() == started_at.
+# Stages work outside requests too (background indexing), they are then only traced.
+
+_request_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+_tracer = None
+_tracer_provider = None
+
+
+class RequestTimings:
+    """Durations of the stages of one request, in the order they finished."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, duration_ms: float):
+        self.stages.append((name, duration_ms))
+
+    def server_timing(self, total_ms: Optional[float] = None) -> str:
+        """Server-Timing header value. Repeated stages (e.g. LLM retries) are summed, with the count as description."""
+        aggregated: Dict[str, List[float]] = {}
+        for name, duration_ms in self.stages:
+            aggregated.setdefault(name, []).append(duration_ms)
+        entries = []
+        for name, durations in aggregated.items():
+            entry = f"{name};dur={sum(durations):.1f}"
+            if len(durations) > 1:
+                entry += f';desc="{len(durations)}x"'
+            entries.append(entry)
+        if total_ms is not None:
+            entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+
+def begin_request() -> Tuple[RequestTimings, Token]:
+    """Starts collecting stage timings for the current request (context); pass the token to end_request()."""
+    timings = RequestTimings()
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token: Token):
+    _request_timings.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
+
+
+def _span(name: str, attributes: Dict, start_time_ns: Optional[int] = None):
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes or None, start_time=start_time_ns)
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Times the enclosed block as stage `name` (also on error); attributes are added to the OpenTelemetry span."""
+    start = time.perf_counter()
+    try:
+        with _span(name, attributes):
+            yield
+    finally:
+        duration_s = time.perf_counter() - start
+        STAGE_DURATION.observe(duration_s, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.add(name, duration_s * 1000)
+
+
+def record_stage(name: str, started_at: float, **attributes):
+    """Records a stage that started at time.perf_counter() == started_at and ends now."""
+    duration_s = time.perf_counter() - started_at
+    STAGE_DURATION.observe(duration_s, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(name, duration_s * 1000)
+    if _tracer is not None:
+        end_time_ns = time.time_ns()
+        span = _tracer.start_span(name, attributes=attributes or None, start_time=end_time_ns - int(duration_s * 1e9))
+        span.end(end_time=end_time_ns)
+
+
+def timed(name: str):
+    """Decorator: every call of the (sync or async) function is a stage."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_span(method: str, path: str):
+    """Root OpenTelemetry span of a request (stages become its children); a no-op when tracing is disabled."""
+    return _span(f"{method} {path}", {"http.request.method": method, "url.path": path})
+
+
+def configure_tracing():
+    """
+    Sets up OpenTelemetry export when TRACING_ENABLED: spans are printed to stdout ("console", works offline)
+    or sent to an OTLP collector ("otlp", endpoint from the standard OTEL_EXPORTER_OTLP_* variables).
+    Uses its own tracer provider, so the global one (and Chroma's telemetry) is left alone.
+    """
+    global _tracer, _tracer_provider
+    if not settings.TRACING_ENABLED or _tracer is not None:
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        if settings.TRACING_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = ConsoleSpanExporter()
+        provider = TracerProvider(resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    except Exception as e:
+        logger.error(f"OpenTelemetry tracing unavailable, continuing with Server-Timing only: {e}", exc_info=True)
+        return
+    _tracer_provider = provider
+    _tracer = provider.get_tracer("codex-ai")
+    logger.info(f"OpenTelemetry tracing enabled ({settings.TRACING_EXPORTER} exporter).")
+
+
+def shutdown_tracing():
+    """Flushes pending spans (called on application shutdown)."""
+    global _tracer, _tracer_provider
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+    _tracer, _tracer_provider = None, None
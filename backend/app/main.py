@@ -12,20 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 import logging
 import traceback
 import time
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+from app.core.config import settings
+from app.core.logging_config import configure_logging, shutdown_logging
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Import the main API router
 from app.api.v1.api import api_router
+from app.core.timing import begin_request, end_request, request_span, configure_tracing, shutdown_tracing
+from app.core.metrics import registry, CONTENT_TYPE, HTTP_REQUESTS, HTTP_REQUEST_DURATION, route_label
+from app.core.profiling import request_profiler
+from app.core.http_cache import conditional_requests
 # --- REMOVED: Initializers (instances created at module level now) ---
 # from app.rag.index_manager import initialize_index_manager
 # from app.rag.engine import initialize_rag_engine
@@ -63,33 +71,82 @@ async def lifespan(app: FastAPI):
         # For now, log critical error and continue startup.
     # --- END ADDED ---
 
+    if settings.FILE_NORMALIZE_LEGACY_ENCODINGS:
+        # Before any request is served, so the conversion can't race a save
+        from app.services.file_service import file_service
+        converted_paths = await asyncio.to_thread(file_service.normalize_legacy_encodings)
+        logger.info(f"Lifespan: Converted {len(converted_paths)} legacy UTF-16 file(s) to UTF-8.")
+
+    # --- ADDED: Scheduled index garbage collection ---
+    gc_task = None
+    if settings.INDEX_GC_INTERVAL_HOURS > 0:
+        from app.rag.index_gc import run_scheduled_gc
+        gc_task = asyncio.create_task(run_scheduled_gc(settings.INDEX_GC_INTERVAL_HOURS, settings.INDEX_GC_DRY_RUN))
+    # --- END ADDED ---
+    from app.services.job_service import job_service
+    job_cleanup_task = asyncio.create_task(job_service.run_scheduled_cleanup())
+
+    configure_tracing()
+
     print("Lifespan: Startup complete.")
 
     yield # The application runs while yielded
 
     # Code to run on shutdown
     logger.info("Lifespan: Shutting down Codex AI Backend...")
+    if gc_task:
+        gc_task.cancel()
+    job_cleanup_task.cancel()
+    job_service.shutdown()
+    shutdown_tracing()
+    shutdown_logging()
     print("Lifespan: Shutdown complete.")
 
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title="Codex AI Backend", lifespan=lifespan)
 
+# --- ADDED: ETags and conditional requests (registered first, so it runs inside the logging/metrics middleware) ---
+if settings.HTTP_CONDITIONAL_REQUESTS:
+    app.middleware("http")(conditional_requests)
+# --- END ADDED ---
+
 
 # --- Request Logging Middleware ---
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
     logger.info(f"MIDDLEWARE: Incoming request: {request.method} {request.url.path}")
+    # --- ADDED: Per-stage timings (Server-Timing header / OpenTelemetry spans) ---
+    timings, timings_token = begin_request()
+    status_code = 500
+    # --- END ADDED ---
+    # --- ADDED: Opt-in profiling of this request ---
+    profiling = settings.PROFILING_ENABLED and request_profiler.requested(request.headers)
+    profile_context = request_profiler.profile(request.method, request.url.path) if profiling else nullcontext({})
+    # --- END ADDED ---
     try:
-        response = await call_next(request)
+        with request_span(request.method, request.url.path), profile_context as profile:
+            response = await call_next(request)
+        status_code = response.status_code
+        if profile.get("file"):
+            response.headers["X-Codex-Profile-File"] = profile["file"]
         process_time = time.time() - start_time
         logger.info(f"MIDDLEWARE: Finished request: {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.4f}s")
+        if settings.SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = timings.server_timing(total_ms=process_time * 1000)
         return response
     except Exception as e:
         process_time = time.time() - start_time
         logger.error(f"MIDDLEWARE: Exception during request: {request.method} {request.url.path} - Error: {e} - Time: {process_time:.4f}s", exc_info=True)
         raise e
+    finally:
+        end_request(timings_token)
+        # --- ADDED: Request metrics, labelled with the route template ---
+        route = route_label(request.scope)
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=str(status_code))
+        HTTP_REQUEST_DURATION.observe(time.time() - start_time, method=request.method, route=route)
+        # --- END ADDED ---
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -102,6 +159,10 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # --- CORS Middleware ---
 origins = [ "http://localhost", "http://127.0.0.1", "http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:5173", "http://127.0.0.1:5173", ]
+# --- ADDED: Response compression ---
+if settings.HTTP_GZIP_MIN_BYTES > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.HTTP_GZIP_MIN_BYTES)
+# --- END ADDED ---
 app.add_middleware( CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"], expose_headers=["*"] )
 
 # --- Root Endpoint / Health Check ---
@@ -116,5 +177,17 @@ async def test_endpoint():
     logger.debug("Test endpoint handler called!")
     return {"status": "test successful"}
 
+# --- Metrics Endpoint (Prometheus text format) ---
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+# --- Profiles of the slowest profiled requests ---
+if settings.PROFILING_ENABLED:
+    @app.get("/diagnostics/profiles", include_in_schema=False)
+    async def list_profiles():
+        return {"directory": str(request_profiler.directory.resolve()), "mode": request_profiler.mode, "profiles": request_profiler.slowest()}
+
 # --- Include API Routers ---
 app.include_router(api_router, prefix="/api/v1")
\ No newline at end of file
@@ -12,19 +12,47 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict # Import Dict
+from typing import Optional, List, Dict, Literal # Import Dict
 from .common import IDModel, generate_uuid # Import generate_uuid
 
+# "full": source nodes with chunk text and metadata; "lean": id, score, title and snippet only
+SourceMode = Literal["full", "lean"]
+# Metadata kept on lean source nodes (enough for the frontend to label the source)
+LEAN_METADATA_KEYS = ("document_type", "document_title", "chapter_id", "chapter_title", "file_path")
+
 # --- Query Models ---
 class AIQueryRequest(BaseModel):
     query: str = Field(..., description="The user's question or query text.")
+    source_mode: Optional[SourceMode] = Field(None, description="'full' or 'lean' source nodes in the response (defaults to AI_SOURCE_NODE_MODE).")
 
 class SourceNodeModel(BaseModel):
      id: str = Field(..., description="The unique ID of the source node/chunk.")
-     text: str = Field(..., description="The text content of the source node/chunk.")
+     text: Optional[str] = Field(None, description="The text content of the source node/chunk (omitted from lean source nodes).")
      score: Optional[float] = Field(None, description="The similarity score of the node (if applicable).")
      metadata: Optional[dict] = Field(None, description="Metadata associated with the node (e.g., file_path, project_id).")
+     title: Optional[str] = Field(None, description="Title of the document the node belongs to (lean source nodes).")
+     snippet: Optional[str] = Field(None, description="Beginning of the node's text (lean source nodes).")
+
+     def lean(self, snippet_chars: int) -> "SourceNodeModel":
+         """Reference to this node: id, score, title, snippet and the labelling metadata, without the chunk text."""
+         metadata = self.metadata or {}
+         snippet = self.snippet if self.text is None else make_snippet(self.text, snippet_chars)
+         return SourceNodeModel(
+             id=self.id, score=self.score, title=self.title or metadata.get("document_title"), snippet=snippet,
+             metadata={key: metadata[key] for key in LEAN_METADATA_KEYS if key in metadata} or None,
+         )
+
+def make_snippet(text: str, max_chars: int) -> str:
+    """The text with collapsed whitespace, cut at a word boundary to at most max_chars (plus an ellipsis)."""
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + "…"
 
 class AIQueryResponse(BaseModel):
     answer: str = Field(..., description="The AI-generated answer.")
@@ -36,6 +64,7 @@ class AISceneGenerationRequest(BaseModel):
     prompt_summary: Optional[str] = Field(None, description="Optional brief summary or prompt to guide the scene generation.")
     previous_scene_order: Optional[int] = Field(None, ge=0, description="The order number of the scene immediately preceding the one to be generated (0 if it's the first scene).")
     direct_sources: Optional[List[str]] = Field(None, description="Optional list of entity names (notes, characters, scenes) to explicitly include as direct sources in the generation context.")
+    source_mode: Optional[SourceMode] = Field(None, description="'full' or 'lean' source nodes in the response (defaults to AI_SOURCE_NODE_MODE).")
 
 class SaveGeneratedSceneToolSchema(BaseModel):
     title: str = Field(..., description="The concise title generated for the scene draft.")
@@ -115,4 +144,14 @@ class RebuildIndexResponse(BaseModel):
     success: bool = Field(..., description="Whether the index rebuild operation was successful")
     message: str = Field(..., description="Status message providing details about the rebuild operation")
     documents_deleted: int = Field(..., description="Number of documents that were deleted from the index")
-    documents_indexed: int = Field(..., description="Number of documents that were added to the index")
\ No newline at end of file
+    documents_indexed: int = Field(..., description="Number of documents that were added to the index")
+
+# --- Index Garbage Collection Models ---
+class IndexGCResponse(BaseModel):
+    project_id: str = Field(..., description="Project whose index entries were scanned")
+    dry_run: bool = Field(..., description="If true, nothing was deleted; the counts describe what would be deleted")
+    nodes_scanned: int = Field(0, description="Number of index nodes scanned for the project")
+    orphaned_nodes: int = Field(0, description="Nodes whose source file no longer exists")
+    duplicate_nodes: int = Field(0, description="Nodes duplicating another node's content for the same file")
+    nodes_deleted: int = Field(0, description="Number of nodes deleted (0 on a dry run)")
+    missing_files: List[str] = Field([], description="Source files of the orphaned nodes")
@@ -0,0 +1,59 @@
+# Copyright 2025 Antimortine
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .common import generate_uuid
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class Job(BaseModel):
+    id: str = Field(default_factory=generate_uuid, description="Unique ID of the job.")
+    kind: str = Field(..., description="Type of work: rebuild_index, split_chapter or export.")
+    project_id: Optional[str] = Field(None, description="Project the job works on.")
+    status: JobStatus = Field(JobStatus.QUEUED, description="queued, running, succeeded, failed or cancelled.")
+    progress: float = Field(0.0, ge=0.0, le=1.0, description="Completed fraction of the work (0.0 - 1.0).")
+    message: Optional[str] = Field(None, description="Human-readable description of the current step.")
+    params: Dict[str, Any] = Field({}, description="Parameters the job was submitted with.")
+    result: Optional[Any] = Field(None, description="Result of a succeeded job (same shape as the synchronous endpoint's response).")
+    error: Optional[str] = Field(None, description="Error message of a failed job.")
+    cancel_requested: bool = Field(False, description="Whether cancellation was requested.")
+    created_at: datetime = Field(..., description="Submission time (UTC).")
+    started_at: Optional[datetime] = Field(None, description="Time the job started running (UTC).")
+    finished_at: Optional[datetime] = Field(None, description="Time the job finished (UTC).")
+
+
+class JobList(BaseModel):
+    jobs: List[Job] = Field([], description="Jobs, newest first.")
+
+
+class ExportJobRequest(BaseModel):
+    format: str = Field("markdown", pattern="^(markdown|zip)$", description="'markdown' for a single file, 'zip' for one file per chapter.")
+    include_titles: bool = Field(True, description="Include scene titles as headings.")
+    separator: str = Field("\n\n---\n\n", description="Separator string between scene blocks.")
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from .common import IDModel
 
 # --- REMOVED: Problematic self-import ---
@@ -29,6 +29,12 @@ class SceneCreate(BaseModel):
     content: str = Field("", description="Markdown content of the scene") # Default to empty
     # project_id and chapter_id will be path parameters
 
+# --- ADDED: Batch creation ---
+# Several scenes created in one request (e.g. accepting AI chapter split proposals)
+class SceneBatchCreate(BaseModel):
+    scenes: List[SceneCreate] = Field(..., min_length=1, description="Scenes to create, in the order they should be appended")
+# --- END ADDED ---
+
 # Properties required when updating a scene
 class SceneUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1)
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import logging
+import time
 import asyncio
 import re # Import regex for parsing
 from pathlib import Path
@@ -30,6 +31,10 @@ from typing import List, Optional, Set # Import Set
 
 from app.models.ai import ProposedScene
 from app.core.config import settings # Import settings
+from app.core.timing import stage, record_stage
+from app.core.metrics import track_llm_call, llm_retry_hook
+from app.core.logging_config import loggable_text
+from app.rag.retrieval import retrieve_nodes, candidate_top_k, project_index
 from app.services.file_service import file_service
 
 logger = logging.getLogger(__name__)
@@ -41,7 +46,7 @@ def _is_retryable_google_api_error(exception):
         if hasattr(exception, 'status_code') and exception.status_code == 429: logger.warning("Google API rate limit hit (429 status code). Retrying chapter split..."); return True
         if isinstance(exception, ResourceExhausted): logger.warning("Google API ResourceExhausted error encountered. Retrying chapter split..."); return True
         if hasattr(exception, 'message') and '429' in str(exception.message): logger.warning("Google API rate limit hit (429 in message). Retrying chapter split..."); return True
-    logger.debug(f"Non-retryable error encountered during chapter split: {type(exception)}")
+    logger.debug("Non-retryable error encountered during chapter split: %s", type(exception))
     return False
 # --- End retry predicate ---
 
@@ -60,6 +65,7 @@ class ChapterSplitter:
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=5, max=30),
         retry=retry_if_exception(_is_retryable_google_api_error),
+        before_sleep=llm_retry_hook("split_chapter"),
         reraise=True
     )
     async def _execute_llm_complete(self, prompt: str):
@@ -67,10 +73,11 @@ class ChapterSplitter:
         # --- MODIFIED: Add prompt size logging ---
         char_count = len(prompt)
         est_tokens = char_count // 4
-        logger.info(f"Calling LLM acomple for chapter splitting (Temperature: {settings.LLM_TEMPERATURE}, Chars: {char_count}, Est. Tokens: {est_tokens})...")
-        logger.debug(f"--- Chapter Split Prompt Start (Chars: {char_count}, Est. Tokens: {est_tokens}) ---\n{prompt}\n--- Chapter Split Prompt End ---")
+        logger.info("Calling LLM acomple for chapter splitting (Temperature: %s, Chars: %s, Est. Tokens: %s)...", settings.LLM_TEMPERATURE, char_count, est_tokens)
+        logger.debug("--- Chapter Split Prompt Start (Chars: %s, Est. Tokens: %s) ---\n%s\n--- Chapter Split Prompt End ---", char_count, est_tokens, loggable_text(prompt))
         # --- END MODIFIED ---
-        response = await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
+        with stage("llm.attempt", prompt_chars=char_count), track_llm_call("split_chapter", char_count):
+            response = await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
         return response
 
     async def split(
@@ -90,7 +97,7 @@ class ChapterSplitter:
         Returns:
             A list of ProposedScene objects or raises HTTPException on failure.
         """
-        logger.info(f"ChapterSplitter: Starting split via Single Call for chapter '{chapter_id}' in project '{project_id}'.")
+        logger.info("ChapterSplitter: Starting split via Single Call for chapter '%s' in project '%s'.", chapter_id, project_id)
 
         if not chapter_content.strip():
             logger.warning("Chapter content is empty, cannot split.")
@@ -106,7 +113,7 @@ class ChapterSplitter:
             logger.warning(f"Could not retrieve chapter title for {chapter_id}: {e}")
 
         final_paths_to_filter_obj = {Path(p).resolve() for p in (paths_to_filter or set())}
-        logger.debug(f"ChapterSplitter: Paths to filter (resolved): {final_paths_to_filter_obj}")
+        logger.debug("ChapterSplitter: Paths to filter (resolved): %s", final_paths_to_filter_obj)
         retrieved_nodes: List[NodeWithScore] = []
         nodes_for_prompt: List[NodeWithScore] = []
 
@@ -114,17 +121,17 @@ class ChapterSplitter:
             # Retrieve RAG Context (Unchanged logic)
             logger.debug("Retrieving context for chapter splitting...")
             retrieval_query = f"Find context relevant to splitting the following chapter content into scenes: {chapter_content[:1000]}..."
-            logger.debug(f"Constructed retrieval query for chapter split: '{retrieval_query}'")
+            logger.debug("Constructed retrieval query for chapter split: '%s'", retrieval_query)
             retriever = VectorIndexRetriever(
-                index=self.index,
-                similarity_top_k=settings.RAG_GENERATION_SIMILARITY_TOP_K,
+                index=project_index(self.index, project_id),
+                similarity_top_k=candidate_top_k(settings.RAG_GENERATION_SIMILARITY_TOP_K),
                 filters=MetadataFilters(filters=[ExactMatchFilter(key="project_id", value=project_id)]),
             )
-            retrieved_nodes = await retriever.aretrieve(retrieval_query)
-            logger.info(f"Retrieved {len(retrieved_nodes)} nodes for chapter split context.")
-            if retrieved_nodes:
+            retrieved_nodes = await retrieve_nodes(retriever, retrieval_query, project_id, settings.RAG_GENERATION_SIMILARITY_TOP_K)
+            logger.info("Retrieved %s nodes for chapter split context.", len(retrieved_nodes))
+            if retrieved_nodes and logger.isEnabledFor(logging.DEBUG):
                 log_nodes = [(n.node_id, n.metadata.get('file_path'), n.score) for n in retrieved_nodes]
-                logger.debug(f"ChapterSplitter: Nodes retrieved BEFORE filtering: {log_nodes}")
+                logger.debug("ChapterSplitter: Nodes retrieved BEFORE filtering: %s", log_nodes)
             else:
                 logger.debug("ChapterSplitter: No nodes retrieved.")
 
@@ -138,10 +145,10 @@ class ChapterSplitter:
                         unique_retrieved_nodes_map[unique_key] = node_with_score
             unique_retrieved_nodes = list(unique_retrieved_nodes_map.values())
             if len(unique_retrieved_nodes) < len(retrieved_nodes):
-                logger.debug(f"Deduplicated {len(retrieved_nodes) - len(unique_retrieved_nodes)} nodes based on content and file path.")
+                logger.debug("Deduplicated %s nodes based on content and file path.", len(retrieved_nodes) - len(unique_retrieved_nodes))
 
             if unique_retrieved_nodes:
-                logger.debug(f"ChapterSplitter: Starting node filtering against {len(final_paths_to_filter_obj)} filter paths.")
+                logger.debug("ChapterSplitter: Starting node filtering against %s filter paths.", len(final_paths_to_filter_obj))
                 for node_with_score in unique_retrieved_nodes:
                     node = node_with_score.node
                     node_path_str = node.metadata.get('file_path')
@@ -152,7 +159,7 @@ class ChapterSplitter:
                     try:
                         node_path_obj = Path(node_path_str).resolve()
                         is_filtered = node_path_obj in final_paths_to_filter_obj
-                        logger.debug(f"  Comparing Node Path: {node_path_obj} | In Filter Set: {is_filtered}")
+                        logger.debug("  Comparing Node Path: %s | In Filter Set: %s", node_path_obj, is_filtered)
                         if not is_filtered:
                             nodes_for_prompt.append(node_with_score)
                     except Exception as e:
@@ -160,12 +167,12 @@ class ChapterSplitter:
                         nodes_for_prompt.append(node_with_score)
 
                 if len(nodes_for_prompt) < len(unique_retrieved_nodes):
-                    logger.debug(f"Filtered {len(unique_retrieved_nodes) - len(nodes_for_prompt)} unique retrieved nodes based on paths_to_filter.")
+                    logger.debug("Filtered %s unique retrieved nodes based on paths_to_filter.", len(unique_retrieved_nodes) - len(nodes_for_prompt))
                 else:
                     logger.debug("No unique nodes were filtered based on paths_to_filter.")
-            if nodes_for_prompt:
+            if nodes_for_prompt and logger.isEnabledFor(logging.DEBUG):
                 log_nodes_after = [(n.node_id, n.metadata.get('file_path'), n.score) for n in nodes_for_prompt]
-                logger.debug(f"ChapterSplitter: Nodes remaining AFTER filtering (for prompt): {log_nodes_after}")
+                logger.debug("ChapterSplitter: Nodes remaining AFTER filtering (for prompt): %s", log_nodes_after)
             else:
                 logger.debug("ChapterSplitter: No nodes remaining after filtering.")
 
@@ -186,10 +193,11 @@ class ChapterSplitter:
                       # --- END MODIFIED ---
                       rag_context_list.append(f"{source_label}\n\n{truncated_content}")
             rag_context_str = "\n\n---\n\n".join(rag_context_list) if rag_context_list else "No additional relevant context snippets were retrieved via search."
-            logger.debug(f"ChapterSplitter: Final rag_context_str for prompt:\n---\n{rag_context_str}\n---")
+            logger.debug("ChapterSplitter: Final rag_context_str for prompt:\n---\n%s\n---", loggable_text(rag_context_str))
 
 
             # --- Build Prompt with Strict Formatting ---
+            prompt_started = time.perf_counter()
             logger.debug("Building strict format prompt for chapter splitting...")
             system_prompt = (
                 "You are an AI assistant specialized in analyzing and structuring narrative text. "
@@ -232,7 +240,9 @@ class ChapterSplitter:
             full_prompt = f"{system_prompt}\n\nUser: {user_message_content}\n\nAssistant:"
 
             # --- Call LLM ---
-            llm_response = await self._execute_llm_complete(full_prompt)
+            record_stage("rag.prompt", prompt_started, prompt_chars=len(full_prompt))
+            with stage("llm"):
+                llm_response = await self._execute_llm_complete(full_prompt)
             generated_text = llm_response.text.strip() if llm_response else ""
 
             if not generated_text:
@@ -240,18 +250,20 @@ class ChapterSplitter:
                  raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error: The AI failed to propose scene splits.")
 
             # --- Parse the Response (Unchanged logic) ---
+            parse_started = time.perf_counter()
             logger.debug("Parsing LLM response for scene splits...")
             proposed_scenes = []
             scene_pattern = re.compile( rf"^{re.escape(scene_start_delim)}\s*?\n" rf"^{re.escape(title_prefix)}\s*(.*?)\s*?\n" rf"^{re.escape(content_prefix)}\s*?\n?" rf"(.*?)" rf"^{re.escape(scene_end_delim)}\s*?$", re.DOTALL | re.MULTILINE )
             matches = scene_pattern.finditer(generated_text); found_scenes = False
             for match in matches:
                 found_scenes = True; title = match.group(1).strip(); content = match.group(2).strip()
-                if title and content: proposed_scenes.append(ProposedScene(suggested_title=title, content=content)); logger.debug(f"Parsed scene: Title='{title[:50]}...', Content Length={len(content)}")
+                if title and content: proposed_scenes.append(ProposedScene(suggested_title=title, content=content)); logger.debug("Parsed scene: Title='%s...', Content Length=%s", title[:50], len(content))
                 else: logger.warning(f"Skipping partially parsed scene block: Title='{title}', Content Present={bool(content)}. Block text: {match.group(0)[:200]}...")
             if not found_scenes: logger.warning(f"Could not parse any scene blocks using delimiters from LLM response. Response start:\n{generated_text[:500]}..."); return []
+            record_stage("rag.parse", parse_started)
             concatenated_content = "".join(scene.content for scene in proposed_scenes)
             if len(concatenated_content.strip()) < len(chapter_content.strip()) * 0.8: logger.warning(f"Concatenated split content length ({len(concatenated_content)}) significantly differs from original ({len(chapter_content)}). Potential content loss.")
-            logger.info(f"Successfully parsed {len(proposed_scenes)} proposed scenes.")
+            logger.info("Successfully parsed %s proposed scenes.", len(proposed_scenes))
             return proposed_scenes
 
         # --- Exception Handling (Unchanged) ---
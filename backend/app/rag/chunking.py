@@ -0,0 +1,113 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import re
+from collections import Counter
+from typing import List
+
+from llama_index.core.schema import BaseNode, TextNode, NodeRelationship, RelatedNodeInfo, MetadataMode
+
+# Paragraphs are separated by blank lines (Markdown)
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+
+# A chunk may end after a paragraph whose hash is divisible by this (once it is at least min_chars long).
+# Boundaries therefore depend on content, not position, so an edit only changes the chunks around it.
+CHUNK_BOUNDARY_DIVISOR = 3
+
+# Metadata key holding the hash of a chunk's embedded content (excluded from the embedded/LLM text itself)
+CHUNK_HASH_KEY = "chunk_hash"
+
+
+def _is_boundary(paragraph: str) -> bool:
+    digest = hashlib.blake2b(paragraph.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % CHUNK_BOUNDARY_DIVISOR == 0
+
+
+def _split_long_paragraph(paragraph: str, max_chars: int) -> List[str]:
+    """Splits a paragraph longer than max_chars on sentence ends (hard-cutting sentences that are still too long)."""
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    pieces: List[str] = []
+    current = ""
+    for sentence in SENTENCE_SPLIT.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current); current = ""
+            pieces.append(sentence[:max_chars]); sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current); current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, min_chars: int, max_chars: int) -> List[str]:
+    """
+    Content-defined chunking at paragraph granularity.
+    Paragraphs are grouped until a chunk is at least min_chars long and ends on a boundary paragraph
+    (see CHUNK_BOUNDARY_DIVISOR), or would exceed max_chars. Editing one paragraph normally changes
+    only the chunk containing it; the chunks before and after keep the same text.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in PARAGRAPH_SPLIT.split(text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_long_paragraph(paragraph, max_chars):
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n\n".join(current)); current = []; size = 0
+            current.append(piece)
+            size += len(piece)
+            if size >= min_chars and _is_boundary(piece):
+                chunks.append("\n\n".join(current)); current = []; size = 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chunk_node_id(file_path: str, chunk_hash: str, occurrence: int) -> str:
+    """Deterministic node id of the occurrence-th chunk with content hash chunk_hash in file_path."""
+    return hashlib.sha256(f"{file_path}\0{chunk_hash}\0{occurrence}".encode("utf-8")).hexdigest()
+
+
+def build_chunk_nodes(document: BaseNode, file_path: str, min_chars: int, max_chars: int) -> List[TextNode]:
+    """
+    Splits a loaded document into chunk nodes with deterministic ids.
+    A chunk's id depends only on the file path, the hash of its embedded content (text plus metadata)
+    and its occurrence number among identical chunks, so unchanged chunks keep their ids between edits.
+    """
+    nodes: List[TextNode] = []
+    occurrences: Counter = Counter()
+    excluded_embed = list(document.excluded_embed_metadata_keys) + [CHUNK_HASH_KEY]
+    excluded_llm = list(document.excluded_llm_metadata_keys) + [CHUNK_HASH_KEY]
+    for text in chunk_text(document.get_content(), min_chars, max_chars):
+        node = TextNode(
+            text=text,
+            metadata=dict(document.metadata),
+            excluded_embed_metadata_keys=excluded_embed,
+            excluded_llm_metadata_keys=excluded_llm,
+            relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=file_path)},
+        )
+        chunk_hash = hashlib.sha256(node.get_content(metadata_mode=MetadataMode.EMBED).encode("utf-8")).hexdigest()
+        occurrence = occurrences[chunk_hash]
+        occurrences[chunk_hash] += 1
+        node.id_ = chunk_node_id(file_path, chunk_hash, occurrence)
+        node.metadata[CHUNK_HASH_KEY] = chunk_hash
+        nodes.append(node)
+    return nodes
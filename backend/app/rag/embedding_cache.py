@@ -0,0 +1,200 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from app.core.metrics import observe_cache_lookups
+
+logger = logging.getLogger(__name__)
+
+# After eviction the cache is trimmed to this fraction of its size limit, so eviction doesn't run on every insert
+EVICTION_TARGET_RATIO = 0.9
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed embedding store (SQLite).
+    Entries are keyed by (embedding model name, SHA-256 of the chunk text) and hold float32 vectors.
+    When the stored vectors exceed max_bytes, least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: Path, max_bytes: int):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the database on first use (so importing/initializing never touches disk)."""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            self._conn = conn
+            logger.info(f"Embedding cache opened at {self.db_path} ({self._total_bytes / (1024 * 1024):.1f} MB stored).")
+        return self._conn
+
+    def get_many(self, model_name: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """Returns cached vectors for the given hashes (missing hashes are absent from the result)."""
+        if not text_hashes:
+            return {}
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            conn = self._connect()
+            unique_hashes = list(dict.fromkeys(text_hashes))
+            # Stay well below SQLite's host parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                chunk = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model_name, text_hash) for text_hash in found],
+                )
+                conn.commit()
+        return found
+
+    def put_many(self, model_name: str, items: List[Tuple[str, List[float]]]):
+        """Stores vectors for the given hashes, then evicts old entries if the size limit is exceeded."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(model_name, text_hash, array("f", vector).tobytes(), now) for text_hash, vector in items]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+            self._total_bytes += sum(len(row[2]) for row in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Deletes least recently used entries until the cache is below EVICTION_TARGET_RATIO of its limit."""
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        if count and total > target:
+            average_size = total / count
+            to_delete = min(count, math.ceil((total - target) / average_size))
+            conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (to_delete,),
+            )
+            conn.commit()
+            logger.info(f"Embedding cache evicted {to_delete} least recently used entries.")
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper that serves text (document) embeddings from an EmbeddingCache
+    and only calls the wrapped model for chunks it has never seen. Query embeddings are passed through.
+    """
+
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(
+            model_name=str(getattr(inner, "model_name", "unknown")),
+            embed_batch_size=getattr(inner, "embed_batch_size", 10),
+            **kwargs,
+        )
+        self._inner = inner
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        text_hashes = [EmbeddingCache.text_hash(text) for text in texts]
+        try:
+            cached = self._cache.get_many(self.model_name, text_hashes)
+        except Exception as e:
+            logger.error(f"Embedding cache lookup failed, embedding without cache: {e}", exc_info=True)
+            return self._inner.get_text_embedding_batch(texts)
+
+        missing = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        if missing:
+            new_vectors = self._inner.get_text_embedding_batch(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            try:
+                self._cache.put_many(self.model_name, list(computed.items()))
+            except Exception as e:
+                logger.error(f"Failed to store embeddings in cache: {e}", exc_info=True)
+            cached.update(computed)
+        observe_cache_lookups("embedding", hits=len(texts) - len(missing), misses=len(missing))
+        logger.debug(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} computed.")
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._get_text_embeddings(texts)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._inner.aget_query_embedding(query)
@@ -0,0 +1,464 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Standalone embedding service: a pool of worker processes sharing one task queue, fronted by a
+# micro-batching dispatcher and a local socket (multiprocessing.connection). API workers talk to it
+# through EmbeddingPoolClient / RemoteEmbedding, so the model is loaded once per pool worker instead
+# of once per uvicorn worker. Start it with:  python -m app.rag.embedding_pool
+# The connection pickles its messages, so a client holding the authkey can run code in the pool: the pool and
+# its clients refuse to run without a deployment-specific EMBEDDING_POOL_AUTHKEY.
+# Workers that die (OOM kill, crash in native code) are restarted; the batches they were embedding fail at once.
+# A worker that keeps dying before it has loaded the model is restarted with exponential backoff and given up on
+# after MAX_WORKER_LOAD_FAILURES attempts; once no worker is left, pending and new requests fail instead of hanging.
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KIND_TEXT = "text"
+KIND_QUERY = "query"
+
+# Connections from many API worker threads may arrive at once (the default backlog of 1 stalls them)
+LISTEN_BACKLOG = 128
+WORKER_CHECK_INTERVAL_S = 1.0
+MAX_WORKER_LOAD_FAILURES = 5
+WORKER_RESTART_MAX_BACKOFF_S = 60.0
+MIN_AUTHKEY_LENGTH = 16
+# Publicly known keys (the former default) are rejected like a missing one
+_PUBLIC_AUTHKEYS = {"codex-ai-embeddings"}
+
+
+def pool_authkey() -> bytes:
+    """EMBEDDING_POOL_AUTHKEY as bytes; raises ValueError if it is missing, too short or publicly known."""
+    authkey = settings.EMBEDDING_POOL_AUTHKEY
+    if len(authkey) < MIN_AUTHKEY_LENGTH or authkey in _PUBLIC_AUTHKEYS:
+        raise ValueError(
+            f"EMBEDDING_POOL_AUTHKEY must be set to a secret of at least {MIN_AUTHKEY_LENGTH} characters shared by the "
+            "embedding pool and the API workers, e.g. the output of: python -c \"import secrets; print(secrets.token_hex(32))\""
+        )
+    return authkey.encode("utf-8")
+
+
+def build_local_embed_model() -> BaseEmbedding:
+    """Loads the configured embedding model (ONNX if selected and usable, otherwise torch) in the current process."""
+    import torch
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    from app.rag.onnx_embedding import load_checked_onnx_embedding
+
+    if settings.EMBEDDING_BACKEND == "onnx":
+        onnx_model = load_checked_onnx_embedding(
+            settings.EMBEDDING_MODEL_NAME,
+            reference_factory=lambda: HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL_NAME, device="cpu"),
+        )
+        if onnx_model is not None:
+            return onnx_model
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    return HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL_NAME, device=device)
+
+
+def _worker_main(worker_index: int, task_queue, result_queue, model_factory: Callable[[], BaseEmbedding]):
+    """Pool worker: loads the model once, then embeds batches from the shared task queue until it gets None."""
+    try:
+        model = model_factory()
+    except Exception as e:
+        result_queue.put((None, "failed", (worker_index, f"Worker {worker_index} could not load the embedding model: {e}")))
+        return
+    result_queue.put((None, "ready", (worker_index, model.model_name)))
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        batch_id, kind, texts = task
+        result_queue.put((batch_id, "taken", worker_index))
+        try:
+            if kind == KIND_QUERY:
+                vectors = [model.get_query_embedding(text) for text in texts]
+            else:
+                vectors = model.get_text_embedding_batch(texts)
+            result_queue.put((batch_id, "ok", vectors))
+        except Exception as e:
+            result_queue.put((batch_id, "error", f"{type(e).__name__}: {e}"))
+
+
+class _PendingRequest:
+    """One client request; filled slice by slice as the batches containing its texts complete."""
+
+    def __init__(self, kind: str, texts: List[str]):
+        self.kind = kind
+        self.texts = texts
+        self.vectors: List[Optional[List[float]]] = [None] * len(texts)
+        self.remaining = len(texts)
+        self.future: Future = Future()
+
+
+class EmbeddingPoolServer:
+    """
+    Owns the worker processes and the micro-batching dispatcher.
+    Concurrent requests are collected for up to max_wait_ms (or until batch_size texts are waiting),
+    merged per kind, cut into batches of batch_size and put on the shared task queue; results are
+    routed back to the requests they came from.
+    """
+
+    def __init__(self, num_workers: int, batch_size: int, max_wait_ms: int,
+                 model_factory: Callable[[], BaseEmbedding] = build_local_embed_model,
+                 worker_check_interval_s: float = WORKER_CHECK_INTERVAL_S,
+                 max_load_failures: int = MAX_WORKER_LOAD_FAILURES):
+        self.num_workers = max(1, num_workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.model_factory = model_factory
+        self.model_name: Optional[str] = None
+        self._incoming: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._batches: Dict[int, List[Tuple[_PendingRequest, int, int]]] = {}
+        self._taken: Dict[int, int] = {} # batch id -> index of the worker embedding it
+        self.worker_check_interval = worker_check_interval_s
+        self.max_load_failures = max(1, max_load_failures)
+        self._load_failures: Dict[int, int] = {} # worker index -> restarts since it last loaded the model
+        self._restart_at: Dict[int, float] = {} # worker index -> monotonic time of its next restart
+        self._given_up: set = set()
+        self._broken: Optional[str] = None # Set once no worker is left; requests then fail at once
+        self._batch_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._task_queue = None
+        self._result_queue = None
+        self._stopped = threading.Event()
+        self.address: Optional[Tuple[str, int]] = None
+
+    def _create_queues(self):
+        context = multiprocessing.get_context("spawn") # torch/ONNX Runtime are not fork-safe
+        return context.Queue(), context.Queue()
+
+    def _start_worker(self, worker_index: int):
+        context = multiprocessing.get_context("spawn")
+        process = context.Process(
+            target=_worker_main, name=f"embedding-worker-{worker_index}", daemon=True,
+            args=(worker_index, self._task_queue, self._result_queue, self.model_factory),
+        )
+        process.start()
+        return process
+
+    def start(self):
+        """Starts the workers one at a time (the first one does any one-off ONNX export/self-check), then the dispatcher."""
+        self._task_queue, self._result_queue = self._create_queues()
+        for worker_index in range(self.num_workers):
+            self._workers.append(self._start_worker(worker_index))
+            _, status, (_, detail) = self._result_queue.get()
+            if status != "ready":
+                raise RuntimeError(detail)
+            self.model_name = detail
+            logger.info(f"Embedding worker {worker_index} ready ({detail}).")
+        threading.Thread(target=self._dispatch_loop, name="embedding-dispatcher", daemon=True).start()
+        threading.Thread(target=self._result_loop, name="embedding-results", daemon=True).start()
+        threading.Thread(target=self._monitor_loop, name="embedding-monitor", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._incoming.put(None)
+        for _ in self._workers:
+            self._task_queue.put(None)
+        self._result_queue.put((None, "stop", None))
+
+    def submit(self, kind: str, texts: List[str]) -> Future:
+        if kind not in (KIND_TEXT, KIND_QUERY):
+            raise ValueError(f"Unknown embedding kind: {kind!r}")
+        request = _PendingRequest(kind, list(texts))
+        if self._broken:
+            request.future.set_exception(RuntimeError(self._broken))
+        elif not request.texts:
+            request.future.set_result([])
+        else:
+            self._incoming.put(request)
+        return request.future
+
+    def _collect(self) -> List[_PendingRequest]:
+        """Blocks for the first request, then gathers more until the batch is full or the wait window closes."""
+        first = self._incoming.get()
+        if first is None:
+            return []
+        collected = [first]
+        waiting_texts = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while waiting_texts < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._incoming.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._incoming.put(None)
+                break
+            collected.append(request)
+            waiting_texts += len(request.texts)
+        return collected
+
+    def _dispatch_loop(self):
+        while not self._stopped.is_set():
+            requests = self._collect()
+            for kind in (KIND_TEXT, KIND_QUERY):
+                slices = [(request, index) for request in requests if request.kind == kind for index in range(len(request.texts))]
+                for start in range(0, len(slices), self.batch_size):
+                    self._send_batch(kind, slices[start:start + self.batch_size])
+
+    def _send_batch(self, kind: str, slices: List[Tuple[_PendingRequest, int]]):
+        # Store contiguous runs per request: (request, first index, count)
+        runs: List[Tuple[_PendingRequest, int, int]] = []
+        for request, index in slices:
+            if runs and runs[-1][0] is request and runs[-1][1] + runs[-1][2] == index:
+                runs[-1] = (request, runs[-1][1], runs[-1][2] + 1)
+            else:
+                runs.append((request, index, 1))
+        batch_id = next(self._batch_ids)
+        with self._lock:
+            if self._broken:
+                self._fail_runs(runs, self._broken)
+                return
+            self._batches[batch_id] = runs
+        self._task_queue.put((batch_id, kind, [request.texts[index] for request, index in slices]))
+
+    def _result_loop(self):
+        while not self._stopped.is_set():
+            batch_id, status, payload = self._result_queue.get()
+            if status == "stop":
+                break
+            if batch_id is None:
+                # A restarted worker reporting in
+                worker_index, detail = payload
+                if status == "ready":
+                    with self._lock:
+                        self._load_failures[worker_index] = 0
+                    logger.info(f"Embedding pool: restarted worker {worker_index} ready ({detail}).")
+                else:
+                    logger.error(f"Embedding pool: restarted worker {status}: {detail}")
+                continue
+            with self._lock:
+                if status == "taken":
+                    if batch_id in self._batches:
+                        self._taken[batch_id] = payload
+                    continue
+                self._taken.pop(batch_id, None)
+                runs = self._batches.pop(batch_id, [])
+            offset = 0
+            for request, first_index, count in runs:
+                if request.future.done():
+                    offset += count
+                    continue
+                if status != "ok":
+                    request.future.set_exception(RuntimeError(payload))
+                    offset += count
+                    continue
+                request.vectors[first_index:first_index + count] = payload[offset:offset + count]
+                offset += count
+                request.remaining -= count
+                if request.remaining == 0:
+                    request.future.set_result(request.vectors)
+
+    def _monitor_loop(self):
+        """Restarts dead workers and fails the batches they had taken, instead of letting clients wait for the timeout."""
+        while not self._stopped.wait(self.worker_check_interval):
+            for worker_index, worker in enumerate(self._workers):
+                if worker.is_alive() or worker_index in self._given_up or self._stopped.is_set():
+                    continue
+                if worker_index not in self._restart_at:
+                    reason = f"Embedding worker {worker_index} died (exit code {getattr(worker, 'exitcode', None)})"
+                    self._fail_batches_of(worker_index, reason)
+                    with self._lock:
+                        failures = self._load_failures.get(worker_index, 0)
+                    if failures >= self.max_load_failures:
+                        self._give_up_on(worker_index, f"{reason}; it failed to start {failures} times in a row")
+                        continue
+                    backoff = min(WORKER_RESTART_MAX_BACKOFF_S, self.worker_check_interval * (2 ** failures - 1))
+                    logger.error(f"{reason}; restarting it in {backoff:.1f} s.")
+                    self._restart_at[worker_index] = time.monotonic() + backoff
+                if time.monotonic() >= self._restart_at[worker_index]:
+                    del self._restart_at[worker_index]
+                    with self._lock:
+                        self._load_failures[worker_index] = self._load_failures.get(worker_index, 0) + 1
+                    self._workers[worker_index] = self._start_worker(worker_index)
+
+    def _give_up_on(self, worker_index: int, reason: str):
+        """Stops restarting a worker; once none is left, fails every pending request and refuses new ones."""
+        self._given_up.add(worker_index)
+        logger.error(f"{reason}; giving up on it.")
+        if len(self._given_up) < len(self._workers):
+            return
+        broken = f"Embedding pool has no worker left: {reason}"
+        with self._lock:
+            self._broken = broken
+            runs = [run for batch_runs in self._batches.values() for run in batch_runs]
+            self._batches.clear()
+            self._taken.clear()
+            self._fail_runs(runs, broken)
+
+    def _fail_batches_of(self, worker_index: int, reason: str):
+        with self._lock:
+            batch_ids = [batch_id for batch_id, taken_by in self._taken.items() if taken_by == worker_index]
+            runs = [run for batch_id in batch_ids for run in self._batches.pop(batch_id, [])]
+            for batch_id in batch_ids:
+                del self._taken[batch_id]
+        self._fail_runs(runs, reason)
+
+    @staticmethod
+    def _fail_runs(runs: List[Tuple[_PendingRequest, int, int]], reason: str):
+        for request, _, _ in runs:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError(reason))
+
+    def _handle_connection(self, connection):
+        """Serves one client connection: ("info",) or (kind, texts) requests, answered in order."""
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == "info":
+                    connection.send(("ok", self.model_name))
+                    continue
+                try:
+                    kind, texts = message
+                    connection.send(("ok", self.submit(kind, texts).result()))
+                except Exception as e:
+                    connection.send(("error", str(e)))
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+
+    def serve_forever(self, address: Tuple[str, int], authkey: bytes):
+        with Listener(address, authkey=authkey, backlog=LISTEN_BACKLOG) as listener:
+            self.address = listener.address
+            logger.info(f"Embedding pool listening on {listener.address} with {self.num_workers} worker(s), "
+                        f"batch size {self.batch_size}, wait window {self.max_wait * 1000:.0f} ms.")
+            while not self._stopped.is_set():
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Embedding pool: rejected connection: {type(e).__name__}: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+
+class EmbeddingPoolClient:
+    """Thin client for the embedding pool; keeps one connection per calling thread."""
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, timeout: float):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(self.address, authkey=self.authkey)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, message):
+        connection = self._connection()
+        try:
+            connection.send(message)
+            if not connection.poll(self.timeout):
+                raise TimeoutError(f"Embedding pool did not answer within {self.timeout} s")
+            status, payload = connection.recv()
+        except Exception:
+            # Drop the connection so a late answer can't be read by the next request
+            self._local.connection = None
+            connection.close()
+            raise
+        if status != "ok":
+            raise RuntimeError(f"Embedding pool error: {payload}")
+        return payload
+
+    def model_name(self) -> str:
+        return self._request(("info",))
+
+    def embed(self, kind: str, texts: List[str]) -> List[List[float]]:
+        return self._request((kind, list(texts)))
+
+
+class RemoteEmbedding(BaseEmbedding):
+    """LlamaIndex embedding model backed by the embedding pool."""
+
+    _client: EmbeddingPoolClient = PrivateAttr()
+
+    def __init__(self, client: EmbeddingPoolClient, **kwargs):
+        super().__init__(model_name=client.model_name(), embed_batch_size=settings.EMBEDDING_POOL_BATCH_SIZE, **kwargs)
+        self._client = client
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RemoteEmbedding"
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._client.embed(KIND_TEXT, texts)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._client.embed(KIND_TEXT, [text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._client.embed(KIND_QUERY, [query])[0]
+
+    # The client blocks on its socket (through the wait window and any batches queued ahead), so the async
+    # variants wait in a thread instead of stalling the event loop
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await asyncio.to_thread(self._get_query_embedding, query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self._get_text_embedding, text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self._get_text_embeddings, texts)
+
+
+def pool_address() -> Tuple[str, int]:
+    return (settings.EMBEDDING_POOL_HOST, settings.EMBEDDING_POOL_PORT)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        authkey = pool_authkey()
+    except ValueError as e:
+        raise SystemExit(f"Embedding pool not started: {e}")
+    server = EmbeddingPoolServer(
+        num_workers=settings.EMBEDDING_POOL_WORKERS,
+        batch_size=settings.EMBEDDING_POOL_BATCH_SIZE,
+        max_wait_ms=settings.EMBEDDING_POOL_MAX_WAIT_MS,
+    )
+    server.start()
+    try:
+        server.serve_forever(pool_address(), authkey)
+    except KeyboardInterrupt:
+        logger.info("Embedding pool shutting down.")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
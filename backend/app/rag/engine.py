@@ -13,7 +13,7 @@
 # limitations under the License.
 
 import logging
-from typing import List, Tuple, Optional, Dict, Set
+from typing import Callable, List, Tuple, Optional, Dict, Set
 from pathlib import Path # Import Path
 
 from app.rag.query_processor import QueryProcessor
@@ -23,7 +23,7 @@ from app.rag.chapter_splitter import ChapterSplitter
 from app.rag.index_manager import index_manager
 from llama_index.core.base.response.schema import NodeWithScore
 # --- ADDED: Import ProposedScene for type hint ---
-from app.models.ai import ProposedScene
+from app.models.ai import ProposedScene, IndexGCResponse
 # --- END ADDED ---
 
 logger = logging.getLogger(__name__)
@@ -46,12 +46,12 @@ class RagEngine:
                   direct_chapter_context: Optional[Dict[str, Optional[str]]] = None, # Added
                   paths_to_filter: Optional[Set[str]] = None
                   ) -> Tuple[str, List[NodeWithScore], Optional[List[Dict[str, str]]]]:
-        logger.debug(f"RagEngine Facade: Delegating query for project '{project_id}' to QueryProcessor.")
+        logger.debug("RagEngine Facade: Delegating query for project '%s' to QueryProcessor.", project_id)
         # Add detailed logging for direct sources before passing to query processor
         if direct_sources_data:
-            logger.info(f"RagEngine: Passing {len(direct_sources_data)} direct source items to QueryProcessor")
+            logger.info("RagEngine: Passing %s direct source items to QueryProcessor", len(direct_sources_data))
             for i, item in enumerate(direct_sources_data):
-                logger.info(f"RagEngine: Direct source {i+1}: Type={item.get('type')}, Name={item.get('name')}, Content length={len(item.get('content', ''))}")
+                logger.info("RagEngine: Direct source %s: Type=%s, Name=%s, Content length=%s", i+1, item.get('type'), item.get('name'), len(item.get('content', '')))
         else:
             logger.info("RagEngine: No direct_sources_data to pass to QueryProcessor")
             
@@ -83,13 +83,13 @@ class RagEngine:
                              direct_sources_data: Optional[List[Dict]] = None, # Added for direct sources
                              paths_to_filter: Optional[Set[str]] = None
                              ) -> Dict[str, str]:
-        logger.debug(f"RagEngine Facade: Delegating generate_scene for project '{project_id}', chapter '{chapter_id}' to SceneGenerator.")
+        logger.debug("RagEngine Facade: Delegating generate_scene for project '%s', chapter '%s' to SceneGenerator.", project_id, chapter_id)
         
         # Log direct sources if present
         if direct_sources_data:
-            logger.info(f"RagEngine: Passing {len(direct_sources_data)} direct source items to SceneGenerator")
+            logger.info("RagEngine: Passing %s direct source items to SceneGenerator", len(direct_sources_data))
             for i, item in enumerate(direct_sources_data):
-                logger.info(f"RagEngine: Scene Gen Direct source {i+1}: Type={item.get('type')}, Name={item.get('name')}, Content length={len(item.get('content', ''))}")
+                logger.info("RagEngine: Scene Gen Direct source %s: Type=%s, Name=%s, Content length=%s", i+1, item.get('type'), item.get('name'), len(item.get('content', '')))
         else:
             logger.info("RagEngine: No direct_sources_data to pass to SceneGenerator")
             
@@ -119,7 +119,7 @@ class RagEngine:
                      explicit_synopsis: Optional[str], # Optional
                      paths_to_filter: Optional[Set[str]] = None
                      ) -> List[str]:
-        logger.debug(f"RagEngine Facade: Delegating rephrase for project '{project_id}' to Rephraser.")
+        logger.debug("RagEngine Facade: Delegating rephrase for project '%s' to Rephraser.", project_id)
         return await self.rephraser.rephrase(
             project_id=project_id, selected_text=selected_text, context_before=context_before,
             context_after=context_after,
@@ -140,7 +140,7 @@ class RagEngine:
                             explicit_chapter_synopsis: Optional[str], # Added
                             paths_to_filter: Optional[Set[str]] = None
                             ) -> List[ProposedScene]: # Corrected return type hint
-        logger.debug(f"RagEngine Facade: Delegating split_chapter for project '{project_id}', chapter '{chapter_id}' to ChapterSplitter.")
+        logger.debug("RagEngine Facade: Delegating split_chapter for project '%s', chapter '%s' to ChapterSplitter.", project_id, chapter_id)
         return await self.chapter_splitter.split(
             project_id=project_id, chapter_id=chapter_id, chapter_content=chapter_content,
             explicit_plan=explicit_plan, # Pass through
@@ -152,29 +152,33 @@ class RagEngine:
     # --- END MODIFIED ---
 
     # (rebuild_index remains unchanged)
-    def rebuild_index(self, project_id: str, file_paths: List[Path]):
+    def rebuild_index(self, project_id: str, file_paths: List[Path], progress: Optional[Callable[[int, int], None]] = None):
         """
         Deletes all existing index entries for a project and re-indexes the provided file paths.
+        progress(done, total) is called before each file and once all are done; an exception it raises
+        (e.g. a job's cancellation) stops the rebuild between files.
         """
-        logger.info(f"RagEngine Facade: Starting index rebuild for project '{project_id}'.")
+        logger.info("RagEngine Facade: Starting index rebuild for project '%s'.", project_id)
         if not self.index_manager:
             logger.error("IndexManager not available in RagEngine. Cannot rebuild index.")
             raise RuntimeError("IndexManager not initialized.")
 
         # 1. Delete existing documents for the project
         try:
-            logger.info(f"RagEngine: Deleting existing documents for project {project_id}...")
+            logger.info("RagEngine: Deleting existing documents for project %s...", project_id)
             self.index_manager.delete_project_docs(project_id)
-            logger.info(f"RagEngine: Finished deleting existing documents for project {project_id}.")
+            logger.info("RagEngine: Finished deleting existing documents for project %s.", project_id)
         except Exception as e:
             logger.error(f"RagEngine: Error deleting documents for project {project_id} during rebuild: {e}", exc_info=True)
             # Decide whether to continue or raise. Let's continue but log the error.
 
         # 2. Re-index the provided files
-        logger.info(f"RagEngine: Re-indexing {len(file_paths)} files for project {project_id}...")
+        logger.info("RagEngine: Re-indexing %s files for project %s...", len(file_paths), project_id)
         indexed_count = 0
         error_count = 0
-        for file_path in file_paths:
+        for done, file_path in enumerate(file_paths):
+            if progress:
+                progress(done, len(file_paths))
             try:
                 # Assuming index_file is synchronous
                 self.index_manager.index_file(file_path)
@@ -182,8 +186,27 @@ class RagEngine:
             except Exception as e:
                 logger.error(f"RagEngine: Error indexing file {file_path} during rebuild: {e}", exc_info=True)
                 error_count += 1
+        if progress:
+            progress(len(file_paths), len(file_paths))
 
-        logger.info(f"RagEngine Facade: Finished index rebuild for project '{project_id}'. Indexed: {indexed_count}, Errors: {error_count}.")
+        logger.info("RagEngine Facade: Finished index rebuild for project '%s'. Indexed: %s, Errors: %s.", project_id, indexed_count, error_count)
+
+    # --- ADDED: Index garbage collection ---
+    def collect_garbage(self, project_id: str, dry_run: bool = True) -> IndexGCResponse:
+        """Removes (or, on a dry run, reports) orphaned and duplicate index nodes of a project."""
+        logger.info("RagEngine Facade: Running index GC for project '%s' (dry_run=%s).", project_id, dry_run)
+        if not self.index_manager:
+            raise RuntimeError("IndexManager not initialized.")
+        return self.index_manager.collect_garbage(project_id, dry_run=dry_run)
+    # --- END ADDED ---
+
+    # --- ADDED: Source node lookup ---
+    def get_source_node(self, project_id: str, node_id: str):
+        """Returns the indexed chunk node_id of the project (None if unknown)."""
+        if not self.index_manager:
+            raise RuntimeError("IndexManager not initialized.")
+        return self.index_manager.get_node(project_id, node_id)
+    # --- END ADDED ---
 
 
 # --- Instantiate Singleton ---
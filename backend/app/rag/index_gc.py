@@ -0,0 +1,142 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from app.models.ai import IndexGCResponse
+from app.rag.chunking import CHUNK_HASH_KEY, chunk_node_id
+
+logger = logging.getLogger(__name__)
+
+# Garbage collection of index nodes that no indexing call will ever clean up:
+# - orphans: nodes whose file_path no longer exists (file removed outside the API, failed delete_doc, ...)
+# - duplicates: several nodes of the same file with the same content, beyond the ones chunking would create
+#   (e.g. a legacy node next to its chunk, or a reinsert that failed halfway)
+# The scheduled run visits every project_id found in the index, not on disk, so the nodes of projects
+# deleted outside the API are collected too.
+
+GC_PAGE_SIZE = 500
+
+
+def _find_duplicates(file_path: str, nodes: List[Tuple[str, Dict]]) -> List[str]:
+    """
+    nodes: (node_id, metadata) pairs of one file sharing the same text. Keeps the nodes whose id is the one
+    chunking assigns (identical paragraphs repeated in a file are legitimate separate chunks); if none
+    has such an id, keeps the first. Returns the ids of the others.
+    """
+    if len(nodes) < 2:
+        return []
+    expected_ids = set()
+    for _, metadata in nodes:
+        chunk_hash = metadata.get(CHUNK_HASH_KEY)
+        if chunk_hash:
+            expected_ids.update(chunk_node_id(file_path, chunk_hash, occurrence) for occurrence in range(len(nodes)))
+    keep = {node_id for node_id, _ in nodes if node_id in expected_ids} or {nodes[0][0]}
+    return [node_id for node_id, _ in nodes if node_id not in keep]
+
+
+def collect_garbage(collection, project_id: str, dry_run: bool = True, page_size: int = GC_PAGE_SIZE,
+                    file_exists: Callable[[str], bool] = lambda path: Path(path).is_file()) -> IndexGCResponse:
+    """
+    Scans a project's nodes in the collection page by page and deletes orphaned and duplicate nodes
+    in bulk once the scan is complete (unless dry_run). Returns a report of what was (or would be) deleted.
+    """
+    report = IndexGCResponse(project_id=project_id, dry_run=dry_run)
+    exists_cache: Dict[str, bool] = {}
+    missing_files = set()
+    orphan_ids: List[str] = []
+    nodes_by_content: Dict[Tuple[str, str], List[Tuple[str, Dict]]] = {}
+
+    offset = 0
+    while True:
+        page = collection.get(where={"project_id": project_id}, limit=page_size, offset=offset, include=["metadatas", "documents"])
+        ids = list(page.get("ids") or [])
+        if not ids:
+            break
+        for node_id, metadata, document in zip(ids, page.get("metadatas") or [], page.get("documents") or []):
+            metadata = metadata or {}
+            file_path = metadata.get("file_path")
+            if not file_path:
+                orphan_ids.append(node_id)
+                continue
+            if file_path not in exists_cache:
+                exists_cache[file_path] = file_exists(file_path)
+            if not exists_cache[file_path]:
+                orphan_ids.append(node_id)
+                missing_files.add(file_path)
+                continue
+            nodes_by_content.setdefault((file_path, document or ""), []).append((node_id, metadata))
+        offset += len(ids)
+
+    duplicate_ids: List[str] = []
+    for (file_path, _), nodes in nodes_by_content.items():
+        duplicate_ids.extend(_find_duplicates(file_path, nodes))
+
+    report.nodes_scanned = offset
+    report.orphaned_nodes = len(orphan_ids)
+    report.duplicate_nodes = len(duplicate_ids)
+    report.missing_files = sorted(missing_files)
+    garbage_ids = orphan_ids + duplicate_ids
+    if garbage_ids and not dry_run:
+        for start in range(0, len(garbage_ids), page_size):
+            collection.delete(ids=garbage_ids[start:start + page_size])
+        report.nodes_deleted = len(garbage_ids)
+    logger.info(f"Index GC for project {project_id}{' (dry run)' if dry_run else ''}: scanned {report.nodes_scanned} node(s), "
+                f"{report.orphaned_nodes} orphaned ({len(missing_files)} missing file(s)), {report.duplicate_nodes} duplicate, {report.nodes_deleted} deleted.")
+    return report
+
+
+def indexed_project_ids(collections: Iterable, page_size: int = GC_PAGE_SIZE, one_project_per_collection: bool = False) -> Set[str]:
+    """
+    Distinct project_id values of the nodes in collections, from a paged metadata scan. With
+    one_project_per_collection (per-project shards), only the first node of each collection is read.
+    """
+    project_ids: Set[str] = set()
+    for collection in collections:
+        offset = 0
+        while True:
+            page = collection.get(limit=1 if one_project_per_collection else page_size, offset=offset, include=["metadatas"])
+            ids = list(page.get("ids") or [])
+            if not ids:
+                break
+            project_ids.update(metadata["project_id"] for metadata in page.get("metadatas") or [] if metadata and metadata.get("project_id"))
+            if one_project_per_collection:
+                break
+            offset += len(ids)
+    return project_ids
+
+
+async def run_scheduled_gc(interval_hours: float, dry_run: bool):
+    """Background task: runs the index GC over every project in the index every interval_hours (started by the app lifespan)."""
+    # --- Local import to avoid circular dependency with index_manager ---
+    from app.rag.index_manager import index_manager
+
+    logger.info(f"Scheduled index GC enabled: every {interval_hours}h{' (dry run)' if dry_run else ''}.")
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        if index_manager is None:
+            continue
+        try:
+            project_ids = await asyncio.to_thread(index_manager.indexed_project_ids)
+        except Exception as e:
+            logger.error(f"Scheduled index GC could not list the indexed projects: {e}", exc_info=True)
+            continue
+        for project_id in project_ids:
+            try:
+                await asyncio.to_thread(index_manager.collect_garbage, project_id, dry_run)
+            except Exception as e:
+                logger.error(f"Scheduled index GC failed for project {project_id}: {e}", exc_info=True)
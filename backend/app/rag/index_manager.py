@@ -15,8 +15,9 @@
 import logging
 from pathlib import Path
 import os
+import threading
 import torch
-from typing import Optional, Dict, Any, List # Import List
+from typing import Optional, Dict, Any, List, Tuple # Import List
 
 from llama_index.core import (
     VectorStoreIndex,
@@ -26,12 +27,28 @@ from llama_index.core import (
     load_index_from_storage,
 )
 from llama_index.core.vector_stores import ExactMatchFilter, MetadataFilters
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.core.schema import BaseNode, TextNode
 from llama_index.vector_stores.chroma import ChromaVectorStore
+from llama_index.core.embeddings import BaseEmbedding
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.llms import LLM
 from llama_index.llms.google_genai import GoogleGenAI
 import chromadb
 from app.core.config import settings, BASE_PROJECT_DIR # Import settings
+from app.core.metrics import INDEX_FILES_IN_PROGRESS, INDEXED_FILES
 from app.services.file_service import file_service
+from app.rag.keyword_index import keyword_index
+from app.rag.embedding_cache import EmbeddingCache, CachedEmbedding
+from app.rag.metered_embedding import MeteredEmbedding
+from app.rag.chunking import build_chunk_nodes
+from app.rag.onnx_embedding import load_checked_onnx_embedding
+from app.rag.embedding_pool import EmbeddingPoolClient, RemoteEmbedding, pool_address, pool_authkey
+from app.rag.sharding import collection_name_for, SHARDING_NONE, SHARDING_PROJECT
+from app.rag.vector_maintenance import hnsw_collection_kwargs
+from app.rag.stub_models import StubLLM, StubEmbedding
+from app.rag.index_gc import collect_garbage, indexed_project_ids
+from app.models.ai import IndexGCResponse
 
 
 logger = logging.getLogger(__name__)
@@ -39,16 +56,20 @@ logger = logging.getLogger(__name__)
 # --- Configuration ---
 CHROMA_PERSIST_DIR = "./chroma_db"
 CHROMA_COLLECTION_NAME = "codex_ai_documents"
+LLM_PROVIDERS = ("google", "stub")
 LLM_MODEL_NAME = "models/gemini-1.5-pro-latest"
-EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+EMBEDDING_MODEL_NAME = settings.EMBEDDING_MODEL_NAME
 
 class IndexManager:
     """
-    Manages the RAG index for project content using LlamaIndex, ChromaDB, Google Gemini LLM, and HuggingFace Embeddings.
+    Manages the RAG index for project content using LlamaIndex, ChromaDB, Google Gemini LLM (or the offline StubLLM), and HuggingFace Embeddings.
     Focuses on index initialization and modification (add/update/delete).
     Injects relevant metadata (project_id, file_path, document_type, document_title, chapter_id, chapter_title) into nodes.
     """
 
+    # Incremented on every change to the index, so callers can tell results computed before a change apart
+    generation: int = 0
+
     def __init__(self):
         """
         Initializes the IndexManager. Sets up LlamaIndex components (LLM, Embeddings, Vector Store)
@@ -56,46 +77,76 @@ class IndexManager:
         """
         logger.info("Initializing IndexManager...")
         self.index: Optional[VectorStoreIndex] = None
-        self.llm: Optional[GoogleGenAI] = None # Specific type hint
-        self.embed_model: Optional[HuggingFaceEmbedding] = None
+        self.llm: Optional[LLM] = None # GoogleGenAI, or StubLLM with LLM_PROVIDER=stub
+        self.embed_model: Optional[BaseEmbedding] = None
         self.storage_context: Optional[StorageContext] = None
         self.vector_store: Optional[ChromaVectorStore] = None
         self.chroma_collection: Optional[chromadb.Collection] = None
-
-        if not settings.GOOGLE_API_KEY:
+        self.chroma_client = None
+        # Shard collections/indexes by collection name (settings.CHROMA_SHARDING)
+        self._shard_collections: Dict[str, chromadb.Collection] = {}
+        self._shard_indexes: Dict[str, VectorStoreIndex] = {}
+        self._shard_lock = threading.Lock()
+
+        if settings.LLM_PROVIDER not in LLM_PROVIDERS:
+            raise ValueError(f"Unknown LLM_PROVIDER '{settings.LLM_PROVIDER}'; expected one of {LLM_PROVIDERS}.")
+        if settings.LLM_PROVIDER == "google" and not settings.GOOGLE_API_KEY:
             logger.error("GOOGLE_API_KEY not found in settings. Cannot initialize AI components.")
             raise ValueError("GOOGLE_API_KEY is not configured.")
 
         try:
             # 1. Configure LlamaIndex Settings globally
-            logger.debug(f"Configuring LLM: {LLM_MODEL_NAME} with temperature: {settings.LLM_TEMPERATURE}")
-            try:
-                 LlamaSettings.llm = GoogleGenAI(
-                     model=LLM_MODEL_NAME,
-                     api_key=settings.GOOGLE_API_KEY,
-                     temperature=settings.LLM_TEMPERATURE
-                 )
-            except TypeError:
-                 logger.warning("Initialization with 'model' failed for GoogleGenAI, trying 'model_name'.")
-                 LlamaSettings.llm = GoogleGenAI(
-                     model_name=LLM_MODEL_NAME,
-                     api_key=settings.GOOGLE_API_KEY,
-                     temperature=settings.LLM_TEMPERATURE
-                 )
+            if settings.LLM_PROVIDER == "stub":
+                LlamaSettings.llm = self._create_stub_llm()
+            else:
+                logger.debug(f"Configuring LLM: {LLM_MODEL_NAME} with temperature: {settings.LLM_TEMPERATURE}")
+                try:
+                     LlamaSettings.llm = GoogleGenAI(
+                         model=LLM_MODEL_NAME,
+                         api_key=settings.GOOGLE_API_KEY,
+                         temperature=settings.LLM_TEMPERATURE
+                     )
+                except TypeError:
+                     logger.warning("Initialization with 'model' failed for GoogleGenAI, trying 'model_name'.")
+                     LlamaSettings.llm = GoogleGenAI(
+                         model_name=LLM_MODEL_NAME,
+                         api_key=settings.GOOGLE_API_KEY,
+                         temperature=settings.LLM_TEMPERATURE
+                     )
             self.llm = LlamaSettings.llm
 
             logger.debug(f"Configuring Embedding Model: {EMBEDDING_MODEL_NAME}")
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"Using device '{device}' for HuggingFace embeddings.")
-            LlamaSettings.embed_model = HuggingFaceEmbedding(model_name=EMBEDDING_MODEL_NAME, device=device)
+            embed_model = None
+            if settings.EMBEDDING_POOL_ENABLED:
+                embed_model = self._create_pool_embedding()
+            if embed_model is None and settings.EMBEDDING_BACKEND == "onnx":
+                embed_model = self._create_onnx_embedding()
+            if embed_model is None and settings.EMBEDDING_BACKEND == "stub":
+                logger.warning("Using the offline stub embedding (EMBEDDING_BACKEND=stub): retrieval quality is not representative.")
+                embed_model = StubEmbedding()
+            if embed_model is None:
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                logger.info(f"Using device '{device}' for HuggingFace embeddings.")
+                embed_model = HuggingFaceEmbedding(model_name=EMBEDDING_MODEL_NAME, device=device)
+            # --- ADDED: Model call metrics (inside the cache, so only texts actually embedded are counted) ---
+            embed_model = MeteredEmbedding(inner=embed_model)
+            # --- END ADDED ---
+            # --- ADDED: Persistent embedding cache in front of the model ---
+            if settings.EMBEDDING_CACHE_ENABLED:
+                logger.info(f"Using persistent embedding cache at {settings.EMBEDDING_CACHE_PATH} (max {settings.EMBEDDING_CACHE_MAX_MB} MB)")
+                cache = EmbeddingCache(Path(settings.EMBEDDING_CACHE_PATH), max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+                embed_model = CachedEmbedding(inner=embed_model, cache=cache)
+            # --- END ADDED ---
+            LlamaSettings.embed_model = embed_model
             self.embed_model = LlamaSettings.embed_model
 
             # 2. Initialize ChromaDB Client and Vector Store
             logger.debug(f"Initializing ChromaDB client with persistence directory: {CHROMA_PERSIST_DIR}")
             os.makedirs(CHROMA_PERSIST_DIR, exist_ok=True)
             db = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
+            self.chroma_client = db
             logger.debug(f"Getting or creating ChromaDB collection: {CHROMA_COLLECTION_NAME}")
-            self.chroma_collection = db.get_or_create_collection(name=CHROMA_COLLECTION_NAME)
+            self.chroma_collection = db.get_or_create_collection(name=CHROMA_COLLECTION_NAME, **hnsw_collection_kwargs())
             logger.debug("Initializing ChromaVectorStore...")
             self.vector_store = ChromaVectorStore(chroma_collection=self.chroma_collection)
 
@@ -119,6 +170,8 @@ class IndexManager:
             if not self.index: # Final check
                  raise RuntimeError("Index could not be loaded or created.")
 
+            if settings.CHROMA_SHARDING != SHARDING_NONE:
+                logger.info(f"Chroma sharding mode '{settings.CHROMA_SHARDING}': project chunks are stored in per-{settings.CHROMA_SHARDING} collections.")
             logger.info("IndexManager initialized successfully.")
 
         except Exception as e:
@@ -126,6 +179,98 @@ class IndexManager:
             self.index = None # Ensure index is None on failure
             raise RuntimeError(f"Failed to initialize IndexManager: {e}") from e
 
+    # --- ADDED: Embedding worker pool client ---
+    def _create_pool_embedding(self) -> Optional[BaseEmbedding]:
+        """
+        Connects to the embedding pool service (python -m app.rag.embedding_pool).
+        Returns None, so the model is loaded in-process instead, if the pool can't be reached.
+        Raises ValueError (startup fails) if EMBEDDING_POOL_AUTHKEY is not configured.
+        """
+        authkey = pool_authkey()
+        try:
+            client = EmbeddingPoolClient(pool_address(), authkey, timeout=settings.EMBEDDING_POOL_TIMEOUT_S)
+            remote_model = RemoteEmbedding(client)
+            logger.info(f"Using embedding pool at {settings.EMBEDDING_POOL_HOST}:{settings.EMBEDDING_POOL_PORT} ({remote_model.model_name}).")
+            return remote_model
+        except Exception as e:
+            logger.error(f"Embedding pool at {settings.EMBEDDING_POOL_HOST}:{settings.EMBEDDING_POOL_PORT} unavailable: {e}. Loading the model in-process.")
+            return None
+    # --- END ADDED ---
+
+    # --- ADDED: ONNX Runtime embedding backend ---
+    def _create_onnx_embedding(self) -> Optional[BaseEmbedding]:
+        """
+        Creates the ONNX Runtime embedding model, checked against the torch model
+        (so indexes built with either backend stay usable). Returns None to fall back to torch.
+        """
+        return load_checked_onnx_embedding(
+            EMBEDDING_MODEL_NAME,
+            reference_factory=lambda: HuggingFaceEmbedding(model_name=EMBEDDING_MODEL_NAME, device="cpu"),
+        )
+    # --- END ADDED ---
+
+    # --- ADDED: Offline LLM ---
+    def _create_stub_llm(self) -> StubLLM:
+        """Local StubLLM (LLM_PROVIDER=stub) for load tests and benchmarks without network access."""
+        logger.warning(
+            "Using the offline stub LLM (LLM_PROVIDER=stub): latency %s ms (%s, jitter %s ms), %s tokens/s, error rate %s, 429 rate %s.",
+            settings.STUB_LLM_LATENCY_MS, settings.STUB_LLM_LATENCY_DISTRIBUTION, settings.STUB_LLM_LATENCY_JITTER_MS,
+            settings.STUB_LLM_TOKENS_PER_SECOND or "unlimited", settings.STUB_LLM_ERROR_RATE, settings.STUB_LLM_RATE_LIMIT_RATE,
+        )
+        return StubLLM(
+            latency_ms=settings.STUB_LLM_LATENCY_MS,
+            latency_distribution=settings.STUB_LLM_LATENCY_DISTRIBUTION,
+            jitter_ms=settings.STUB_LLM_LATENCY_JITTER_MS,
+            tokens_per_second=settings.STUB_LLM_TOKENS_PER_SECOND,
+            error_rate=settings.STUB_LLM_ERROR_RATE,
+            rate_limit_rate=settings.STUB_LLM_RATE_LIMIT_RATE,
+            seed=settings.STUB_LLM_SEED,
+        )
+    # --- END ADDED ---
+
+    # --- ADDED: Per-project collection routing ---
+    def collection_name_for(self, project_id: Optional[str]) -> str:
+        """Name of the Chroma collection holding project_id's chunks under the configured sharding mode."""
+        return collection_name_for(CHROMA_COLLECTION_NAME, project_id or "", settings.CHROMA_SHARDING, settings.CHROMA_SHARD_BUCKETS)
+
+    def get_collection(self, project_id: Optional[str]) -> Optional[chromadb.Collection]:
+        """Returns the Chroma collection for project_id (the shared collection unless sharding is enabled)."""
+        name = self.collection_name_for(project_id)
+        if name == CHROMA_COLLECTION_NAME or not self.chroma_client:
+            return self.chroma_collection
+        with self._shard_lock:
+            collection = self._shard_collections.get(name)
+            if collection is None:
+                logger.debug(f"Getting or creating shard collection '{name}' for project {project_id}")
+                collection = self.chroma_client.get_or_create_collection(name=name, **hnsw_collection_kwargs())
+                self._shard_collections[name] = collection
+            return collection
+
+    def get_index(self, project_id: Optional[str]) -> Optional[VectorStoreIndex]:
+        """Returns the VectorStoreIndex over project_id's collection (self.index unless sharding is enabled)."""
+        name = self.collection_name_for(project_id)
+        if name == CHROMA_COLLECTION_NAME or not self.chroma_client:
+            return self.index
+        collection = self.get_collection(project_id)
+        with self._shard_lock:
+            index = self._shard_indexes.get(name)
+            if index is None:
+                index = VectorStoreIndex.from_vector_store(ChromaVectorStore(chroma_collection=collection))
+                self._shard_indexes[name] = index
+            return index
+
+    def _routing_project_id(self, file_path: Path) -> Optional[str]:
+        """project_id used to route file_path to its collection (not needed, so not computed, without sharding)."""
+        if settings.CHROMA_SHARDING == SHARDING_NONE:
+            return None
+        return self._extract_project_id(file_path)
+
+    def _forget_shard(self, name: str):
+        with self._shard_lock:
+            self._shard_collections.pop(name, None)
+            self._shard_indexes.pop(name, None)
+    # --- END ADDED ---
+
     def _extract_project_id(self, file_path: Path) -> str | None:
         """
         Extracts the project_id from the file path relative to BASE_PROJECT_DIR.
@@ -242,49 +387,171 @@ class IndexManager:
         """
         Loads, parses, embeds, adds metadata (project_id, file_path, document_type, document_title, chapter_id, chapter_title),
         and inserts/updates a single file's content into the index.
-        If the document already exists (based on file_path), it's deleted first.
-        Empty files are skipped.
+        The content is split into chunks; chunks already stored for the file_path are kept,
+        vanished chunks are deleted and only new chunks are embedded and inserted.
+        Empty files are skipped (and their stale nodes removed).
 
         Args:
             file_path: Path to the file to index
             preloaded_metadata: Optional dictionary containing pre-loaded metadata to use instead of reading from filesystem
                                This helps avoid race conditions when metadata has just been updated
         """
-        if not self.index: logger.error("Index is not initialized. Cannot index file."); return
-        if not isinstance(file_path, Path): logger.error(f"IndexManager.index_file called with invalid type for file_path: {type(file_path)}"); return
-        if not file_path.is_file(): logger.warning(f"IndexManager.index_file called with non-existent file: {file_path}"); return
+        INDEX_FILES_IN_PROGRESS.inc()
+        try:
+            self._index_file(file_path, preloaded_metadata)
+        finally:
+            self.generation += 1
+            INDEX_FILES_IN_PROGRESS.dec()
+            INDEXED_FILES.inc()
+
+    def _index_file(self, file_path: Path, preloaded_metadata: Optional[Dict[str, Any]]):
+        documents = self._prepare_documents(file_path, preloaded_metadata)
+        if not documents: return
+
+        try:
+            stale_ids, new_nodes, all_nodes = self._diff_file_nodes(file_path, documents)
+            self._apply_node_diff(stale_ids, new_nodes, documents[0].metadata.get('project_id'))
+            keyword_index.remove_file(str(file_path))
+            keyword_index.add_nodes(all_nodes)
+            logger.info(f"Successfully indexed/updated file: {file_path} with project_id '{documents[0].metadata.get('project_id')}' "
+                        f"({len(new_nodes)} chunk(s) inserted, {len(stale_ids)} deleted, {len(all_nodes) - len(new_nodes)} unchanged)")
+        except Exception as e:
+            logger.error(f"Error indexing file {file_path}: {e}", exc_info=True)
+
+    # --- ADDED: Batch indexing ---
+    def index_files(self, file_paths: List[Path], preloaded_metadata: Optional[Dict[Path, Dict[str, Any]]] = None) -> int:
+        """
+        Indexes several files with a single insert, so their new chunks are embedded in one batch
+        instead of one embedding pass per file. Skip rules and chunk diffing are the same as index_file.
+
+        Args:
+            file_paths: Paths of the files to index
+            preloaded_metadata: Optional mapping of file path to the preloaded metadata for that file (see index_file)
+
+        Returns:
+            The number of chunks inserted into the index.
+        """
+        INDEX_FILES_IN_PROGRESS.inc(len(file_paths))
+        try:
+            return self._index_files(file_paths, preloaded_metadata or {})
+        finally:
+            self.generation += 1
+            INDEX_FILES_IN_PROGRESS.dec(len(file_paths))
+            INDEXED_FILES.inc(len(file_paths))
+
+    def _index_files(self, file_paths: List[Path], preloaded_metadata: Dict[Path, Dict[str, Any]]) -> int:
+        all_stale_ids: List[str] = []
+        all_new_nodes: List[BaseNode] = []
+        file_nodes: Dict[Path, List[BaseNode]] = {}
+        # Diffs grouped by target collection (a single group unless sharding is enabled)
+        collection_diffs: Dict[str, Tuple[Optional[str], List[str], List[BaseNode]]] = {}
+        try:
+            for file_path in file_paths:
+                documents = self._prepare_documents(file_path, preloaded_metadata.get(file_path))
+                if not documents: continue
+                stale_ids, new_nodes, nodes = self._diff_file_nodes(file_path, documents)
+                project_id = documents[0].metadata.get('project_id')
+                _, group_stale_ids, group_new_nodes = collection_diffs.setdefault(self.collection_name_for(project_id), (project_id, [], []))
+                group_stale_ids.extend(stale_ids)
+                group_new_nodes.extend(new_nodes)
+                all_stale_ids.extend(stale_ids)
+                all_new_nodes.extend(new_nodes)
+                file_nodes[file_path] = nodes
+            if not file_nodes:
+                logger.info(f"IndexManager: No documents to insert for batch of {len(file_paths)} file(s).")
+                return 0
+
+            for project_id, group_stale_ids, group_new_nodes in collection_diffs.values():
+                self._apply_node_diff(group_stale_ids, group_new_nodes, project_id)
+            for file_path, nodes in file_nodes.items():
+                keyword_index.remove_file(str(file_path))
+                keyword_index.add_nodes(nodes)
+            logger.info(f"Successfully indexed batch of {len(file_nodes)} file(s): {len(all_new_nodes)} chunk(s) inserted, {len(all_stale_ids)} deleted.")
+            return len(all_new_nodes)
+        except Exception as e:
+            logger.error(f"Error indexing batch of {len(file_paths)} file(s): {e}", exc_info=True)
+            return 0
+    # --- END ADDED ---
+
+    # --- ADDED: Chunk-level diff reindexing ---
+    def _get_file_node_ids(self, file_path: Path) -> Optional[List[str]]:
+        """Returns the ids of the chunks currently stored for file_path, or None if they cannot be read."""
+        collection = self.get_collection(self._routing_project_id(file_path))
+        if not collection:
+            return None
+        try:
+            result = collection.get(where={"file_path": str(file_path)}, include=[])
+            return list(result.get("ids") or [])
+        except Exception as e:
+            logger.warning(f"Could not read stored chunks for {file_path}: {e}")
+            return None
+
+    def _diff_file_nodes(self, file_path: Path, documents: List[Any]) -> Tuple[List[str], List[BaseNode], List[BaseNode]]:
+        """
+        Chunks the loaded documents of a file and compares the chunk ids with those stored in Chroma.
+        Returns (ids of vanished chunks, chunks to insert, all current chunks).
+        If the stored chunks cannot be read, the file's nodes are deleted and every chunk is inserted.
+        """
+        nodes: List[BaseNode] = []
+        for document in documents:
+            nodes.extend(build_chunk_nodes(document, str(file_path), settings.RAG_CHUNK_MIN_CHARS, settings.RAG_CHUNK_MAX_CHARS))
+
+        existing_ids = self._get_file_node_ids(file_path)
+        if existing_ids is None:
+            self.delete_doc(file_path)
+            return [], nodes, nodes
+
+        current_ids = {node.node_id for node in nodes}
+        existing_id_set = set(existing_ids)
+        stale_ids = [node_id for node_id in existing_ids if node_id not in current_ids]
+        new_nodes = [node for node in nodes if node.node_id not in existing_id_set]
+        logger.debug(f"Chunk diff for {file_path}: {len(nodes)} chunk(s), {len(new_nodes)} new, {len(stale_ids)} vanished.")
+        return stale_ids, new_nodes, nodes
+
+    def _apply_node_diff(self, stale_ids: List[str], new_nodes: List[BaseNode], project_id: Optional[str] = None):
+        """Deletes vanished chunks by id and inserts (embeds) new ones, in project_id's collection."""
+        if stale_ids:
+            self.get_collection(project_id).delete(ids=stale_ids)
+        if new_nodes:
+            self.get_index(project_id).insert_nodes(new_nodes)
+    # --- END ADDED ---
+
+    def _prepare_documents(self, file_path: Path, preloaded_metadata: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Runs the skip checks for a file and loads it into documents with metadata attached.
+        Returns an empty list if the file should not be (re)inserted; skipped files have their nodes deleted.
+        """
+        if not self.index: logger.error("Index is not initialized. Cannot index file."); return []
+        if not isinstance(file_path, Path): logger.error(f"IndexManager.index_file called with invalid type for file_path: {type(file_path)}"); return []
+        if not file_path.is_file(): logger.warning(f"IndexManager.index_file called with non-existent file: {file_path}"); return []
 
         try:
             if file_path.stat().st_size == 0:
                 logger.info(f"Skipping indexing for empty file: {file_path}")
                 self.delete_doc(file_path) # Attempt to remove any stale nodes
-                return
-        except OSError as e: logger.error(f"Could not check file size for {file_path}: {e}"); return
+                return []
+        except OSError as e: logger.error(f"Could not check file size for {file_path}: {e}"); return []
 
         logger.info(f"IndexManager: Received request to index/update file: {file_path}")
         project_id = self._extract_project_id(file_path)
-        if not project_id: logger.error(f"Could not determine project_id for file {file_path}. Skipping indexing."); return
+        if not project_id: logger.error(f"Could not determine project_id for file {file_path}. Skipping indexing."); return []
         
         # ADDED: Check if the file is a special file that should be skipped (like .folder notes)
         if file_path.stem == '.folder' or file_path.stem.startswith('.'):
             logger.info(f"Skipping indexing for technical file: {file_path}")
             self.delete_doc(file_path)  # Remove any existing nodes for this path
-            return
+            return []
             
         # Get document details and check if it should be skipped
         doc_details = self._get_document_details(file_path, project_id)
         if doc_details.get('document_type') == 'SkipIndexing':
             logger.info(f"Skipping indexing for file marked as SkipIndexing: {file_path}")
             self.delete_doc(file_path)  # Remove any existing nodes for this path
-            return
+            return []
             
         logger.info(f"Determined project_id '{project_id}' for file {file_path}")
 
         try:
-            # --- Delete existing nodes first ---
-            self.delete_doc(file_path)
-            # --- End Deletion ---
-
             logger.debug(f"Loading document content from: {file_path}")
             def file_metadata_func(file_name: str) -> Dict[str, Any]:
                  current_path = Path(file_name)
@@ -322,9 +589,9 @@ class IndexManager:
 
             reader = SimpleDirectoryReader(input_files=[file_path], file_metadata=file_metadata_func)
             documents = reader.load_data()
-            if not documents: logger.warning(f"No documents loaded from file: {file_path}. Skipping insertion."); return
+            if not documents: logger.warning(f"No documents loaded from file: {file_path}. Skipping insertion."); return []
 
-            logger.debug(f"Inserting new nodes for file: {file_path} (metadata added via file_metadata_func)")
+            logger.debug(f"Prepared nodes for file: {file_path} (metadata added via file_metadata_func)")
 
             # --- MODIFIED: Handle preloaded metadata for Notes as well ---
             if preloaded_metadata and preloaded_metadata.get('document_type') in ['Scene', 'Note', 'Character']: # Add Note/Character
@@ -341,11 +608,11 @@ class IndexManager:
                     logger.debug(f"Final document metadata for insertion: {doc.metadata}")
             # --- END MODIFIED ---
 
-            self.index.insert_nodes(documents)
-            logger.info(f"Successfully indexed/updated file: {file_path} with project_id '{project_id}'")
+            return documents
 
         except Exception as e:
             logger.error(f"Error indexing file {file_path}: {e}", exc_info=True)
+            return []
 
 
     def delete_doc(self, file_path: Path):
@@ -355,13 +622,17 @@ class IndexManager:
         """
         if not isinstance(file_path, Path): logger.error(f"IndexManager.delete_doc called with invalid type for file_path: {type(file_path)}"); return
         logger.info(f"IndexManager: Received request to delete document associated with file path: {file_path}")
+        self.generation += 1
 
+        project_id = self._routing_project_id(file_path)
+        collection = self.get_collection(project_id)
+        index = self.get_index(project_id)
         # --- MODIFIED: Attempt both deletion methods ---
         # Attempt 1: Direct ChromaDB deletion using file_path metadata
-        if self.chroma_collection:
+        if collection:
             try:
                 logger.debug(f"Attempting direct ChromaDB deletion for file_path: {str(file_path)}")
-                delete_result = self.chroma_collection.delete(where={"file_path": str(file_path)})
+                delete_result = collection.delete(where={"file_path": str(file_path)})
                 logger.info(f"Direct ChromaDB deletion attempt for file_path='{str(file_path)}' completed.")
             except Exception as chroma_delete_err:
                 logger.warning(f"Direct ChromaDB deletion failed for {file_path}: {chroma_delete_err}")
@@ -369,11 +640,11 @@ class IndexManager:
             logger.warning("Chroma collection not available for direct deletion.")
 
         # Attempt 2: LlamaIndex deletion using ref_doc_id
-        if self.index:
+        if index:
              doc_id = str(file_path) # LlamaIndex uses file path string as ref_doc_id
              try:
                  logger.debug(f"Attempting LlamaIndex deletion for ref_doc_id: {doc_id}")
-                 self.index.delete_ref_doc(ref_doc_id=doc_id, delete_from_docstore=True)
+                 index.delete_ref_doc(ref_doc_id=doc_id, delete_from_docstore=True)
                  logger.info(f"LlamaIndex deletion attempt for ref_doc_id: {doc_id} completed (might not find nodes if direct delete worked).")
              except Exception as e:
                  # This might be expected if direct deletion worked, or could be another issue
@@ -381,6 +652,7 @@ class IndexManager:
         else:
              logger.error("Index is not initialized. Cannot delete doc via LlamaIndex.")
         # --- END MODIFIED ---
+        keyword_index.remove_file(str(file_path))
 
 
     def delete_project_docs(self, project_id: str):
@@ -393,12 +665,110 @@ class IndexManager:
             return
 
         logger.info(f"Attempting to delete all indexed documents for project_id: {project_id} directly from ChromaDB.")
+        self.generation += 1
+        keyword_index.remove_project(project_id)
         try:
-            self.chroma_collection.delete(where={"project_id": project_id})
-            logger.info(f"Successfully deleted documents for project {project_id} from ChromaDB collection '{self.chroma_collection.name}'.")
+            name = self.collection_name_for(project_id)
+            if settings.CHROMA_SHARDING == SHARDING_PROJECT and self.chroma_client:
+                # The whole collection belongs to the project
+                self._forget_shard(name)
+                try:
+                    self.chroma_client.delete_collection(name=name)
+                    logger.info(f"Successfully deleted ChromaDB collection '{name}' of project {project_id}.")
+                except Exception as e:
+                    logger.warning(f"ChromaDB collection '{name}' of project {project_id} not deleted (it may not exist): {e}")
+                return
+            collection = self.get_collection(project_id)
+            collection.delete(where={"project_id": project_id})
+            logger.info(f"Successfully deleted documents for project {project_id} from ChromaDB collection '{collection.name}'.")
         except Exception as e:
             logger.error(f"Error during direct ChromaDB deletion for project {project_id}: {e}", exc_info=True)
 
+    # --- ADDED: Bulk deletion for directories ---
+    def delete_directory_docs(self, directory: Path):
+        """
+        Deletes the nodes of every file under directory with a single index operation:
+        the project root is deleted by project_id, a chapter directory by its chapter_id metadata,
+        and any other directory by file_path prefix (ids looked up in one query, deleted in one call).
+        """
+        project_id = self._extract_project_id(directory)
+        if not project_id:
+            logger.error(f"Could not determine project_id for directory {directory}. Skipping index deletion.")
+            return
+        relative_parts = directory.resolve().relative_to((BASE_PROJECT_DIR / project_id).resolve()).parts
+        if not relative_parts:
+            self.delete_project_docs(project_id)
+            return
+
+        collection = self.get_collection(project_id)
+        if collection is None:
+            logger.error("Chroma collection not initialized. Cannot delete directory docs.")
+            return
+        keyword_index.remove_project(project_id) # Reloaded from Chroma on the next search
+        self.generation += 1
+        if len(relative_parts) == 2 and relative_parts[0] == "chapters":
+            chapter_id = relative_parts[1]
+            logger.info(f"Deleting all indexed documents of chapter {chapter_id} in project {project_id}.")
+            collection.delete(where={"$and": [{"project_id": project_id}, {"chapter_id": chapter_id}]})
+            return
+
+        prefix = str(directory) + os.sep
+        result = collection.get(where={"project_id": project_id}, include=["metadatas"])
+        node_ids = [node_id for node_id, metadata in zip(result.get("ids") or [], result.get("metadatas") or [])
+                    if str((metadata or {}).get("file_path", "")).startswith(prefix)]
+        logger.info(f"Deleting {len(node_ids)} indexed node(s) under {directory}.")
+        if node_ids:
+            collection.delete(ids=node_ids)
+    # --- END ADDED ---
+
+    # --- ADDED: Orphan and duplicate node garbage collection ---
+    def collect_garbage(self, project_id: str, dry_run: bool = True) -> IndexGCResponse:
+        """
+        Finds the project's nodes whose source file no longer exists or that duplicate another chunk,
+        and deletes them in bulk unless dry_run. Returns the report.
+        """
+        collection = self.get_collection(project_id)
+        if collection is None:
+            raise RuntimeError("Chroma collection not initialized.")
+        report = collect_garbage(collection, project_id, dry_run=dry_run)
+        if report.nodes_deleted:
+            keyword_index.remove_project(project_id) # Reloaded from Chroma on the next search
+            self.generation += 1
+        return report
+
+    def indexed_project_ids(self) -> List[str]:
+        """Ids of the projects that have nodes in the index (whether or not they still exist on disk)."""
+        if not self.chroma_collection:
+            raise RuntimeError("Chroma collection not initialized.")
+        project_ids = indexed_project_ids([self.chroma_collection]) # Includes nodes not yet moved to shards
+        if settings.CHROMA_SHARDING != SHARDING_NONE and self.chroma_client:
+            names = [getattr(collection, "name", collection) for collection in self.chroma_client.list_collections()]
+            shards = [self.chroma_client.get_collection(name=name) for name in names if name.startswith(f"{CHROMA_COLLECTION_NAME}_")]
+            project_ids |= indexed_project_ids(shards, one_project_per_collection=settings.CHROMA_SHARDING == SHARDING_PROJECT)
+        return sorted(project_ids)
+    # --- END ADDED ---
+
+    # --- ADDED: Source node lookup ---
+    def get_node(self, project_id: str, node_id: str) -> Optional[BaseNode]:
+        """Returns the stored chunk node_id of project_id, or None if it does not exist (or belongs to another project)."""
+        collection = self.get_collection(project_id)
+        if collection is None:
+            raise RuntimeError("Chroma collection not initialized.")
+        result = collection.get(ids=[node_id], include=["documents", "metadatas"])
+        if not result.get("ids"):
+            return None
+        metadata = (result.get("metadatas") or [None])[0] or {}
+        if metadata.get("project_id") != project_id:
+            return None
+        text = (result.get("documents") or [None])[0] or ""
+        try:
+            node = metadata_dict_to_node(metadata, text=text)
+        except Exception:
+            node = TextNode(text=text, metadata={key: value for key, value in metadata.items() if not key.startswith("_")})
+        node.id_ = node_id
+        return node
+    # --- END ADDED ---
+
 
 # --- Instantiate Singleton ---
 try:
@@ -0,0 +1,186 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Iterable
+
+from llama_index.core.schema import BaseNode, TextNode, NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+logger = logging.getLogger(__name__)
+
+# Unicode-aware word tokens (\w matches Cyrillic, accented Latin, CJK, digits, ...)
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into normalized keyword tokens: NFKC-normalized, case-folded,
+    'ё' folded to 'е', underscores treated as separators. Single characters are dropped
+    unless they are digits.
+    """
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е").replace("_", " ")
+    return [token for token in TOKEN_PATTERN.findall(normalized) if len(token) > 1 or token.isdigit()]
+
+
+class _ProjectKeywordIndex:
+    """BM25 inverted index for the chunks of one project."""
+
+    def __init__(self):
+        self.nodes: Dict[str, BaseNode] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict) # term -> {node_id: term frequency}
+        self.file_nodes: Dict[str, Set[str]] = defaultdict(set) # file_path -> node_ids
+        self.total_length = 0
+
+    def add(self, node: BaseNode):
+        node_id = node.node_id
+        if node_id in self.nodes:
+            self.remove_node(node_id)
+        terms = Counter(tokenize(node.get_content()))
+        self.nodes[node_id] = node
+        self.lengths[node_id] = sum(terms.values())
+        self.total_length += self.lengths[node_id]
+        for term, frequency in terms.items():
+            self.postings[term][node_id] = frequency
+        file_path = node.metadata.get("file_path")
+        if file_path:
+            self.file_nodes[file_path].add(node_id)
+
+    def remove_node(self, node_id: str):
+        node = self.nodes.pop(node_id, None)
+        if node is None:
+            return
+        self.total_length -= self.lengths.pop(node_id, 0)
+        for term in set(tokenize(node.get_content())):
+            term_postings = self.postings.get(term)
+            if term_postings is not None:
+                term_postings.pop(node_id, None)
+                if not term_postings:
+                    del self.postings[term]
+        file_path = node.metadata.get("file_path")
+        if file_path and file_path in self.file_nodes:
+            self.file_nodes[file_path].discard(node_id)
+            if not self.file_nodes[file_path]:
+                del self.file_nodes[file_path]
+
+    def remove_file(self, file_path: str):
+        for node_id in list(self.file_nodes.get(file_path, ())):
+            self.remove_node(node_id)
+
+    def search(self, query_terms: Iterable[str], top_k: int) -> List[NodeWithScore]:
+        document_count = len(self.nodes)
+        if document_count == 0:
+            return []
+        average_length = self.total_length / document_count or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(query_terms):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            document_frequency = len(term_postings)
+            idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for node_id, frequency in term_postings.items():
+                length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[node_id] / average_length)
+                scores[node_id] += idf * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [NodeWithScore(node=self.nodes[node_id], score=score) for node_id, score in ranked]
+
+
+class KeywordIndex:
+    """
+    Per-project BM25 keyword index kept alongside the Chroma vector index.
+    Covers the same chunks as Chroma: a project is loaded from the Chroma collection the
+    first time it is searched, and IndexManager keeps loaded projects in sync on insert/delete.
+    Catches exact names (characters, invented places, Cyrillic proper nouns) that dense search misses.
+    """
+
+    def __init__(self):
+        self._projects: Dict[str, _ProjectKeywordIndex] = {}
+        self._lock = threading.RLock()
+
+    def _load_project(self, project_id: str) -> _ProjectKeywordIndex:
+        """Builds a project's keyword index from the chunks stored in Chroma."""
+        # --- Local import to avoid circular dependency with index_manager ---
+        from app.rag.index_manager import index_manager
+        project_index = _ProjectKeywordIndex()
+        collection = index_manager.get_collection(project_id) if index_manager else None
+        if collection is None:
+            logger.warning(f"KeywordIndex: Chroma collection not available, keyword index for project {project_id} is empty.")
+            return project_index
+        try:
+            result = collection.get(where={"project_id": project_id}, include=["documents", "metadatas"])
+        except Exception as e:
+            logger.error(f"KeywordIndex: Failed to load chunks for project {project_id} from Chroma: {e}", exc_info=True)
+            return project_index
+        for node_id, text, metadata in zip(result.get("ids") or [], result.get("documents") or [], result.get("metadatas") or []):
+            try:
+                node = metadata_dict_to_node(metadata or {}, text=text)
+                node.id_ = node_id
+            except Exception:
+                node = TextNode(id_=node_id, text=text or "", metadata=metadata or {})
+            project_index.add(node)
+        logger.info(f"KeywordIndex: Loaded {len(project_index.nodes)} chunks for project {project_id}.")
+        return project_index
+
+    def _get_project(self, project_id: str) -> _ProjectKeywordIndex:
+        with self._lock:
+            project_index = self._projects.get(project_id)
+            if project_index is None:
+                project_index = self._load_project(project_id)
+                self._projects[project_id] = project_index
+            return project_index
+
+    def search(self, project_id: str, query: str, top_k: int) -> List[NodeWithScore]:
+        """Returns up to top_k chunks of the project ranked by BM25 score for the query."""
+        query_terms = tokenize(query)
+        if not query_terms:
+            return []
+        project_index = self._get_project(project_id)
+        with self._lock:
+            return project_index.search(query_terms, top_k)
+
+    def add_nodes(self, nodes: List[BaseNode]):
+        """Adds (or replaces) chunks in the keyword index of projects that are already loaded."""
+        with self._lock:
+            for node in nodes:
+                project_index = self._projects.get(node.metadata.get("project_id"))
+                if project_index is not None:
+                    project_index.add(node)
+
+    def remove_file(self, file_path: str):
+        """Removes all chunks of a file from the loaded projects."""
+        with self._lock:
+            for project_index in self._projects.values():
+                project_index.remove_file(file_path)
+
+    def remove_project(self, project_id: str):
+        """Drops a project's keyword index; it is reloaded from Chroma on the next search."""
+        with self._lock:
+            self._projects.pop(project_id, None)
+
+
+# --- Instantiate Singleton ---
+keyword_index = KeywordIndex()
@@ -0,0 +1,83 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from typing import List
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from app.core.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_DURATION, EMBEDDED_TEXTS
+
+
+class MeteredEmbedding(BaseEmbedding):
+    """
+    Pass-through embedding model wrapper recording the size and latency of every call to the wrapped model
+    (codex_embedding_* metrics). IndexManager puts it directly around the model, inside the embedding cache,
+    so only texts the model actually embeds are counted.
+    """
+
+    _inner: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, **kwargs):
+        super().__init__(
+            model_name=str(getattr(inner, "model_name", "unknown")),
+            embed_batch_size=getattr(inner, "embed_batch_size", 10),
+            **kwargs,
+        )
+        self._inner = inner
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MeteredEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    @staticmethod
+    def _observe(kind: str, count: int, started_at: float):
+        EMBEDDING_BATCH_SIZE.observe(count, kind=kind)
+        EMBEDDING_BATCH_DURATION.observe(time.perf_counter() - started_at, kind=kind)
+        EMBEDDED_TEXTS.inc(count, kind=kind)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        started_at = time.perf_counter()
+        vectors = self._inner.get_text_embedding_batch(texts)
+        self._observe("text", len(texts), started_at)
+        return vectors
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        started_at = time.perf_counter()
+        vectors = await self._inner.aget_text_embedding_batch(texts)
+        self._observe("text", len(texts), started_at)
+        return vectors
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        started_at = time.perf_counter()
+        vector = self._inner.get_query_embedding(query)
+        self._observe("query", 1, started_at)
+        return vector
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        started_at = time.perf_counter()
+        vector = await self._inner.aget_query_embedding(query)
+        self._observe("query", 1, started_at)
+        return vector
@@ -0,0 +1,220 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+FLOAT_MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+EXPORT_CONFIG_FILE = "export_config.json"
+SELF_CHECK_FILE = "self_check.json"
+ONNX_OPSET = 17
+
+# Multilingual sample used to compare ONNX and torch vectors at startup
+SELF_CHECK_TEXTS = [
+    "The council gathered in Rivendell to decide the fate of the ring.",
+    "Элрон встретил путников у реки на рассвете.",
+    "Sie gingen schweigend durch den dunklen Wald.",
+    "Chapter 3 plan: introduce the antagonist, then the storm.",
+    "Short note.",
+]
+
+
+def export_onnx_model(model_name: str, model_dir: Path, quantize: bool):
+    """
+    Exports the sentence-transformers model to ONNX (transformer only; pooling is done in numpy)
+    and, if requested, writes an int8 dynamically quantized copy next to it.
+    Needs torch and the 'onnx' package; only runs when the exported files are missing.
+    """
+    float_path = model_dir / FLOAT_MODEL_FILE
+    if not float_path.is_file():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        logger.info(f"Exporting embedding model '{model_name}' to ONNX at {model_dir}...")
+        model_dir.mkdir(parents=True, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+        sample = tokenizer(["Export sample sentence."], return_tensors="pt", padding=True)
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+
+        class _LastHiddenState(torch.nn.Module):
+            # Passes the inputs by keyword (forward() argument order differs between transformers versions)
+            def __init__(self, inner):
+                super().__init__()
+                self.inner = inner
+
+            def forward(self, *inputs):
+                return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+        with torch.no_grad():
+            torch.onnx.export(
+                _LastHiddenState(transformer), tuple(sample[name] for name in input_names), str(float_path),
+                input_names=input_names, output_names=["last_hidden_state"], dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET, dynamo=False,
+            )
+        tokenizer.save_pretrained(str(model_dir))
+        export_config = {"model_name": model_name, "max_seq_length": st_model.max_seq_length}
+        (model_dir / EXPORT_CONFIG_FILE).write_text(json.dumps(export_config), encoding="utf-8")
+        del st_model, transformer
+        logger.info(f"ONNX export of '{model_name}' complete.")
+
+    quantized_path = model_dir / QUANTIZED_MODEL_FILE
+    if quantize and not quantized_path.is_file():
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        logger.info(f"Quantizing ONNX embedding model to int8: {quantized_path}")
+        quantize_dynamic(model_input=str(float_path), model_output=str(quantized_path), weight_type=QuantType.QInt8)
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """
+    Runs a sentence-transformers embedding model with ONNX Runtime on CPU: mean pooling over the
+    last hidden state and L2 normalization, matching HuggingFaceEmbedding's output.
+    The model is exported (and optionally int8-quantized) on first use into model_dir.
+    """
+
+    _session = PrivateAttr()
+    _tokenizer = PrivateAttr()
+    _input_names: List[str] = PrivateAttr()
+    _max_length: int = PrivateAttr()
+    _model_path: Path = PrivateAttr()
+
+    def __init__(self, model_name: str, model_dir: Path, quantize: bool = False, num_threads: int = 0, embed_batch_size: int = 10, **kwargs):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        export_onnx_model(model_name, model_dir, quantize)
+        super().__init__(
+            model_name=f"{model_name} (onnx{'-int8' if quantize else ''})",
+            embed_batch_size=embed_batch_size,
+            **kwargs,
+        )
+        self._model_path = model_dir / (QUANTIZED_MODEL_FILE if quantize else FLOAT_MODEL_FILE)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(str(self._model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+        self._tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        export_config = json.loads((model_dir / EXPORT_CONFIG_FILE).read_text(encoding="utf-8"))
+        self._max_length = int(export_config.get("max_seq_length") or 512)
+        logger.info(f"ONNX embedding model loaded from {self._model_path} (intra-op threads: {num_threads or 'default'}).")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        tokens = self._tokenizer(texts, padding=True, truncation=True, max_length=self._max_length, return_tensors="np")
+        feed = {name: tokens[name].astype(np.int64) for name in self._input_names if name in tokens}
+        last_hidden_state = self._session.run(None, feed)[0]
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _self_check_key(self) -> str:
+        stat = self._model_path.stat()
+        return f"{self._model_path.name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    def load_self_check(self) -> Optional[float]:
+        """Returns the minimum cosine recorded by an earlier self-check of this exact model file, if any."""
+        check_path = self._model_path.parent / SELF_CHECK_FILE
+        try:
+            results = json.loads(check_path.read_text(encoding="utf-8"))
+            return results.get(self._self_check_key())
+        except (OSError, ValueError):
+            return None
+
+    def save_self_check(self, min_cosine: float):
+        check_path = self._model_path.parent / SELF_CHECK_FILE
+        try:
+            results = json.loads(check_path.read_text(encoding="utf-8")) if check_path.is_file() else {}
+        except ValueError:
+            results = {}
+        results[self._self_check_key()] = min_cosine
+        check_path.write_text(json.dumps(results), encoding="utf-8")
+
+
+def embedding_agreement(candidate: BaseEmbedding, reference: BaseEmbedding, texts: Optional[List[str]] = None) -> float:
+    """Returns the lowest cosine similarity between the two models' vectors over the sample texts."""
+    texts = texts or SELF_CHECK_TEXTS
+    candidate_vectors = np.asarray(candidate.get_text_embedding_batch(texts), dtype=np.float32)
+    reference_vectors = np.asarray(reference.get_text_embedding_batch(texts), dtype=np.float32)
+    dot = (candidate_vectors * reference_vectors).sum(axis=1)
+    norms = np.linalg.norm(candidate_vectors, axis=1) * np.linalg.norm(reference_vectors, axis=1)
+    return float((dot / np.clip(norms, 1e-12, None)).min())
+
+
+def load_checked_onnx_embedding(model_name: str, reference_factory: Callable[[], BaseEmbedding]) -> Optional[OnnxEmbedding]:
+    """
+    Creates the ONNX embedding model configured in settings and, if EMBEDDING_ONNX_SELF_CHECK is on,
+    verifies it against the torch model built by reference_factory (once per model file; the result is recorded).
+    Returns None if the model can't be created or its vectors deviate too much.
+    """
+    try:
+        onnx_model = OnnxEmbedding(
+            model_name=model_name,
+            model_dir=Path(settings.EMBEDDING_ONNX_DIR) / model_name.replace("/", "__"),
+            quantize=settings.EMBEDDING_ONNX_QUANTIZE,
+            num_threads=settings.EMBEDDING_ONNX_THREADS,
+        )
+    except Exception as e:
+        logger.error(f"Could not load ONNX embedding backend (export needs the 'onnx' package): {e}. Falling back to torch.", exc_info=True)
+        return None
+
+    if not settings.EMBEDDING_ONNX_SELF_CHECK:
+        return onnx_model
+    min_cosine = onnx_model.load_self_check()
+    if min_cosine is None:
+        try:
+            logger.info("Running ONNX embedding self-check against the torch model...")
+            reference = reference_factory()
+            min_cosine = embedding_agreement(onnx_model, reference)
+            del reference
+            onnx_model.save_self_check(min_cosine)
+        except Exception as e:
+            logger.error(f"ONNX embedding self-check failed to run: {e}. Falling back to torch.", exc_info=True)
+            return None
+    if min_cosine < settings.EMBEDDING_ONNX_MIN_COSINE:
+        logger.error(f"ONNX embeddings deviate from torch (min cosine {min_cosine:.4f} < {settings.EMBEDDING_ONNX_MIN_COSINE}). Falling back to torch.")
+        return None
+    logger.info(f"Using ONNX Runtime embedding backend ({onnx_model.model_name}), self-check min cosine {min_cosine:.4f}.")
+    return onnx_model
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import logging
+import time
 import re # Import re
 from pathlib import Path
 from llama_index.core.retrievers import VectorIndexRetriever
@@ -26,6 +27,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from google.api_core.exceptions import GoogleAPICallError, ServiceUnavailable, ResourceExhausted
 
 from app.core.config import settings # Import settings
+from app.core.timing import stage, record_stage
+from app.core.metrics import track_llm_call, llm_retry_hook
+from app.core.logging_config import loggable_text
+from app.rag.retrieval import retrieve_nodes, candidate_top_k, project_index
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +41,7 @@ def _is_retryable_google_api_error(exception):
         if hasattr(exception, 'status_code') and exception.status_code == 429: logger.warning("Google API rate limit hit (429 status code). Retrying query..."); return True
         if isinstance(exception, ResourceExhausted): logger.warning("Google API ResourceExhausted error encountered. Retrying query..."); return True
         if hasattr(exception, 'message') and '429' in str(exception.message): logger.warning("Google API rate limit hit (429 in message). Retrying query..."); return True
-    logger.debug(f"Non-retryable error encountered during query: {type(exception)}")
+    logger.debug("Non-retryable error encountered during query: %s", type(exception))
     return False
 # --- End retry predicate ---
 
@@ -53,6 +58,7 @@ class QueryProcessor:
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=5, max=30),
         retry=retry_if_exception(_is_retryable_google_api_error),
+        before_sleep=llm_retry_hook("query"),
         reraise=True
     )
     async def _execute_llm_complete(self, prompt: str):
@@ -60,10 +66,11 @@ class QueryProcessor:
         # --- MODIFIED: Add prompt size logging ---
         char_count = len(prompt)
         est_tokens = char_count // 4
-        logger.info(f"Calling LLM with combined context for query (Temperature: {settings.LLM_TEMPERATURE}, Chars: {char_count}, Est. Tokens: {est_tokens})...")
-        logger.debug(f"--- Query Prompt Start (Chars: {char_count}, Est. Tokens: {est_tokens}) ---\n{prompt}\n--- Query Prompt End ---")
+        logger.info("Calling LLM with combined context for query (Temperature: %s, Chars: %s, Est. Tokens: %s)...", settings.LLM_TEMPERATURE, char_count, est_tokens)
+        logger.debug("--- Query Prompt Start (Chars: %s, Est. Tokens: %s) ---\n%s\n--- Query Prompt End ---", char_count, est_tokens, loggable_text(prompt))
         # --- END MODIFIED ---
-        return await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
+        with stage("llm.attempt", prompt_chars=char_count), track_llm_call("query", char_count):
+            return await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
 
     async def query(self,
                   project_id: str,
@@ -81,12 +88,12 @@ class QueryProcessor:
         
         # Add diagnostics for direct sources data
         if direct_sources_data:
-            logger.info(f"QueryProcessor.query: Received {len(direct_sources_data)} direct sources items")
+            logger.info("QueryProcessor.query: Received %s direct sources items", len(direct_sources_data))
             for i, item in enumerate(direct_sources_data):
                 item_type = item.get('type', 'Unknown')
                 item_name = item.get('name', f'Item {i+1}')
                 content_length = len(item.get('content', ''))
-                logger.info(f"QueryProcessor.query: Direct source {i+1}: Type={item_type}, Name={item_name}, Content length={content_length}")
+                logger.info("QueryProcessor.query: Direct source %s: Type=%s, Name=%s, Content length=%s", i+1, item_type, item_name, content_length)
                 
                 # Verify content exists and is reasonable
                 if content_length == 0:
@@ -95,12 +102,12 @@ class QueryProcessor:
                     logger.warning(f"QueryProcessor.query: Direct source {item_type} '{item_name}' has very short content: '{item.get('content')}'")                
         else:
             logger.info("QueryProcessor.query: Empty direct_sources_data list received")
-        logger.info(f"QueryProcessor: Received query for project '{project_id}': '{query_text}'")
+        logger.info("QueryProcessor: Received query for project '%s': '%s'", project_id, query_text)
         retrieved_nodes: List[NodeWithScore] = []
         nodes_for_prompt: List[NodeWithScore] = []
         direct_sources_info_list: Optional[List[Dict[str, str]]] = None
         final_paths_to_filter_obj = {Path(p).resolve() for p in (paths_to_filter or set())}
-        logger.debug(f"QueryProcessor: Paths to filter (resolved): {final_paths_to_filter_obj}")
+        logger.debug("QueryProcessor: Paths to filter (resolved): %s", final_paths_to_filter_obj)
 
         if direct_sources_data:
              direct_sources_info_list = []
@@ -119,14 +126,14 @@ class QueryProcessor:
 
         try:
             # 1. Retrieve Nodes (Unchanged)
-            logger.debug(f"Creating retriever with top_k={settings.RAG_QUERY_SIMILARITY_TOP_K} and filter for project_id='{project_id}'")
-            retriever = VectorIndexRetriever(index=self.index, similarity_top_k=settings.RAG_QUERY_SIMILARITY_TOP_K, filters=MetadataFilters(filters=[ExactMatchFilter(key="project_id", value=project_id)]))
-            logger.info(f"Retrieving nodes for query: '{query_text}'")
-            retrieved_nodes = await retriever.aretrieve(query_text)
-            logger.info(f"Retrieved {len(retrieved_nodes)} nodes for query context.")
-            if retrieved_nodes:
+            logger.debug("Creating retriever with top_k=%s and filter for project_id='%s'", settings.RAG_QUERY_SIMILARITY_TOP_K, project_id)
+            retriever = VectorIndexRetriever(index=project_index(self.index, project_id), similarity_top_k=candidate_top_k(settings.RAG_QUERY_SIMILARITY_TOP_K), filters=MetadataFilters(filters=[ExactMatchFilter(key="project_id", value=project_id)]))
+            logger.info("Retrieving nodes for query: '%s'", query_text)
+            retrieved_nodes = await retrieve_nodes(retriever, query_text, project_id, settings.RAG_QUERY_SIMILARITY_TOP_K)
+            logger.info("Retrieved %s nodes for query context.", len(retrieved_nodes))
+            if retrieved_nodes and logger.isEnabledFor(logging.DEBUG):
                 log_nodes = [(n.node_id, n.metadata.get('file_path'), n.score) for n in retrieved_nodes]
-                logger.debug(f"QueryProcessor: Nodes retrieved BEFORE filtering: {log_nodes}")
+                logger.debug("QueryProcessor: Nodes retrieved BEFORE filtering: %s", log_nodes)
             else:
                 logger.debug("QueryProcessor: No nodes retrieved.")
 
@@ -140,10 +147,10 @@ class QueryProcessor:
                         unique_retrieved_nodes_map[unique_key] = node_with_score
             unique_retrieved_nodes = list(unique_retrieved_nodes_map.values())
             if len(unique_retrieved_nodes) < len(retrieved_nodes):
-                logger.debug(f"Deduplicated {len(retrieved_nodes) - len(unique_retrieved_nodes)} nodes based on content and file path.")
+                logger.debug("Deduplicated %s nodes based on content and file path.", len(retrieved_nodes) - len(unique_retrieved_nodes))
 
             if unique_retrieved_nodes:
-                logger.debug(f"QueryProcessor: Starting node filtering against {len(final_paths_to_filter_obj)} filter paths.")
+                logger.debug("QueryProcessor: Starting node filtering against %s filter paths.", len(final_paths_to_filter_obj))
                 for node_with_score in unique_retrieved_nodes:
                     node = node_with_score.node
                     node_path_str = node.metadata.get('file_path')
@@ -159,7 +166,7 @@ class QueryProcessor:
                         # First, compare as Path objects
                         if node_path_obj in final_paths_to_filter_obj:
                             is_filtered = True
-                            logger.debug(f"  Filtering node via Path object match: {node_path_obj}")
+                            logger.debug("  Filtering node via Path object match: %s", node_path_obj)
                         
                         # For Notes and other document types that may have path inconsistencies,
                         # also check string comparison as fallback
@@ -169,7 +176,7 @@ class QueryProcessor:
                                 filter_path_str = str(filter_path).lower().replace('\\', '/')
                                 if node_path_str_norm == filter_path_str:
                                     is_filtered = True
-                                    logger.debug(f"  Filtering node via string path match: {node_path_str_norm}")
+                                    logger.debug("  Filtering node via string path match: %s", node_path_str_norm)
                                     break
                         
                         # If the node is not filtered, add it to the prompt
@@ -181,16 +188,17 @@ class QueryProcessor:
                         nodes_for_prompt.append(node_with_score)
 
                 if len(nodes_for_prompt) < len(unique_retrieved_nodes):
-                    logger.debug(f"Filtered {len(unique_retrieved_nodes) - len(nodes_for_prompt)} unique retrieved nodes based on paths_to_filter.")
+                    logger.debug("Filtered %s unique retrieved nodes based on paths_to_filter.", len(unique_retrieved_nodes) - len(nodes_for_prompt))
                 else:
                     logger.debug("No unique nodes were filtered based on paths_to_filter.")
-            if nodes_for_prompt:
+            if nodes_for_prompt and logger.isEnabledFor(logging.DEBUG):
                 log_nodes_after = [(n.node_id, n.metadata.get('file_path'), n.score) for n in nodes_for_prompt]
-                logger.debug(f"QueryProcessor: Nodes remaining AFTER filtering (for prompt): {log_nodes_after}")
+                logger.debug("QueryProcessor: Nodes remaining AFTER filtering (for prompt): %s", log_nodes_after)
             else:
                 logger.debug("QueryProcessor: No nodes remaining after filtering.")
 
             # 2. Build Prompt
+            prompt_started = time.perf_counter()
             logger.debug("Building query prompt with explicit, direct, and retrieved context...")
             system_prompt = (
                 "You are an AI assistant answering questions about a creative writing project. "
@@ -223,7 +231,7 @@ class QueryProcessor:
             # Handle direct sources content more robustly
             if direct_sources_data and len(direct_sources_data) > 0:
                 # Log what we're about to process
-                logger.info(f"QueryProcessor: Processing {len(direct_sources_data)} direct sources items")
+                logger.info("QueryProcessor: Processing %s direct sources items", len(direct_sources_data))
                 content_found = False
                 
                 # First verify we have actual content in at least one item
@@ -233,12 +241,12 @@ class QueryProcessor:
                     source_content = source_item.get('content', '')
                     content_length = len(source_content)
                     
-                    logger.info(f"QueryProcessor: Checking direct source {i+1}: Type={source_type}, Name='{source_name}', Content length={content_length}")
+                    logger.info("QueryProcessor: Checking direct source %s: Type=%s, Name='%s', Content length=%s", i+1, source_type, source_name, content_length)
                     
                     if content_length > 0:
                         content_found = True
                         if source_type == 'Note':
-                            logger.info(f"QueryProcessor: Found valid Note content for '{source_name}' with length {content_length}")
+                            logger.info("QueryProcessor: Found valid Note content for '%s' with length %s", source_name, content_length)
                 
                 # Only add the section header if we found content
                 if content_found:
@@ -255,7 +263,7 @@ class QueryProcessor:
                             logger.warning(f"QueryProcessor: Skipping empty direct source: {source_type} '{source_name}'")
                             continue
                             
-                        logger.info(f"QueryProcessor: Adding direct source to prompt: {source_type} '{source_name}' with content length {len(source_content)}")
+                        logger.info("QueryProcessor: Adding direct source to prompt: %s '%s' with content length %s", source_type, source_name, len(source_content))
                         
                         # No truncation for directly requested content
                         user_message_content += (f"--- Start Directly Requested {source_type}: \"{source_name}\" ---\n" 
@@ -283,7 +291,7 @@ class QueryProcessor:
                       # --- END MODIFIED ---
                       rag_context_list.append(f"{source_label}\n\n{truncated_content}")
             retrieved_context_str = "\n\n---\n\n".join(rag_context_list) if rag_context_list else "No additional relevant context snippets were retrieved via search."
-            logger.debug(f"QueryProcessor: Final rag_context_str for prompt:\n---\n{retrieved_context_str}\n---")
+            logger.debug("QueryProcessor: Final rag_context_str for prompt:\n---\n%s\n---", loggable_text(retrieved_context_str))
 
             user_message_content += (
                  f"**Retrieved Context Snippets:**\n```markdown\n{retrieved_context_str}\n```\n\n"
@@ -292,7 +300,9 @@ class QueryProcessor:
             full_prompt = f"{system_prompt}\n\nUser: {user_message_content}\n\nAssistant:"
 
             # 3. Call LLM via retry helper
-            llm_response = await self._execute_llm_complete(full_prompt)
+            record_stage("rag.prompt", prompt_started, prompt_chars=len(full_prompt))
+            with stage("llm"):
+                llm_response = await self._execute_llm_complete(full_prompt)
             answer = llm_response.text.strip() if llm_response else ""
             logger.info("LLM call complete.")
             if not answer: logger.warning("LLM query returned an empty response string."); answer = "(The AI did not provide an answer based on the context.)"
@@ -310,15 +320,15 @@ class QueryProcessor:
                 direct_source_names = [item.get('name') for item in direct_sources_info_list]
                 
                 # Log what we have before ensuring all items are included
-                logger.info(f"Current direct_sources_info_list: {direct_sources_info_list}")
-                logger.info(f"Current direct source names: {direct_source_names}")
+                logger.info("Current direct_sources_info_list: %s", direct_sources_info_list)
+                logger.info("Current direct source names: %s", direct_source_names)
                 
                 # Add any missing items from direct_sources_data
                 for source in direct_sources_data:
                     source_type = source.get('type', 'Unknown')
                     source_name = source.get('name', 'Unknown')
                     if source_name and source_name not in direct_source_names:
-                        logger.info(f"Adding missing direct source to info list: {source_type} '{source_name}'")
+                        logger.info("Adding missing direct source to info list: %s '%s'", source_type, source_name)
                         direct_sources_info_list.append({
                             "type": source_type,
                             "name": source_name
@@ -328,12 +338,12 @@ class QueryProcessor:
             if not direct_sources_info_list or len(direct_sources_info_list) == 0:
                 # For backward compatibility with tests, return None when there are no direct sources
                 direct_sources_info_list = None
-                logger.info(f"Query successful. Returning answer, {len(nodes_for_prompt)} filtered source nodes, and no direct sources (None)")
+                logger.info("Query successful. Returning answer, %s filtered source nodes, and no direct sources (None)", len(nodes_for_prompt))
                 return answer, nodes_for_prompt, None
             else:
                 # Log what we're returning when we have direct sources
-                logger.info(f"Query successful. Returning answer, {len(nodes_for_prompt)} filtered source nodes, and {len(direct_sources_info_list)} direct sources")
-                logger.info(f"Direct sources to return: {direct_sources_info_list}")
+                logger.info("Query successful. Returning answer, %s filtered source nodes, and %s direct sources", len(nodes_for_prompt), len(direct_sources_info_list))
+                logger.info("Direct sources to return: %s", direct_sources_info_list)
                 return answer, nodes_for_prompt, direct_sources_info_list
 
         # Exception Handling (Unchanged)
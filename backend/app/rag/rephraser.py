@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import logging
+import time
 import asyncio
 import re
 from pathlib import Path
@@ -27,6 +28,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from google.api_core.exceptions import GoogleAPICallError, ServiceUnavailable, ResourceExhausted # Import base error
 
 from app.core.config import settings # Import settings directly
+from app.core.timing import stage, record_stage
+from app.core.metrics import track_llm_call, llm_retry_hook
+from app.core.logging_config import loggable_text
+from app.rag.retrieval import retrieve_nodes, candidate_top_k, project_index
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +42,7 @@ def _is_retryable_google_api_error(exception):
         if hasattr(exception, 'status_code') and exception.status_code == 429: logger.warning("Google API rate limit hit (429 status code). Retrying rephrase..."); return True
         if isinstance(exception, ResourceExhausted): logger.warning("Google API ResourceExhausted error encountered. Retrying rephrase..."); return True
         if hasattr(exception, 'message') and '429' in str(exception.message): logger.warning("Google API rate limit hit (429 in message). Retrying rephrase..."); return True
-    logger.debug(f"Non-retryable error encountered during rephrase: {type(exception)}")
+    logger.debug("Non-retryable error encountered during rephrase: %s", type(exception))
     return False
 # --- End retry predicate ---
 
@@ -55,6 +60,7 @@ class Rephraser:
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=5, max=30),
         retry=retry_if_exception(_is_retryable_google_api_error),
+        before_sleep=llm_retry_hook("rephrase"),
         reraise=True
     )
     async def _execute_llm_complete(self, prompt: str):
@@ -62,10 +68,11 @@ class Rephraser:
         # --- MODIFIED: Add prompt size logging ---
         char_count = len(prompt)
         est_tokens = char_count // 4
-        logger.info(f"Calling LLM for rephrase suggestions (Temperature: {settings.LLM_TEMPERATURE}, Chars: {char_count}, Est. Tokens: {est_tokens})...")
-        logger.debug(f"--- Rephrase Prompt Start (Chars: {char_count}, Est. Tokens: {est_tokens}) ---\n{prompt}\n--- Rephrase Prompt End ---")
+        logger.info("Calling LLM for rephrase suggestions (Temperature: %s, Chars: %s, Est. Tokens: %s)...", settings.LLM_TEMPERATURE, char_count, est_tokens)
+        logger.debug("--- Rephrase Prompt Start (Chars: %s, Est. Tokens: %s) ---\n%s\n--- Rephrase Prompt End ---", char_count, est_tokens, loggable_text(prompt))
         # --- END MODIFIED ---
-        return await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
+        with stage("llm.attempt", prompt_chars=char_count), track_llm_call("rephrase", char_count):
+            return await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
 
     async def rephrase(
         self,
@@ -77,14 +84,14 @@ class Rephraser:
         explicit_synopsis: Optional[str], # Now optional
         paths_to_filter: Optional[Set[str]] = None
         ) -> List[str]:
-        logger.info(f"Rephraser: Starting rephrase for project '{project_id}'. Text: '{selected_text[:50]}...'")
+        logger.info("Rephraser: Starting rephrase for project '%s'. Text: '%s...'", project_id, selected_text[:50])
 
         if not selected_text.strip():
              logger.warning("Rephraser: Received empty selected_text. Returning empty suggestions.")
              return []
 
         final_paths_to_filter_obj = {Path(p).resolve() for p in (paths_to_filter or set())}
-        logger.debug(f"Rephraser: Paths to filter (resolved): {final_paths_to_filter_obj}")
+        logger.debug("Rephraser: Paths to filter (resolved): %s", final_paths_to_filter_obj)
         retrieved_nodes: List[NodeWithScore] = []
         nodes_for_prompt: List[NodeWithScore] = []
 
@@ -95,18 +102,18 @@ class Rephraser:
                 f"Find context relevant to rephrasing the specific text: '{selected_text}'. "
                 f"The surrounding passage is: '{retrieval_context}'."
             )
-            logger.debug(f"Constructed retrieval query for rephrase: '{retrieval_query}'")
-            logger.debug(f"Creating retriever for rephrase with top_k={settings.RAG_GENERATION_SIMILARITY_TOP_K} and filter for project_id='{project_id}'")
+            logger.debug("Constructed retrieval query for rephrase: '%s'", retrieval_query)
+            logger.debug("Creating retriever for rephrase with top_k=%s and filter for project_id='%s'", settings.RAG_GENERATION_SIMILARITY_TOP_K, project_id)
             retriever = VectorIndexRetriever(
-                index=self.index,
-                similarity_top_k=settings.RAG_GENERATION_SIMILARITY_TOP_K,
+                index=project_index(self.index, project_id),
+                similarity_top_k=candidate_top_k(settings.RAG_GENERATION_SIMILARITY_TOP_K),
                 filters=MetadataFilters(filters=[ExactMatchFilter(key="project_id", value=project_id)]),
             )
-            retrieved_nodes = await retriever.aretrieve(retrieval_query)
-            logger.info(f"Retrieved {len(retrieved_nodes)} nodes for rephrase context.")
-            if retrieved_nodes:
+            retrieved_nodes = await retrieve_nodes(retriever, retrieval_query, project_id, settings.RAG_GENERATION_SIMILARITY_TOP_K)
+            logger.info("Retrieved %s nodes for rephrase context.", len(retrieved_nodes))
+            if retrieved_nodes and logger.isEnabledFor(logging.DEBUG):
                 log_nodes = [(n.node_id, n.metadata.get('file_path'), n.score) for n in retrieved_nodes]
-                logger.debug(f"Rephraser: Nodes retrieved BEFORE filtering: {log_nodes}")
+                logger.debug("Rephraser: Nodes retrieved BEFORE filtering: %s", log_nodes)
             else:
                 logger.debug("Rephraser: No nodes retrieved.")
 
@@ -120,10 +127,10 @@ class Rephraser:
                         unique_retrieved_nodes_map[unique_key] = node_with_score
             unique_retrieved_nodes = list(unique_retrieved_nodes_map.values())
             if len(unique_retrieved_nodes) < len(retrieved_nodes):
-                logger.debug(f"Deduplicated {len(retrieved_nodes) - len(unique_retrieved_nodes)} nodes based on content and file path.")
+                logger.debug("Deduplicated %s nodes based on content and file path.", len(retrieved_nodes) - len(unique_retrieved_nodes))
 
             if unique_retrieved_nodes:
-                logger.debug(f"Rephraser: Starting node filtering against {len(final_paths_to_filter_obj)} filter paths.")
+                logger.debug("Rephraser: Starting node filtering against %s filter paths.", len(final_paths_to_filter_obj))
                 for node_with_score in unique_retrieved_nodes:
                     node = node_with_score.node
                     node_path_str = node.metadata.get('file_path')
@@ -134,7 +141,7 @@ class Rephraser:
                     try:
                         node_path_obj = Path(node_path_str).resolve()
                         is_filtered = node_path_obj in final_paths_to_filter_obj
-                        logger.debug(f"  Comparing Node Path: {node_path_obj} | In Filter Set: {is_filtered}")
+                        logger.debug("  Comparing Node Path: %s | In Filter Set: %s", node_path_obj, is_filtered)
                         if not is_filtered:
                             nodes_for_prompt.append(node_with_score)
                     except Exception as e:
@@ -142,12 +149,12 @@ class Rephraser:
                         nodes_for_prompt.append(node_with_score)
 
                 if len(nodes_for_prompt) < len(unique_retrieved_nodes):
-                    logger.debug(f"Filtered {len(unique_retrieved_nodes) - len(nodes_for_prompt)} unique retrieved nodes based on paths_to_filter.")
+                    logger.debug("Filtered %s unique retrieved nodes based on paths_to_filter.", len(unique_retrieved_nodes) - len(nodes_for_prompt))
                 else:
                     logger.debug("No unique nodes were filtered based on paths_to_filter.")
-            if nodes_for_prompt:
+            if nodes_for_prompt and logger.isEnabledFor(logging.DEBUG):
                 log_nodes_after = [(n.node_id, n.metadata.get('file_path'), n.score) for n in nodes_for_prompt]
-                logger.debug(f"Rephraser: Nodes remaining AFTER filtering (for prompt): {log_nodes_after}")
+                logger.debug("Rephraser: Nodes remaining AFTER filtering (for prompt): %s", log_nodes_after)
             else:
                 logger.debug("Rephraser: No nodes remaining after filtering.")
 
@@ -168,10 +175,11 @@ class Rephraser:
                       # --- END MODIFIED ---
                       rag_context_list.append(f"{source_label}\n\n{truncated_content}")
             rag_context_str = "\n\n---\n\n".join(rag_context_list) if rag_context_list else "No specific context was retrieved via search."
-            logger.debug(f"Rephraser: Final rag_context_str for prompt:\n---\n{rag_context_str}\n---")
+            logger.debug("Rephraser: Final rag_context_str for prompt:\n---\n%s\n---", loggable_text(rag_context_str))
 
 
             # 2. Build Rephrase Prompt
+            prompt_started = time.perf_counter()
             logger.debug("Building rephrase prompt...")
             system_prompt = (
                 "You are an expert writing assistant. Your task is to rephrase the user's selected text, providing several alternative phrasings. "
@@ -218,7 +226,9 @@ class Rephraser:
 
 
             # 3. Call LLM via retry helper
-            llm_response = await self._execute_llm_complete(full_prompt)
+            record_stage("rag.prompt", prompt_started, prompt_chars=len(full_prompt))
+            with stage("llm"):
+                llm_response = await self._execute_llm_complete(full_prompt)
             generated_text = llm_response.text.strip() if llm_response else ""
 
             if not generated_text:
@@ -226,7 +236,7 @@ class Rephraser:
                  return ["Error: The AI failed to generate suggestions. Please try again."]
 
             # 4. Parse the Numbered List Response (Unchanged)
-            logger.debug(f"Raw LLM response for parsing:\n{generated_text}")
+            logger.debug("Raw LLM response for parsing:\n%s", generated_text)
             suggestions = re.findall(r"^\s*\d+\.\s*(.*)", generated_text, re.MULTILINE)
             if not suggestions:
                 logger.warning(f"Could not parse numbered list from LLM response. Response was:\n{generated_text}")
@@ -236,7 +246,7 @@ class Rephraser:
 
             suggestions = [s.strip() for s in suggestions if s.strip()][:settings.RAG_REPHRASE_SUGGESTION_COUNT]
 
-            logger.info(f"Successfully parsed {len(suggestions)} rephrase suggestions for project '{project_id}'.")
+            logger.info("Successfully parsed %s rephrase suggestions for project '%s'.", len(suggestions), project_id)
             return suggestions
 
         # Exception Handling (Unchanged)
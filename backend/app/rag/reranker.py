@@ -0,0 +1,97 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from llama_index.core.base.response.schema import NodeWithScore
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Characters of each candidate passed to the cross-encoder (it truncates to its own max tokens anyway;
+# cutting early avoids tokenizing whole 15k-character scenes).
+RERANK_MAX_PASSAGE_CHARS = 2000
+
+
+class CrossEncoderReranker:
+    """
+    Reranks retrieved nodes with a small local cross-encoder (sentence-transformers) on CPU.
+    Candidates are scored in batches until the latency budget is spent; candidates that were not
+    scored in time keep their retrieval order after the scored ones.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _get_model(self):
+        """Loads the cross-encoder on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    logger.info(f"Loading cross-encoder reranker model: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def rerank(self, query: str, nodes: List[NodeWithScore], top_n: int,
+               budget_ms: Optional[int] = None, batch_size: Optional[int] = None) -> List[NodeWithScore]:
+        """
+        Returns the top_n nodes by cross-encoder relevance to the query.
+        Falls back to the first top_n nodes in retrieval order if the model cannot be used.
+        """
+        if len(nodes) <= 1:
+            return nodes[:top_n]
+        budget_ms = settings.RAG_RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        batch_size = max(1, settings.RAG_RERANK_BATCH_SIZE if batch_size is None else batch_size)
+
+        try:
+            model = self._get_model()
+        except Exception as e:
+            logger.error(f"Reranker model '{self.model_name}' unavailable, keeping retrieval order: {e}", exc_info=True)
+            return nodes[:top_n]
+
+        start = time.perf_counter()
+        scores: List[float] = []
+        try:
+            for batch_start in range(0, len(nodes), batch_size):
+                batch = nodes[batch_start:batch_start + batch_size]
+                pairs = [(query, n.node.get_content()[:RERANK_MAX_PASSAGE_CHARS]) for n in batch]
+                scores.extend(float(score) for score in model.predict(pairs, batch_size=batch_size))
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if elapsed_ms >= budget_ms and len(scores) < len(nodes):
+                    logger.warning(f"Rerank budget of {budget_ms} ms spent after scoring {len(scores)}/{len(nodes)} candidates.")
+                    break
+        except Exception as e:
+            logger.error(f"Reranking failed, keeping retrieval order: {e}", exc_info=True)
+            return nodes[:top_n]
+
+        scored = sorted(
+            (NodeWithScore(node=n.node, score=score) for n, score in zip(nodes, scores)),
+            key=lambda n: n.score, reverse=True
+        )
+        # Unscored candidates keep retrieval order, placed below every scored candidate
+        floor = scored[-1].score if scored else 0.0
+        unscored = [NodeWithScore(node=n.node, score=floor - (i + 1)) for i, n in enumerate(nodes[len(scores):])]
+        logger.debug(f"Reranked {len(scores)} candidates in {(time.perf_counter() - start) * 1000:.1f} ms, keeping top {top_n}.")
+        return (scored + unscored)[:top_n]
+
+
+# --- Instantiate Singleton ---
+reranker = CrossEncoderReranker(settings.RAG_RERANK_MODEL)
@@ -0,0 +1,102 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from typing import Dict, List
+
+from llama_index.core.base.response.schema import NodeWithScore
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.schema import QueryBundle
+
+from app.core.config import settings
+from app.core.timing import stage
+from app.rag.keyword_index import keyword_index
+from app.rag.reranker import reranker
+from app.rag.sharding import SHARDING_NONE
+
+logger = logging.getLogger(__name__)
+
+# Shared retrieval flow for the RAG processors (QueryProcessor, SceneGenerator, Rephraser, ChapterSplitter).
+# Each processor builds its own project-filtered VectorIndexRetriever (over project_index) and passes it to retrieve_nodes,
+# which adds the optional stages configured in settings.
+
+
+def reciprocal_rank_fusion(result_lists: List[List[NodeWithScore]], top_k: int, k: int = 60) -> List[NodeWithScore]:
+    """
+    Merges ranked result lists with reciprocal rank fusion: score(node) = sum(1 / (k + rank)).
+    Rank-based, so BM25 and cosine scores don't need to be on the same scale.
+    Returned nodes carry the fused score.
+    """
+    fused_scores: Dict[str, float] = {}
+    nodes_by_id: Dict[str, NodeWithScore] = {}
+    for results in result_lists:
+        for rank, node_with_score in enumerate(results, start=1):
+            node_id = node_with_score.node.node_id
+            fused_scores[node_id] = fused_scores.get(node_id, 0.0) + 1.0 / (k + rank)
+            nodes_by_id.setdefault(node_id, node_with_score)
+    ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=nodes_by_id[node_id].node, score=fused_scores[node_id]) for node_id in ranked_ids]
+
+
+def project_index(default_index, project_id: str):
+    """Index to retrieve project_id's chunks from: its shard collection when CHROMA_SHARDING is enabled, else default_index."""
+    if settings.CHROMA_SHARDING == SHARDING_NONE:
+        return default_index
+    # --- Local import to avoid circular dependency with index_manager ---
+    from app.rag.index_manager import index_manager
+    if index_manager is None:
+        return default_index
+    return index_manager.get_index(project_id)
+
+
+def candidate_top_k(top_k: int) -> int:
+    """Number of nodes a processor's retriever should fetch: over-retrieves when the rerank stage is enabled."""
+    if settings.RAG_RERANK_ENABLED:
+        return max(top_k, settings.RAG_RERANK_CANDIDATES)
+    return top_k
+
+
+async def retrieve_nodes(retriever, query: str, project_id: str, top_k: int) -> List[NodeWithScore]:
+    """
+    Retrieves context nodes for a query.
+    Always runs the dense retriever (built with similarity_top_k=candidate_top_k(top_k)). Optional stages:
+    - RAG_HYBRID_RETRIEVAL: BM25 keyword results for the project are fused in with reciprocal rank fusion.
+    - RAG_RERANK_ENABLED: candidates are reranked by a local cross-encoder and the best RAG_RERANK_TOP_N kept.
+    """
+    # The query is embedded here rather than inside the retriever, so embedding and vector search are timed separately
+    query_bundle = query
+    embed_model = getattr(retriever, "_embed_model", None)
+    if isinstance(embed_model, BaseEmbedding):
+        with stage("rag.embed_query"):
+            query_bundle = QueryBundle(query_str=query, embedding=await embed_model.aget_query_embedding(query))
+    with stage("rag.vector_search", project_id=project_id):
+        retrieved_nodes = await retriever.aretrieve(query_bundle)
+    candidate_count = candidate_top_k(top_k)
+
+    if settings.RAG_HYBRID_RETRIEVAL:
+        try:
+            with stage("rag.keyword_search"):
+                keyword_nodes = await asyncio.to_thread(keyword_index.search, project_id, query, candidate_count)
+            fused_nodes = reciprocal_rank_fusion([retrieved_nodes, keyword_nodes], top_k=candidate_count, k=settings.RAG_HYBRID_RRF_K)
+            logger.debug("Hybrid retrieval: %s dense + %s keyword nodes fused into %s.", len(retrieved_nodes), len(keyword_nodes), len(fused_nodes))
+            retrieved_nodes = fused_nodes
+        except Exception as e:
+            logger.error(f"Keyword search failed for project {project_id}, using dense results only: {e}", exc_info=True)
+
+    if settings.RAG_RERANK_ENABLED and retrieved_nodes:
+        with stage("rag.rerank"):
+            retrieved_nodes = await asyncio.to_thread(reranker.rerank, query, retrieved_nodes, settings.RAG_RERANK_TOP_N)
+
+    return retrieved_nodes
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import logging
+import time
 import asyncio
 import re
 from pathlib import Path
@@ -29,6 +30,10 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 from google.api_core.exceptions import GoogleAPICallError, ServiceUnavailable, ResourceExhausted # Import base error
 
 from app.core.config import settings # Import settings
+from app.core.timing import stage, record_stage
+from app.core.metrics import track_llm_call, llm_retry_hook
+from app.core.logging_config import loggable_text
+from app.rag.retrieval import retrieve_nodes, candidate_top_k, project_index
 from app.services.file_service import file_service # Import file_service to get chapter title
 
 
@@ -41,7 +46,7 @@ def _is_retryable_google_api_error(exception):
         if hasattr(exception, 'status_code') and exception.status_code == 429: logger.warning("Google API rate limit hit (429 status code). Retrying scene gen..."); return True
         if isinstance(exception, ResourceExhausted): logger.warning("Google API ResourceExhausted error encountered. Retrying scene gen..."); return True
         if hasattr(exception, 'message') and '429' in str(exception.message): logger.warning("Google API rate limit hit (429 in message). Retrying scene gen..."); return True
-    logger.debug(f"Non-retryable error encountered during scene gen: {type(exception)}")
+    logger.debug("Non-retryable error encountered during scene gen: %s", type(exception))
     return False
 
 class SceneGenerator:
@@ -58,6 +63,7 @@ class SceneGenerator:
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=5, max=30),
         retry=retry_if_exception(_is_retryable_google_api_error),
+        before_sleep=llm_retry_hook("generate_scene"),
         reraise=True
     )
     async def _execute_llm_complete(self, prompt: str):
@@ -65,10 +71,11 @@ class SceneGenerator:
         # --- MODIFIED: Add prompt size logging ---
         char_count = len(prompt)
         est_tokens = char_count // 4
-        logger.info(f"Calling LLM acomple for scene generation (Temperature: {settings.LLM_TEMPERATURE}, Chars: {char_count}, Est. Tokens: {est_tokens})...")
-        logger.debug(f"--- Scene Gen Prompt Start (Chars: {char_count}, Est. Tokens: {est_tokens}) ---\n{prompt}\n--- Scene Gen Prompt End ---")
+        logger.info("Calling LLM acomple for scene generation (Temperature: %s, Chars: %s, Est. Tokens: %s)...", settings.LLM_TEMPERATURE, char_count, est_tokens)
+        logger.debug("--- Scene Gen Prompt Start (Chars: %s, Est. Tokens: %s) ---\n%s\n--- Scene Gen Prompt End ---", char_count, est_tokens, loggable_text(prompt))
         # --- END MODIFIED ---
-        response = await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
+        with stage("llm.attempt", prompt_chars=char_count), track_llm_call("generate_scene", char_count):
+            response = await self.llm.acomplete(prompt, temperature=settings.LLM_TEMPERATURE)
         return response
 
     async def generate_scene(
@@ -93,11 +100,11 @@ class SceneGenerator:
             A dictionary containing 'title' and 'content' of the generated scene,
             or raises an HTTPException on failure.
         """
-        logger.info(f"SceneGenerator: Generating scene via Single Call for project '{project_id}', chapter '{chapter_id}'.")
+        logger.info("SceneGenerator: Generating scene via Single Call for project '%s', chapter '%s'.", project_id, chapter_id)
         retrieved_nodes: List[NodeWithScore] = []
         nodes_for_prompt: List[NodeWithScore] = []
         final_paths_to_filter_obj = {Path(p).resolve() for p in (paths_to_filter or set())}
-        logger.debug(f"SceneGenerator: Paths to filter (resolved): {final_paths_to_filter_obj}")
+        logger.debug("SceneGenerator: Paths to filter (resolved): %s", final_paths_to_filter_obj)
 
         chapter_title = f"Chapter {chapter_id}" # Default
         try:
@@ -122,13 +129,13 @@ class SceneGenerator:
                  # --- END MODIFIED ---
             retrieval_query = " ".join(retrieval_query_parts)
 
-            logger.debug(f"Constructed retrieval query for scene gen: '{retrieval_query}'")
-            retriever = VectorIndexRetriever( index=self.index, similarity_top_k=settings.RAG_GENERATION_SIMILARITY_TOP_K, filters=MetadataFilters(filters=[ExactMatchFilter(key="project_id", value=project_id)]), )
-            retrieved_nodes = await retriever.aretrieve(retrieval_query)
-            logger.info(f"Retrieved {len(retrieved_nodes)} nodes for RAG context.")
-            if retrieved_nodes:
+            logger.debug("Constructed retrieval query for scene gen: '%s'", retrieval_query)
+            retriever = VectorIndexRetriever( index=project_index(self.index, project_id), similarity_top_k=candidate_top_k(settings.RAG_GENERATION_SIMILARITY_TOP_K), filters=MetadataFilters(filters=[ExactMatchFilter(key="project_id", value=project_id)]), )
+            retrieved_nodes = await retrieve_nodes(retriever, retrieval_query, project_id, settings.RAG_GENERATION_SIMILARITY_TOP_K)
+            logger.info("Retrieved %s nodes for RAG context.", len(retrieved_nodes))
+            if retrieved_nodes and logger.isEnabledFor(logging.DEBUG):
                 log_nodes = [(n.node_id, n.metadata.get('file_path'), n.score) for n in retrieved_nodes]
-                logger.debug(f"SceneGenerator: Nodes retrieved BEFORE filtering: {log_nodes}")
+                logger.debug("SceneGenerator: Nodes retrieved BEFORE filtering: %s", log_nodes)
             else:
                 logger.debug("SceneGenerator: No nodes retrieved.")
 
@@ -142,10 +149,10 @@ class SceneGenerator:
                         unique_retrieved_nodes_map[unique_key] = node_with_score
             unique_retrieved_nodes = list(unique_retrieved_nodes_map.values())
             if len(unique_retrieved_nodes) < len(retrieved_nodes):
-                logger.debug(f"Deduplicated {len(retrieved_nodes) - len(unique_retrieved_nodes)} nodes based on content and file path.")
+                logger.debug("Deduplicated %s nodes based on content and file path.", len(retrieved_nodes) - len(unique_retrieved_nodes))
 
             if unique_retrieved_nodes:
-                logger.debug(f"SceneGenerator: Starting node filtering against {len(final_paths_to_filter_obj)} filter paths.")
+                logger.debug("SceneGenerator: Starting node filtering against %s filter paths.", len(final_paths_to_filter_obj))
                 for node_with_score in unique_retrieved_nodes:
                     node = node_with_score.node
                     node_path_str = node.metadata.get('file_path')
@@ -156,7 +163,7 @@ class SceneGenerator:
                     try:
                         node_path_obj = Path(node_path_str).resolve()
                         is_filtered = node_path_obj in final_paths_to_filter_obj
-                        logger.debug(f"  Comparing Node Path: {node_path_obj} | In Filter Set: {is_filtered}")
+                        logger.debug("  Comparing Node Path: %s | In Filter Set: %s", node_path_obj, is_filtered)
                         if not is_filtered:
                             nodes_for_prompt.append(node_with_score)
                     except Exception as e:
@@ -164,12 +171,12 @@ class SceneGenerator:
                         nodes_for_prompt.append(node_with_score)
 
                 if len(nodes_for_prompt) < len(unique_retrieved_nodes):
-                    logger.debug(f"Filtered {len(unique_retrieved_nodes) - len(nodes_for_prompt)} unique retrieved nodes based on paths_to_filter.")
+                    logger.debug("Filtered %s unique retrieved nodes based on paths_to_filter.", len(unique_retrieved_nodes) - len(nodes_for_prompt))
                 else:
                     logger.debug("No unique nodes were filtered based on paths_to_filter.")
-            if nodes_for_prompt:
+            if nodes_for_prompt and logger.isEnabledFor(logging.DEBUG):
                 log_nodes_after = [(n.node_id, n.metadata.get('file_path'), n.score) for n in nodes_for_prompt]
-                logger.debug(f"SceneGenerator: Nodes remaining AFTER filtering (for prompt): {log_nodes_after}")
+                logger.debug("SceneGenerator: Nodes remaining AFTER filtering (for prompt): %s", log_nodes_after)
             else:
                 logger.debug("SceneGenerator: No nodes remaining after filtering.")
 
@@ -190,9 +197,10 @@ class SceneGenerator:
                       # --- END MODIFIED ---
                       rag_context_list.append(f"{source_label}\n\n{truncated_content}")
             rag_context_str = "\n\n---\n\n".join(rag_context_list) if rag_context_list else "No additional context retrieved via search."
-            logger.debug(f"SceneGenerator: Final rag_context_str for prompt:\n---\n{rag_context_str}\n---")
+            logger.debug("SceneGenerator: Final rag_context_str for prompt:\n---\n%s\n---", loggable_text(rag_context_str))
 
             # --- 2. Build Generation Prompt ---
+            prompt_started = time.perf_counter()
             logger.debug("Building strict format generation prompt...")
             system_prompt = (
                 "You are an expert writing assistant helping a user draft the next scene in their creative writing project. "
@@ -257,13 +265,13 @@ class SceneGenerator:
                     except Exception as e:
                         logger.warning(f"Error checking previous scene names: {e}")
             
-            logger.debug(f"SceneGenerator: Already included scene names: {included_scene_names}")
+            logger.debug("SceneGenerator: Already included scene names: %s", included_scene_names)
             
             # Process direct sources if they exist, avoiding duplication with previous scenes
             direct_sources_context = ""
             if direct_sources_data and len(direct_sources_data) > 0:
                 original_count = len(direct_sources_data)
-                logger.info(f"SceneGenerator: Processing {original_count} direct sources")
+                logger.info("SceneGenerator: Processing %s direct sources", original_count)
                 
                 # Filter out direct sources that are already included in previous scenes
                 filtered_sources = []
@@ -273,18 +281,18 @@ class SceneGenerator:
                     
                     # Check if this is a scene that's already included
                     if source_type.lower() == 'scene' and source_name in included_scene_names:
-                        logger.info(f"SceneGenerator: Skipping duplicate scene in direct sources: {source_name}")
+                        logger.info("SceneGenerator: Skipping duplicate scene in direct sources: %s", source_name)
                         continue
                     
                     # Also check the raw source string (for formats like "Scene: Title")
                     if isinstance(source, str) and source in included_scene_names:
-                        logger.info(f"SceneGenerator: Skipping duplicate scene reference: {source}")
+                        logger.info("SceneGenerator: Skipping duplicate scene reference: %s", source)
                         continue
                         
                     filtered_sources.append(source)
                 
                 if len(filtered_sources) < original_count:
-                    logger.info(f"SceneGenerator: Filtered out {original_count - len(filtered_sources)} duplicate sources")
+                    logger.info("SceneGenerator: Filtered out %s duplicate sources", original_count - len(filtered_sources))
                 
                 # Process the filtered sources
                 direct_sources_list = []
@@ -310,7 +318,7 @@ class SceneGenerator:
                 
                 if direct_sources_list:
                     direct_sources_context = "\n".join(direct_sources_list)
-                    logger.info(f"SceneGenerator: Added {len(direct_sources_list)} direct sources to the generation context")
+                    logger.info("SceneGenerator: Added %s direct sources to the generation context", len(direct_sources_list))
             
             user_message_content += (
                 f"{previous_scenes_prompt_part}"
@@ -324,11 +332,14 @@ class SceneGenerator:
             full_prompt = f"{system_prompt}\n\nUser: {user_message_content}\n\nAssistant:"
 
             # --- 3. Call LLM via Retry Helper ---
-            llm_response = await self._execute_llm_complete(full_prompt)
+            record_stage("rag.prompt", prompt_started, prompt_chars=len(full_prompt))
+            with stage("llm"):
+                llm_response = await self._execute_llm_complete(full_prompt)
             generated_text = llm_response.text.strip() if llm_response else ""
             if not generated_text: raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error: The AI failed to generate a scene draft. Please try again.")
 
             # --- 4. Parse the Response (Unchanged logic) ---
+            parse_started = time.perf_counter()
             logger.debug("Parsing LLM response for title and content...")
             title = "Untitled Scene"; content = generated_text
             title_match = re.search(r"^\s*##\s+(.+?)\s*$", generated_text, re.MULTILINE)
@@ -338,9 +349,10 @@ class SceneGenerator:
                 if newline_after_title != -1: parsed_content = generated_text[newline_after_title:].strip();
                 else: parsed_content = generated_text[content_start_index:].strip()
 
-                if parsed_content: title = parsed_title; content = parsed_content; logger.info(f"Successfully parsed title and content via regex: '{title}'")
+                if parsed_content: title = parsed_title; content = parsed_content; logger.info("Successfully parsed title and content via regex: '%s'", title)
                 else: logger.warning(f"LLM response had H2 heading '## {parsed_title}' but no substantial content followed."); title = "Untitled Scene"; content = generated_text
             else: logger.warning(f"LLM response did not contain an H2 heading '## Title'. Using default title.")
+            record_stage("rag.parse", parse_started)
             
             # Convert NodeWithScore objects to serializable format for the response
             serialized_nodes = []
@@ -369,7 +381,7 @@ class SceneGenerator:
                 "direct_sources": formatted_direct_sources
             }
             
-            logger.info(f"Scene generation processed. Title: '{generated_draft['title']}', with {len(serialized_nodes)} source nodes and {len(formatted_direct_sources)} direct sources")
+            logger.info("Scene generation processed. Title: '%s', with %s source nodes and %s direct sources", generated_draft['title'], len(serialized_nodes), len(formatted_direct_sources))
             return generated_draft
 
         # Exception handling (Unchanged)
@@ -0,0 +1,132 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import hashlib
+import logging
+import sys
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Collection sharding for the Chroma vector store (settings.CHROMA_SHARDING):
+# - "none":    every project in one collection (filtered by project_id metadata at query time)
+# - "project": one collection per project
+# - "bucket":  projects hashed into CHROMA_SHARD_BUCKETS collections
+# Existing single-collection stores are moved over with: python -m app.rag.sharding --mode project
+
+SHARDING_NONE = "none"
+SHARDING_PROJECT = "project"
+SHARDING_BUCKET = "bucket"
+SHARDING_MODES = (SHARDING_NONE, SHARDING_PROJECT, SHARDING_BUCKET)
+MIGRATION_PAGE_SIZE = 500
+# Same defaults as index_manager (not imported from there: that would load the models)
+DEFAULT_CHROMA_PERSIST_DIR = "./chroma_db"
+DEFAULT_CHROMA_COLLECTION_NAME = "codex_ai_documents"
+
+
+def collection_name_for(base_name: str, project_id: str, mode: str, buckets: int) -> str:
+    """
+    Returns the Chroma collection holding project_id's chunks.
+    Project ids are hashed so the name always satisfies Chroma's naming rules.
+    """
+    if mode == SHARDING_NONE or not project_id:
+        return base_name
+    digest = hashlib.sha1(project_id.encode("utf-8")).hexdigest()
+    if mode == SHARDING_PROJECT:
+        return f"{base_name}_p_{digest[:16]}"
+    if mode == SHARDING_BUCKET:
+        return f"{base_name}_b{int(digest, 16) % max(buckets, 1):02d}"
+    raise ValueError(f"Unknown Chroma sharding mode: '{mode}' (expected one of {', '.join(SHARDING_MODES)})")
+
+
+def migrate_collection(client, base_name: str, mode: str, buckets: int, page_size: int = MIGRATION_PAGE_SIZE, delete_source: bool = False,
+                       collection_kwargs: Optional[Dict] = None) -> Dict[str, int]:
+    """
+    Copies the chunks of the shared collection into their shard collections, page by page.
+    Stored embeddings are copied as they are, so nothing is re-embedded.
+    Chunks already present in a shard are overwritten (upsert), so an interrupted run can simply be repeated.
+    New shard collections are created with collection_kwargs (e.g. HNSW metadata).
+
+    Returns:
+        Mapping of shard collection name to the number of chunks copied into it.
+    """
+    if mode == SHARDING_NONE:
+        raise ValueError("Target sharding mode must be 'project' or 'bucket'.")
+    source = client.get_collection(name=base_name)
+    shards: Dict[str, object] = {}
+    copied: Dict[str, int] = {}
+    moved_ids: List[str] = []
+    offset = 0
+    while True:
+        page = source.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        ids: List[str] = list(page.get("ids") or [])
+        if not ids:
+            break
+        grouped: Dict[str, Dict[str, list]] = {}
+        for i, node_id in enumerate(ids):
+            metadata = page["metadatas"][i] or {}
+            name = collection_name_for(base_name, metadata.get("project_id", ""), mode, buckets)
+            group = grouped.setdefault(name, {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+            group["ids"].append(node_id)
+            group["embeddings"].append(page["embeddings"][i])
+            group["documents"].append(page["documents"][i])
+            group["metadatas"].append(metadata)
+        for name, group in grouped.items():
+            if name == base_name:
+                continue # Chunks without a project_id stay where they are
+            if name not in shards:
+                shards[name] = client.get_or_create_collection(name=name, **(collection_kwargs or {}))
+            shards[name].upsert(**group)
+            copied[name] = copied.get(name, 0) + len(group["ids"])
+            moved_ids.extend(group["ids"])
+        offset += len(ids)
+        logger.info(f"Shard migration: {offset} chunk(s) processed.")
+
+    if delete_source and moved_ids:
+        # Deleted only after every page is copied, so the offsets above stay valid
+        for start in range(0, len(moved_ids), page_size):
+            source.delete(ids=moved_ids[start:start + page_size])
+        logger.info(f"Shard migration: removed {len(moved_ids)} migrated chunk(s) from '{base_name}'.")
+    return copied
+
+
+def main(argv: Optional[List[str]] = None):
+    import chromadb
+    from app.core.config import settings
+    from app.rag.vector_maintenance import hnsw_collection_kwargs
+
+    parser = argparse.ArgumentParser(
+        description="Copies the shared Chroma collection into per-project (or per-bucket) collections.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--db-path", default=DEFAULT_CHROMA_PERSIST_DIR, help="Path to the ChromaDB persistence directory.")
+    parser.add_argument("--collection", default=DEFAULT_CHROMA_COLLECTION_NAME, help="Name of the shared collection to migrate.")
+    parser.add_argument("--mode", choices=[SHARDING_PROJECT, SHARDING_BUCKET], default=SHARDING_PROJECT, help="Target sharding mode.")
+    parser.add_argument("--buckets", type=int, default=settings.CHROMA_SHARD_BUCKETS, help="Number of buckets (bucket mode).")
+    parser.add_argument("--page-size", type=int, default=MIGRATION_PAGE_SIZE, help="Chunks copied per page.")
+    parser.add_argument("--delete-source", action="store_true", help="Remove migrated chunks from the shared collection afterwards.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    client = chromadb.PersistentClient(path=args.db_path)
+    copied = migrate_collection(client, args.collection, args.mode, args.buckets, page_size=args.page_size, delete_source=args.delete_source,
+                                collection_kwargs=hnsw_collection_kwargs())
+    for name, count in sorted(copied.items()):
+        print(f"{name}: {count} chunk(s)")
+    print(f"Migrated {sum(copied.values())} chunk(s) into {len(copied)} collection(s). Set CHROMA_SHARDING={args.mode} to use them.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
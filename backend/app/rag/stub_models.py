@@ -0,0 +1,232 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+
+from google.api_core.exceptions import InternalServerError, ResourceExhausted
+from llama_index.core.base.llms.types import (
+    ChatMessage, ChatResponse, CompletionResponse, CompletionResponseAsyncGen, CompletionResponseGen, LLMMetadata
+)
+from llama_index.core.base.llms.generic_utils import completion_response_to_chat_response
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import CustomLLM
+from pydantic import PrivateAttr
+
+# Offline stand-ins for Gemini and the HuggingFace embedding model (LLM_PROVIDER=stub, EMBEDDING_BACKEND=stub),
+# so the backend can be load-tested and benchmarked end to end without network access or an API key.
+# StubLLM answers in the format each processor parses (H2 heading for scene generation, numbered list for
+# rephrasing, scene delimiters for chapter splits), so the parsing code runs for real; the text itself only
+# depends on the prompt. Latency, generation speed and failures (errors, 429 rate limits) are simulated.
+# This module must not read app settings: the benchmarks import it before they configure the environment.
+
+STUB_EMBEDDING_DIM = 384
+SCENE_PARAGRAPHS_PER_SPLIT = 3
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+_CHAPTER_PATTERN = re.compile(r"<<<CHAPTER_START>>>\n(.*?)\n<<<CHAPTER_END>>>", re.DOTALL)
+_SUGGESTION_COUNT_PATTERN = re.compile(r"Provide exactly (\d+) distinct suggestions")
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_STREAM_CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class StubLLM(CustomLLM):
+    """
+    Deterministic local LLM. Each call waits a first-token latency drawn from latency_distribution
+    (latency_ms is the median; jitter_ms the spread: ± range for "uniform", standard deviation for "normal",
+    median to 84th percentile for "lognormal"; "exponential" ignores it), then generates the answer at
+    tokens_per_second (0 = instantly; streaming yields it word by word at that rate). error_rate and
+    rate_limit_rate are the probabilities of failing with a 500 or a 429 (the error types the Gemini
+    client raises, so the processors' retry logic runs). seed makes the random draws reproducible.
+    """
+    latency_ms: float = 0.0
+    latency_distribution: str = "fixed"
+    jitter_ms: float = 0.0
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: Optional[int] = None
+    _prompt_chars: List[int] = PrivateAttr(default_factory=list)
+    _random: random.Random = PrivateAttr()
+    _random_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{self.latency_distribution}'; expected one of {LATENCY_DISTRIBUTIONS}")
+        self._random = random.Random(self.seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="stub-llm", context_window=1_000_000, num_output=8192)
+
+    @property
+    def prompt_chars(self) -> List[int]:
+        """Sizes of the prompts received since the last reset_stats()."""
+        return self._prompt_chars
+
+    def reset_stats(self):
+        self._prompt_chars = []
+
+    # --- Answers ---
+    def _answer(self, prompt: str) -> str:
+        self._prompt_chars.append(len(prompt))
+        digest = _digest(prompt)
+        chapter_match = _CHAPTER_PATTERN.search(prompt)
+        if chapter_match:
+            paragraphs = [p.strip() for p in chapter_match.group(1).split("\n\n") if p.strip()]
+            blocks = []
+            for number, start in enumerate(range(0, len(paragraphs), SCENE_PARAGRAPHS_PER_SPLIT), start=1):
+                content = "\n\n".join(paragraphs[start:start + SCENE_PARAGRAPHS_PER_SPLIT])
+                blocks.append(f"<<<SCENE_START>>>\nTITLE: Scene {number}\nCONTENT:\n{content}\n<<<SCENE_END>>>")
+            return "\n".join(blocks)
+        if "H2 Markdown heading" in prompt:
+            return f"## Stub Scene {digest[:8]}\n\n" + "\n\n".join(f"Generated paragraph {i} ({digest[i:i + 8]})." for i in range(5))
+        if "numbered list" in prompt:
+            count_match = _SUGGESTION_COUNT_PATTERN.search(prompt)
+            count = int(count_match.group(1)) if count_match else 3
+            return "\n".join(f"{i}. Stub suggestion {i} ({digest[i:i + 8]})." for i in range(1, count + 1))
+        return f"Stub answer {digest[:12]} to a prompt of {len(prompt)} characters."
+
+    # --- Simulated latency and failures ---
+    def _draw(self) -> Tuple[float, bool]:
+        """Returns the first-token delay in seconds and whether the call fails; raises an injected 429 right away."""
+        with self._random_lock:
+            draw = self._random.random()
+            median, jitter = self.latency_ms / 1000, self.jitter_ms / 1000
+            if self.latency_distribution == "uniform":
+                delay = self._random.uniform(median - jitter, median + jitter)
+            elif self.latency_distribution == "normal":
+                delay = self._random.gauss(median, jitter)
+            elif self.latency_distribution == "lognormal" and median > 0:
+                delay = median * math.exp(self._random.gauss(0, math.log1p(jitter / median)))
+            elif self.latency_distribution == "exponential" and median > 0:
+                delay = self._random.expovariate(math.log(2) / median) # The median of Exp(rate) is ln 2 / rate
+            else:
+                delay = median
+        if draw < self.rate_limit_rate:
+            raise ResourceExhausted("Stub LLM: injected rate limit (429).") # Rejected before any work, like a quota error
+        return max(delay, 0.0), draw < self.rate_limit_rate + self.error_rate
+
+    def _generation_time(self, text: str) -> float:
+        return len(text) / 4 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0 # 4 chars per token
+
+    @staticmethod
+    def _injected_error() -> InternalServerError:
+        return InternalServerError("Stub LLM: injected server error (500).")
+
+    # --- LLM interface ---
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        delay, failed = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise self._injected_error()
+        text = self._answer(prompt)
+        time.sleep(self._generation_time(text))
+        return CompletionResponse(text=text)
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        delay, failed = self._draw()
+        await asyncio.sleep(delay) # Waits without blocking the event loop, like the real async client
+        if failed:
+            raise self._injected_error()
+        text = self._answer(prompt)
+        await asyncio.sleep(self._generation_time(text))
+        return CompletionResponse(text=text)
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        delay, failed = self._draw()
+        text = "" if failed else self._answer(prompt)
+
+        def gen() -> CompletionResponseGen:
+            time.sleep(delay)
+            if failed:
+                raise self._injected_error()
+            streamed = ""
+            for chunk in _STREAM_CHUNK_PATTERN.findall(text):
+                time.sleep(self._generation_time(chunk))
+                streamed += chunk
+                yield CompletionResponse(text=streamed, delta=chunk)
+
+        return gen()
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        delay, failed = self._draw()
+        text = "" if failed else self._answer(prompt)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            await asyncio.sleep(delay)
+            if failed:
+                raise self._injected_error()
+            streamed = ""
+            for chunk in _STREAM_CHUNK_PATTERN.findall(text):
+                await asyncio.sleep(self._generation_time(chunk))
+                streamed += chunk
+                yield CompletionResponse(text=streamed, delta=chunk)
+
+        return gen()
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return completion_response_to_chat_response(await self.acomplete(self.messages_to_prompt(messages), formatted=True))
+
+
+class StubEmbedding(BaseEmbedding):
+    """
+    Hashed bag-of-words embedding (feature hashing over word tokens, L2-normalized). Deterministic, fast and
+    still lexically meaningful, so retrieval returns plausible nodes. Not a substitute for the real model
+    when measuring embedding cost or retrieval quality.
+    """
+    dim: int = STUB_EMBEDDING_DIM
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("model_name", "stub-hash-embedding")
+        super().__init__(**kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            token_hash = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+            vector[token_hash % self.dim] += 1.0 if (token_hash >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
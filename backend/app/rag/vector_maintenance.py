@@ -0,0 +1,203 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import shutil
+import sqlite3
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Offline maintenance for the Chroma vector store (run while the backend is stopped):
+#   python -m app.rag.vector_maintenance stats
+#   python -m app.rag.vector_maintenance compact [--collection NAME]
+# Chunk churn (delete + reinsert on every edit) leaves deleted entries in the HNSW graph and in chroma.sqlite3;
+# compacting copies the live records (with their stored embeddings) into a fresh collection, built with the
+# CHROMA_HNSW_* settings, then reclaims the space of the old one.
+
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+REBUILD_SUFFIX = "__rebuild"
+REBUILD_PAGE_SIZE = 500
+# Files written by Chroma's persisted HNSW segments; only directories containing one of these are ever pruned
+HNSW_SEGMENT_FILES = ("header.bin", "data_level0.bin", "length.bin", "link_lists.bin")
+DEFAULT_CHROMA_PERSIST_DIR = "./chroma_db"
+DEFAULT_CHROMA_COLLECTION_NAME = "codex_ai_documents"
+
+
+def hnsw_collection_kwargs() -> Dict[str, Any]:
+    """
+    Collection creation kwargs carrying the configured HNSW parameters (empty when none are set,
+    so Chroma's defaults apply). Chroma only applies them to new collections; compact existing ones to change them.
+    """
+    metadata: Dict[str, Any] = {}
+    if settings.CHROMA_HNSW_SPACE:
+        metadata["hnsw:space"] = settings.CHROMA_HNSW_SPACE
+    if settings.CHROMA_HNSW_M > 0:
+        metadata["hnsw:M"] = settings.CHROMA_HNSW_M
+    if settings.CHROMA_HNSW_CONSTRUCTION_EF > 0:
+        metadata["hnsw:construction_ef"] = settings.CHROMA_HNSW_CONSTRUCTION_EF
+    if settings.CHROMA_HNSW_SEARCH_EF > 0:
+        metadata["hnsw:search_ef"] = settings.CHROMA_HNSW_SEARCH_EF
+    return {"metadata": metadata} if metadata else {}
+
+
+def directory_size(path: Path) -> int:
+    """Total size in bytes of the files under path."""
+    return sum(file.stat().st_size for file in Path(path).rglob("*") if file.is_file())
+
+
+def _collection_names(client) -> List[str]:
+    return sorted(getattr(collection, "name", collection) for collection in client.list_collections())
+
+
+def copy_records(source, target, page_size: int = REBUILD_PAGE_SIZE) -> int:
+    """Copies every record of source (ids, stored embeddings, documents, metadatas) into target, page by page."""
+    copied = 0
+    while True:
+        page = source.get(limit=page_size, offset=copied, include=["embeddings", "documents", "metadatas"])
+        ids = list(page.get("ids") or [])
+        if not ids:
+            return copied
+        target.upsert(ids=ids, embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+        copied += len(ids)
+
+
+def rebuild_collection(client, name: str, page_size: int = REBUILD_PAGE_SIZE) -> int:
+    """
+    Rebuilds collection name: its live records are copied into a fresh collection (created with the HNSW settings),
+    which then replaces the original. The original is only deleted once the copy is complete; a run interrupted
+    after that point is finished by the next run. Returns the number of records in the rebuilt collection.
+    """
+    temp_name = f"{name}{REBUILD_SUFFIX}"
+    existing = _collection_names(client)
+    if temp_name in existing:
+        if name not in existing:
+            logger.warning(f"Finishing interrupted rebuild of '{name}'.")
+            client.get_collection(name=temp_name).modify(name=name)
+            return client.get_collection(name=name).count()
+        client.delete_collection(name=temp_name) # Partial copy from an interrupted run
+
+    source = client.get_collection(name=name)
+    # Keep the collection's current HNSW parameters unless settings override them
+    metadata = {key: value for key, value in (source.metadata or {}).items() if key.startswith("hnsw:")}
+    metadata.update(hnsw_collection_kwargs().get("metadata", {}))
+    target = client.create_collection(name=temp_name, metadata=metadata or None)
+    copied = copy_records(source, target, page_size)
+    if target.count() != source.count():
+        client.delete_collection(name=temp_name)
+        raise RuntimeError(f"Rebuild of '{name}' copied {target.count()} of {source.count()} records; original kept.")
+    client.delete_collection(name=name)
+    target.modify(name=name)
+    logger.info(f"Rebuilt collection '{name}' ({copied} records).")
+    return copied
+
+
+def prune_orphan_segments(persist_dir: Path) -> int:
+    """
+    Removes HNSW segment directories that no longer belong to any collection (Chroma leaves them behind
+    when a collection is deleted) and vacuums chroma.sqlite3. Returns the number of directories removed.
+    """
+    persist_dir = Path(persist_dir)
+    sqlite_path = persist_dir / CHROMA_SQLITE_FILE
+    connection = sqlite3.connect(str(sqlite_path))
+    try:
+        live_segments = {row[0] for row in connection.execute("SELECT id FROM segments")}
+    finally:
+        connection.close()
+
+    removed = 0
+    for child in persist_dir.iterdir():
+        try:
+            uuid.UUID(child.name)
+        except ValueError:
+            continue
+        if child.is_dir() and child.name not in live_segments and any((child / file).exists() for file in HNSW_SEGMENT_FILES):
+            logger.info(f"Removing orphaned segment directory {child}")
+            shutil.rmtree(child)
+            removed += 1
+
+    connection = sqlite3.connect(str(sqlite_path))
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    return removed
+
+
+def collection_stats(client, names: List[str]) -> List[Dict[str, Any]]:
+    stats = []
+    for name in names:
+        collection = client.get_collection(name=name)
+        hnsw = {key: value for key, value in (collection.metadata or {}).items() if key.startswith("hnsw:")}
+        stats.append({"name": name, "count": collection.count(), "hnsw": hnsw})
+    return stats
+
+
+def compact(persist_dir: Path, names: Optional[List[str]] = None, page_size: int = REBUILD_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Rebuilds the given collections (default: all), prunes orphaned segment files and reports
+    the record counts and on-disk size of the persist directory before and after.
+    """
+    import chromadb
+
+    persist_dir = Path(persist_dir)
+    size_before = directory_size(persist_dir)
+    client = chromadb.PersistentClient(path=str(persist_dir))
+    names = names or [name for name in _collection_names(client) if not name.endswith(REBUILD_SUFFIX)]
+    counts = {name: rebuild_collection(client, name, page_size) for name in names}
+    del client
+    pruned = prune_orphan_segments(persist_dir)
+    size_after = directory_size(persist_dir)
+    return {"collections": counts, "segments_pruned": pruned, "bytes_before": size_before, "bytes_after": size_after}
+
+
+def main(argv: Optional[List[str]] = None):
+    import chromadb
+
+    parser = argparse.ArgumentParser(description="Offline maintenance of the Chroma vector store (stop the backend first).")
+    parser.add_argument("command", choices=["stats", "compact"], help="'stats' prints counts, HNSW settings and disk size; 'compact' rebuilds collections.")
+    parser.add_argument("--db-path", default=DEFAULT_CHROMA_PERSIST_DIR, help="Path to the ChromaDB persistence directory.")
+    parser.add_argument("--collection", action="append", help="Collection to compact (repeatable). Default: all collections.")
+    parser.add_argument("--page-size", type=int, default=REBUILD_PAGE_SIZE, help="Records copied per page.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    persist_dir = Path(args.db_path)
+    if not (persist_dir / CHROMA_SQLITE_FILE).is_file():
+        print(f"Error: no Chroma store found at '{persist_dir.resolve()}'.", file=sys.stderr)
+        return 1
+
+    if args.command == "stats":
+        client = chromadb.PersistentClient(path=str(persist_dir))
+        for entry in collection_stats(client, args.collection or _collection_names(client)):
+            print(f"{entry['name']}: {entry['count']} records, HNSW {entry['hnsw'] or 'defaults'}")
+        print(f"On disk: {directory_size(persist_dir) / (1024 * 1024):.1f} MB")
+        return 0
+
+    report = compact(persist_dir, args.collection, args.page_size)
+    for name, count in report["collections"].items():
+        print(f"{name}: rebuilt with {count} records")
+    print(f"Pruned {report['segments_pruned']} orphaned segment(s).")
+    print(f"On disk: {report['bytes_before'] / (1024 * 1024):.1f} MB -> {report['bytes_after'] / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,16 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import logging
+import time
 from fastapi import HTTPException, status
 from app.rag.engine import rag_engine
-from app.models.ai import ( AISceneGenerationRequest, AISceneGenerationResponse, AIRephraseRequest, AIRephraseResponse, AIChapterSplitRequest, AIChapterSplitResponse, ProposedScene )
+from app.models.ai import ( AISceneGenerationRequest, AISceneGenerationResponse, AIRephraseRequest, AIRephraseResponse, AIChapterSplitRequest, AIChapterSplitResponse, ProposedScene, IndexGCResponse, SourceNodeModel )
 from llama_index.core.base.response.schema import NodeWithScore
-from typing import List, Tuple, Optional, Dict, Set, TypedDict # Import TypedDict
+from typing import Callable, List, Tuple, Optional, Dict, Set, TypedDict, Hashable # Import TypedDict
 import re
 from pathlib import Path
 from app.services.file_service import file_service
+from app.services.job_service import JobCancelled
 from app.core.config import settings
+from app.core.timing import stage, record_stage, timed
+from app.core.logging_config import loggable_text
+from app.core.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 PREVIOUS_SCENE_COUNT = settings.RAG_GENERATION_PREVIOUS_SCENE_COUNT
@@ -41,9 +47,26 @@ class AIService:
     def __init__(self):
         self.rag_engine = rag_engine; self.file_service = file_service
         if self.rag_engine is None: logger.critical("RagEngine instance is None during AIService init!")
+        self._singleflight = SingleFlight()
         logger.info("AIService initialized.")
 
+    # --- ADDED: Coalescing of identical in-flight requests ---
+    def _index_generation(self):
+        return getattr(getattr(self.rag_engine, "index_manager", None), "generation", 0)
+
+    async def _coalesced(self, operation: str, project_id: str, payload: Hashable, compute):
+        """
+        Runs compute() once for concurrent calls with the same operation, project, payload and index generation
+        (double-clicks, frontend retries); all callers get the same result. See app/core/singleflight.py.
+        """
+        if not settings.AI_COALESCE_REQUESTS:
+            return await compute()
+        key = (operation, project_id, payload, self._index_generation())
+        return await self._singleflight.do(key, compute)
+    # --- END ADDED ---
+
     # Context Loading Helper (already implemented in previous step)
+    @timed("ai.load_context")
     def _load_context(self, project_id: str, chapter_id: Optional[str] = None) -> LoadedContext:
         """
         Loads project-level and optionally chapter-level plan/synopsis.
@@ -66,7 +89,7 @@ class AIService:
             plan_path = self.file_service._get_content_block_path(project_id, "plan.md")
             context['project_plan'] = self.file_service.read_content_block_file(project_id, "plan.md")
             context['filter_paths'].add(str(plan_path.resolve()))
-            logger.debug(f"  - Loaded project plan (path: {plan_path})")
+            logger.debug("  - Loaded project plan (path: %s)", plan_path)
         except HTTPException as e:
             if e.status_code != 404: logger.error(f"  - Error loading project plan: {e.detail}")
             else: logger.debug("  - Project plan file not found.")
@@ -78,7 +101,7 @@ class AIService:
             synopsis_path = self.file_service._get_content_block_path(project_id, "synopsis.md")
             context['project_synopsis'] = self.file_service.read_content_block_file(project_id, "synopsis.md")
             context['filter_paths'].add(str(synopsis_path.resolve()))
-            logger.debug(f"  - Loaded project synopsis (path: {synopsis_path})")
+            logger.debug("  - Loaded project synopsis (path: %s)", synopsis_path)
         except HTTPException as e:
             if e.status_code != 404: logger.error(f"  - Error loading project synopsis: {e.detail}")
             else: logger.debug("  - Project synopsis file not found.")
@@ -102,9 +125,9 @@ class AIService:
                 context['chapter_plan'] = self.file_service.read_chapter_plan_file(project_id, chapter_id)
                 if context['chapter_plan'] is not None:
                     context['filter_paths'].add(str(chap_plan_path.resolve()))
-                    logger.debug(f"  - Loaded chapter plan for {chapter_id} (path: {chap_plan_path})")
+                    logger.debug("  - Loaded chapter plan for %s (path: %s)", chapter_id, chap_plan_path)
                 else:
-                    logger.debug(f"  - Chapter plan file not found for {chapter_id}.")
+                    logger.debug("  - Chapter plan file not found for %s.", chapter_id)
             except Exception as e:
                  logger.error(f"  - Error loading chapter plan for {chapter_id}: {e}", exc_info=True)
 
@@ -114,17 +137,21 @@ class AIService:
                 context['chapter_synopsis'] = self.file_service.read_chapter_synopsis_file(project_id, chapter_id)
                 if context['chapter_synopsis'] is not None:
                     context['filter_paths'].add(str(chap_syn_path.resolve()))
-                    logger.debug(f"  - Loaded chapter synopsis for {chapter_id} (path: {chap_syn_path})")
+                    logger.debug("  - Loaded chapter synopsis for %s (path: %s)", chapter_id, chap_syn_path)
                 else:
-                    logger.debug(f"  - Chapter synopsis file not found for {chapter_id}.")
+                    logger.debug("  - Chapter synopsis file not found for %s.", chapter_id)
             except Exception as e:
                  logger.error(f"  - Error loading chapter synopsis for {chapter_id}: {e}", exc_info=True)
 
-        logger.debug(f"AIService: Context loading complete. Filter paths: {context['filter_paths']}")
+        logger.debug("AIService: Context loading complete. Filter paths: %s", context['filter_paths'])
         return context
 
     async def query_project(self, project_id: str, query_text: str) -> Tuple[str, List[NodeWithScore], Optional[List[Dict[str, str]]]]:
-        logger.info(f"AIService: Processing general AI query for project {project_id}. Query: '{query_text}'")
+        normalized_query = " ".join(query_text.split())
+        return await self._coalesced("query", project_id, normalized_query, lambda: self._query_project(project_id, query_text))
+
+    async def _query_project(self, project_id: str, query_text: str) -> Tuple[str, List[NodeWithScore], Optional[List[Dict[str, str]]]]:
+        logger.info("AIService: Processing general AI query for project %s. Query: '%s'", project_id, query_text)
         if self.rag_engine is None: raise HTTPException(status_code=503, detail="AI Engine not ready.")
 
         # Initialization
@@ -139,6 +166,7 @@ class AIService:
         paths_to_filter = project_context.get('filter_paths', set())
         # --- END REFACTORED ---
 
+        entity_list_started = time.perf_counter()
         entity_list = []
         directly_included_paths: Set[str] = paths_to_filter.copy() # Start with paths from project context
         direct_chapter_context: Optional[Dict[str, Optional[str]]] = None # For chapter plan/synopsis if matched
@@ -211,17 +239,17 @@ class AIService:
                                             # UTF-16 LE BOM appears as ÿþ in latin-1 encoding
                                             if note_title.startswith('ÿþ'):
                                                 note_title = note_title[2:]
-                                                logger.info(f"AIService (Query): Removed BOM characters from title, new title: '{note_title}'")
+                                                logger.info("AIService (Query): Removed BOM characters from title, new title: '%s'", note_title)
                                             # Handle other potential BOM markers
                                             elif note_title.startswith('\ufeff'): # UTF-8 BOM
                                                 note_title = note_title[1:]
-                                                logger.info(f"AIService (Query): Removed UTF-8 BOM from title, new title: '{note_title}'")
+                                                logger.info("AIService (Query): Removed UTF-8 BOM from title, new title: '%s'", note_title)
                                             
-                                            logger.info(f"AIService (Query): Extracted note title '{note_title}' from file {note_path.name}")
+                                            logger.info("AIService (Query): Extracted note title '%s' from file %s", note_title, note_path.name)
                                             
                                             # If title seems generic, store entire first line for better matching
                                             if note_title.lower() in ["note", "note 1", "notes"]:
-                                                logger.info(f"AIService (Query): Note has generic title: '{note_title}'")
+                                                logger.info("AIService (Query): Note has generic title: '%s'", note_title)
                             except Exception as title_error:
                                 logger.warning(f"AIService (Query): Could not extract title from note {note_path}, using filename: {title_error}")
                                 
@@ -233,7 +261,7 @@ class AIService:
                                 note_id = note_path.stem  # The note ID is the filename without extension
                                 if 'notes' in project_metadata and note_id in project_metadata['notes']:
                                     metadata_title = project_metadata['notes'][note_id].get('title')
-                                    logger.info(f"AIService (Query): Found metadata title '{metadata_title}' for note {note_path.name}")
+                                    logger.info("AIService (Query): Found metadata title '%s' for note %s", metadata_title, note_path.name)
                             except Exception as meta_err:
                                 logger.warning(f"AIService (Query): Could not retrieve metadata title for note {note_path}: {meta_err}")
                             
@@ -246,11 +274,13 @@ class AIService:
                                 'metadata_title': metadata_title  # Store metadata title if available
                             })
                             
-                            logger.info(f"AIService (Query): Added note entity: '{note_title}' from {note_path.name}")
+                            logger.info("AIService (Query): Added note entity: '%s' from %s", note_title, note_path.name)
                         except Exception as e: logger.warning(f"Could not process note path {note_path}: {e}")
         except Exception as e: logger.error(f"AIService (Query): Unexpected error compiling entity list for {project_id}: {e}", exc_info=True)
 
-        logger.debug(f"AIService (Query): Compiled entity list with {len(entity_list)} items.")
+        logger.debug("AIService (Query): Compiled entity list with %s items.", len(entity_list))
+        record_stage("ai.entity_list", entity_list_started, entities=len(entity_list))
+        direct_sources_started = time.perf_counter()
         if entity_list:
             # Improved Unicode normalization for multilingual support, especially for Cyrillic
             import unicodedata
@@ -275,8 +305,8 @@ class AIService:
             # Extract meaningful words from the query for better matching
             query_words = extract_query_words(query_text)
             normalized_query = normalize_name(query_text)
-            logger.debug(f"AIService (Query): Searching for entity names in normalized query: '{normalized_query}'")
-            logger.debug(f"AIService (Query): Extracted query words: {query_words}")
+            logger.debug("AIService (Query): Searching for entity names in normalized query: '%s'", normalized_query)
+            logger.debug("AIService (Query): Extracted query words: %s", query_words)
             
             # Special handling for Russian queries with "технической информации" section
             # Find sections like "ключевые слова (проигнорируй ... техническая информация): keyword1, keyword2, ..."
@@ -290,11 +320,11 @@ class AIService:
             
             if tech_info_match:
                 tech_info = tech_info_match.group(1).strip()
-                logger.info(f"AIService (Query): Found technical info section for entity extraction: '{tech_info}'")
+                logger.info("AIService (Query): Found technical info section for entity extraction: '%s'", tech_info)
                 
                 # Split by commas and clean each item
                 raw_keywords = [k.strip() for k in tech_info.split(',')]
-                logger.info(f"AIService (Query): Raw comma-separated keywords: {raw_keywords}")
+                logger.info("AIService (Query): Raw comma-separated keywords: %s", raw_keywords)
                 
                 # Save these keywords for exact matching
                 for keyword in raw_keywords:
@@ -302,11 +332,11 @@ class AIService:
                     clean_keyword = keyword.strip().strip('"').strip()
                     if clean_keyword and len(clean_keyword) > 2:  # Avoid empty or very short keywords
                         entity_keywords_to_match.append(clean_keyword)
-                        logger.info(f"AIService (Query): Added keyword for exact matching: '{clean_keyword}'")
+                        logger.info("AIService (Query): Added keyword for exact matching: '%s'", clean_keyword)
                 
                 # No special cases - we want pure exact matching to work for all notes
                 
-                logger.info(f"AIService (Query): Final entity keywords to match: {entity_keywords_to_match}")
+                logger.info("AIService (Query): Final entity keywords to match: %s", entity_keywords_to_match)
             
             for entity in entity_list:
                 # Skip project plan/synopsis as they are always loaded explicitly (if available)
@@ -314,7 +344,7 @@ class AIService:
                 
                 # Skip technical/system notes (just in case they weren't filtered earlier)
                 if entity['type'] == 'Note' and (entity['name'].startswith('.') or entity['name'] == '.folder'):
-                    logger.debug(f"AIService (Query): Skipping technical note '{entity['name']}'")
+                    logger.debug("AIService (Query): Skipping technical note '%s'", entity['name'])
                     continue
 
                 normalized_entity_name = normalize_name(entity['name'])
@@ -332,12 +362,12 @@ class AIService:
                         normalized_keyword in normalized_entity_name or
                         normalized_entity_name in normalized_keyword):
                         entity_match_found = True
-                        logger.info(f"AIService (Query): Entity '{entity['name']}' MATCHED keyword '{keyword}'")
+                        logger.info("AIService (Query): Entity '%s' MATCHED keyword '%s'", entity['name'], keyword)
                         break
                 
                 if entity_match_found:
                     # This is an entity we want to include in direct sources
-                    logger.info(f"AIService (Query): Including entity '{entity['name']}' as it matches a keyword to match")
+                    logger.info("AIService (Query): Including entity '%s' as it matches a keyword to match", entity['name'])
                     # Continue to matching code below
                     pass
                 # We've removed the reference to ignored_keywords since it no longer exists
@@ -349,7 +379,7 @@ class AIService:
                 pattern = rf"\b{re.escape(normalized_entity_name)}\b"
                 if re.search(pattern, normalized_query):
                     is_match = True
-                    logger.debug(f"AIService (Query): Found exact word match for '{entity['name']}'")
+                    logger.debug("AIService (Query): Found exact word match for '%s'", entity['name'])
                 # For Notes specifically
                 # Specific handling for different entity types
                 elif entity['type'] == 'Scene' or entity['type'] == 'Character':
@@ -359,7 +389,7 @@ class AIService:
                     clean_name = original_name
                     normalized_clean_name = normalize_name(clean_name)
                     
-                    logger.info(f"AIService (Query): Checking {entity['type']} '{original_name}' with normalized name: '{normalized_clean_name}'")
+                    logger.debug("AIService (Query): Checking %s '%s' with normalized name: '%s'", entity['type'], original_name, normalized_clean_name)
                     
                     # For scenes like "Внутренний лог Zero" we need more flexible matching
                     # Check if all the significant words from the scene title are in the query
@@ -373,11 +403,11 @@ class AIService:
                         
                         if len(matching_words) >= min_matches_needed:
                             is_match = True
-                            logger.info(f"AIService (Query): Found multiple word matches for {entity['type']} '{original_name}': {matching_words}")
+                            logger.info("AIService (Query): Found multiple word matches for %s '%s': %s", entity['type'], original_name, matching_words)
                         # Direct mention with name in quotes
                         elif re.search(f'"{re.escape(normalized_clean_name)}"', normalized_query):
                             is_match = True
-                            logger.info(f"AIService (Query): Found quoted name '{original_name}' in query")
+                            logger.info("AIService (Query): Found quoted name '%s' in query", original_name)
                 
                 elif entity['type'] == 'Note':
                     # IMPORTANT FIX: Use metadata_title for matching when available since it's the actual note title
@@ -388,35 +418,35 @@ class AIService:
                     clean_name = original_name
                     if clean_name.startswith('\u00ff\u00fe'): # UTF-16 LE BOM in latin-1
                         clean_name = clean_name[2:]
-                        logger.info(f"AIService (Query): Removed BOM characters from note name for matching: '{clean_name}'")
+                        logger.debug("AIService (Query): Removed BOM characters from note name for matching: '%s'", clean_name)
                     
-                    logger.info(f"AIService (Query): Using '{clean_name}' for note matching (metadata_title={entity.get('metadata_title')}, entity name={entity['name']})")
+                    logger.debug("AIService (Query): Using '%s' for note matching (metadata_title=%s, entity name=%s)", clean_name, entity.get('metadata_title'), entity['name'])
                     
                     # SIMPLIFIED MATCHING STRATEGY
-                    logger.info(f"AIService (Query): ===== START NOTE MATCHING for '{clean_name}' =====")
+                    logger.debug("AIService (Query): ===== START NOTE MATCHING for '%s' =====", clean_name)
                     
                     # Log entity being processed for debugging
-                    logger.info(f"AIService (Query): Processing note '{clean_name}' for matching")
+                    logger.debug("AIService (Query): Processing note '%s' for matching", clean_name)
                     
                     # 1. Direct keyword match from the comma-separated list (MOST IMPORTANT MATCHING METHOD)
                     # This should be the primary matching method when technical keywords section exists
                     if not is_match:
                         for keyword in entity_keywords_to_match:
                             # Log what we're checking for clarity
-                            logger.info(f"AIService (Query): Checking if note title '{clean_name}' exactly matches keyword '{keyword}'")
+                            logger.debug("AIService (Query): Checking if note title '%s' exactly matches keyword '%s'", clean_name, keyword)
                             
                             if clean_name == keyword.strip():
                                 is_match = True
-                                logger.info(f"AIService (Query): EXACT MATCH - Note title '{clean_name}' exactly matches keyword '{keyword}'")
+                                logger.info("AIService (Query): EXACT MATCH - Note title '%s' exactly matches keyword '%s'", clean_name, keyword)
                                 break
                                 
                             # Also try with quotes removed (in case query has "\u0414\u0443\u0445 \u0438 \u0434\u0435\u0442\u0430\u043b\u0438\u0437\u0430\u0446\u0438\u044f")
                             clean_keyword = keyword.strip().strip('"').strip()
-                            logger.info(f"AIService (Query): Also checking cleaned version: '{clean_keyword}'")
+                            logger.debug("AIService (Query): Also checking cleaned version: '%s'", clean_keyword)
                             
                             if clean_name == clean_keyword:
                                 is_match = True
-                                logger.info(f"AIService (Query): EXACT MATCH after quote removal - Note '{clean_name}' matches '{clean_keyword}'")
+                                logger.info("AIService (Query): EXACT MATCH after quote removal - Note '%s' matches '%s'", clean_name, clean_keyword)
                                 break
                     
                     # 2. Case-insensitive match
@@ -427,7 +457,7 @@ class AIService:
                             keyword_lower = keyword.lower()
                             if clean_name_lower == keyword_lower:
                                 is_match = True
-                                logger.info(f"AIService (Query): CASE-INSENSITIVE MATCH - '{clean_name_lower}' == '{keyword_lower}'")
+                                logger.info("AIService (Query): CASE-INSENSITIVE MATCH - '%s' == '%s'", clean_name_lower, keyword_lower)
                                 break
                             # For multi-word notes, check for fuzzy matches
                             elif ' ' in clean_name:
@@ -438,26 +468,26 @@ class AIService:
                                 overlap = clean_words.intersection(keyword_words)
                                 # Calculate percent of overlap
                                 overlap_percent = len(overlap) / max(len(clean_words), len(keyword_words))
-                                logger.info(f"AIService (Query): Overlap between '{clean_name}' and '{keyword}': {len(overlap)}/{max(len(clean_words), len(keyword_words))} words ({overlap_percent:.2%})")
+                                logger.debug("AIService (Query): Overlap between '%s' and '%s': %s/%s words (%.2f%%)", clean_name, keyword, len(overlap), max(len(clean_words), len(keyword_words)), overlap_percent * 100)
                                 # If significant overlap, consider it a match
                                 if overlap_percent > 0.5:
                                     is_match = True
-                                    logger.info(f"AIService (Query): WORD OVERLAP MATCH - Note '{clean_name}' words match keyword '{keyword}'")
+                                    logger.info("AIService (Query): WORD OVERLAP MATCH - Note '%s' words match keyword '%s'", clean_name, keyword)
                                     break
                     
                     # Log final result for this note
-                    logger.info(f"AIService (Query): Is '{clean_name}' matched? {is_match}")
-                    logger.info(f"AIService (Query): ===== END NOTE MATCHING for '{clean_name}' =====\n")
+                    logger.debug("AIService (Query): Is '%s' matched? %s", clean_name, is_match)
+                    logger.debug("AIService (Query): ===== END NOTE MATCHING for '%s' =====\n", clean_name)
                     
                     if is_match:
-                        logger.info(f"AIService (Query): Found match for Note '{entity['name']}' - TYPE: {entity['type']}")
+                        logger.info("AIService (Query): Found match for Note '%s' - TYPE: %s", entity['name'], entity['type'])
                 
                 if is_match:
-                    logger.info(f"AIService (Query): Found direct match: Type='{entity['type']}', Name='{entity['name']}'")
+                    logger.info("AIService (Query): Found direct match: Type='%s', Name='%s'", entity['type'], entity['name'])
                     try:
                         if entity['type'] == 'Chapter':
                             chapter_id_match = entity['id']
-                            logger.debug(f"AIService (Query): Loading direct context for matched Chapter '{entity['name']}' (ID: {chapter_id_match})...")
+                            logger.debug("AIService (Query): Loading direct context for matched Chapter '%s' (ID: %s)...", entity['name'], chapter_id_match)
                             # Use _load_context to get chapter plan/synopsis
                             matched_chapter_context = self._load_context(project_id, chapter_id_match)
                             # Store the loaded context to pass to the engine
@@ -468,7 +498,7 @@ class AIService:
                             }
                             # Add successfully loaded chapter file paths to filter set
                             directly_included_paths.update(matched_chapter_context.get('filter_paths', set()))
-                            logger.info(f"AIService (Query): Loaded direct chapter context for '{entity['name']}'. Plan: {bool(direct_chapter_context['chapter_plan'])}, Synopsis: {bool(direct_chapter_context['chapter_synopsis'])}")
+                            logger.info("AIService (Query): Loaded direct chapter context for '%s'. Plan: %s, Synopsis: %s", entity['name'], bool(direct_chapter_context['chapter_plan']), bool(direct_chapter_context['chapter_synopsis']))
                         else: # Handle other entity types (World, Character, Scene, Note)
                             file_path_to_load = entity.get('file_path')
                             if not file_path_to_load or not isinstance(file_path_to_load, Path):
@@ -477,14 +507,14 @@ class AIService:
                             content = ""
                             if entity['type'] == 'World': 
                                 content = self.file_service.read_content_block_file(project_id, file_path_to_load.name)
-                                logger.info(f"AIService (Query): Successfully read World content block: {file_path_to_load.name}")
+                                logger.info("AIService (Query): Successfully read World content block: %s", file_path_to_load.name)
                             elif entity['type'] in ['Character', 'Scene', 'Note']: 
                                 try:
-                                    logger.info(f"AIService (Query): Attempting to read {entity['type']} file: {file_path_to_load}")
+                                    logger.info("AIService (Query): Attempting to read %s file: %s", entity['type'], file_path_to_load)
                                     content = self.file_service.read_text_file(file_path_to_load)
-                                    logger.info(f"AIService (Query): Successfully read {entity['type']} file, content length: {len(content)}")
+                                    logger.info("AIService (Query): Successfully read %s file, content length: %s", entity['type'], len(content))
                                     if entity['type'] == 'Note':
-                                        logger.info(f"AIService (Query): NOTE CONTENT FIRST 100 CHARS: {content[:100]}")
+                                        logger.info("AIService (Query): NOTE CONTENT: %s", loggable_text(content))
                                 except Exception as read_error:
                                     logger.error(f"AIService (Query): Error reading {entity['type']} file {file_path_to_load}: {read_error}")
                                     raise
@@ -500,30 +530,31 @@ class AIService:
                             
                             # Log more details for debugging
                             if entity['type'] == 'Note':
-                                logger.info(f"AIService (Query): Added Note to direct_sources_data: {entity['name']} with path {file_path_to_load}")
-                                logger.info(f"AIService (Query): Current direct_sources_data count: {len(direct_sources_data)}")
-                                logger.info(f"AIService (Query): Direct source data note content first 100 chars: {content[:100] if content else '(empty)'}")
+                                logger.info("AIService (Query): Added Note to direct_sources_data: %s with path %s", entity['name'], file_path_to_load)
+                                logger.info("AIService (Query): Current direct_sources_data count: %s", len(direct_sources_data))
+                                logger.info("AIService (Query): Direct source data note content: %s", loggable_text(content))
                             
-                            logger.info(f"AIService (Query): Successfully loaded direct content for '{entity['name']}' (Length: {len(content)})")
+                            logger.info("AIService (Query): Successfully loaded direct content for '%s' (Length: %s)", entity['name'], len(content))
                     except Exception as e: logger.error(f"AIService (Query): Error loading direct content for '{entity['name']}': {e}", exc_info=True)
 
         # Enhanced logging for direct sources debugging
-        logger.info(f"AIService (Query): Final processing - query_text: '{query_text}'")
-        logger.info(f"AIService (Query): Direct sources data count: {len(direct_sources_data)}")
+        logger.info("AIService (Query): Final processing - query_text: '%s'", query_text)
+        logger.info("AIService (Query): Direct sources data count: %s", len(direct_sources_data))
         
         if direct_sources_data:
             for i, item in enumerate(direct_sources_data):
-                logger.info(f"AIService (Query): Direct source {i+1} type={item.get('type')}, name={item.get('name')}")
+                logger.info("AIService (Query): Direct source %s type=%s, name=%s", i+1, item.get('type'), item.get('name'))
                 content_len = len(item.get('content', ''))
-                logger.info(f"AIService (Query): Content length: {content_len}, first 100 chars: {item.get('content', '')[:100]}")
+                logger.info("AIService (Query): Content length: %s, content: %s", content_len, loggable_text(item.get('content', '')))
 
         # Log original summary
         if not direct_sources_data and not direct_chapter_context: 
             logger.info("AIService (Query): No direct entity matches found in query.")
         else: 
-            logger.info(f"AIService (Query): Found and loaded {len(direct_sources_data)} direct sources and chapter context: {bool(direct_chapter_context)}.")
+            logger.info("AIService (Query): Found and loaded %s direct sources and chapter context: %s.", len(direct_sources_data), bool(direct_chapter_context))
 
-        logger.debug(f"AIService (Query): Final paths to filter from RAG: {directly_included_paths}")
+        record_stage("ai.direct_sources", direct_sources_started, direct_sources=len(direct_sources_data))
+        logger.debug("AIService (Query): Final paths to filter from RAG: %s", directly_included_paths)
         logger.debug("AIService (Query): Delegating query to RagEngine...")
         answer, source_nodes, direct_sources_info_list = await self.rag_engine.query(
             project_id=project_id,
@@ -536,12 +567,12 @@ class AIService:
         )
         
         # Log the results returned from RAG engine
-        logger.info(f"AIService (Query): RagEngine returned: answer length={len(answer) if answer else 0}")
-        logger.info(f"AIService (Query): source_nodes count={len(source_nodes) if source_nodes else 0}")
+        logger.info("AIService (Query): RagEngine returned: answer length=%s", len(answer) if answer else 0)
+        logger.info("AIService (Query): source_nodes count=%s", len(source_nodes) if source_nodes else 0)
         
         # Debug the direct_sources_info_list
         if direct_sources_info_list:
-            logger.info(f"AIService (Query): direct_sources_info_list returned: {direct_sources_info_list}")
+            logger.info("AIService (Query): direct_sources_info_list returned: %s", direct_sources_info_list)
         else:
             logger.info("AIService (Query): direct_sources_info_list is None or empty")
             
@@ -554,25 +585,30 @@ class AIService:
                     "type": source.get("type", "Unknown"),
                     "name": source.get("name", "Unknown")
                 })
-            logger.info(f"AIService (Query): Created direct_sources_info_list: {direct_sources_info_list}")
+            logger.info("AIService (Query): Created direct_sources_info_list: %s", direct_sources_info_list)
             
         return answer, source_nodes, direct_sources_info_list
 
     async def generate_scene_draft(self, project_id: str, chapter_id: str, request_data: AISceneGenerationRequest) -> Dict[str, str]:
-        logger.info(f"AIService: Processing scene generation request for project {project_id}, chapter {chapter_id}, previous order: {request_data.previous_scene_order}")
+        return await self._coalesced("generate_scene", project_id, (chapter_id, request_data.model_dump_json()),
+                                     lambda: self._generate_scene_draft(project_id, chapter_id, request_data))
+
+    async def _generate_scene_draft(self, project_id: str, chapter_id: str, request_data: AISceneGenerationRequest) -> Dict[str, str]:
+        logger.info("AIService: Processing scene generation request for project %s, chapter %s, previous order: %s", project_id, chapter_id, request_data.previous_scene_order)
         if self.rag_engine is None: raise HTTPException(status_code=503, detail="AI Engine not ready.")
         
         # Extract direct sources if provided
         direct_sources_data = []  # List to hold direct entity content
+        direct_sources_started = time.perf_counter()
         if request_data.direct_sources and len(request_data.direct_sources) > 0:
-            logger.info(f"AIService (Gen): Processing {len(request_data.direct_sources)} direct source references")
+            logger.info("AIService (Gen): Processing %s direct source references", len(request_data.direct_sources))
             
             # Compile entity list similar to query method
             entity_list = []
             try:
                 # Add standard entity types
                 entity_list = self._compile_entity_list(project_id)
-                logger.debug(f"AIService (Gen): Compiled entity list with {len(entity_list)} items.")
+                logger.debug("AIService (Gen): Compiled entity list with %s items.", len(entity_list))
             except Exception as e:
                 logger.error(f"AIService (Gen): Error compiling entity list: {e}", exc_info=True)
                 # Continue with empty entity list rather than failing
@@ -613,7 +649,7 @@ class AIService:
                                 'file_path': str(file_path_to_load)
                             }
                             direct_sources_data.append(source_item)
-                            logger.info(f"AIService (Gen): Added direct source: {entity['type']} '{display_name}' with path {file_path_to_load}")
+                            logger.info("AIService (Gen): Added direct source: %s '%s' with path %s", entity['type'], display_name, file_path_to_load)
                             break
                         except Exception as e:
                             logger.error(f"AIService (Gen): Error processing direct source '{direct_source_name}': {e}", exc_info=True)
@@ -621,7 +657,8 @@ class AIService:
                 if not source_found:
                     logger.warning(f"AIService (Gen): Direct source '{direct_source_name}' not found in entity list")
             
-            logger.info(f"AIService (Gen): Processed {len(direct_sources_data)} direct sources for scene generation")
+            logger.info("AIService (Gen): Processed %s direct sources for scene generation", len(direct_sources_data))
+        record_stage("ai.direct_sources", direct_sources_started, direct_sources=len(direct_sources_data))
 
         # --- REFACTORED: Use helper for project AND chapter context ---
         loaded_context = self._load_context(project_id, chapter_id)
@@ -633,6 +670,7 @@ class AIService:
         # --- END REFACTORED ---
 
         explicit_previous_scenes: List[Tuple[int, str]] = []
+        previous_scenes_started = time.perf_counter()
         # Load previous scenes and add their paths to the filter set
         previous_scene_order = request_data.previous_scene_order
         if previous_scene_order is not None and previous_scene_order > 0 and PREVIOUS_SCENE_COUNT > 0:
@@ -653,9 +691,10 @@ class AIService:
                         except HTTPException as scene_load_err: logger.warning(f"AIService (Gen): Scene file not found/error for order {target_order} (ID: {scene_id_to_load}): {scene_load_err.detail}")
             except Exception as general_err: logger.error(f"AIService (Gen): Unexpected error loading previous scenes: {general_err}", exc_info=True)
             explicit_previous_scenes.reverse()
+        record_stage("ai.previous_scenes", previous_scenes_started, scenes=len(explicit_previous_scenes))
 
-        logger.debug(f"AIService (Gen): Context prepared - Proj Plan: {bool(explicit_plan)}, Proj Syn: {bool(explicit_synopsis)}, Chap Plan: {bool(explicit_chapter_plan)}, Chap Syn: {bool(explicit_chapter_synopsis)}, Prev Scenes: {len(explicit_previous_scenes)}")
-        logger.debug(f"AIService (Gen): Paths to filter from RAG: {paths_to_filter}")
+        logger.debug("AIService (Gen): Context prepared - Proj Plan: %s, Proj Syn: %s, Chap Plan: %s, Chap Syn: %s, Prev Scenes: %s", bool(explicit_plan), bool(explicit_synopsis), bool(explicit_chapter_plan), bool(explicit_chapter_synopsis), len(explicit_previous_scenes))
+        logger.debug("AIService (Gen): Paths to filter from RAG: %s", paths_to_filter)
         try:
             generated_draft_dict = await self.rag_engine.generate_scene(
                 project_id=project_id, chapter_id=chapter_id, prompt_summary=request_data.prompt_summary,
@@ -675,7 +714,10 @@ class AIService:
         except Exception as e: logger.error(f"Unexpected error during scene generation delegation: {e}", exc_info=True); raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred during AI scene generation.")
 
     async def rephrase_text(self, project_id: str, request_data: AIRephraseRequest) -> List[str]:
-        logger.info(f"AIService: Processing rephrase request for project {project_id}. Text: '{request_data.text_to_rephrase[:50]}...'")
+        return await self._coalesced("rephrase", project_id, request_data.model_dump_json(), lambda: self._rephrase_text(project_id, request_data))
+
+    async def _rephrase_text(self, project_id: str, request_data: AIRephraseRequest) -> List[str]:
+        logger.info("AIService: Processing rephrase request for project %s. Text: '%s...'", project_id, request_data.text_to_rephrase[:50])
         if self.rag_engine is None: raise HTTPException(status_code=503, detail="AI Engine not ready.")
 
         # --- REFACTORED: Use helper for project context ---
@@ -685,7 +727,7 @@ class AIService:
         paths_to_filter = loaded_context.get('filter_paths', set())
         # --- END REFACTORED ---
 
-        logger.debug(f"AIService (Rephrase): Paths to filter from RAG: {paths_to_filter}")
+        logger.debug("AIService (Rephrase): Paths to filter from RAG: %s", paths_to_filter)
         try:
             suggestions = await self.rag_engine.rephrase(
                 project_id=project_id, selected_text=request_data.text_to_rephrase,
@@ -700,11 +742,15 @@ class AIService:
         except Exception as e: logger.error(f"Unexpected error during rephrase delegation: {e}", exc_info=True); raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred during AI rephrasing.")
 
     async def split_chapter_into_scenes(self, project_id: str, chapter_id: str, request_data: AIChapterSplitRequest) -> List[ProposedScene]:
-        logger.info(f"AIService: Processing chapter split request for project {project_id}, chapter {chapter_id}")
+        return await self._coalesced("split_chapter", project_id, (chapter_id, request_data.model_dump_json()),
+                                     lambda: self._split_chapter_into_scenes(project_id, chapter_id, request_data))
+
+    async def _split_chapter_into_scenes(self, project_id: str, chapter_id: str, request_data: AIChapterSplitRequest) -> List[ProposedScene]:
+        logger.info("AIService: Processing chapter split request for project %s, chapter %s", project_id, chapter_id)
         if self.rag_engine is None: raise HTTPException(status_code=503, detail="AI Engine not ready.")
         chapter_content = request_data.chapter_content
         if not chapter_content or not chapter_content.strip(): logger.warning(f"AIService (Split): Received empty chapter content for chapter {chapter_id}. Returning empty split."); return []
-        logger.debug(f"AIService (Split): Received chapter content (Length: {len(chapter_content)})")
+        logger.debug("AIService (Split): Received chapter content (Length: %s)", len(chapter_content))
 
         # --- REFACTORED: Use helper for project AND chapter context ---
         loaded_context = self._load_context(project_id, chapter_id)
@@ -715,7 +761,7 @@ class AIService:
         paths_to_filter = loaded_context.get('filter_paths', set())
         # --- END REFACTORED ---
 
-        logger.debug(f"AIService (Split): Paths to filter from RAG: {paths_to_filter}")
+        logger.debug("AIService (Split): Paths to filter from RAG: %s", paths_to_filter)
         try:
             logger.debug("AIService (Split): Delegating to ChapterSplitter...")
             proposed_scenes = await self.rag_engine.split_chapter(
@@ -731,19 +777,20 @@ class AIService:
         except Exception as e: logger.error(f"Unexpected error during chapter split delegation: {e}", exc_info=True); raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred during AI chapter splitting.")
 
     # (rebuild_project_index remains unchanged)
-    async def rebuild_project_index(self, project_id: str) -> Tuple[int, int]:
+    async def rebuild_project_index(self, project_id: str, progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
         """
         Deletes and rebuilds the vector index for a specific project.
+        progress(done, total) is called from the worker thread between files (see RagEngine.rebuild_index).
         Returns a tuple of (deleted_count, indexed_count).
         """
-        logger.info(f"AIService: Received request to rebuild index for project {project_id}")
+        logger.info("AIService: Received request to rebuild index for project %s", project_id)
         if self.rag_engine is None:
             logger.error("AIService: Cannot rebuild index, RagEngine not ready.")
             raise HTTPException(status_code=503, detail="AI Engine not ready.")
 
         try:
             # 1. Get all markdown file paths for the project
-            logger.info(f"AIService: Finding all markdown files for project {project_id}...")
+            logger.info("AIService: Finding all markdown files for project %s...", project_id)
             markdown_paths = self.file_service.get_all_markdown_paths(project_id)
             if not markdown_paths:
                 logger.warning(f"AIService: No markdown files found for project {project_id}. Index rebuild might not be necessary or project is empty.")
@@ -754,11 +801,11 @@ class AIService:
                 indexed_count = len(markdown_paths)
 
             # 2. Delegate to RagEngine to perform deletion and re-indexing
-            logger.info(f"AIService: Delegating index rebuild for {len(markdown_paths)} files to RagEngine...")
-            # Assuming RagEngine.rebuild_index is synchronous for now
-            # If it becomes async, use 'await' here.
-            result = self.rag_engine.rebuild_index(project_id, markdown_paths)
-            logger.info(f"AIService: Index rebuild delegation complete for project {project_id}.")
+            logger.info("AIService: Delegating index rebuild for %s files to RagEngine...", len(markdown_paths))
+            # RagEngine.rebuild_index is synchronous; run it in a worker thread so the event loop stays responsive
+            with stage("rag.rebuild_index", files=len(markdown_paths)):
+                result = await asyncio.to_thread(self.rag_engine.rebuild_index, project_id, markdown_paths, progress)
+            logger.info("AIService: Index rebuild delegation complete for project %s.", project_id)
             
             # For now, assume deleted count equals indexed count
             # In a more advanced implementation, the RagEngine could return actual counts
@@ -766,10 +813,46 @@ class AIService:
             
             return deleted_count, indexed_count
 
+        except JobCancelled:
+            logger.info("AIService: Index rebuild for project %s cancelled.", project_id)
+            raise
         except Exception as e:
             logger.error(f"AIService: Unexpected error during index rebuild for project {project_id}: {e}", exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to rebuild index for project {project_id} due to an internal error.")
 
+    # --- ADDED: Index garbage collection ---
+    async def collect_index_garbage(self, project_id: str, dry_run: bool = True) -> IndexGCResponse:
+        """
+        Removes index nodes of a project whose source file is gone or that duplicate other chunks.
+        With dry_run, only reports what would be removed. Also works for projects deleted from disk.
+        """
+        logger.info("AIService: Received request to collect index garbage for project %s (dry_run=%s)", project_id, dry_run)
+        if self.rag_engine is None:
+            logger.error("AIService: Cannot collect index garbage, RagEngine not ready.")
+            raise HTTPException(status_code=503, detail="AI Engine not ready.")
+        try:
+            return await asyncio.to_thread(self.rag_engine.collect_garbage, project_id, dry_run)
+        except Exception as e:
+            logger.error(f"AIService: Error collecting index garbage for project {project_id}: {e}", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to collect index garbage for project {project_id}.")
+    # --- END ADDED ---
+
+    # --- ADDED: Source node lookup ---
+    async def get_source_node(self, project_id: str, node_id: str) -> SourceNodeModel:
+        """Full text and metadata of a source node listed (by reference) in an AI response or chat history."""
+        if self.rag_engine is None:
+            logger.error("AIService: Cannot get source node, RagEngine not ready.")
+            raise HTTPException(status_code=503, detail="AI Engine not ready.")
+        try:
+            node = await asyncio.to_thread(self.rag_engine.get_source_node, project_id, node_id)
+        except Exception as e:
+            logger.error(f"AIService: Error reading source node {node_id} of project {project_id}: {e}", exc_info=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to read source node {node_id}.")
+        if node is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Source node {node_id} not found in project {project_id}. It may have been re-indexed.")
+        return SourceNodeModel(id=node.node_id, text=node.text, metadata=node.metadata, title=node.metadata.get("document_title"))
+    # --- END ADDED ---
+
 
 # --- Instantiate Singleton ---
 try: ai_service = AIService()
@@ -0,0 +1,188 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from fastapi import HTTPException
+from app.services.file_service import file_service
+from app.services.project_service import project_service
+from app.services.chapter_service import chapter_service
+from app.core.config import settings
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from pathlib import Path
+from typing import Iterator, List, Tuple
+import io
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable sink for zipfile. Bytes written by zipfile are held
+    only until the next drain(), so the archive can be streamed as it is built.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ExportService:
+    """
+    Exports a whole project manuscript (all chapters and scenes, in order).
+    Output is produced as a stream of chunks: scene files are read lazily on a small
+    thread pool with bounded read-ahead, so the full manuscript is never held in memory.
+    """
+
+    def _get_manuscript_outline(self, project_id: str) -> List[Tuple[str, str, List[Tuple[str, Path]]]]:
+        """
+        Returns the ordered chapters of a project as (chapter_id, chapter_title, [(scene_title, scene_path), ...]).
+        Only metadata is read here; scene content is read while streaming.
+        """
+        outline = []
+        for chapter in chapter_service.get_all_for_project(project_id).chapters:
+            try:
+                chapter_metadata = file_service.read_chapter_metadata(project_id, chapter.id)
+            except HTTPException as e:
+                logger.warning(f"Skipping chapter {chapter.id} in export: metadata unavailable ({e.detail})")
+                continue
+            scenes_meta = chapter_metadata.get('scenes', {})
+            ordered_scenes = sorted(
+                scenes_meta.items(),
+                key=lambda item: item[1].get('order', 0) if isinstance(item[1].get('order'), int) else 0
+            )
+            scenes = [
+                (data.get('title', f"Scene {scene_id}"), file_service._get_scene_path(project_id, chapter.id, scene_id))
+                for scene_id, data in ordered_scenes
+            ]
+            outline.append((chapter.id, chapter.title, scenes))
+        return outline
+
+    def _read_scene(self, scene_path: Path) -> str:
+        """Reads a scene file for export; missing files are exported as empty scenes."""
+        try:
+            return file_service.read_text_file(scene_path)
+        except HTTPException as e:
+            if e.status_code == 404:
+                logger.warning(f"Scene file missing during export: {scene_path}")
+                return ""
+            raise
+
+    def _iter_scene_contents(self, scene_paths: List[Path]) -> Iterator[str]:
+        """
+        Yields scene contents in order. At most EXPORT_READ_AHEAD reads are in flight
+        (or buffered) at any time, so memory stays bounded regardless of project size.
+        """
+        read_ahead = max(1, settings.EXPORT_READ_AHEAD)
+        with ThreadPoolExecutor(max_workers=read_ahead, thread_name_prefix="export-read") as executor:
+            pending = deque()
+            paths = iter(scene_paths)
+            for scene_path in paths:
+                pending.append(executor.submit(self._read_scene, scene_path))
+                if len(pending) >= read_ahead:
+                    break
+            while pending:
+                content = pending.popleft().result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(executor.submit(self._read_scene, next_path))
+                yield content
+
+    def _iter_chapter_blocks(self, scenes: List[Tuple[str, Path]], contents: Iterator[str], include_titles: bool, separator: str, heading: str) -> Iterator[str]:
+        """Yields the Markdown text of one chapter's scenes, piece by piece, taking scene contents from the shared read-ahead iterator."""
+        for index, (scene_title, _) in enumerate(scenes):
+            if index > 0:
+                yield separator
+            if include_titles:
+                yield f"{heading} {scene_title}\n\n"
+            yield next(contents)
+
+    def get_export_filename(self, project_id: str, export_format: str) -> str:
+        """Builds a download filename from the project name."""
+        project = project_service.get_by_id(project_id)
+        extension = "zip" if export_format == "zip" else "md"
+        return f"{chapter_service._slugify(project.name)}.{extension}"
+
+    def stream_markdown(self, project_id: str, include_titles: bool = True, separator: str = "\n\n---\n\n") -> Iterator[bytes]:
+        """
+        Streams the whole manuscript as a single UTF-8 Markdown document.
+        Project name is an H1, chapter titles are H2 and (optionally) scene titles are H3.
+        """
+        project = project_service.get_by_id(project_id)
+        outline = self._get_manuscript_outline(project_id)
+        logger.info(f"Streaming Markdown export for project {project_id} ({len(outline)} chapters)")
+
+        def generate() -> Iterator[bytes]:
+            contents = self._iter_scene_contents([path for _, _, scenes in outline for _, path in scenes])
+            yield f"# {project.name}\n\n".encode("utf-8")
+            for index, (_, chapter_title, scenes) in enumerate(outline):
+                if index > 0:
+                    yield b"\n\n"
+                yield f"## {chapter_title}\n\n".encode("utf-8")
+                for piece in self._iter_chapter_blocks(scenes, contents, include_titles, separator, heading="###"):
+                    yield piece.encode("utf-8")
+            yield b"\n"
+
+        return generate()
+
+    def stream_zip(self, project_id: str, include_titles: bool = True, separator: str = "\n\n---\n\n") -> Iterator[bytes]:
+        """
+        Streams the manuscript as a zip archive with one Markdown file per chapter
+        (same layout as the chapter compile output). Compressed bytes are yielded as they are produced.
+        """
+        project_service.get_by_id(project_id) # Ensure project exists before streaming starts
+        outline = self._get_manuscript_outline(project_id)
+        logger.info(f"Streaming zip export for project {project_id} ({len(outline)} chapters)")
+
+        def generate() -> Iterator[bytes]:
+            contents = self._iter_scene_contents([path for _, _, scenes in outline for _, path in scenes])
+            sink = _ZipStreamBuffer()
+            with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for index, (chapter_id, chapter_title, scenes) in enumerate(outline, start=1):
+                    slug = chapter_service._slugify(chapter_title) if chapter_title else chapter_id
+                    with archive.open(f"{index:02d}-{slug}.md", mode="w") as chapter_file:
+                        for piece in self._iter_chapter_blocks(scenes, contents, include_titles, separator, heading="##"):
+                            chapter_file.write(piece.encode("utf-8"))
+                            data = sink.drain()
+                            if data:
+                                yield data
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain() # Central directory
+            if data:
+                yield data
+
+        return generate()
+
+
+# Create a single instance
+export_service = ExportService()
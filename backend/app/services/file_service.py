@@ -17,9 +17,12 @@ import json
 import os # Import os for path.getmtime
 from pathlib import Path
 from fastapi import HTTPException, status
-from app.core.config import BASE_PROJECT_DIR
+from app.core.config import BASE_PROJECT_DIR, settings
+from app.core.metrics import observe_cache_lookups
 import logging
-from typing import List, Dict, Optional # Import Dict, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple # Import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +30,20 @@ logger = logging.getLogger(__name__)
 # Adjust as needed, similar to .gitignore logic but simpler for this purpose
 EXCLUDED_FOR_MTIME = {'.git', 'venv', '.venv', 'node_modules', '__pycache__', 'chroma_db', '.chroma'}
 
+# Encodings used when decoding text files, checked in this order
+BOM_ENCODINGS = ((b'\xef\xbb\xbf', 'utf-8'), (b'\xff\xfe', 'utf-16-le'), (b'\xfe\xff', 'utf-16-be'))
+FALLBACK_ENCODINGS = ('utf-8', 'utf-16', 'utf-16-le', 'utf-16-be', 'latin-1', 'cp1252')
+UTF16_BOMS = (b'\xff\xfe', b'\xfe\xff')
+
 class FileService:
 
+    def __init__(self):
+        # path -> ((mtime_ns, size), encoding) for files read so far
+        self._encoding_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        # path -> ((mtime_ns, size), content), LRU ordered; bounded by settings.FILE_CONTENT_CACHE_SIZE
+        self._content_cache: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     # --- Path Helper Methods ---
     # ... (existing helpers unchanged) ...
     def _get_project_path(self, project_id: str) -> Path:
@@ -114,54 +129,140 @@ class FileService:
             logger.error(f"Error creating directory {path}: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not create directory structure for {path.name}")
 
+    def _decode_bytes(self, raw_data: bytes, preferred_encoding: Optional[str] = None) -> tuple[str, str]:
+        """
+        Decodes raw file bytes in memory. Checks for a BOM first, then tries the
+        previously detected encoding (if any) before the standard fallback order.
+        Returns a (content, encoding) tuple. Raises UnicodeDecodeError if nothing fits.
+        """
+        for bom, encoding in BOM_ENCODINGS:
+            if raw_data.startswith(bom):
+                return raw_data[len(bom):].decode(encoding), encoding
+
+        encodings_to_try = list(FALLBACK_ENCODINGS)
+        if preferred_encoding in encodings_to_try:
+            encodings_to_try.remove(preferred_encoding)
+            encodings_to_try.insert(0, preferred_encoding)
+
+        last_error = None
+        for encoding in encodings_to_try:
+            try:
+                return raw_data.decode(encoding), encoding
+            except UnicodeDecodeError as e:
+                last_error = e
+        raise last_error
+
+    def _invalidate_cached_text(self, path: Path):
+        """Drops any cached encoding/content for a path (called after writes and deletes)."""
+        key = str(path)
+        with self._cache_lock:
+            self._encoding_cache.pop(key, None)
+            self._content_cache.pop(key, None)
+
     def read_text_file(self, path: Path) -> str:
-        """Reads content from a text file with robust encoding handling."""
+        """
+        Reads content from a text file with robust encoding handling.
+        The file is read once and decoded in memory. The detected encoding is remembered
+        per file (keyed by mtime/size), and decoded content is optionally kept in a small
+        LRU cache (settings.FILE_CONTENT_CACHE_SIZE).
+        """
         if not self.path_exists(path):
              raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{path.name} not found")
-             
-        # First try direct binary reading to check for BOMs (Byte Order Marks)
+
+        key = str(path)
+        try:
+            stat_result = path.stat()
+            file_version = (stat_result.st_mtime_ns, stat_result.st_size)
+        except OSError as e:
+            logger.error(f"IO error reading file {path}: {e}")
+            return f"[Error reading file - encoding issues: {e}]"
+
+        preferred_encoding = None
+        content_cache_enabled = settings.FILE_CONTENT_CACHE_SIZE > 0
+        with self._cache_lock:
+            cached_content = self._content_cache.get(key)
+            if cached_content and cached_content[0] == file_version:
+                self._content_cache.move_to_end(key)
+                observe_cache_lookups("file_content", hits=1, misses=0)
+                return cached_content[1]
+            cached_encoding = self._encoding_cache.get(key)
+            if cached_encoding and cached_encoding[0] == file_version:
+                preferred_encoding = cached_encoding[1]
+
+        if content_cache_enabled:
+            observe_cache_lookups("file_content", hits=0, misses=1)
+
         try:
             with open(path, 'rb') as f:
-                raw_data = f.read(4)  # Read first 4 bytes to check for BOM
-                
-                # Check for UTF-16 BOMs
-                if raw_data.startswith(b'\xff\xfe'):  # UTF-16 LE BOM
-                    with open(path, 'r', encoding='utf-16-le') as f:
-                        content = f.read()
-                        logger.info(f"Successfully read {path.name} using UTF-16-LE encoding (detected BOM)")
-                        return content
-                        
-                elif raw_data.startswith(b'\xfe\xff'):  # UTF-16 BE BOM
-                    with open(path, 'r', encoding='utf-16-be') as f:
-                        content = f.read()
-                        logger.info(f"Successfully read {path.name} using UTF-16-BE encoding (detected BOM)")
-                        return content
-        except Exception as e:
-            logger.warning(f"Error checking for BOM in {path}: {e}")
-        
-        # Try different encodings in order of likelihood
-        encodings_to_try = ['utf-8', 'utf-16', 'utf-16-le', 'utf-16-be', 'latin-1', 'cp1252']
-        last_error = None
-        
-        for encoding in encodings_to_try:
+                raw_data = f.read()
+        except IOError as e:
+            logger.error(f"IO error reading file {path}: {e}")
+            return f"[Error reading file - encoding issues: {e}]"
+
+        try:
+            content, encoding = self._decode_bytes(raw_data, preferred_encoding)
+        except UnicodeDecodeError as e:
+            logger.error(f"Failed to read {path} with any encoding: {e}")
+            # Return empty string with a warning in it rather than failing completely
+            return f"[Error reading file - encoding issues: {e}]"
+        logger.debug(f"Successfully read {path.name} using {encoding} encoding")
+
+        with self._cache_lock:
+            self._encoding_cache[key] = (file_version, encoding)
+            cache_size = settings.FILE_CONTENT_CACHE_SIZE
+            if cache_size > 0:
+                self._content_cache[key] = (file_version, content)
+                self._content_cache.move_to_end(key)
+                while len(self._content_cache) > cache_size:
+                    self._content_cache.popitem(last=False)
+        return content
+
+    def normalize_legacy_encodings(self, root: Path = BASE_PROJECT_DIR) -> List[Path]:
+        """
+        One-off migration: rewrites the BOM-marked UTF-16 .md/.json files under root as UTF-8 (saves always
+        write UTF-8, so files only stay UTF-16 until their first save). Guessed fallback encodings are left
+        untouched. Each file is replaced atomically, and only if it did not change since it was read.
+        Returns the converted paths.
+        """
+        converted = []
+        for path in sorted(root.rglob("*")):
+            if path.suffix.lower() not in (".md", ".json") or not path.is_file():
+                continue
             try:
-                with open(path, 'r', encoding=encoding) as file:
-                    content = file.read()
-                    logger.debug(f"Successfully read {path.name} using {encoding} encoding")
-                    return content
+                stat_result = path.stat()
+                raw_data = path.read_bytes()
+            except OSError as e:
+                logger.warning(f"Could not read {path} for encoding normalization: {e}")
+                continue
+            if raw_data[:2] not in UTF16_BOMS:
+                continue
+            try:
+                content = raw_data.decode('utf-16')
             except UnicodeDecodeError as e:
-                last_error = e
-                logger.warning(f"Could not read {path.name} with {encoding} encoding: {e}")
+                logger.warning(f"Skipping {path}: not valid UTF-16 despite its BOM ({e})")
                 continue
-            except IOError as e:
-                last_error = e
-                logger.error(f"IO error reading file {path}: {e}")
-                break
-                
-        # If we're here, we couldn't read with any encoding
-        logger.error(f"Failed to read {path} with any encoding: {last_error}")
-        # Return empty string with a warning in it rather than failing completely
-        return f"[Error reading file - encoding issues: {last_error}]"
+            if self._replace_if_unchanged(path, content, (stat_result.st_mtime_ns, stat_result.st_size)):
+                logger.info(f"Normalized {path} from UTF-16 to UTF-8")
+                converted.append(path)
+        return converted
+
+    def _replace_if_unchanged(self, path: Path, content: str, file_version: Tuple[int, int]) -> bool:
+        """Atomically replaces path with content as UTF-8 unless the file changed since file_version was taken."""
+        temp_path = path.with_name(f".{path.name}.utf8.tmp")
+        try:
+            temp_path.write_text(content, encoding='utf-8')
+            current = path.stat()
+            if (current.st_mtime_ns, current.st_size) != file_version:
+                logger.info(f"Not normalizing {path}: it was modified meanwhile")
+                temp_path.unlink(missing_ok=True)
+                return False
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not normalize {path} to UTF-8: {e}")
+            temp_path.unlink(missing_ok=True)
+            return False
+        self._invalidate_cached_text(path)
+        return True
 
     def write_text_file(self, path: Path, content: str, trigger_index: bool = False):
         """
@@ -169,6 +270,7 @@ class FileService:
         Optionally triggers indexing if trigger_index is True and it's a markdown file.
         """
         self.create_directory(path.parent)
+        self._invalidate_cached_text(path)
         try:
             path.write_text(content, encoding='utf-8')
             logger.debug(f"Wrote text file: {path}")
@@ -238,6 +340,7 @@ class FileService:
 
         if not path.is_file():
              raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{path.name} is not a file")
+        self._invalidate_cached_text(path)
         try:
             path.unlink()
             logger.info(f"Successfully deleted file: {path}")
@@ -248,17 +351,15 @@ class FileService:
     def delete_directory(self, path: Path):
         """Deletes a directory and its contents recursively, including index cleanup."""
         if self.path_exists(path) and path.is_dir():
-            logger.info(f"Attempting index deletion for all .md files within directory: {path}")
+            logger.info(f"Attempting index deletion for all files within directory: {path}")
             from app.rag.index_manager import index_manager
             if index_manager:
-                markdown_files = list(path.rglob('*.md'))
-                for md_file in markdown_files:
-                    if BASE_PROJECT_DIR.resolve() in md_file.resolve().parents:
-                        try:
-                            logger.info(f"Attempting deletion from index for: {md_file}")
-                            index_manager.delete_doc(md_file)
-                        except Exception as e:
-                            logger.warning(f"Error deleting document {md_file.name} from index during directory delete: {e}")
+                if BASE_PROJECT_DIR.resolve() in path.resolve().parents:
+                    try:
+                        # One bulk index operation for the whole directory instead of one per file
+                        index_manager.delete_directory_docs(path)
+                    except Exception as e:
+                        logger.warning(f"Error deleting documents under {path} from index during directory delete: {e}")
             else:
                 logger.error("IndexManager not available, skipping index deletion during directory delete.")
 
@@ -268,6 +369,12 @@ class FileService:
 
         if not path.is_dir():
              raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{path.name} is not a directory")
+        with self._cache_lock:
+            # Drop cached entries for anything under the removed directory
+            prefix = str(path)
+            for cache in (self._encoding_cache, self._content_cache):
+                for key in [k for k in cache if k == prefix or k.startswith(prefix + os.sep)]:
+                    del cache[key]
         try:
             shutil.rmtree(path)
             logger.info(f"Successfully deleted directory: {path}")
@@ -600,4 +707,11 @@ class FileService:
 
 
 # Create a single instance
-file_service = FileService()
\ No newline at end of file
+file_service = FileService()
+
+
+if __name__ == "__main__":
+    # python -m app.services.file_service: converts the legacy UTF-16 files of all projects to UTF-8
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    converted_paths = file_service.normalize_legacy_encodings()
+    print(f"Converted {len(converted_paths)} UTF-16 file(s) under {BASE_PROJECT_DIR} to UTF-8.")
\ No newline at end of file
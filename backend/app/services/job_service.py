@@ -0,0 +1,306 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Background jobs for operations that outlive a reasonable HTTP request (index rebuilds, chapter splits,
+# bulk exports). A job is submitted with an async handler, runs on the event loop once one of the
+# JOBS_MAX_WORKERS slots is free, reports progress through its JobContext and ends with a JSON-serializable
+# result or an error. Job state is written to JOBS_DIR on every change, so finished jobs (and their
+# results) survive restarts; jobs still queued or running at shutdown are marked failed on the next start.
+# Handlers that run blocking work in a thread are submitted with cooperative_cancel: cancelling them only sets
+# cancel_requested, and the job stays running until the thread notices (raise_if_cancelled()) and stops, so its
+# work can't outlive the job. exclusive submissions are refused while a job of the same kind and project is unfinished.
+# Finished jobs and their files are deleted JOBS_RETENTION_HOURS after they finished, by prune_expired() (run on
+# every submit and job completion, and hourly by the app lifespan through run_scheduled_cleanup()).
+
+JobHandler = Callable[["JobContext"], Awaitable[Any]]
+
+INTERRUPTED_MESSAGE = "Interrupted by a server restart."
+CLEANUP_INTERVAL_HOURS = 1.0
+
+
+class JobCancelled(Exception):
+    """Raised by JobContext.raise_if_cancelled() in handlers that poll for cancellation."""
+
+
+class JobContext:
+    """Handed to a job handler. report() and raise_if_cancelled() may also be called from worker threads."""
+
+    def __init__(self, service: "JobService", job: Job, loop: asyncio.AbstractEventLoop):
+        self._service = service
+        self._loop = loop
+        self.job_id = job.id
+        self.project_id = job.project_id
+        self.params = dict(job.params)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._service._jobs[self.job_id].cancel_requested
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, progress: Optional[float] = None, message: Optional[str] = None):
+        self._loop.call_soon_threadsafe(self._service._update_progress, self.job_id, progress, message)
+
+    def output_path(self, suffix: str) -> Path:
+        """Path for a result file of the job (removed together with the job)."""
+        return self._service.directory / f"{self.job_id}{suffix}"
+
+
+class JobService:
+    def __init__(self, directory: Path, max_workers: int, retention_hours: float):
+        self.directory = directory
+        self.max_workers = max(1, max_workers)
+        self.retention = timedelta(hours=retention_hours)
+        self._jobs: Dict[str, Job] = {}
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending: Deque[str] = deque()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._cooperative: Set[str] = set() # Jobs whose handlers stop themselves once cancel_requested is set
+        self._write_lock = threading.Lock()
+        self._loaded = False
+
+    # --- Persistence ---
+    def _job_file(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def _persist(self, job: Job):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self._job_file(job.id).with_suffix(".json.tmp")
+        with self._write_lock:
+            temp_path.write_text(job.model_dump_json(), encoding="utf-8")
+            os.replace(temp_path, self._job_file(job.id))
+
+    def _remove_files(self, job_id: str):
+        for path in self.directory.glob(f"{job_id}*"):
+            path.unlink(missing_ok=True)
+
+    def _load(self):
+        """Loads persisted jobs once, fails the ones a restart interrupted and drops expired ones."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.directory.is_dir():
+            return
+        now = datetime.now(timezone.utc)
+        for path in self.directory.glob("*.json"):
+            try:
+                job = Job.model_validate_json(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.error(f"Skipping unreadable job file {path}: {e}")
+                continue
+            if not job.status.finished:
+                job.status, job.error, job.finished_at = JobStatus.FAILED, INTERRUPTED_MESSAGE, now
+                self._persist(job)
+            self._jobs[job.id] = job
+        self.prune_expired()
+        logger.info(f"JobService: Loaded {len(self._jobs)} job(s) from {self.directory}")
+
+    def prune_expired(self) -> int:
+        """Deletes the jobs (and their files) that finished more than the retention period ago; returns how many."""
+        cutoff = datetime.now(timezone.utc) - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status.finished and job.finished_at and job.finished_at < cutoff and job_id not in self._subscribers]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._remove_files(job_id)
+        if expired:
+            logger.info(f"JobService: Removed {len(expired)} expired job(s)")
+        return len(expired)
+
+    async def run_scheduled_cleanup(self, interval_hours: float = CLEANUP_INTERVAL_HOURS):
+        """Background task: prunes expired jobs every interval_hours, so idle servers drop them too (started by the app lifespan)."""
+        while True:
+            await asyncio.sleep(interval_hours * 3600)
+            try:
+                self._load()
+                self.prune_expired()
+            except Exception as e:
+                logger.error(f"JobService: Scheduled cleanup failed: {e}", exc_info=True)
+
+    # --- Public API ---
+    def submit(self, kind: str, handler: JobHandler, project_id: Optional[str] = None, params: Optional[Dict[str, Any]] = None,
+               cooperative_cancel: bool = False, exclusive: bool = False) -> Job:
+        """Queues a job; must be called from the event loop (i.e. from an async endpoint)."""
+        self._load()
+        self.prune_expired()
+        if exclusive:
+            active = next((job for job in self._jobs.values()
+                           if job.kind == kind and job.project_id == project_id and not job.status.finished), None)
+            if active is not None:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                    detail=f"A {kind} job for project {project_id} is already {active.status.value} (job {active.id})")
+        job = Job(kind=kind, project_id=project_id, params=params or {}, created_at=datetime.now(timezone.utc), message="Queued")
+        self._jobs[job.id] = job
+        self._handlers[job.id] = handler
+        if cooperative_cancel:
+            self._cooperative.add(job.id)
+        self._persist(job)
+        self._pending.append(job.id)
+        logger.info(f"JobService: Submitted {kind} job {job.id} (project {project_id})")
+        self._dispatch()
+        return job
+
+    def get(self, job_id: str) -> Job:
+        self._load()
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+        return job
+
+    def list_jobs(self, project_id: Optional[str] = None, kind: Optional[str] = None) -> List[Job]:
+        self._load()
+        jobs = [job for job in self._jobs.values()
+                if (project_id is None or job.project_id == project_id) and (kind is None or job.kind == kind)]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancels a queued job immediately; a running job gets its task cancelled. Jobs submitted with
+        cooperative_cancel instead keep running until their handler stops at its next raise_if_cancelled().
+        """
+        job = self.get(job_id)
+        if job.status.finished:
+            return job
+        job.cancel_requested = True
+        if job.status == JobStatus.QUEUED:
+            self._handlers.pop(job_id, None)
+            self._cooperative.discard(job_id)
+            self._finish(job, JobStatus.CANCELLED)
+        elif job_id in self._cooperative:
+            job.message = "Cancelling"
+            self._changed(job)
+        else:
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+            self._persist(job)
+        return job
+
+    def delete(self, job_id: str):
+        """Removes a finished job and its files."""
+        job = self.get(job_id)
+        if not job.status.finished:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} is still {job.status.value}; cancel it first")
+        del self._jobs[job_id]
+        self._remove_files(job_id)
+
+    async def subscribe(self, job_id: str):
+        """Yields the job after every change, starting with its current state, until it has finished."""
+        job = self.get(job_id)
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(updates)
+        try:
+            current = job.model_copy()
+            yield current
+            while not current.status.finished:
+                current = await updates.get()
+                yield current
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(updates)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    def shutdown(self):
+        """Fails the queued and running jobs (called on application shutdown; their handlers can't be resumed)."""
+        for job_id in [*self._pending, *self._tasks]:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.status.finished:
+                self._finish(job, JobStatus.FAILED, error=INTERRUPTED_MESSAGE)
+        self._pending.clear()
+        self._handlers.clear()
+        for task in self._tasks.values():
+            task.cancel()
+
+    # --- Execution ---
+    def _dispatch(self):
+        while self._pending and len(self._tasks) < self.max_workers:
+            job_id = self._pending.popleft()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != JobStatus.QUEUED:
+                continue
+            self._tasks[job_id] = asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: Job):
+        handler = self._handlers.pop(job.id)
+        job.status, job.started_at, job.message = JobStatus.RUNNING, datetime.now(timezone.utc), "Running"
+        self._changed(job)
+        try:
+            result = await handler(JobContext(self, job, asyncio.get_running_loop()))
+            if job.cancel_requested:
+                self._finish(job, JobStatus.CANCELLED)
+            else:
+                job.result, job.progress = result, 1.0
+                self._finish(job, JobStatus.SUCCEEDED)
+        except (asyncio.CancelledError, JobCancelled):
+            if not job.status.finished: # Already failed by shutdown()
+                self._finish(job, JobStatus.CANCELLED)
+        except HTTPException as e:
+            self._finish(job, JobStatus.FAILED, error=str(e.detail))
+        except Exception as e:
+            logger.error(f"JobService: {job.kind} job {job.id} failed: {e}", exc_info=True)
+            self._finish(job, JobStatus.FAILED, error=str(e) or type(e).__name__)
+        finally:
+            self._tasks.pop(job.id, None)
+            self._cooperative.discard(job.id)
+            self._dispatch()
+
+    def _finish(self, job: Job, new_status: JobStatus, error: Optional[str] = None):
+        job.status, job.error, job.finished_at = new_status, error, datetime.now(timezone.utc)
+        job.message = {JobStatus.SUCCEEDED: "Done", JobStatus.CANCELLED: "Cancelled"}.get(new_status, "Failed")
+        logger.info(f"JobService: {job.kind} job {job.id} {new_status.value}" + (f": {error}" if error else ""))
+        self._changed(job)
+        self.prune_expired()
+
+    def _update_progress(self, job_id: str, progress: Optional[float], message: Optional[str]):
+        job = self._jobs.get(job_id)
+        if job is None or job.status != JobStatus.RUNNING:
+            return
+        if progress is not None:
+            job.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            job.message = message
+        self._changed(job)
+
+    def _changed(self, job: Job):
+        try:
+            self._persist(job)
+        except OSError as e:
+            logger.error(f"JobService: Failed to persist job {job.id}: {e}")
+        for updates in self._subscribers.get(job.id, ()):
+            updates.put_nowait(job.model_copy())
+
+
+# Create a single instance
+job_service = JobService(Path(settings.JOBS_DIR), max_workers=settings.JOBS_MAX_WORKERS, retention_hours=settings.JOBS_RETENTION_HOURS)
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 from fastapi import HTTPException, status
-from app.models.scene import SceneCreate, SceneUpdate, SceneRead, SceneList
+from app.models.scene import SceneCreate, SceneUpdate, SceneRead, SceneList, SceneBatchCreate
 from app.services.file_service import file_service
 # --- MODIFIED: Keep chapter_service import at top level ---
 from app.services.chapter_service import chapter_service
@@ -113,6 +113,110 @@ class SceneService:
             content=scene_in.content
         )
 
+    # --- ADDED: Batch creation ---
+    def create_batch(self, project_id: str, chapter_id: str, batch_in: SceneBatchCreate) -> SceneList:
+        """
+        Creates several scenes within a chapter in one operation.
+        The chapter is validated and its metadata written once, and all new scene files
+        are indexed together in a single batch instead of one embedding pass per scene.
+        """
+        chapter = chapter_service.get_by_id(project_id, chapter_id) # Ensure chapter exists (once)
+
+        chapter_metadata = file_service.read_chapter_metadata(project_id, chapter_id)
+        if 'scenes' not in chapter_metadata: chapter_metadata['scenes'] = {}
+        existing_scenes = chapter_metadata['scenes']
+
+        # --- Allocate orders: explicit orders must be free, the rest are appended after the max ---
+        used_orders = {data.get('order'): data.get('title', existing_id) for existing_id, data in existing_scenes.items() if isinstance(data.get('order'), int)}
+        for scene_in in batch_in.scenes:
+            if scene_in.order is None:
+                continue
+            if scene_in.order in used_orders:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Scene order {scene_in.order} already exists for scene '{used_orders[scene_in.order]}'"
+                )
+            used_orders[scene_in.order] = scene_in.title
+        next_order = max(used_orders.keys(), default=0) + 1
+
+        new_scenes: list[SceneRead] = []
+        for scene_in in batch_in.scenes:
+            scene_id = generate_uuid()
+            if file_service.path_exists(file_service._get_scene_path(project_id, chapter_id, scene_id)):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Scene ID collision")
+            if scene_in.order is None:
+                final_order = next_order
+                next_order += 1
+            else:
+                final_order = scene_in.order
+            new_scenes.append(SceneRead(
+                id=scene_id,
+                project_id=project_id,
+                chapter_id=chapter_id,
+                title=scene_in.title,
+                order=final_order,
+                content=scene_in.content
+            ))
+            chapter_metadata['scenes'][scene_id] = {"title": scene_in.title, "order": final_order}
+
+        # --- Save Metadata ONCE, before writing the files ---
+        logger.debug(f"Writing chapter metadata for {len(new_scenes)} new scenes BEFORE writing files.")
+        try:
+            file_service.write_chapter_metadata(project_id, chapter_id, chapter_metadata) # JSON, no index trigger
+        except Exception as meta_write_err:
+            logger.error(f"Failed to write chapter metadata for batch of {len(new_scenes)} scenes: {meta_write_err}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to save scene metadata."
+            ) from meta_write_err
+
+        # --- Write the scene files WITHOUT triggering index (indexed together below) ---
+        written_paths: list[Path] = []
+        for scene in new_scenes:
+            scene_path = file_service._get_scene_path(project_id, chapter_id, scene.id)
+            try:
+                file_service.write_text_file(scene_path, scene.content, trigger_index=False)
+                written_paths.append(scene_path)
+            except Exception as file_write_err:
+                logger.error(f"Failed to write scene file {scene_path} during batch creation: {file_write_err}", exc_info=True)
+                # Attempt to rollback the whole batch (files already written and metadata entries)
+                try:
+                    logger.warning(f"Attempting to rollback batch of {len(new_scenes)} scenes due to file write error.")
+                    for written_path in written_paths:
+                        written_path.unlink(missing_ok=True)
+                    for rollback_scene in new_scenes:
+                        chapter_metadata['scenes'].pop(rollback_scene.id, None)
+                    file_service.write_chapter_metadata(project_id, chapter_id, chapter_metadata)
+                except Exception as rollback_err:
+                    logger.error(f"Failed to rollback batch scene creation: {rollback_err}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Failed to save scene content file."
+                ) from file_write_err
+
+        # --- One index batch for all new scenes, with preloaded metadata to avoid stale reads ---
+        try:
+            preloaded_metadata = {
+                file_service._get_scene_path(project_id, chapter_id, scene.id): {
+                    "document_type": "Scene",
+                    "document_title": scene.title,
+                    "chapter_id": chapter_id,
+                    "chapter_title": chapter.title
+                }
+                for scene in new_scenes
+            }
+            if index_manager:
+                index_manager.index_files(written_paths, preloaded_metadata=preloaded_metadata)
+            else:
+                logger.error("IndexManager not available, cannot index new scenes.")
+        except Exception as index_err:
+            # Data is saved; don't fail the request. User might need to re-index manually.
+            logger.error(f"Error during batch index of {len(written_paths)} new scenes: {index_err}", exc_info=True)
+
+        new_scenes.sort(key=lambda s: s.order)
+        return SceneList(scenes=new_scenes)
+    # --- END ADDED ---
+
     def get_by_id(self, project_id: str, chapter_id: str, scene_id: str) -> SceneRead:
         """Gets scene details and content by ID."""
         chapter_service.get_by_id(project_id, chapter_id) # Ensure chapter exists
@@ -0,0 +1,70 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+# Compares two result files of benchmarks.run, e.g. before and after an optimization:
+#   python -m benchmarks.compare benchmarks/results/abc1234-medium.json benchmarks/results/def5678-medium.json
+
+COMPARED_META = ["scale", "project", "projects", "seed", "embeddings", "llm_latency_ms"]
+
+
+def load(path: Path) -> Dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare(baseline: Dict, candidate: Dict, metric: str = "median_ms", threshold_pct: float = 10.0) -> List[Dict]:
+    """One row per scenario present in either file; 'status' is faster/slower beyond threshold_pct, else same."""
+    rows = []
+    for name in list(dict.fromkeys([*baseline["scenarios"], *candidate["scenarios"]])):
+        before = baseline["scenarios"].get(name, {}).get(metric)
+        after = candidate["scenarios"].get(name, {}).get(metric)
+        row = {"scenario": name, "before": before, "after": after, "change_pct": None, "status": "missing"}
+        if before is not None and after is not None:
+            row["change_pct"] = (after - before) / before * 100 if before else 0.0
+            row["status"] = "slower" if row["change_pct"] > threshold_pct else "faster" if row["change_pct"] < -threshold_pct else "same"
+        rows.append(row)
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--metric", default="median_ms", choices=["min_ms", "median_ms", "mean_ms", "p95_ms", "max_ms"])
+    parser.add_argument("--threshold", type=float, default=10.0, help="Change in percent below which a scenario counts as unchanged.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any scenario got slower.")
+    args = parser.parse_args(argv)
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for key in COMPARED_META:
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"Warning: '{key}' differs ({baseline['meta'].get(key)} vs {candidate['meta'].get(key)}), timings may not be comparable.", file=sys.stderr)
+
+    print(f"{args.metric}: {baseline['meta'].get('commit')} -> {candidate['meta'].get('commit')}")
+    rows = compare(baseline, candidate, args.metric, args.threshold)
+    for row in rows:
+        if row["status"] == "missing":
+            print(f"{row['scenario']:<16} {'(only in one file)':>32}")
+            continue
+        print(f"{row['scenario']:<16} {row['before']:>12.2f} -> {row['after']:>12.2f} ms  {row['change_pct']:>+8.1f}%  {row['status']}")
+    return 1 if args.fail_on_regression and any(row["status"] == "slower" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
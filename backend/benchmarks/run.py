@@ -0,0 +1,247 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.stubs import StubLLM
+from benchmarks.synthetic import SCALES, LANGUAGES, create_project
+
+# Offline benchmark runner. Usage (from backend/):
+#   python -m benchmarks.run --scale medium --repeats 20
+#   python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json
+#
+# The app runs in-process behind a TestClient, in a throwaway working directory (projects, Chroma store and
+# embedding cache are isolated from the real ones), with a deterministic stub LLM and, unless
+# --real-embeddings is given, a stub embedder. Settings from the environment / .env still apply, so a
+# configuration (e.g. RAG_HYBRID_RETRIEVAL=true) can be benchmarked by exporting it before the run.
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+RESULTS_FORMAT_VERSION = 1
+
+SCENARIOS = ["list_projects", "note_tree", "crud_scene", "crud_note", "rebuild_index", "query_project", "generate_scene", "split_chapter"]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Codex AI backend benchmarks offline and write the timings as JSON.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="medium", help="Synthetic project size preset.")
+    parser.add_argument("--chapters", type=int, help="Override the preset's chapter count.")
+    parser.add_argument("--scenes-per-chapter", type=int, help="Override the preset's scenes per chapter.")
+    parser.add_argument("--paragraphs-per-scene", type=int, help="Override the preset's paragraphs per scene.")
+    parser.add_argument("--characters", type=int, help="Override the preset's character count.")
+    parser.add_argument("--notes", type=int, help="Override the preset's note count.")
+    parser.add_argument("--languages", help=f"Comma-separated subset of {','.join(LANGUAGES)}.")
+    parser.add_argument("--projects", type=int, default=3, help="Number of projects created (project listing scales with it).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per scenario.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per scenario before measuring.")
+    parser.add_argument("--scenarios", help=f"Comma-separated subset of: {','.join(SCENARIOS)}.")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM response time.")
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding model instead of the stub.")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/<commit>-<scale>.json).")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary projects and Chroma store for inspection.")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the app while benchmarking.")
+    return parser.parse_args(argv)
+
+
+def git_revision() -> Dict:
+    def _git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": _git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(_git("status", "--porcelain", "--", "."))}
+
+
+def summarize(durations_ms: List[float]) -> Dict:
+    ordered = sorted(durations_ms)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p95_ms": round(ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def measure(operation: Callable[[int], None], repeats: int, warmup: int) -> Dict:
+    """Calls operation(iteration) warmup + repeats times and summarizes the timed calls."""
+    for iteration in range(warmup):
+        operation(iteration)
+    durations_ms = []
+    for iteration in range(warmup, warmup + repeats):
+        start = time.perf_counter()
+        operation(iteration)
+        durations_ms.append((time.perf_counter() - start) * 1000)
+    return summarize(durations_ms)
+
+
+def prepare_environment(workdir: Path, args: argparse.Namespace):
+    """
+    Points the app at the working directory and selects the offline stubs. Must run before anything imports
+    app.*: settings are read and the IndexManager singleton is created at import time.
+    """
+    os.chdir(workdir) # ./chroma_db and the embedding cache default to paths relative to the working directory
+    os.environ["BASE_PROJECT_DIR"] = str(workdir / "user_projects")
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["STUB_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    if not args.real_embeddings:
+        os.environ["EMBEDDING_BACKEND"] = "stub"
+        os.environ["EMBEDDING_POOL_ENABLED"] = "false" # The pool workers would load the real model
+
+
+def _ok(response, expected_status: int = 200):
+    if response.status_code != expected_status:
+        raise RuntimeError(f"{response.request.method} {response.request.url} returned {response.status_code}: {response.text[:300]}")
+    return response.json()
+
+
+def build_scenarios(client, project: Dict, scale, extras: Dict) -> Dict[str, Callable[[int], None]]:
+    """One callable per scenario; each call is one timed operation. extras collects per-scenario details."""
+    base = f"/api/v1/projects/{project['project_id']}"
+    chapter_id = project["chapter_ids"][0]
+
+    def list_projects(_):
+        _ok(client.get("/api/v1/projects/"))
+
+    def note_tree(_):
+        _ok(client.get(f"{base}/notes/tree"))
+
+    def crud_scene(iteration):
+        scene = _ok(client.post(f"{base}/chapters/{chapter_id}/scenes/", json={"title": f"Bench scene {iteration}", "content": project["chapter_text"][:2000]}), 201)
+        scene_url = f"{base}/chapters/{chapter_id}/scenes/{scene['id']}"
+        _ok(client.get(scene_url))
+        _ok(client.patch(scene_url, json={"content": project["chapter_text"][:2500]}))
+        _ok(client.delete(scene_url))
+
+    def crud_note(iteration):
+        note = _ok(client.post(f"{base}/notes/", json={"title": f"Bench note {iteration}", "content": project["chapter_text"][:1000], "folder_path": "/Bench"}), 201)
+        _ok(client.get(f"{base}/notes/{note['id']}"))
+        _ok(client.patch(f"{base}/notes/{note['id']}", json={"content": project["chapter_text"][:1500]}))
+        _ok(client.delete(f"{base}/notes/{note['id']}"))
+
+    def rebuild_index(_):
+        _ok(client.post(f"/api/v1/ai/rebuild_index/{project['project_id']}"))
+
+    def query_project(iteration):
+        queries = project["queries"]
+        _ok(client.post(f"/api/v1/ai/query/{project['project_id']}", json={"query": queries[iteration % len(queries)]}))
+
+    def generate_scene(_):
+        _ok(client.post(f"/api/v1/ai/generate/scene/{project['project_id']}/{chapter_id}",
+                        json={"prompt_summary": project["queries"][0], "previous_scene_order": scale.scenes_per_chapter}))
+
+    def split_chapter(_):
+        result = _ok(client.post(f"/api/v1/ai/split/chapter/{project['project_id']}/{chapter_id}", json={"chapter_content": project["chapter_text"]}))
+        extras.setdefault("split_chapter", {})["proposed_scenes"] = len(result["proposed_scenes"])
+
+    return {
+        "list_projects": list_projects, "note_tree": note_tree, "crud_scene": crud_scene, "crud_note": crud_note,
+        "rebuild_index": rebuild_index, "query_project": query_project, "generate_scene": generate_scene, "split_chapter": split_chapter,
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    selected = args.scenarios.split(",") if args.scenarios else SCENARIOS
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    scale = SCALES[args.scale]
+    for name in ("chapters", "scenes_per_chapter", "paragraphs_per_scene", "characters", "notes"):
+        if getattr(args, name) is not None:
+            setattr(scale, name, getattr(args, name))
+    if args.languages:
+        scale.languages = args.languages.split(",")
+
+    revision = git_revision()
+    output = (args.output or RESULTS_DIR / f"{revision['commit']}-{args.scale}.json").resolve()
+    original_cwd = Path.cwd()
+    workdir = Path(tempfile.mkdtemp(prefix="codex-ai-bench-"))
+    sys.path.insert(0, str(BACKEND_DIR))
+    try:
+        prepare_environment(workdir, args)
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.rag.index_manager import index_manager
+        llm: StubLLM = index_manager.llm
+        logging.getLogger().setLevel(args.log_level.upper())
+
+        with TestClient(app) as client:
+            setup_start = time.perf_counter()
+            projects = [create_project(client, scale, seed=args.seed + offset, name=f"Synthetic {offset + 1}") for offset in range(args.projects)]
+            setup_seconds = time.perf_counter() - setup_start
+            print(f"Created {args.projects} synthetic project(s) in {setup_seconds:.1f}s (workdir: {workdir})")
+
+            extras: Dict[str, Dict] = {}
+            scenarios = build_scenarios(client, projects[0], scale, extras)
+            results = {}
+            for name in selected:
+                llm.reset_stats()
+                results[name] = measure(scenarios[name], args.repeats, args.warmup)
+                if llm.prompt_chars:
+                    extras.setdefault(name, {})["mean_prompt_chars"] = round(statistics.fmean(llm.prompt_chars))
+                results[name].update(extras.get(name, {}))
+                print(f"{name:<16} median {results[name]['median_ms']:>10.2f} ms   p95 {results[name]['p95_ms']:>10.2f} ms")
+    finally:
+        os.chdir(original_cwd)
+        if args.keep_workdir:
+            print(f"Kept working directory: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "meta": {
+            **revision,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "project": scale.as_dict(),
+            "projects": args.projects,
+            "seed": args.seed,
+            "repeats": args.repeats,
+            "warmup": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms,
+            "embeddings": "real" if args.real_embeddings else "stub",
+            "setup_seconds": round(setup_seconds, 3),
+        },
+        "scenarios": results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
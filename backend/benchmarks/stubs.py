@@ -0,0 +1,19 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The offline stand-ins for Gemini and the HuggingFace embedding model live in the app
+# (LLM_PROVIDER=stub, EMBEDDING_BACKEND=stub); re-exported here for the benchmark tests.
+from app.rag.stub_models import StubLLM, StubEmbedding, STUB_EMBEDDING_DIM, SCENE_PARAGRAPHS_PER_SPLIT
+
+__all__ = ["StubLLM", "StubEmbedding", "STUB_EMBEDDING_DIM", "SCENE_PARAGRAPHS_PER_SPLIT"]
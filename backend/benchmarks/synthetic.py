@@ -0,0 +1,142 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List
+
+# Synthetic projects for the benchmarks. Everything is created through the HTTP API, so files, metadata
+# and index contents are exactly what a real user's project would have. Text is generated from a seed:
+# the same scale and seed always produce the same project.
+
+# Small vocabularies per language; sentences mix them so tokenization, chunking and embedding see
+# non-ASCII text (Cyrillic, accents, CJK) like the multilingual projects the app is used for.
+VOCABULARY: Dict[str, Dict[str, List[str]]] = {
+    "en": {
+        "subjects": ["The captain", "An old scholar", "The young thief", "Her brother", "The stranger", "The queen"],
+        "verbs": ["walked toward", "remembered", "argued about", "searched for", "whispered about", "feared"],
+        "objects": ["the northern gate", "a forgotten letter", "the silver compass", "the burning library", "the last ship", "the river crossing"],
+    },
+    "ru": {
+        "subjects": ["Капитан", "Старый учёный", "Молодой вор", "Её брат", "Незнакомец", "Королева"],
+        "verbs": ["направился к", "вспомнил о", "спорил о", "искал", "шептал о", "боялся"],
+        "objects": ["северным воротам", "забытом письме", "серебряный компас", "горящей библиотеке", "последний корабль", "переправы через реку"],
+    },
+    "de": {
+        "subjects": ["Der Kapitän", "Ein alter Gelehrter", "Der junge Dieb", "Ihr Bruder", "Der Fremde", "Die Königin"],
+        "verbs": ["ging zu", "erinnerte sich an", "stritt über", "suchte nach", "flüsterte über", "fürchtete"],
+        "objects": ["dem Nordtor", "einen vergessenen Brief", "den silbernen Kompass", "die brennende Bibliothek", "das letzte Schiff", "die Flussüberquerung"],
+    },
+    "fr": {
+        "subjects": ["Le capitaine", "Un vieil érudit", "Le jeune voleur", "Son frère", "L'étranger", "La reine"],
+        "verbs": ["marcha vers", "se souvint de", "se disputa à propos de", "chercha", "murmura à propos de", "craignait"],
+        "objects": ["la porte du nord", "une lettre oubliée", "la boussole d'argent", "la bibliothèque en flammes", "le dernier navire", "la traversée du fleuve"],
+    },
+    "ja": {
+        "subjects": ["船長は", "年老いた学者は", "若い盗賊は", "彼女の兄は", "見知らぬ男は", "女王は"],
+        "verbs": ["向かった", "思い出した", "議論した", "探した", "ささやいた", "恐れた"],
+        "objects": ["北の門へ", "忘れられた手紙を", "銀の羅針盤を", "燃える図書館を", "最後の船を", "川の渡し場を"],
+    },
+}
+LANGUAGES = sorted(VOCABULARY)
+
+
+@dataclass
+class ProjectScale:
+    chapters: int = 5
+    scenes_per_chapter: int = 6
+    paragraphs_per_scene: int = 8
+    characters: int = 10
+    notes: int = 30
+    note_folder_depth: int = 2
+    languages: List[str] = field(default_factory=lambda: list(LANGUAGES))
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+SCALES: Dict[str, ProjectScale] = {
+    "small": ProjectScale(chapters=2, scenes_per_chapter=3, paragraphs_per_scene=4, characters=4, notes=8, note_folder_depth=1),
+    "medium": ProjectScale(),
+    "large": ProjectScale(chapters=20, scenes_per_chapter=12, paragraphs_per_scene=12, characters=40, notes=200, note_folder_depth=3),
+}
+
+
+class TextGenerator:
+    """Seeded generator of multilingual prose. Each paragraph is in one language; a project mixes them."""
+
+    def __init__(self, seed: int, languages: List[str]):
+        unknown = set(languages) - set(VOCABULARY)
+        if unknown:
+            raise ValueError(f"Unknown language(s): {', '.join(sorted(unknown))}. Available: {', '.join(LANGUAGES)}")
+        self.rng = random.Random(seed)
+        self.languages = languages
+
+    def sentence(self, language: str) -> str:
+        words = VOCABULARY[language]
+        sentence = f"{self.rng.choice(words['subjects'])} {self.rng.choice(words['verbs'])} {self.rng.choice(words['objects'])}"
+        return sentence + ("。" if language == "ja" else ".")
+
+    def paragraph(self, sentences: int = 0) -> str:
+        language = self.rng.choice(self.languages)
+        separator = "" if language == "ja" else " "
+        return separator.join(self.sentence(language) for _ in range(sentences or self.rng.randint(3, 7)))
+
+    def paragraphs(self, count: int) -> str:
+        return "\n\n".join(self.paragraph() for _ in range(count))
+
+    def title(self) -> str:
+        words = VOCABULARY[self.rng.choice(self.languages)]
+        return self.rng.choice(words["objects"]).strip().capitalize()
+
+
+def _check(response, expected_status: int = 200):
+    if response.status_code != expected_status:
+        raise RuntimeError(f"{response.request.method} {response.request.url} returned {response.status_code}: {response.text[:300]}")
+    return response.json()
+
+
+def create_project(client, scale: ProjectScale, seed: int = 42, name: str = "") -> Dict:
+    """
+    Creates a project at the given scale through the API (client: a FastAPI TestClient or any httpx-like
+    client rooted at the backend). Returns the ids the scenarios need.
+    """
+    text = TextGenerator(seed, scale.languages)
+    project_id = _check(client.post("/api/v1/projects/", json={"name": name or f"Synthetic {seed}"}), 201)["id"]
+    base = f"/api/v1/projects/{project_id}"
+    for block in ("plan", "synopsis", "world"):
+        _check(client.put(f"{base}/{block}", json={"content": text.paragraphs(6)}))
+
+    for _ in range(scale.characters):
+        _check(client.post(f"{base}/characters/", json={"name": text.title(), "description": text.paragraphs(3)}), 201)
+
+    chapter_ids = []
+    for order in range(1, scale.chapters + 1):
+        chapter_id = _check(client.post(f"{base}/chapters/", json={"title": text.title(), "order": order}), 201)["id"]
+        chapter_ids.append(chapter_id)
+        if scale.scenes_per_chapter:
+            scenes = [{"title": text.title(), "content": text.paragraphs(scale.paragraphs_per_scene)} for _ in range(scale.scenes_per_chapter)]
+            _check(client.post(f"{base}/chapters/{chapter_id}/scenes/batch", json={"scenes": scenes}), 201)
+
+    for index in range(scale.notes):
+        depth = text.rng.randint(0, scale.note_folder_depth)
+        folder_path = "/" + "/".join(f"Folder {text.rng.randint(1, 4)}" for _ in range(depth))
+        _check(client.post(f"{base}/notes/", json={"title": f"Note {index + 1}", "content": text.paragraphs(4), "folder_path": folder_path}), 201)
+
+    return {
+        "project_id": project_id,
+        "chapter_ids": chapter_ids,
+        "chapter_text": text.paragraphs(scale.paragraphs_per_scene * 3), # Input for the chapter split scenario
+        "queries": [text.sentence(language) for language in scale.languages],
+    }
@@ -31,7 +31,7 @@ from app.models.ai import (
     AIQueryRequest, AIQueryResponse, SourceNodeModel,
     AISceneGenerationRequest, AISceneGenerationResponse,
     AIRephraseRequest, AIRephraseResponse,
-    AIChapterSplitRequest, AIChapterSplitResponse, ProposedScene
+    AIChapterSplitRequest, AIChapterSplitResponse, ProposedScene, IndexGCResponse
 )
 from app.models.common import Message
 from app.models.project import ProjectRead
@@ -104,6 +104,11 @@ def test_query_project_success():
         
         # Check the direct sources
         assert response_data["direct_sources"] == mock_direct_sources_info
+
+        # Stage timings are reported to the client
+        server_timing = response.headers["server-timing"]
+        assert "api.serialize;dur=" in server_timing
+        assert "total;dur=" in server_timing
     finally:
         # Clean up the dependency override after test completes
         app.dependency_overrides.pop(get_ai_service, None)
@@ -296,6 +301,7 @@ def test_rephrase_text_success():
         assert response.status_code == status.HTTP_200_OK
         response_data = response.json()
         assert response_data["suggestions"] == mock_suggestions
+        mock_ai_service.rephrase_text.assert_awaited_once_with(project_id=PROJECT_ID, request_data=AIRephraseRequest(**rephrase_data))
     finally:
         # Clean up the dependency override after test completes
         app.dependency_overrides.pop(get_ai_service, None)
@@ -529,4 +535,67 @@ def test_rebuild_index_service_error():
     finally:
         # Clean up patches
         ai_service_patcher.stop()
-# --- END ADDED ---
\ No newline at end of file
+# --- END ADDED ---
+
+
+# --- Tests for Index GC Endpoint ---
+@pytest.mark.parametrize("query, expected_dry_run", [("", True), ("?dry_run=false", False)])
+def test_collect_index_garbage(query, expected_dry_run):
+    mock_ai_service = AsyncMock(spec=AIService)
+    mock_ai_service.collect_index_garbage.return_value = IndexGCResponse(
+        project_id=PROJECT_ID, dry_run=expected_dry_run, nodes_scanned=10, orphaned_nodes=2, duplicate_nodes=1,
+        nodes_deleted=0 if expected_dry_run else 3, missing_files=["chapters/c1/s1.md"]
+    )
+    app.dependency_overrides[get_ai_service] = lambda: mock_ai_service
+    try:
+        response = client.post(f"/api/v1/ai/index_gc/{PROJECT_ID}{query}")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["orphaned_nodes"] == 2
+        assert response.json()["missing_files"] == ["chapters/c1/s1.md"]
+        mock_ai_service.collect_index_garbage.assert_awaited_once_with(PROJECT_ID, dry_run=expected_dry_run)
+    finally:
+        app.dependency_overrides.pop(get_ai_service, None)
+
+
+# --- Tests for Lean Source Nodes ---
+def test_query_project_lean_sources():
+    long_text = "The dragon sleeps under the mountain. " * 20
+    node = NodeWithScore(node=TextNode(id_='n1', text=long_text, metadata={
+        'file_path': '/projects/p/notes/n1.md', 'project_id': PROJECT_ID, 'document_type': 'Note', 'document_title': 'Dragons'
+    }), score=0.9)
+    mock_ai_service = AsyncMock(spec=AIService)
+    mock_ai_service.query_project.return_value = ("Under the mountain.", [node], [])
+    app.dependency_overrides[get_ai_service] = lambda: mock_ai_service
+    try:
+        response = client.post(f"/api/v1/ai/query/{PROJECT_ID}", json={"query": "Where is the dragon?", "source_mode": "lean"})
+
+        assert response.status_code == status.HTTP_200_OK
+        source = response.json()["source_nodes"][0]
+        assert source["id"] == "n1"
+        assert source["score"] == 0.9
+        assert source["title"] == "Dragons"
+        assert source["text"] is None
+        assert source["metadata"] == {"document_type": "Note", "document_title": "Dragons", "file_path": "/projects/p/notes/n1.md"}
+        assert source["snippet"].startswith("The dragon sleeps")
+        assert source["snippet"].endswith("…")
+        assert len(source["snippet"]) <= 201
+    finally:
+        app.dependency_overrides.pop(get_ai_service, None)
+
+def test_get_source_node():
+    mock_ai_service = AsyncMock(spec=AIService)
+    mock_ai_service.get_source_node.return_value = SourceNodeModel(id="n1", text="Full chunk text", metadata={"document_title": "Dragons"}, title="Dragons")
+    app.dependency_overrides[get_ai_service] = lambda: mock_ai_service
+    try:
+        response = client.get(f"/api/v1/ai/source_node/{PROJECT_ID}/n1")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["text"] == "Full chunk text"
+        mock_ai_service.get_source_node.assert_awaited_once_with(PROJECT_ID, "n1")
+
+        mock_ai_service.get_source_node.side_effect = HTTPException(status_code=404, detail="Source node n2 not found")
+        response = client.get(f"/api/v1/ai/source_node/{PROJECT_ID}/n2")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    finally:
+        app.dependency_overrides.pop(get_ai_service, None)
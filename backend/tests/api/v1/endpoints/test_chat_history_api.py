@@ -255,6 +255,28 @@ def test_update_chat_history_session_metadata_missing(mock_project_dep, mock_fil
     expected_history_list = [{"id": 0, "query": "q", "response": None, "error": None}]
     mock_file_svc.write_chat_session_history.assert_called_once_with(PROJECT_ID, SESSION_ID_1, expected_history_list)
 
+@patch('app.api.v1.endpoints.chat_history.file_service', autospec=True)
+@patch('app.api.v1.endpoints.content_blocks.project_service', autospec=True)
+def test_update_chat_history_stores_source_references(mock_project_dep, mock_file_svc):
+    """Source nodes of saved answers are stored as references (id, score, title, snippet), not chunk copies."""
+    mock_project_dep.get_by_id.side_effect = mock_project_exists
+    mock_file_svc.get_chat_sessions_metadata.return_value = {SESSION_ID_1: {"name": "Test Session"}}
+    source_node = {"id": "n1", "text": "Chunk text " * 100, "score": 0.5,
+                   "metadata": {"file_path": "/projects/p/plan.md", "document_type": "Plan", "document_title": "Project Plan"}}
+    history_data_in = {"history": [{"id": 0, "query": "q", "response": {"answer": "a", "source_nodes": [source_node]}}]}
+
+    response = client.put(f"/api/v1/projects/{PROJECT_ID}/chat_history/{SESSION_ID_1}", json=history_data_in)
+
+    assert response.status_code == status.HTTP_200_OK
+    written_history = mock_file_svc.write_chat_session_history.call_args.args[2]
+    stored_node = written_history[0]["response"]["source_nodes"][0]
+    assert stored_node["id"] == "n1"
+    assert stored_node["text"] is None
+    assert stored_node["title"] == "Project Plan"
+    assert stored_node["metadata"] == {"document_type": "Plan", "document_title": "Project Plan", "file_path": "/projects/p/plan.md"}
+    assert len(stored_node["snippet"]) < len(source_node["text"])
+    assert response.json()["history"][0]["response"]["source_nodes"][0] == stored_node
+
 @patch('app.api.v1.endpoints.content_blocks.project_service', autospec=True)
 def test_update_chat_history_validation_error(mock_project_dep):
     """Test updating history with invalid data format."""
@@ -0,0 +1,123 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import pytest
+from fastapi import HTTPException, status
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.ai import ProposedScene
+from app.models.project import ProjectRead
+from app.services.ai_service import get_ai_service
+from app.services.job_service import JobService
+
+PROJECT_ID = "test-project-jobs"
+CHAPTER_ID = "test-chapter-jobs"
+
+
+@pytest.fixture
+def jobs_client(tmp_path):
+    mock_ai_service = MagicMock()
+    mock_ai_service.split_chapter_into_scenes = AsyncMock(return_value=[ProposedScene(suggested_title="One", content="Text")])
+    mock_ai_service.rebuild_project_index = AsyncMock(return_value=(3, 3))
+    app.dependency_overrides[get_ai_service] = lambda: mock_ai_service
+    service = JobService(tmp_path, max_workers=2, retention_hours=1)
+    try:
+        with patch("app.api.v1.endpoints.jobs.job_service", service), \
+             patch("app.api.v1.endpoints.jobs.project_service") as mock_project_service, \
+             TestClient(app) as client: # One event loop for the whole test, so jobs keep running between requests
+            mock_project_service.get_by_id.side_effect = lambda project_id: ProjectRead(id=project_id, name="Mock")
+            yield client, mock_ai_service
+    finally:
+        app.dependency_overrides.pop(get_ai_service, None)
+
+
+def _wait_finished(client, job_id: str) -> dict:
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_split_chapter_job(jobs_client):
+    client, mock_ai_service = jobs_client
+    response = client.post(f"/api/v1/jobs/split_chapter/{PROJECT_ID}/{CHAPTER_ID}", json={"chapter_content": "Some chapter text."})
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job = _wait_finished(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"proposed_scenes": [{"suggested_title": "One", "content": "Text"}]}
+    mock_ai_service.split_chapter_into_scenes.assert_awaited_once()
+
+    listed = client.get("/api/v1/jobs/", params={"project_id": PROJECT_ID}).json()["jobs"]
+    assert [entry["id"] for entry in listed] == [job["id"]]
+
+
+def test_rebuild_job_events_stream(jobs_client):
+    client, _ = jobs_client
+    job_id = client.post(f"/api/v1/jobs/rebuild_index/{PROJECT_ID}").json()["id"]
+    _wait_finished(client, job_id)
+
+    response = client.get(f"/api/v1/jobs/{job_id}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1]["status"] == "succeeded"
+    assert events[-1]["result"]["documents_indexed"] == 3
+
+
+def test_split_chapter_job_rejects_empty_content_and_unknown_jobs(jobs_client):
+    client, _ = jobs_client
+    response = client.post(f"/api/v1/jobs/split_chapter/{PROJECT_ID}/{CHAPTER_ID}", json={"chapter_content": ""})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/api/v1/jobs/unknown").status_code == status.HTTP_404_NOT_FOUND
+    assert client.post("/api/v1/jobs/unknown/cancel").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_rebuild_job_reports_progress_per_file_and_stops_when_cancelled(jobs_client):
+    client, mock_ai_service = jobs_client
+    first_file_done, release = threading.Event(), threading.Event()
+
+    def rebuild(progress):
+        for done in range(3):
+            progress(done, 3)
+            if done == 1:
+                first_file_done.set()
+                release.wait(5)
+        progress(3, 3)
+
+    async def rebuild_project_index(project_id, progress=None):
+        await asyncio.to_thread(rebuild, progress)
+        return 3, 3
+
+    mock_ai_service.rebuild_project_index = AsyncMock(side_effect=rebuild_project_index)
+    job_id = client.post(f"/api/v1/jobs/rebuild_index/{PROJECT_ID}").json()["id"]
+    assert first_file_done.wait(5)
+    running = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert running["message"] == "Indexed 1 of 3 files" and 0.05 < running["progress"] < 1.0
+    assert client.post(f"/api/v1/jobs/rebuild_index/{PROJECT_ID}").status_code == status.HTTP_409_CONFLICT
+
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel").json()["status"] == "running" # Until the rebuild thread stops
+    release.set()
+    job = _wait_finished(client, job_id)
+    assert job["status"] == "cancelled"
+    assert job["message"] == "Cancelled"
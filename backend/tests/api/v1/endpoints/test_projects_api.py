@@ -266,4 +266,66 @@ def test_delete_project_not_found(mock_project_service: MagicMock):
 
     assert response.status_code == 404
     assert response.json() == {"detail": error_detail}
-    mock_project_service.delete.assert_called_once_with(project_id=project_id)
\ No newline at end of file
+    mock_project_service.delete.assert_called_once_with(project_id=project_id)
+# --- ADDED: Manuscript export ---
+@patch('app.api.v1.endpoints.projects.export_service', autospec=True)
+def test_export_project_markdown(mock_export_service: MagicMock):
+    """Test streaming a Markdown export."""
+    project_id = "export-uuid"
+    mock_export_service.stream_markdown.return_value = iter([b"# Novel\n\n", b"## Chapter\n\n", b"Text\n"])
+    mock_export_service.get_export_filename.return_value = "novel.md"
+
+    response = client.get(f"/api/v1/projects/{project_id}/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/markdown")
+    assert response.headers["content-disposition"] == 'attachment; filename="novel.md"'
+    assert response.text == "# Novel\n\n## Chapter\n\nText\n"
+    mock_export_service.stream_markdown.assert_called_once_with(project_id, include_titles=True, separator="\n\n---\n\n")
+    mock_export_service.stream_zip.assert_not_called()
+
+@patch('app.services.export_service.project_service', autospec=True)
+def test_export_project_non_ascii_name(mock_export_project_service: MagicMock):
+    """A Cyrillic project name gets an ASCII fallback filename and the UTF-8 name in filename*."""
+    project_id = "export-uuid"
+    mock_export_project_service.get_by_id.return_value = ProjectRead(id=project_id, name="Война и мир")
+    with patch('app.api.v1.endpoints.projects.export_service.stream_markdown', return_value=iter([b"# \xd0\x92\n"])):
+        response = client.get(f"/api/v1/projects/{project_id}/export")
+
+    assert response.status_code == 200
+    disposition = response.headers["content-disposition"]
+    assert disposition.isascii()
+    assert 'filename="manuscript.md"' in disposition
+    assert "filename*=UTF-8''%D0%B2%D0%BE%D0%B9%D0%BD%D0%B0" in disposition
+
+@patch('app.api.v1.endpoints.projects.export_service', autospec=True)
+def test_export_project_zip(mock_export_service: MagicMock):
+    """Test streaming a zip export with custom options."""
+    project_id = "export-uuid"
+    mock_export_service.stream_zip.return_value = iter([b"PK\x03\x04", b"rest"])
+    mock_export_service.get_export_filename.return_value = "novel.zip"
+
+    response = client.get(f"/api/v1/projects/{project_id}/export", params={"format": "zip", "include_titles": "false", "separator": "%0A%0A"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert response.content == b"PK\x03\x04rest"
+    mock_export_service.stream_zip.assert_called_once_with(project_id, include_titles=False, separator="\n\n")
+
+@patch('app.api.v1.endpoints.projects.export_service', autospec=True)
+def test_export_project_not_found(mock_export_service: MagicMock):
+    """Test export of a missing project returns 404 before streaming starts."""
+    project_id = "non-existent-uuid"
+    error_detail = f"Project {project_id} not found"
+    mock_export_service.stream_markdown.side_effect = HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_detail)
+
+    response = client.get(f"/api/v1/projects/{project_id}/export")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": error_detail}
+
+def test_export_project_invalid_format():
+    """Test that an unknown export format is rejected."""
+    response = client.get("/api/v1/projects/some-uuid/export", params={"format": "pdf"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+# --- END ADDED ---
@@ -24,7 +24,7 @@ from app.services.scene_service import scene_service
 # Import the service instance *used by the dependency* to mock it
 from app.services.chapter_service import chapter_service as chapter_service_for_dependency
 # Import models for type checking and response validation
-from app.models.scene import SceneRead, SceneList, SceneCreate, SceneUpdate
+from app.models.scene import SceneRead, SceneList, SceneCreate, SceneUpdate, SceneBatchCreate
 from app.models.chapter import ChapterRead # Needed for mocking chapter dependency
 from app.models.common import Message
 
@@ -123,6 +123,37 @@ def test_create_scene_chapter_not_found(mock_chapter_service_dep: MagicMock, moc
     mock_chapter_service_dep.get_by_id.assert_called_once_with(project_id=PROJECT_ID, chapter_id=NON_EXISTENT_CHAPTER_ID)
     mock_scene_service.create.assert_not_called()
 
+# --- ADDED: Batch creation ---
+@patch('app.api.v1.endpoints.scenes.scene_service', autospec=True)
+@patch('app.api.v1.endpoints.scenes.chapter_service', autospec=True)
+def test_create_scenes_batch_success(mock_chapter_service_dep: MagicMock, mock_scene_service: MagicMock):
+    mock_chapter_service_dep.get_by_id.side_effect = mock_chapter_exists
+    batch_data_in = {"scenes": [{"title": "Part One", "content": "A"}, {"title": "Part Two", "content": "B"}]}
+    mock_scene_service.create_batch.return_value = SceneList(scenes=[
+        SceneRead(id=SCENE_ID_1, project_id=PROJECT_ID, chapter_id=CHAPTER_ID, title="Part One", order=1, content="A"),
+        SceneRead(id=SCENE_ID_2, project_id=PROJECT_ID, chapter_id=CHAPTER_ID, title="Part Two", order=2, content="B"),
+    ])
+    response = client.post(f"/api/v1/projects/{PROJECT_ID}/chapters/{CHAPTER_ID}/scenes/batch", json=batch_data_in)
+    assert response.status_code == status.HTTP_201_CREATED
+    response_data = response.json()
+    assert [s["id"] for s in response_data["scenes"]] == [SCENE_ID_1, SCENE_ID_2]
+    mock_chapter_service_dep.get_by_id.assert_called_once_with(project_id=PROJECT_ID, chapter_id=CHAPTER_ID)
+    mock_scene_service.create_batch.assert_called_once()
+    call_kwargs = mock_scene_service.create_batch.call_args.kwargs
+    assert call_kwargs['project_id'] == PROJECT_ID
+    assert call_kwargs['chapter_id'] == CHAPTER_ID
+    assert isinstance(call_kwargs['batch_in'], SceneBatchCreate)
+    assert [s.title for s in call_kwargs['batch_in'].scenes] == ["Part One", "Part Two"]
+
+@patch('app.api.v1.endpoints.scenes.scene_service', autospec=True)
+@patch('app.api.v1.endpoints.scenes.chapter_service', autospec=True)
+def test_create_scenes_batch_empty_list(mock_chapter_service_dep: MagicMock, mock_scene_service: MagicMock):
+    mock_chapter_service_dep.get_by_id.side_effect = mock_chapter_exists
+    response = client.post(f"/api/v1/projects/{PROJECT_ID}/chapters/{CHAPTER_ID}/scenes/batch", json={"scenes": []})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_scene_service.create_batch.assert_not_called()
+# --- END ADDED ---
+
 # (Rest of the file remains unchanged - Omitted for brevity)
 @patch('app.api.v1.endpoints.scenes.scene_service', autospec=True)
 @patch('app.api.v1.endpoints.scenes.chapter_service', autospec=True)
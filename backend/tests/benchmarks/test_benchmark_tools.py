@@ -0,0 +1,51 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from benchmarks.compare import compare
+from benchmarks.stubs import StubLLM, StubEmbedding
+from benchmarks.synthetic import TextGenerator
+
+
+def test_text_generator_is_deterministic():
+    assert TextGenerator(7, ["en", "ru"]).paragraphs(5) == TextGenerator(7, ["en", "ru"]).paragraphs(5)
+    assert TextGenerator(7, ["en", "ru"]).paragraphs(5) != TextGenerator(8, ["en", "ru"]).paragraphs(5)
+
+
+def test_stub_llm_answers_chapter_split_in_parsed_format():
+    llm = StubLLM()
+    chapter = "\n\n".join(f"Paragraph {i}." for i in range(7))
+    prompt = f"Split between <<<CHAPTER_START>>> and <<<CHAPTER_END>>>.\n<<<CHAPTER_START>>>\n{chapter}\n<<<CHAPTER_END>>>\n\nOutput..."
+
+    answer = llm.complete(prompt).text
+
+    assert answer.count("<<<SCENE_START>>>\nTITLE: Scene") == 3 # 3 + 3 + 1 paragraphs
+    assert "Paragraph 6." in answer
+    assert llm.complete(prompt).text == answer
+    assert llm.prompt_chars == [len(prompt), len(prompt)]
+
+
+def test_stub_embedding_is_normalized_and_lexical():
+    embedding = StubEmbedding()
+    vector = embedding.get_text_embedding("Капитан искал серебряный компас")
+    assert abs(sum(v * v for v in vector) - 1.0) < 1e-9
+    assert embedding.get_query_embedding("Капитан искал серебряный компас") == vector
+
+
+def test_compare_flags_changes_beyond_threshold():
+    baseline = {"scenarios": {"a": {"median_ms": 100.0}, "b": {"median_ms": 100.0}, "c": {"median_ms": 100.0}, "gone": {"median_ms": 1.0}}}
+    candidate = {"scenarios": {"a": {"median_ms": 80.0}, "b": {"median_ms": 105.0}, "c": {"median_ms": 150.0}}}
+
+    statuses = {row["scenario"]: row["status"] for row in compare(baseline, candidate, threshold_pct=10)}
+
+    assert statuses == {"a": "faster", "b": "same", "c": "slower", "gone": "missing"}
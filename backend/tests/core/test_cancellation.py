@@ -0,0 +1,66 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
+
+from app.core.cancellation import cancel_on_disconnect, CLIENT_CLOSED_REQUEST
+from app.core.metrics import AI_REQUESTS_CANCELLED
+
+
+class FakeRequest:
+    method = "POST"
+
+    class url:
+        path = "/api/v1/ai/query/p1"
+
+    def __init__(self, disconnect_after: float):
+        self.disconnect_after = disconnect_after
+
+    async def receive(self):
+        await asyncio.sleep(self.disconnect_after)
+        return {"type": "http.disconnect"}
+
+
+async def test_result_is_returned_while_client_is_connected():
+    async def compute():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    assert await cancel_on_disconnect(FakeRequest(disconnect_after=10), compute(), "query") == "answer"
+
+
+async def test_disconnect_cancels_retry_loop_within_a_second():
+    operation = "test_disconnect"
+    attempts = 0
+
+    # Retry backoff of 30 s, as in the processors: the disconnect has to interrupt the sleep
+    @retry(wait=wait_fixed(30), stop=stop_after_attempt(3), retry=retry_if_exception_type(ConnectionError))
+    async def call_llm():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise ConnectionError("429")
+
+    started = time.perf_counter()
+    with pytest.raises(HTTPException) as exc_info:
+        await cancel_on_disconnect(FakeRequest(disconnect_after=0.2), call_llm(), operation)
+    assert exc_info.value.status_code == CLIENT_CLOSED_REQUEST
+    assert time.perf_counter() - started < 1
+    assert attempts == 1 # Cancelled during the backoff sleep, no second attempt
+    assert AI_REQUESTS_CANCELLED.value(operation=operation) == 1
@@ -0,0 +1,121 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from fastapi import FastAPI, Body
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+from app.core.http_cache import conditional_requests, etag_matches
+
+DOCUMENT_URL = "/api/v1/projects/p1/plan"
+
+
+def make_client(seen_requests=None, gzip_min_bytes=0):
+    app = FastAPI()
+    app.middleware("http")(conditional_requests)
+    if gzip_min_bytes:
+        app.add_middleware(GZipMiddleware, minimum_size=gzip_min_bytes)
+    document = {"content": "first", "last_modified": 1700000000.0}
+
+    @app.middleware("http")
+    async def record_requests(request, call_next): # Stands in for the logging/metrics middleware
+        if seen_requests is not None:
+            seen_requests.append(request.method)
+        return await call_next(request)
+
+    @app.get(DOCUMENT_URL)
+    async def get_document():
+        return document
+
+    @app.put(DOCUMENT_URL)
+    async def put_document(content: str = Body(..., embed=True)):
+        document.update(content=content, last_modified=document["last_modified"] + 60)
+        return document
+
+    return TestClient(app)
+
+
+def test_etag_matching():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"c"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+    # If-Match uses strong comparison: weak tags never match
+    assert not etag_matches('W/"b"', '"b"', weak=False)
+    assert etag_matches('W/"a", "b"', '"b"', weak=False)
+    # Content-coding suffixes are ignored
+    assert etag_matches('"b-gzip"', '"b"', weak=False)
+    assert etag_matches('"b"', '"b-gzip"')
+
+
+def test_get_revalidation_returns_304_until_the_content_changes():
+    client = make_client()
+    first = client.get(DOCUMENT_URL)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+    assert first.headers["last-modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+    not_modified = client.get(DOCUMENT_URL, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert client.get(DOCUMENT_URL, headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+
+    client.put(DOCUMENT_URL, json={"content": "second"})
+    changed = client.get(DOCUMENT_URL, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["content"] == "second"
+    assert changed.headers["etag"] != etag
+
+
+def test_if_match_rejects_updates_of_a_stale_version():
+    client = make_client()
+    etag = client.get(DOCUMENT_URL).headers["etag"]
+
+    applied = client.put(DOCUMENT_URL, json={"content": "from tab 1"}, headers={"If-Match": etag})
+    assert applied.status_code == 200
+    assert applied.headers["etag"] == client.get(DOCUMENT_URL).headers["etag"] != etag
+
+    stale = client.put(DOCUMENT_URL, json={"content": "from tab 2"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == applied.headers["etag"]
+    assert client.get(DOCUMENT_URL).json()["content"] == "from tab 1"
+
+    assert client.put(DOCUMENT_URL, json={"content": "forced"}).status_code == 200 # No precondition, no check
+
+
+def test_if_match_check_is_not_seen_as_a_request():
+    seen_requests = []
+    client = make_client(seen_requests)
+    etag = client.get(DOCUMENT_URL).headers["etag"]
+    seen_requests.clear()
+
+    assert client.put(DOCUMENT_URL, json={"content": "new"}, headers={"If-Match": etag}).status_code == 200
+    assert client.put(DOCUMENT_URL, json={"content": "newer"}, headers={"If-Match": f"W/{etag}"}).status_code == 412
+    assert client.put("/api/v1/projects/p1/missing", json={"content": "x"}, headers={"If-Match": etag}).status_code == 412
+    assert seen_requests == ["PUT", "PUT", "PUT"]
+
+
+def test_gzip_responses_get_their_own_etag(monkeypatch):
+    monkeypatch.setattr("app.core.http_cache.settings.HTTP_GZIP_MIN_BYTES", 10)
+    client = make_client(gzip_min_bytes=10)
+
+    gzipped = client.get(DOCUMENT_URL, headers={"Accept-Encoding": "gzip"})
+    identity = client.get(DOCUMENT_URL, headers={"Accept-Encoding": "identity"})
+    assert gzipped.headers["content-encoding"] == "gzip" and "content-encoding" not in identity.headers
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+
+    not_modified = client.get(DOCUMENT_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == gzipped.headers["etag"]
+    applied = client.put(DOCUMENT_URL, json={"content": "new"}, headers={"If-Match": gzipped.headers["etag"]})
+    assert applied.status_code == 200
@@ -0,0 +1,57 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.core.logging_config import CallSiteSampler, JsonFormatter, loggable_text, parse_levels
+
+
+def _record(level: int = logging.INFO, lineno: int = 10, msg: str = "message %s", args=("arg",), **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", level, "/app/test.py", lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_loggable_text_redacts_unless_bodies_enabled():
+    prompt = "Secret plot twist " * 100
+    with patch.object(settings, "LOG_PROMPT_BODIES", False):
+        rendered = str(loggable_text(prompt))
+        assert rendered.startswith("<redacted sha256:") and rendered.endswith(f"chars={len(prompt)}>")
+        assert "Secret" not in rendered
+        assert rendered == str(loggable_text(prompt)) # Same text, same hash
+    with patch.object(settings, "LOG_PROMPT_BODIES", True):
+        assert "prompt: %s" % loggable_text(prompt) == f"prompt: {prompt}"
+
+
+def test_call_site_sampler_keeps_every_nth_record_and_all_warnings():
+    sampler = CallSiteSampler(every=3)
+    kept = [sampler.filter(_record()) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampler.filter(_record(lineno=20)) # Separate count per call site
+    assert all(sampler.filter(_record(level=logging.WARNING)) for _ in range(3))
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(_record(project_id="p1"))
+    entry = json.loads(line)
+    assert entry["message"] == "message arg"
+    assert entry["level"] == "INFO" and entry["logger"] == "app.test"
+    assert entry["project_id"] == "p1"
+
+
+def test_parse_levels_ignores_invalid_entries():
+    assert parse_levels("app.rag=DEBUG, chromadb=warning,broken,app.x=LOUD") == {"app.rag": logging.DEBUG, "chromadb": logging.WARNING}
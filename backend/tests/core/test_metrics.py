@@ -0,0 +1,74 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted, InternalServerError
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Counter, Histogram, MetricsRegistry, track_llm_call, LLM_CALLS, LLM_RATE_LIMITED, CONTENT_TYPE
+from app.main import app
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("test_requests_total", "Requests.", ["route"]))
+    latency = registry.register(Histogram("test_latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0)))
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    latency.observe(0.05, route="/x")
+    latency.observe(0.5, route="/x")
+    latency.observe(5.0, route="/x")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_requests_total Requests.",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{route="/a\\"b"} 3',
+        "# HELP test_latency_seconds Latency.",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{route="/x",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/x",le="1"} 2',
+        'test_latency_seconds_bucket{route="/x",le="+Inf"} 3',
+        'test_latency_seconds_sum{route="/x"} 5.55',
+        'test_latency_seconds_count{route="/x"} 3',
+    ]
+    with pytest.raises(ValueError):
+        requests.inc(path="/a")
+
+
+def test_track_llm_call_classifies_outcomes():
+    operation = "test_operation"
+    with track_llm_call(operation, 4000):
+        pass
+    with pytest.raises(ResourceExhausted):
+        with track_llm_call(operation, 4000):
+            raise ResourceExhausted("quota")
+    with pytest.raises(InternalServerError):
+        with track_llm_call(operation, 4000):
+            raise InternalServerError("boom")
+
+    assert LLM_CALLS.value(operation=operation, outcome="ok") == 1
+    assert LLM_CALLS.value(operation=operation, outcome="rate_limited") == 1
+    assert LLM_CALLS.value(operation=operation, outcome="error") == 1
+    assert LLM_RATE_LIMITED.value(operation=operation) == 1
+
+
+def test_metrics_endpoint_reports_route_templates():
+    client = TestClient(app)
+    client.get("/test")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert 'codex_http_request_duration_seconds_count{method="GET",route="/test"}' in response.text
+    assert "codex_llm_calls_total" in response.text
@@ -0,0 +1,64 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pstats
+import time
+
+from app.core.profiling import RequestProfiler, MODE_CPROFILE
+
+
+def _busy_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_sampling_profile_is_written_in_folded_format(tmp_path):
+    profiler = RequestProfiler(tmp_path, keep_slowest=5, interval_ms=1)
+    with profiler.profile("POST", "/api/v1/ai/query/p1") as result:
+        _busy_work(0.05)
+
+    assert result["file"].endswith("ms.folded")
+    lines = (tmp_path / result["file"]).read_text(encoding="utf-8").splitlines()
+    assert lines
+    assert any("_busy_work (test_profiling.py:" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_only_the_slowest_profiles_are_kept(tmp_path):
+    profiler = RequestProfiler(tmp_path, keep_slowest=2, mode=MODE_CPROFILE)
+    files = []
+    for seconds in (0.03, 0.06, 0.001, 0.09):
+        with profiler.profile("GET", "/slow") as result:
+            _busy_work(seconds)
+        files.append(result["file"])
+
+    assert files[2] is None # Faster than both kept profiles
+    kept = [entry["file"] for entry in profiler.slowest()]
+    assert kept == [files[3], files[1]]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(kept)
+    pstats.Stats(str(tmp_path / files[3])) # Loadable by pstats/snakeviz
+
+    # A new profiler (e.g. after a restart) picks up the kept profiles from the directory
+    assert [entry["file"] for entry in RequestProfiler(tmp_path, keep_slowest=2).slowest()] == kept
+
+
+def test_overlapping_requests_are_not_profiled(tmp_path):
+    profiler = RequestProfiler(tmp_path, keep_slowest=5, interval_ms=1)
+    with profiler.profile("GET", "/first") as first:
+        with profiler.profile("GET", "/second") as second:
+            pass
+    assert second["skipped"] and second["file"] is None
+    assert first["file"] is not None
@@ -0,0 +1,79 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["result"]
+
+    results = await asyncio.gather(*(flight.do(("query", "p1", "text", 0), compute) for _ in range(5)))
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+    await flight.do(("query", "p1", "text", 0), compute) # Nothing is cached once the call has finished
+    await flight.do(("query", "p1", "text", 1), compute)
+    assert calls == 3
+
+
+async def test_errors_are_shared():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do(("k",), compute) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_computation_is_cancelled_only_with_its_last_caller():
+    flight = SingleFlight()
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def compute():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    first = asyncio.create_task(flight.do(("k",), compute))
+    second = asyncio.create_task(flight.do(("k",), compute))
+    await started.wait()
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    await asyncio.sleep(0)
+    assert not cancelled.is_set() # The second caller still waits for the result
+
+    second.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    await asyncio.wait_for(cancelled.wait(), 1)
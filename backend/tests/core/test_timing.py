@@ -0,0 +1,68 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.timing import RequestTimings, begin_request, end_request, current_timings, stage, record_stage, timed
+
+
+def test_server_timing_sums_repeated_stages():
+    timings = RequestTimings()
+    timings.add("ai.load_context", 1.25)
+    timings.add("llm.attempt", 100.0)
+    timings.add("llm.attempt", 50.0)
+
+    assert timings.server_timing(total_ms=200.0) == 'ai.load_context;dur=1.2, llm.attempt;dur=150.0;desc="2x", total;dur=200.0'
+
+
+def test_stages_are_recorded_only_inside_a_request():
+    with stage("outside"):
+        pass
+    assert current_timings() is None
+
+    timings, token = begin_request()
+    try:
+        with pytest.raises(ValueError):
+            with stage("failing"):
+                raise ValueError("boom")
+        record_stage("inline", time.perf_counter() - 0.01)
+    finally:
+        end_request(token)
+
+    assert [name for name, _ in timings.stages] == ["failing", "inline"]
+    assert timings.stages[1][1] >= 10.0
+    assert current_timings() is None
+
+
+async def test_timed_decorator_covers_async_functions_and_threads():
+    @timed("async_stage")
+    async def async_work():
+        await asyncio.sleep(0)
+        return "async"
+
+    @timed("sync_stage")
+    def sync_work():
+        return "sync"
+
+    timings, token = begin_request()
+    try:
+        assert await async_work() == "async"
+        assert await asyncio.to_thread(sync_work) == "sync" # Context (and the timings) is copied into the thread
+    finally:
+        end_request(token)
+
+    assert [name for name, _ in timings.stages] == ["async_stage", "sync_stage"]
@@ -0,0 +1,63 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from llama_index.core import Document
+
+from app.rag.chunking import chunk_text, build_chunk_nodes, CHUNK_HASH_KEY
+
+
+def _paragraphs(count: int, prefix: str = "Paragraph"):
+    return [f"{prefix} {i}. " + ("Lorem ipsum dolor sit amet. " * 8).strip() for i in range(count)]
+
+
+def test_chunk_text_respects_size_limits():
+    text = "\n\n".join(_paragraphs(40))
+    chunks = chunk_text(text, min_chars=400, max_chars=1500)
+    assert len(chunks) > 1
+    assert all(len(chunk.replace("\n\n", "")) <= 1500 for chunk in chunks) # Paragraph separators aren't counted
+    assert "".join(chunks).replace("\n\n", "") == text.replace("\n\n", "")
+
+
+def test_chunk_text_splits_long_paragraph_on_sentences():
+    paragraph = "A short sentence. " * 200
+    chunks = chunk_text(paragraph, min_chars=100, max_chars=300)
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_chunk_text_edit_is_local():
+    paragraphs = _paragraphs(60)
+    original = chunk_text("\n\n".join(paragraphs), min_chars=400, max_chars=1500)
+    paragraphs[30] = "This paragraph was edited. " + "Changed words here. " * 5
+    edited = chunk_text("\n\n".join(paragraphs), min_chars=400, max_chars=1500)
+
+    changed = set(edited) - set(original)
+    assert 1 <= len(changed) <= 2
+    assert len(set(edited) & set(original)) >= len(original) - 3
+
+
+def test_build_chunk_nodes_ids_are_stable_and_unique():
+    text = "\n\n".join(["* * *", "Same paragraph. " * 40, "* * *", "Same paragraph. " * 40])
+    document = Document(text=text, metadata={"file_path": "/p/a.md", "project_id": "p"})
+
+    first = build_chunk_nodes(document, "/p/a.md", min_chars=10, max_chars=2000)
+    second = build_chunk_nodes(document, "/p/a.md", min_chars=10, max_chars=2000)
+    other_file = build_chunk_nodes(document, "/p/b.md", min_chars=10, max_chars=2000)
+
+    assert [n.node_id for n in first] == [n.node_id for n in second]
+    assert len({n.node_id for n in first}) == len(first) # Repeated chunks get distinct ids
+    assert not {n.node_id for n in first} & {n.node_id for n in other_file}
+    assert all(n.ref_doc_id == "/p/a.md" for n in first)
+    assert all(n.metadata["project_id"] == "p" and CHUNK_HASH_KEY in n.metadata for n in first)
+    assert CHUNK_HASH_KEY not in first[0].get_content(metadata_mode="embed")
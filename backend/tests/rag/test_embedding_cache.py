@@ -0,0 +1,95 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from typing import List
+
+from llama_index.core.embeddings import BaseEmbedding
+
+from app.rag.embedding_cache import EmbeddingCache, CachedEmbedding
+
+
+class _CountingEmbedding(BaseEmbedding):
+    """Deterministic fake model that records which texts it was asked to embed."""
+    calls: List[str] = []
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self.calls.append(text)
+        return [float(len(text)), 1.0, 0.5]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return [0.0, 0.0, float(len(query))]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache" / "embeddings.sqlite3", max_bytes=1024 * 1024)
+    yield cache
+    cache.close()
+
+
+def test_cached_embedding_only_embeds_new_texts(cache):
+    inner = _CountingEmbedding(model_name="fake-model", calls=[])
+    model = CachedEmbedding(inner=inner, cache=cache)
+
+    first = model.get_text_embedding_batch(["alpha", "beta", "alpha"])
+    assert first == [[5.0, 1.0, 0.5], [4.0, 1.0, 0.5], [5.0, 1.0, 0.5]]
+    assert inner.calls == ["alpha", "beta"] # Duplicate embedded once
+
+    second = model.get_text_embedding_batch(["beta", "gamma"])
+    assert second == [[4.0, 1.0, 0.5], [5.0, 1.0, 0.5]]
+    assert inner.calls == ["alpha", "beta", "gamma"]
+
+
+def test_cache_survives_restart_and_is_keyed_by_model(tmp_path):
+    db_path = tmp_path / "embeddings.sqlite3"
+    first_cache = EmbeddingCache(db_path, max_bytes=1024 * 1024)
+    CachedEmbedding(inner=_CountingEmbedding(model_name="model-a", calls=[]), cache=first_cache).get_text_embedding("scene text")
+    first_cache.close()
+
+    reopened = EmbeddingCache(db_path, max_bytes=1024 * 1024)
+    same_model = _CountingEmbedding(model_name="model-a", calls=[])
+    other_model = _CountingEmbedding(model_name="model-b", calls=[])
+    CachedEmbedding(inner=same_model, cache=reopened).get_text_embedding("scene text")
+    CachedEmbedding(inner=other_model, cache=reopened).get_text_embedding("scene text")
+    reopened.close()
+
+    assert same_model.calls == []
+    assert other_model.calls == ["scene text"]
+
+
+def test_query_embeddings_are_not_cached(cache):
+    inner = _CountingEmbedding(model_name="fake-model", calls=[])
+    model = CachedEmbedding(inner=inner, cache=cache)
+    assert model.get_query_embedding("who?") == [0.0, 0.0, 4.0]
+    assert cache.get_many("fake-model", [EmbeddingCache.text_hash("who?")]) == {}
+
+
+def test_size_based_eviction_drops_least_recently_used(tmp_path):
+    # Each 3-dim float32 vector is 12 bytes; the limit fits three of them
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite3", max_bytes=36)
+    cache.put_many("m", [("h1", [1.0, 1.0, 1.0])])
+    cache.put_many("m", [("h2", [2.0, 2.0, 2.0])])
+    cache.put_many("m", [("h3", [3.0, 3.0, 3.0])])
+    cache.get_many("m", ["h1"]) # Touch h1 so h2 becomes the oldest
+    cache.put_many("m", [("h4", [4.0, 4.0, 4.0])])
+
+    remaining = cache.get_many("m", ["h1", "h2", "h3", "h4"])
+    cache.close()
+    assert "h2" not in remaining
+    assert set(remaining) <= {"h1", "h3", "h4"}
+    assert "h4" in remaining and "h1" in remaining
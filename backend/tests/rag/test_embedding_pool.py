@@ -0,0 +1,201 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import queue
+import threading
+import time
+from typing import List
+
+import pytest
+from llama_index.core.embeddings import BaseEmbedding
+
+from app.rag.embedding_pool import EmbeddingPoolServer, EmbeddingPoolClient, RemoteEmbedding, _worker_main, pool_authkey, KIND_TEXT, KIND_QUERY
+
+
+BATCHES: List[List[str]] = []
+
+
+class _FakeModel(BaseEmbedding):
+    """Vector = [len(text), 1.0]; records the batches it receives; fails on the text 'boom', exits the worker on 'die'."""
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        BATCHES.append(list(texts))
+        if "die" in texts:
+            raise SystemExit(1)
+        if "boom" in texts:
+            raise ValueError("cannot embed boom")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return [float(len(query)), -1.0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+
+def _fake_model():
+    return _FakeModel(model_name="fake-model", embed_batch_size=100)
+
+
+class _ThreadedPoolServer(EmbeddingPoolServer):
+    """Same dispatcher and routing, with threads instead of worker processes."""
+
+    def _create_queues(self):
+        return queue.Queue(), queue.Queue()
+
+    def _start_worker(self, worker_index: int):
+        thread = threading.Thread(target=_worker_main, args=(worker_index, self._task_queue, self._result_queue, self.model_factory), daemon=True)
+        thread.start()
+        return thread
+
+
+@pytest.fixture
+def server():
+    BATCHES.clear()
+    pool = _ThreadedPoolServer(num_workers=2, batch_size=4, max_wait_ms=200, model_factory=_fake_model)
+    pool.start()
+    yield pool
+    pool.stop()
+
+
+def test_concurrent_requests_are_micro_batched(server):
+    futures = [server.submit(KIND_TEXT, ["x" * length]) for length in range(1, 5)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert results == [[[1.0, 1.0]], [[2.0, 1.0]], [[3.0, 1.0]], [[4.0, 1.0]]]
+    assert BATCHES == [["x", "xx", "xxx", "xxxx"]] # Four requests, one model call
+
+
+def test_large_request_is_split_into_batches(server):
+    texts = ["y" * length for length in range(1, 11)]
+    result = server.submit(KIND_TEXT, texts).result(timeout=5)
+
+    assert result == [[float(length), 1.0] for length in range(1, 11)]
+    assert sorted(len(batch) for batch in BATCHES) == [2, 4, 4]
+
+
+def test_errors_fail_only_the_affected_requests(server):
+    bad = server.submit(KIND_TEXT, ["boom"])
+    with pytest.raises(RuntimeError, match="cannot embed boom"):
+        bad.result(timeout=5)
+    assert server.submit(KIND_TEXT, ["fine"]).result(timeout=5) == [[4.0, 1.0]]
+
+
+def test_remote_embedding_over_socket(server):
+    threading.Thread(target=server.serve_forever, args=(("127.0.0.1", 0), b"secret"), daemon=True).start()
+    for _ in range(100):
+        if server.address:
+            break
+        time.sleep(0.01)
+
+    model = RemoteEmbedding(EmbeddingPoolClient(server.address, b"secret", timeout=5))
+
+    assert model.model_name == "fake-model"
+    assert model.get_text_embedding_batch(["xy", "xyz"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert model.get_query_embedding("who") == [3.0, -1.0]
+    with pytest.raises(RuntimeError, match="Embedding pool error"):
+        model.get_text_embedding("boom")
+
+
+def test_dead_worker_fails_its_batch_and_is_restarted():
+    BATCHES.clear()
+    pool = _ThreadedPoolServer(num_workers=1, batch_size=4, max_wait_ms=0, model_factory=_fake_model, worker_check_interval_s=0.05)
+    pool.start()
+    try:
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="Embedding worker 0 died"):
+            pool.submit(KIND_TEXT, ["die"]).result(timeout=5)
+        assert time.monotonic() - started < 5 # Failed by the monitor, not by a client timeout
+        assert pool.submit(KIND_TEXT, ["fine"]).result(timeout=5) == [[4.0, 1.0]]
+    finally:
+        pool.stop()
+
+
+def test_worker_that_cannot_reload_the_model_is_given_up_on():
+    loads = []
+
+    def load_once():
+        loads.append(1)
+        if len(loads) > 1:
+            raise OSError("model files missing")
+        return _fake_model()
+
+    pool = _ThreadedPoolServer(num_workers=1, batch_size=4, max_wait_ms=0, model_factory=load_once,
+                               worker_check_interval_s=0.01, max_load_failures=3)
+    pool.start()
+    try:
+        with pytest.raises(RuntimeError, match="Embedding worker 0 died"):
+            pool.submit(KIND_TEXT, ["die"]).result(timeout=5)
+        pending = pool.submit(KIND_TEXT, ["queued"]) # Sits on the task queue while no worker is alive
+        with pytest.raises(RuntimeError, match="no worker left"):
+            pending.result(timeout=5)
+        with pytest.raises(RuntimeError, match="no worker left"):
+            pool.submit(KIND_TEXT, ["later"]).result(timeout=1)
+        time.sleep(0.1)
+        assert len(loads) == 4 # The initial load and three restarts, then no more
+    finally:
+        pool.stop()
+
+
+def test_unknown_kind_is_rejected(server):
+    with pytest.raises(ValueError, match="Unknown embedding kind"):
+        server.submit("image", ["x"])
+
+
+def test_pool_authkey_is_required(monkeypatch):
+    monkeypatch.setattr("app.rag.embedding_pool.settings.EMBEDDING_POOL_AUTHKEY", "")
+    with pytest.raises(ValueError, match="EMBEDDING_POOL_AUTHKEY"):
+        pool_authkey()
+    monkeypatch.setattr("app.rag.embedding_pool.settings.EMBEDDING_POOL_AUTHKEY", "codex-ai-embeddings")
+    with pytest.raises(ValueError):
+        pool_authkey()
+    monkeypatch.setattr("app.rag.embedding_pool.settings.EMBEDDING_POOL_AUTHKEY", "a" * 32)
+    assert pool_authkey() == b"a" * 32
+
+
+class _SlowClient:
+    """Stands in for EmbeddingPoolClient; embed() blocks like a request waiting on a busy pool."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def model_name(self) -> str:
+        return "fake-model"
+
+    def embed(self, kind: str, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.delay)
+        return [[float(len(text)), -1.0 if kind == KIND_QUERY else 1.0] for text in texts]
+
+
+async def test_pending_query_embedding_does_not_block_the_event_loop():
+    model = RemoteEmbedding(_SlowClient(delay=0.5))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    try:
+        assert await model.aget_query_embedding("who") == [3.0, -1.0]
+    finally:
+        ticking.cancel()
+
+    assert ticks >= 10 # The loop kept running while the embedding was pending
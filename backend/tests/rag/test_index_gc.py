@@ -0,0 +1,112 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from app.rag.chunking import chunk_node_id
+from app.rag.index_gc import collect_garbage, indexed_project_ids, run_scheduled_gc
+
+PROJECT_ID = "proj-gc"
+LIVE_FILE = "/projects/proj-gc/plan.md"
+GONE_FILE = "/projects/proj-gc/chapters/c1/s1.md"
+
+
+def _node(node_id, file_path, text, chunk_hash=None):
+    metadata = {"project_id": PROJECT_ID, "file_path": file_path}
+    if chunk_hash:
+        metadata["chunk_hash"] = chunk_hash
+    return node_id, metadata, text
+
+
+def _paged_collection(nodes, page_size):
+    """Mock collection whose get() pages through nodes like Chroma's limit/offset."""
+    collection = MagicMock()
+
+    def _get(limit, offset, include, where=None):
+        page = nodes[offset:offset + limit]
+        return {"ids": [n[0] for n in page], "metadatas": [n[1] for n in page], "documents": [n[2] for n in page]}
+
+    collection.get.side_effect = _get
+    return collection
+
+
+def _nodes():
+    canonical_a = chunk_node_id(LIVE_FILE, "hash-a", 0)
+    repeated_a = chunk_node_id(LIVE_FILE, "hash-a", 1) # Same paragraph twice in the file: both are legitimate
+    return [
+        _node(canonical_a, LIVE_FILE, "Paragraph A", "hash-a"),
+        _node(repeated_a, LIVE_FILE, "Paragraph A", "hash-a"),
+        _node("legacy-uuid", LIVE_FILE, "Paragraph A"), # Left over from an older indexing run
+        _node(chunk_node_id(LIVE_FILE, "hash-b", 0), LIVE_FILE, "Paragraph B", "hash-b"),
+        _node("gone-1", GONE_FILE, "Deleted scene, part 1"),
+        _node("gone-2", GONE_FILE, "Deleted scene, part 2"),
+    ]
+
+
+def test_dry_run_reports_without_deleting():
+    collection = _paged_collection(_nodes(), page_size=2)
+
+    report = collect_garbage(collection, PROJECT_ID, dry_run=True, page_size=2, file_exists=lambda path: path == LIVE_FILE)
+
+    assert report.nodes_scanned == 6
+    assert report.orphaned_nodes == 2
+    assert report.duplicate_nodes == 1
+    assert report.missing_files == [GONE_FILE]
+    assert report.nodes_deleted == 0
+    assert collection.get.call_count == 4 # Three pages plus the empty one
+    collection.delete.assert_not_called()
+
+
+def test_gc_bulk_deletes_orphans_and_duplicates():
+    collection = _paged_collection(_nodes(), page_size=500)
+    checked_paths = []
+
+    def _exists(path):
+        checked_paths.append(path)
+        return path == LIVE_FILE
+
+    report = collect_garbage(collection, PROJECT_ID, dry_run=False, file_exists=_exists)
+
+    assert report.nodes_deleted == 3
+    collection.delete.assert_called_once_with(ids=["gone-1", "gone-2", "legacy-uuid"])
+    assert sorted(checked_paths) == [GONE_FILE, LIVE_FILE] # One existence check per file
+
+
+def test_indexed_project_ids_include_projects_gone_from_disk():
+    # The project directory of "deleted-project" was removed outside the API; its nodes are still indexed
+    nodes = _nodes() + [("left-1", {"project_id": "deleted-project", "file_path": "/projects/deleted-project/plan.md"}, "Plan")]
+    collection = _paged_collection(nodes, page_size=2)
+
+    assert indexed_project_ids([collection], page_size=2) == {PROJECT_ID, "deleted-project"}
+    shard = _paged_collection(nodes[-1:], page_size=1)
+    assert indexed_project_ids([shard], one_project_per_collection=True) == {"deleted-project"}
+    assert shard.get.call_count == 1
+
+
+async def test_scheduled_gc_visits_projects_deleted_from_disk():
+    manager = MagicMock()
+    manager.indexed_project_ids.return_value = ["deleted-project"]
+    collected = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    manager.collect_garbage.side_effect = lambda project_id, dry_run: loop.call_soon_threadsafe(collected.set)
+
+    with patch("app.rag.index_manager.index_manager", manager):
+        task = asyncio.create_task(run_scheduled_gc(interval_hours=1e-6, dry_run=False))
+        try:
+            await asyncio.wait_for(collected.wait(), timeout=5)
+        finally:
+            task.cancel()
+
+    manager.collect_garbage.assert_any_call("deleted-project", False)
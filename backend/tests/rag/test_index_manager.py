@@ -29,6 +29,8 @@ import app.rag.index_manager
 from app.rag.index_manager import IndexManager, CHROMA_PERSIST_DIR, CHROMA_COLLECTION_NAME
 from app.core.config import BASE_PROJECT_DIR, settings
 from app.services.file_service import FileService, file_service as actual_file_service
+from app.rag.chunking import build_chunk_nodes
+from llama_index.core import Document
 
 
 # --- Mocks Setup ---
@@ -478,12 +480,14 @@ def test_index_file_success_normal_file(
     patched_index_manager_instance
 ):
     manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
     project_id = "proj_index1"
     file_path = BASE_PROJECT_DIR / project_id / "plan.md"
     doc_id = str(file_path)
     mock_is_file.return_value = True
     mock_stat.return_value.st_size = 100
-    mock_document = MagicMock(name="MockDocumentPlan")
+    mock_document = Document(text="Plan content.")
     mock_simple_directory_reader_instance.load_data.return_value = [mock_document]
 
     # Mocks for file_metadata_func internal calls (assuming plan doesn't need them)
@@ -493,12 +497,14 @@ def test_index_file_success_normal_file(
     manager.index_file(file_path)
 
     mock_is_file.assert_called_once()
-    mock_stat.assert_called_once()
-    manager.index.delete_ref_doc.assert_called_once_with(ref_doc_id=doc_id, delete_from_docstore=True)
+    mock_stat.assert_called() # The size check; Path.resolve() in _extract_project_id stats the path too
+    mock_chroma_collection.get.assert_called_once_with(where={"file_path": doc_id}, include=[])
+    manager.index.delete_ref_doc.assert_not_called() # Nothing stored yet, so nothing to delete
     mocks["sdr_cls"].assert_called_once_with(input_files=[file_path], file_metadata=ANY)
     assert callable(mocks["sdr_cls"].call_args.kwargs['file_metadata'])
     mock_simple_directory_reader_instance.load_data.assert_called_once()
-    manager.index.insert_nodes.assert_called_once_with([mock_document])
+    manager.index.insert_nodes.assert_called_once()
+    assert [node.text for node in manager.index.insert_nodes.call_args.args[0]] == [mock_document.text]
 
 @patch('pathlib.Path.is_file')
 @patch('pathlib.Path.stat')
@@ -508,6 +514,8 @@ def test_index_file_success_character_file(
     patched_index_manager_instance
 ):
     manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
     project_id = "proj_char_index"
     character_id = "char_abc"
     character_name = "Gandalf"
@@ -515,7 +523,7 @@ def test_index_file_success_character_file(
     doc_id = str(file_path)
     mock_is_file.return_value = True
     mock_stat.return_value.st_size = 50
-    mock_document = MagicMock(name="MockDocumentChar")
+    mock_document = Document(text="Character content.")
     mock_simple_directory_reader_instance.load_data.return_value = [mock_document]
 
     mock_internal_file_service.read_project_metadata.return_value = {
@@ -524,12 +532,14 @@ def test_index_file_success_character_file(
     manager.index_file(file_path)
 
     mock_is_file.assert_called_once()
-    mock_stat.assert_called_once()
-    manager.index.delete_ref_doc.assert_called_once_with(ref_doc_id=doc_id, delete_from_docstore=True)
+    mock_stat.assert_called() # The size check; Path.resolve() in _extract_project_id stats the path too
+    mock_chroma_collection.get.assert_called_once_with(where={"file_path": doc_id}, include=[])
+    manager.index.delete_ref_doc.assert_not_called() # Nothing stored yet, so nothing to delete
     mocks["sdr_cls"].assert_called_once_with(input_files=[file_path], file_metadata=ANY)
     assert callable(mocks["sdr_cls"].call_args.kwargs['file_metadata'])
     mock_simple_directory_reader_instance.load_data.assert_called_once()
-    manager.index.insert_nodes.assert_called_once_with([mock_document])
+    manager.index.insert_nodes.assert_called_once()
+    assert [node.text for node in manager.index.insert_nodes.call_args.args[0]] == [mock_document.text]
 
 @patch('pathlib.Path.is_file')
 @patch('pathlib.Path.stat')
@@ -540,6 +550,8 @@ def test_index_file_success_scene_file(
 ):
     """Test indexing a scene file, verifying chapter metadata is included."""
     manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
     project_id = "proj_scene_index"
     chapter_id = "ch_abc"
     scene_id = "sc_xyz"
@@ -549,7 +561,7 @@ def test_index_file_success_scene_file(
     doc_id = str(file_path)
     mock_is_file.return_value = True
     mock_stat.return_value.st_size = 150
-    mock_document = MagicMock(name="MockDocumentScene")
+    mock_document = Document(text="Scene content.")
     mock_simple_directory_reader_instance.load_data.return_value = [mock_document]
 
     # --- Explicitly reset side effects and set return values ---
@@ -566,8 +578,9 @@ def test_index_file_success_scene_file(
     manager.index_file(file_path)
 
     mock_is_file.assert_called_once()
-    mock_stat.assert_called_once()
-    manager.index.delete_ref_doc.assert_called_once_with(ref_doc_id=doc_id, delete_from_docstore=True)
+    mock_stat.assert_called() # The size check; Path.resolve() in _extract_project_id stats the path too
+    mock_chroma_collection.get.assert_called_once_with(where={"file_path": doc_id}, include=[])
+    manager.index.delete_ref_doc.assert_not_called() # Nothing stored yet, so nothing to delete
     mocks["sdr_cls"].assert_called_once_with(input_files=[file_path], file_metadata=ANY)
     assert callable(mocks["sdr_cls"].call_args.kwargs['file_metadata'])
 
@@ -582,7 +595,8 @@ def test_index_file_success_scene_file(
     assert generated_meta['chapter_title'] == chapter_title # Check chapter title
 
     mock_simple_directory_reader_instance.load_data.assert_called_once()
-    manager.index.insert_nodes.assert_called_once_with([mock_document])
+    manager.index.insert_nodes.assert_called_once()
+    assert [node.text for node in manager.index.insert_nodes.call_args.args[0]] == [mock_document.text]
 
 # --- ADDED: Test indexing chapter plan/synopsis ---
 @patch('pathlib.Path.is_file')
@@ -594,6 +608,8 @@ def test_index_file_success_chapter_plan(
 ):
     """Test indexing a chapter plan file."""
     manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
     project_id = "proj_chap_plan_index"
     chapter_id = "ch_plan_idx"
     chapter_title = "The Planning Chapter"
@@ -601,7 +617,7 @@ def test_index_file_success_chapter_plan(
     doc_id = str(file_path)
     mock_is_file.return_value = True
     mock_stat.return_value.st_size = 80
-    mock_document = MagicMock(name="MockDocumentChapPlan")
+    mock_document = Document(text="Chapter plan content.")
     mock_simple_directory_reader_instance.load_data.return_value = [mock_document]
 
     # --- ADDED: Explicitly reset side effect ---
@@ -615,8 +631,9 @@ def test_index_file_success_chapter_plan(
     manager.index_file(file_path)
 
     mock_is_file.assert_called_once()
-    mock_stat.assert_called_once()
-    manager.index.delete_ref_doc.assert_called_once_with(ref_doc_id=doc_id, delete_from_docstore=True)
+    mock_stat.assert_called() # The size check; Path.resolve() in _extract_project_id stats the path too
+    mock_chroma_collection.get.assert_called_once_with(where={"file_path": doc_id}, include=[])
+    manager.index.delete_ref_doc.assert_not_called() # Nothing stored yet, so nothing to delete
     mocks["sdr_cls"].assert_called_once_with(input_files=[file_path], file_metadata=ANY)
     assert callable(mocks["sdr_cls"].call_args.kwargs['file_metadata'])
 
@@ -630,7 +647,8 @@ def test_index_file_success_chapter_plan(
     assert generated_meta['chapter_title'] == chapter_title
 
     mock_simple_directory_reader_instance.load_data.assert_called_once()
-    manager.index.insert_nodes.assert_called_once_with([mock_document])
+    manager.index.insert_nodes.assert_called_once()
+    assert [node.text for node in manager.index.insert_nodes.call_args.args[0]] == [mock_document.text]
 # --- END ADDED ---
 
 
@@ -670,10 +688,110 @@ def test_index_file_outside_project(mock_stat: MagicMock, mock_is_file: MagicMoc
     mock_stat.return_value.st_size = 10
     manager.index_file(file_path)
     mock_is_file.assert_called_once()
-    mock_stat.assert_called_once()
+    mock_stat.assert_called() # The size check; Path.resolve() in _extract_project_id stats the path too
     manager.index.delete_ref_doc.assert_not_called()
     manager.index.insert_nodes.assert_not_called()
 
+# --- ADDED: index_files (batch) Tests ---
+@patch('pathlib.Path.is_file')
+@patch('pathlib.Path.stat')
+def test_index_files_single_insert(mock_stat: MagicMock, mock_is_file: MagicMock, patched_index_manager_instance):
+    """Test that batch indexing loads each file but inserts all documents with one call."""
+    manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
+    project_id = "proj_batch"
+    chapter_id = "ch_batch"
+    path1 = BASE_PROJECT_DIR / project_id / "chapters" / chapter_id / "sc_1.md"
+    path2 = BASE_PROJECT_DIR / project_id / "chapters" / chapter_id / "sc_2.md"
+    mock_is_file.return_value = True
+    mock_stat.return_value.st_size = 100
+    doc1 = Document(text="Scene one.")
+    doc2 = Document(text="Scene two.")
+    mock_simple_directory_reader_instance.load_data.side_effect = [[doc1], [doc2]]
+    mock_internal_file_service.read_project_metadata.return_value = {"chapters": {chapter_id: {"title": "Batch"}}}
+    mock_internal_file_service.read_chapter_metadata.return_value = {"scenes": {}}
+    preloaded = {
+        path1: {"document_type": "Scene", "document_title": "One", "chapter_id": chapter_id, "chapter_title": "Batch"},
+        path2: {"document_type": "Scene", "document_title": "Two", "chapter_id": chapter_id, "chapter_title": "Batch"},
+    }
+
+    inserted = manager.index_files([path1, path2], preloaded_metadata=preloaded)
+
+    assert inserted == 2
+    assert mocks["sdr_cls"].call_count == 2
+    assert mock_chroma_collection.get.call_count == 2
+    manager.index.insert_nodes.assert_called_once()
+    inserted_nodes = manager.index.insert_nodes.call_args.args[0]
+    assert [node.text for node in inserted_nodes] == ["Scene one.", "Scene two."]
+    assert [node.metadata['document_title'] for node in inserted_nodes] == ["One", "Two"]
+    mock_simple_directory_reader_instance.load_data.side_effect = None
+
+@patch('pathlib.Path.is_file')
+@patch('pathlib.Path.stat')
+def test_index_files_all_skipped(mock_stat: MagicMock, mock_is_file: MagicMock, patched_index_manager_instance):
+    """Test that a batch where every file is skipped does not call insert_nodes."""
+    manager, mocks = patched_index_manager_instance
+    file_path = BASE_PROJECT_DIR / "proj_batch_empty" / "empty.md"
+    mock_is_file.return_value = True
+    mock_stat.return_value.st_size = 0
+    inserted = manager.index_files([file_path])
+    assert inserted == 0
+    mocks["sdr_cls"].assert_not_called()
+    manager.index.insert_nodes.assert_not_called()
+# --- END ADDED ---
+
+@patch('pathlib.Path.is_file')
+@patch('pathlib.Path.stat')
+def test_index_file_only_touches_changed_chunks(mock_stat: MagicMock, mock_is_file: MagicMock, patched_index_manager_instance):
+    """Test that re-indexing an edited file deletes only vanished chunks and inserts only new ones."""
+    manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
+    file_path = BASE_PROJECT_DIR / "proj_diff" / "plan.md"
+    mock_is_file.return_value = True
+    mock_stat.return_value.st_size = 100
+    paragraphs = [f"Paragraph {i}: " + "word " * 150 for i in range(6)]
+    old_document = Document(text="\n\n".join(paragraphs))
+    paragraphs[3] = "Paragraph 3 was rewritten during an autosave. " + "new " * 100
+    new_document = Document(text="\n\n".join(paragraphs))
+    old_nodes = build_chunk_nodes(old_document, str(file_path), settings.RAG_CHUNK_MIN_CHARS, settings.RAG_CHUNK_MAX_CHARS)
+    new_nodes = build_chunk_nodes(new_document, str(file_path), settings.RAG_CHUNK_MIN_CHARS, settings.RAG_CHUNK_MAX_CHARS)
+    old_ids = {node.node_id for node in old_nodes}
+    new_ids = {node.node_id for node in new_nodes}
+    assert old_ids & new_ids # Some chunks survive the edit
+    mock_chroma_collection.get.return_value = {"ids": [node.node_id for node in old_nodes]}
+    mock_simple_directory_reader_instance.load_data.return_value = [new_document]
+    mock_internal_file_service.read_project_metadata.return_value = {}
+
+    manager.index_file(file_path)
+
+    mock_chroma_collection.delete.assert_called_once_with(ids=[node_id for node_id in (n.node_id for n in old_nodes) if node_id not in new_ids])
+    inserted_ids = {node.node_id for node in manager.index.insert_nodes.call_args.args[0]}
+    assert inserted_ids == new_ids - old_ids
+    manager.index.delete_ref_doc.assert_not_called()
+
+@patch('pathlib.Path.is_file')
+@patch('pathlib.Path.stat')
+def test_index_file_unchanged_content_is_noop(mock_stat: MagicMock, mock_is_file: MagicMock, patched_index_manager_instance):
+    """Test that saving identical content neither deletes nor inserts anything."""
+    manager, mocks = patched_index_manager_instance
+    manager.chroma_collection = mock_chroma_collection
+    mock_chroma_collection.get.return_value = {"ids": []} # No chunks stored yet
+    file_path = BASE_PROJECT_DIR / "proj_diff" / "plan.md"
+    mock_is_file.return_value = True
+    mock_stat.return_value.st_size = 100
+    document = Document(text="Same text as before.")
+    stored_nodes = build_chunk_nodes(document, str(file_path), settings.RAG_CHUNK_MIN_CHARS, settings.RAG_CHUNK_MAX_CHARS)
+    mock_chroma_collection.get.return_value = {"ids": [node.node_id for node in stored_nodes]}
+    mock_simple_directory_reader_instance.load_data.return_value = [document]
+    mock_internal_file_service.read_project_metadata.return_value = {}
+
+    manager.index_file(file_path)
+
+    mock_chroma_collection.delete.assert_not_called()
+    manager.index.insert_nodes.assert_not_called()
+
 # --- delete_doc Tests ---
 # (Unchanged - omitted)
 def test_delete_doc_success(patched_index_manager_instance):
@@ -722,4 +840,58 @@ def test_delete_project_docs_no_collection(patched_index_manager_instance):
     project_id = "proj_no_coll"
     manager.chroma_collection = None
     manager.delete_project_docs(project_id)
-    mock_chroma_collection.delete.assert_not_called()
\ No newline at end of file
+    mock_chroma_collection.delete.assert_not_called()
+
+# --- delete_directory_docs Tests ---
+def test_delete_directory_docs_project_root(patched_index_manager_instance):
+    manager, _ = patched_index_manager_instance
+    collection = MagicMock()
+    manager.chroma_collection = collection
+    manager.delete_directory_docs(BASE_PROJECT_DIR / "proj_dir")
+    collection.delete.assert_called_once_with(where={"project_id": "proj_dir"})
+
+def test_delete_directory_docs_chapter_is_one_delete(patched_index_manager_instance):
+    manager, _ = patched_index_manager_instance
+    collection = MagicMock()
+    manager.chroma_collection = collection
+    manager.delete_directory_docs(BASE_PROJECT_DIR / "proj_dir" / "chapters" / "ch_1")
+    collection.delete.assert_called_once_with(where={"$and": [{"project_id": "proj_dir"}, {"chapter_id": "ch_1"}]})
+    collection.get.assert_not_called()
+    manager.index.delete_ref_doc.assert_not_called()
+
+def test_delete_directory_docs_by_path_prefix(patched_index_manager_instance):
+    manager, _ = patched_index_manager_instance
+    collection = MagicMock()
+    manager.chroma_collection = collection
+    notes_dir = BASE_PROJECT_DIR / "proj_dir" / "notes"
+    collection.get.return_value = {
+        "ids": ["n1", "n2", "n3"],
+        "metadatas": [
+            {"file_path": str(notes_dir / "a.md")},
+            {"file_path": str(BASE_PROJECT_DIR / "proj_dir" / "notes_old" / "b.md")}, # Same prefix, different directory
+            {"file_path": str(notes_dir / "sub" / "c.md")},
+        ],
+    }
+    manager.delete_directory_docs(notes_dir)
+    collection.get.assert_called_once_with(where={"project_id": "proj_dir"}, include=["metadatas"])
+    collection.delete.assert_called_once_with(ids=["n1", "n3"])
+
+
+# --- Tests for get_node ---
+def test_get_node_returns_stored_chunk_of_project(patched_index_manager_instance):
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores.utils import node_to_metadata_dict
+    manager, _ = patched_index_manager_instance
+    collection = manager.chroma_collection
+    stored = TextNode(id_="n1", text="Chunk text", metadata={"project_id": "proj-1", "document_title": "Project Plan"})
+    collection.get.return_value = {"ids": ["n1"], "documents": ["Chunk text"], "metadatas": [node_to_metadata_dict(stored, remove_text=True)]}
+
+    node = manager.get_node("proj-1", "n1")
+
+    collection.get.assert_called_once_with(ids=["n1"], include=["documents", "metadatas"])
+    assert node.node_id == "n1" and node.text == "Chunk text"
+    assert node.metadata == {"project_id": "proj-1", "document_title": "Project Plan"}
+    # Chunks of other projects and unknown ids are not found
+    assert manager.get_node("proj-2", "n1") is None
+    collection.get.return_value = {"ids": [], "documents": [], "metadatas": []}
+    assert manager.get_node("proj-1", "missing") is None
@@ -0,0 +1,140 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from llama_index.core.schema import TextNode, NodeWithScore
+
+from app.rag.keyword_index import KeywordIndex, tokenize
+from app.rag.retrieval import reciprocal_rank_fusion, retrieve_nodes
+
+
+PROJECT_ID = "proj-kw"
+
+
+def _node(node_id: str, text: str, file_path: str = None, project_id: str = PROJECT_ID) -> TextNode:
+    return TextNode(id_=node_id, text=text, metadata={"project_id": project_id, "file_path": file_path or f"/p/{node_id}.md"})
+
+
+@pytest.fixture
+def mock_chroma_manager():
+    """index_manager stand-in whose Chroma collection holds three chunks of one project."""
+    collection = MagicMock()
+    collection.get.return_value = {
+        "ids": ["n1", "n2", "n3"],
+        "documents": [
+            "Элрон встретил путников у реки.",
+            "The council gathered in Rivendell to discuss the ring.",
+            "A quiet morning; nothing happened at all.",
+        ],
+        "metadatas": [
+            {"project_id": PROJECT_ID, "file_path": "/p/a.md"},
+            {"project_id": PROJECT_ID, "file_path": "/p/b.md"},
+            {"project_id": PROJECT_ID, "file_path": "/p/c.md"},
+        ],
+    }
+    manager = MagicMock()
+    manager.chroma_collection = collection
+    manager.get_collection.return_value = collection
+    with patch("app.rag.index_manager.index_manager", manager):
+        yield manager
+
+
+def test_tokenize_unicode():
+    assert tokenize("Элрон, Ёжик и Rivendell_Gate!") == ["элрон", "ежик", "rivendell", "gate"]
+    assert tokenize("a 7 b") == ["7"]
+    assert tokenize("") == []
+
+
+def test_search_loads_project_from_chroma(mock_chroma_manager):
+    index = KeywordIndex()
+    results = index.search(PROJECT_ID, "ЭЛРОН", top_k=5)
+
+    mock_chroma_manager.chroma_collection.get.assert_called_once_with(where={"project_id": PROJECT_ID}, include=["documents", "metadatas"])
+    assert [r.node.node_id for r in results] == ["n1"]
+    assert results[0].node.metadata["file_path"] == "/p/a.md"
+
+    # Loaded once, then served from memory
+    index.search(PROJECT_ID, "Rivendell", top_k=5)
+    mock_chroma_manager.chroma_collection.get.assert_called_once()
+
+
+def test_bm25_ranks_rarer_and_more_frequent_terms_higher(mock_chroma_manager):
+    index = KeywordIndex()
+    index.search(PROJECT_ID, "warmup", top_k=1) # Load project
+    index.add_nodes([
+        _node("n4", "Rivendell. Rivendell again, always Rivendell."),
+        _node("n5", "The ring was heavy."),
+    ])
+    results = index.search(PROJECT_ID, "Rivendell ring", top_k=2)
+    assert [r.node.node_id for r in results] == ["n4", "n2"]
+    assert results[0].score > results[1].score > 0
+
+
+def test_add_nodes_ignores_unloaded_projects(mock_chroma_manager):
+    index = KeywordIndex()
+    index.add_nodes([_node("x1", "Gandalf", project_id="other-project")])
+    assert "other-project" not in index._projects
+
+
+def test_remove_file_and_project(mock_chroma_manager):
+    index = KeywordIndex()
+    assert index.search(PROJECT_ID, "council", top_k=5)
+    index.remove_file("/p/b.md")
+    assert index.search(PROJECT_ID, "council", top_k=5) == []
+
+    # Dropped projects are reloaded from Chroma on the next search
+    index.remove_project(PROJECT_ID)
+    assert [r.node.node_id for r in index.search(PROJECT_ID, "council", top_k=5)] == ["n2"]
+    assert mock_chroma_manager.chroma_collection.get.call_count == 2
+
+
+def test_reciprocal_rank_fusion_merges_and_dedups():
+    a, b, c = _node("a", "A"), _node("b", "B"), _node("c", "C")
+    dense = [NodeWithScore(node=a, score=0.9), NodeWithScore(node=b, score=0.8)]
+    keyword = [NodeWithScore(node=c, score=12.0), NodeWithScore(node=b, score=3.0)]
+
+    fused = reciprocal_rank_fusion([dense, keyword], top_k=2, k=60)
+
+    assert [n.node.node_id for n in fused] == ["b", "a"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 62)
+    assert fused[1].score == pytest.approx(1 / 61)
+
+
+@pytest.mark.asyncio
+async def test_retrieve_nodes_dense_only_by_default(monkeypatch):
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_HYBRID_RETRIEVAL", False)
+    dense = [NodeWithScore(node=_node("a", "A"), score=0.9)]
+    retriever = MagicMock()
+    retriever.aretrieve = AsyncMock(return_value=dense)
+    with patch("app.rag.retrieval.keyword_index") as mock_keyword_index:
+        result = await retrieve_nodes(retriever, "query", PROJECT_ID, top_k=3)
+    assert result is dense
+    mock_keyword_index.search.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_retrieve_nodes_hybrid(monkeypatch):
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_HYBRID_RETRIEVAL", True)
+    dense = [NodeWithScore(node=_node("a", "A"), score=0.9)]
+    keyword = [NodeWithScore(node=_node("k", "Элрон"), score=4.2)]
+    retriever = MagicMock()
+    retriever.aretrieve = AsyncMock(return_value=dense)
+    with patch("app.rag.retrieval.keyword_index") as mock_keyword_index:
+        mock_keyword_index.search.return_value = keyword
+        result = await retrieve_nodes(retriever, "Элрон", PROJECT_ID, top_k=3)
+    retriever.aretrieve.assert_awaited_once_with("Элрон")
+    mock_keyword_index.search.assert_called_once_with(PROJECT_ID, "Элрон", 3)
+    assert {n.node.node_id for n in result} == {"a", "k"}
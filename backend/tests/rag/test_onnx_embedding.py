@@ -0,0 +1,67 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.rag.index_manager import IndexManager
+from app.rag.onnx_embedding import embedding_agreement
+
+
+def _model(vectors):
+    model = MagicMock()
+    model.get_text_embedding_batch.return_value = vectors
+    return model
+
+
+def test_embedding_agreement_returns_lowest_cosine():
+    candidate = _model([[1.0, 0.0], [0.0, 2.0]])
+    reference = _model([[2.0, 0.0], [1.0, 1.0]])
+    assert embedding_agreement(candidate, reference, texts=["a", "b"]) == pytest.approx(2 ** -0.5, rel=1e-6)
+
+
+@pytest.fixture
+def bare_manager(monkeypatch):
+    """IndexManager without running __init__ (only the ONNX factory method is exercised)."""
+    monkeypatch.setattr("app.rag.onnx_embedding.settings.EMBEDDING_ONNX_SELF_CHECK", True)
+    monkeypatch.setattr("app.rag.onnx_embedding.settings.EMBEDDING_ONNX_MIN_COSINE", 0.98)
+    return IndexManager.__new__(IndexManager)
+
+
+def test_create_onnx_embedding_falls_back_when_export_fails(bare_manager):
+    with patch("app.rag.onnx_embedding.OnnxEmbedding", side_effect=ImportError("No module named 'onnx'")):
+        assert bare_manager._create_onnx_embedding() is None
+
+
+@pytest.mark.parametrize("min_cosine, accepted", [(0.999, True), (0.9, False)])
+def test_create_onnx_embedding_self_check(bare_manager, min_cosine, accepted):
+    onnx_model = MagicMock()
+    onnx_model.load_self_check.return_value = None
+    with patch("app.rag.onnx_embedding.OnnxEmbedding", return_value=onnx_model), \
+         patch("app.rag.index_manager.HuggingFaceEmbedding") as mock_hf_cls, \
+         patch("app.rag.onnx_embedding.embedding_agreement", return_value=min_cosine):
+        result = bare_manager._create_onnx_embedding()
+
+    mock_hf_cls.assert_called_once()
+    onnx_model.save_self_check.assert_called_once_with(min_cosine)
+    assert (result is onnx_model) == accepted
+
+
+def test_create_onnx_embedding_uses_recorded_self_check(bare_manager):
+    onnx_model = MagicMock()
+    onnx_model.load_self_check.return_value = 0.995
+    with patch("app.rag.onnx_embedding.OnnxEmbedding", return_value=onnx_model), \
+         patch("app.rag.index_manager.HuggingFaceEmbedding") as mock_hf_cls:
+        assert bare_manager._create_onnx_embedding() is onnx_model
+    mock_hf_cls.assert_not_called()
@@ -0,0 +1,90 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from llama_index.core.schema import TextNode, NodeWithScore
+
+from app.rag.reranker import CrossEncoderReranker
+from app.rag.retrieval import retrieve_nodes, candidate_top_k
+
+
+def _nodes(*texts):
+    return [NodeWithScore(node=TextNode(id_=f"n{i}", text=text), score=1.0 - i * 0.1) for i, text in enumerate(texts)]
+
+
+def _reranker_with_model(predict):
+    reranker = CrossEncoderReranker("test-model")
+    reranker._model = MagicMock()
+    reranker._model.predict.side_effect = predict
+    return reranker
+
+
+def test_rerank_orders_by_cross_encoder_score():
+    # Score = length of passage, so the longest text wins
+    reranker = _reranker_with_model(lambda pairs, batch_size: [len(p[1]) for p in pairs])
+    nodes = _nodes("short", "the longest passage", "medium text")
+
+    result = reranker.rerank("query", nodes, top_n=2, budget_ms=10_000, batch_size=2)
+
+    assert [n.node.node_id for n in result] == ["n1", "n2"]
+    assert result[0].score == len("the longest passage")
+    assert reranker._model.predict.call_count == 2 # Two batches of size 2
+
+
+def test_rerank_stops_at_budget_and_keeps_retrieval_order_for_rest():
+    reranker = _reranker_with_model(lambda pairs, batch_size: [0.1 * (i + 1) for i in range(len(pairs))])
+    nodes = _nodes("a", "b", "c", "d")
+
+    # First batch "takes" 50 ms, budget is 10 ms
+    with patch("app.rag.reranker.time.perf_counter", side_effect=[0.0, 0.05, 0.05]):
+        result = reranker.rerank("query", nodes, top_n=4, budget_ms=10, batch_size=2)
+
+    assert reranker._model.predict.call_count == 1
+    assert [n.node.node_id for n in result] == ["n1", "n0", "n2", "n3"]
+    assert result[1].score > result[2].score > result[3].score
+
+
+def test_rerank_falls_back_when_model_unavailable():
+    reranker = CrossEncoderReranker("missing-model")
+    nodes = _nodes("a", "b", "c")
+    with patch.object(reranker, "_get_model", side_effect=OSError("not downloaded")):
+        result = reranker.rerank("query", nodes, top_n=2)
+    assert result == nodes[:2]
+
+
+def test_candidate_top_k(monkeypatch):
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_RERANK_ENABLED", False)
+    assert candidate_top_k(7) == 7
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_RERANK_ENABLED", True)
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_RERANK_CANDIDATES", 20)
+    assert candidate_top_k(7) == 20
+
+
+@pytest.mark.asyncio
+async def test_retrieve_nodes_reranks_when_enabled(monkeypatch):
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_HYBRID_RETRIEVAL", False)
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_RERANK_ENABLED", True)
+    monkeypatch.setattr("app.rag.retrieval.settings.RAG_RERANK_TOP_N", 1)
+    candidates = _nodes("a", "b")
+    retriever = MagicMock()
+    retriever.aretrieve = AsyncMock(return_value=candidates)
+
+    with patch("app.rag.retrieval.reranker") as mock_reranker:
+        mock_reranker.rerank.return_value = candidates[1:]
+        result = await retrieve_nodes(retriever, "query", "proj", top_k=7)
+
+    mock_reranker.rerank.assert_called_once_with("query", candidates, 1)
+    assert result == candidates[1:]
@@ -0,0 +1,110 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import chromadb
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.rag.index_manager import IndexManager, CHROMA_COLLECTION_NAME
+from app.rag.sharding import collection_name_for, migrate_collection
+
+
+BASE = "codex_ai_documents"
+
+
+def test_collection_name_for_modes():
+    assert collection_name_for(BASE, "proj-1", "none", 16) == BASE
+    project_name = collection_name_for(BASE, "proj-1", "project", 16)
+    assert project_name.startswith(f"{BASE}_p_") and project_name == collection_name_for(BASE, "proj-1", "project", 16)
+    assert project_name != collection_name_for(BASE, "proj-2", "project", 16)
+    bucket_names = {collection_name_for(BASE, f"proj-{i}", "bucket", 4) for i in range(50)}
+    assert bucket_names == {f"{BASE}_b{i:02d}" for i in range(4)}
+    assert collection_name_for(BASE, "", "project", 16) == BASE # Chunks without a project stay in the shared collection
+    with pytest.raises(ValueError):
+        collection_name_for(BASE, "proj-1", "bogus", 16)
+
+
+def test_migrate_collection_copies_embeddings_per_project(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    source = client.get_or_create_collection(name=BASE)
+    source.add(
+        ids=["a1", "a2", "b1"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [0.5, 0.5]],
+        documents=["alpha one", "alpha two", "beta one"],
+        metadatas=[{"project_id": "A"}, {"project_id": "A"}, {"project_id": "B"}],
+    )
+
+    copied = migrate_collection(client, BASE, "project", 16, page_size=2, delete_source=True)
+
+    shard_a = collection_name_for(BASE, "A", "project", 16)
+    shard_b = collection_name_for(BASE, "B", "project", 16)
+    assert copied == {shard_a: 2, shard_b: 1}
+    migrated = client.get_collection(name=shard_a).get(ids=["a2"], include=["embeddings", "documents", "metadatas"])
+    assert migrated["documents"] == ["alpha two"]
+    assert list(migrated["embeddings"][0]) == [0.0, 1.0]
+    assert migrated["metadatas"] == [{"project_id": "A"}]
+    assert source.count() == 0
+
+
+@pytest.fixture
+def sharded_manager(monkeypatch):
+    """IndexManager without running __init__, in per-project sharding mode."""
+    monkeypatch.setattr("app.rag.index_manager.settings.CHROMA_SHARDING", "project")
+    manager = IndexManager.__new__(IndexManager)
+    manager.index = MagicMock(name="SharedIndex")
+    manager.chroma_collection = MagicMock(name="SharedCollection")
+    manager.chroma_client = MagicMock(name="ChromaClient")
+    manager._shard_collections = {}
+    manager._shard_indexes = {}
+    manager._shard_lock = threading.Lock()
+    return manager
+
+
+def test_get_index_routes_to_project_collection(sharded_manager):
+    with patch("app.rag.index_manager.VectorStoreIndex.from_vector_store") as mock_from_vs, \
+         patch("app.rag.index_manager.ChromaVectorStore") as mock_vs_cls:
+        index = sharded_manager.get_index("proj-1")
+        assert sharded_manager.get_index("proj-1") is index # Cached
+
+    expected_name = collection_name_for(CHROMA_COLLECTION_NAME, "proj-1", "project", 16)
+    sharded_manager.chroma_client.get_or_create_collection.assert_called_once_with(name=expected_name)
+    mock_vs_cls.assert_called_once_with(chroma_collection=sharded_manager.chroma_client.get_or_create_collection.return_value)
+    mock_from_vs.assert_called_once_with(mock_vs_cls.return_value)
+    assert index is mock_from_vs.return_value and index is not sharded_manager.index
+
+
+def test_delete_project_docs_drops_project_collection(sharded_manager):
+    sharded_manager._shard_collections[sharded_manager.collection_name_for("proj-1")] = MagicMock()
+    with patch("app.rag.index_manager.keyword_index") as mock_keyword_index:
+        sharded_manager.delete_project_docs("proj-1")
+
+    mock_keyword_index.remove_project.assert_called_once_with("proj-1")
+    sharded_manager.chroma_client.delete_collection.assert_called_once_with(name=sharded_manager.collection_name_for("proj-1"))
+    sharded_manager.chroma_collection.delete.assert_not_called()
+    assert sharded_manager._shard_collections == {}
+
+
+def test_indexed_project_ids_reads_project_shards(tmp_path, sharded_manager):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    source = client.get_or_create_collection(name=CHROMA_COLLECTION_NAME)
+    source.add(ids=["a1", "a2", "b1"], embeddings=[[1.0, 0.0], [0.0, 1.0], [0.5, 0.5]], documents=["a", "a", "b"],
+               metadatas=[{"project_id": "A"}, {"project_id": "A"}, {"project_id": "B"}])
+    migrate_collection(client, CHROMA_COLLECTION_NAME, "project", 16, delete_source=True)
+    source.add(ids=["c1"], embeddings=[[1.0, 1.0]], documents=["c"], metadatas=[{"project_id": "C"}]) # Not migrated yet
+    sharded_manager.chroma_client = client
+    sharded_manager.chroma_collection = source
+
+    assert sharded_manager.indexed_project_ids() == ["A", "B", "C"]
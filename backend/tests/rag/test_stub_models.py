@@ -0,0 +1,57 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import time
+
+import pytest
+from google.api_core.exceptions import InternalServerError, ResourceExhausted
+
+from app.rag.stub_models import StubLLM
+
+
+def test_rephrase_answer_is_a_numbered_list_of_the_requested_size():
+    prompt = "- Provide exactly 4 distinct suggestions.\n- Output the suggestions as a simple numbered list (e.g., '1. One\\n2. Two')."
+    answer = StubLLM().complete(prompt).text
+    assert len(re.findall(r"^\s*\d+\.\s*(.*)", answer, re.MULTILINE)) == 4
+
+
+def test_injected_failures_use_the_gemini_error_types():
+    with pytest.raises(ResourceExhausted):
+        StubLLM(rate_limit_rate=1.0).complete("prompt")
+    with pytest.raises(InternalServerError):
+        StubLLM(error_rate=1.0).complete("prompt")
+
+
+def test_latency_draws_are_reproducible_with_a_seed():
+    def delays(seed):
+        llm = StubLLM(latency_ms=100, latency_distribution="lognormal", jitter_ms=50, seed=seed)
+        return [llm._draw()[0] for _ in range(5)]
+
+    assert delays(1) == delays(1) != delays(2)
+    assert StubLLM(latency_ms=100)._draw() == (0.1, False)
+    with pytest.raises(ValueError):
+        StubLLM(latency_distribution="bimodal")
+
+
+async def test_streaming_yields_the_full_answer_at_the_token_rate():
+    llm = StubLLM(tokens_per_second=2000)
+    full = llm.complete("stream me").text
+
+    started = time.perf_counter()
+    chunks = [chunk async for chunk in await llm.astream_complete("stream me")]
+
+    assert len(chunks) > 1
+    assert "".join(chunk.delta for chunk in chunks) == chunks[-1].text == full
+    assert time.perf_counter() - started >= len(full) / 4 / 2000 * 0.9
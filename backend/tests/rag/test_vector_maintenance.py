@@ -0,0 +1,63 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import chromadb
+import pytest
+
+from app.rag.vector_maintenance import hnsw_collection_kwargs, compact
+
+
+@pytest.fixture
+def hnsw_settings(monkeypatch):
+    def _set(space="", m=0, construction_ef=0, search_ef=0):
+        monkeypatch.setattr("app.rag.vector_maintenance.settings.CHROMA_HNSW_SPACE", space)
+        monkeypatch.setattr("app.rag.vector_maintenance.settings.CHROMA_HNSW_M", m)
+        monkeypatch.setattr("app.rag.vector_maintenance.settings.CHROMA_HNSW_CONSTRUCTION_EF", construction_ef)
+        monkeypatch.setattr("app.rag.vector_maintenance.settings.CHROMA_HNSW_SEARCH_EF", search_ef)
+    return _set
+
+
+def test_hnsw_collection_kwargs(hnsw_settings):
+    hnsw_settings()
+    assert hnsw_collection_kwargs() == {} # Chroma defaults
+    hnsw_settings(space="cosine", m=32, search_ef=80)
+    assert hnsw_collection_kwargs() == {"metadata": {"hnsw:space": "cosine", "hnsw:M": 32, "hnsw:search_ef": 80}}
+
+
+def test_compact_rebuilds_with_live_records_and_new_settings(tmp_path, hnsw_settings):
+    hnsw_settings(space="cosine")
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.get_or_create_collection(name="codex_ai_documents")
+    collection.add(
+        ids=[f"n{i}" for i in range(300)],
+        embeddings=[[float(i), 1.0, 0.5] for i in range(300)],
+        documents=[f"chunk {i}" for i in range(300)],
+        metadatas=[{"project_id": "p1", "file_path": f"/p1/{i}.md"} for i in range(300)],
+    )
+    collection.delete(ids=[f"n{i}" for i in range(200)]) # Churn
+    del collection, client
+
+    report = compact(tmp_path, page_size=64)
+
+    assert report["collections"] == {"codex_ai_documents": 100}
+    assert report["bytes_before"] > 0 and report["bytes_after"] > 0
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    rebuilt = client.get_collection(name="codex_ai_documents")
+    assert rebuilt.count() == 100
+    assert rebuilt.metadata.get("hnsw:space") == "cosine"
+    record = rebuilt.get(ids=["n250"], include=["embeddings", "documents", "metadatas"])
+    assert record["documents"] == ["chunk 250"]
+    assert list(record["embeddings"][0]) == pytest.approx([250.0, 1.0, 0.5])
+    assert record["metadatas"] == [{"project_id": "p1", "file_path": "/p1/250.md"}]
+    assert [getattr(c, "name", c) for c in client.list_collections()] == ["codex_ai_documents"]
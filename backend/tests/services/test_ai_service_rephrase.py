@@ -152,4 +152,34 @@ async def test_rephrase_text_engine_returns_error_string(mock_file_service: Magi
             explicit_plan=mock_plan,
             explicit_synopsis=mock_synopsis,
             paths_to_filter=mock_loaded_context['filter_paths']
-        )
\ No newline at end of file
+        )
+
+@pytest.mark.asyncio
+@patch('app.services.ai_service.rag_engine', autospec=True)
+@patch('app.services.ai_service.file_service', autospec=True)
+async def test_rephrase_text_coalesces_identical_concurrent_requests(mock_file_service: MagicMock, mock_rag_engine: MagicMock):
+    """Identical concurrent rephrase requests share one engine call; a different text gets its own."""
+    project_id = "rephrase-proj-coalesce"
+    request_data = AIRephraseRequest(text_to_rephrase="The quick brown fox", n_suggestions=3)
+    other_request = AIRephraseRequest(text_to_rephrase="A different sentence", n_suggestions=3)
+    mock_loaded_context: LoadedContext = {
+        'project_plan': None, 'project_synopsis': None, 'chapter_plan': None,
+        'chapter_synopsis': None, 'chapter_title': None, 'filter_paths': set()
+    }
+
+    async def slow_rephrase(**kwargs):
+        await asyncio.sleep(0.01)
+        return [f"Rephrased: {kwargs['selected_text']}"]
+    mock_rag_engine.rephrase = AsyncMock(side_effect=slow_rephrase)
+
+    service_instance = AIService()
+    with patch.object(service_instance, '_load_context', return_value=mock_loaded_context):
+        results = await asyncio.gather(
+            service_instance.rephrase_text(project_id, request_data),
+            service_instance.rephrase_text(project_id, request_data.model_copy()),
+            service_instance.rephrase_text(project_id, other_request),
+        )
+
+    assert results[0] == results[1] == ["Rephrased: The quick brown fox"]
+    assert results[2] == ["Rephrased: A different sentence"]
+    assert mock_rag_engine.rephrase.await_count == 2
@@ -0,0 +1,124 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import zipfile
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
+
+from app.services.export_service import ExportService
+from app.models.chapter import ChapterRead, ChapterList
+from app.models.project import ProjectRead
+
+
+PROJECT_ID = "project-export"
+
+
+@pytest.fixture
+def export_mocks():
+    """Two chapters (listed out of order in metadata) with scenes stored as in-memory 'files'."""
+    scene_files = {
+        Path("ch1/s1.md"): "First scene.",
+        Path("ch1/s2.md"): "Second scene.",
+        Path("ch2/s3.md"): "Third scene.",
+    }
+    chapter_metadata = {
+        "ch1": {"scenes": {"s2": {"title": "Scene Two", "order": 2}, "s1": {"title": "Scene One", "order": 1}}},
+        "ch2": {"scenes": {"s3": {"title": "Scene Three", "order": 1}}},
+    }
+
+    with patch("app.services.export_service.project_service") as mock_project_service, \
+         patch("app.services.export_service.chapter_service") as mock_chapter_service, \
+         patch("app.services.export_service.file_service") as mock_file_service:
+        mock_project_service.get_by_id.return_value = ProjectRead(id=PROJECT_ID, name="My Novel")
+        mock_chapter_service.get_all_for_project.return_value = ChapterList(chapters=[
+            ChapterRead(id="ch1", project_id=PROJECT_ID, title="Beginning", order=1),
+            ChapterRead(id="ch2", project_id=PROJECT_ID, title="End", order=2),
+        ])
+        mock_chapter_service._slugify.side_effect = lambda text: text.lower().replace(" ", "-")
+        mock_file_service.read_chapter_metadata.side_effect = lambda project_id, chapter_id: chapter_metadata[chapter_id]
+        mock_file_service._get_scene_path.side_effect = lambda project_id, chapter_id, scene_id: Path(f"{chapter_id}/{scene_id}.md")
+        mock_file_service.read_text_file.side_effect = lambda path: scene_files[path]
+        yield mock_file_service
+
+
+def test_stream_markdown_orders_chapters_and_scenes(export_mocks):
+    service = ExportService()
+    stream = service.stream_markdown(PROJECT_ID)
+
+    # Nothing is read until the stream is consumed
+    export_mocks.read_text_file.assert_not_called()
+    output = b"".join(stream).decode("utf-8")
+
+    assert output == (
+        "# My Novel\n\n"
+        "## Beginning\n\n"
+        "### Scene One\n\nFirst scene."
+        "\n\n---\n\n"
+        "### Scene Two\n\nSecond scene."
+        "\n\n"
+        "## End\n\n"
+        "### Scene Three\n\nThird scene."
+        "\n"
+    )
+    assert export_mocks.read_text_file.call_count == 3
+
+
+def test_stream_markdown_without_titles_and_missing_scene(export_mocks):
+    def read_or_404(path):
+        if path == Path("ch1/s2.md"):
+            raise HTTPException(status_code=404, detail="missing")
+        return {"ch1/s1.md": "First scene.", "ch2/s3.md": "Third scene."}[path.as_posix()]
+    export_mocks.read_text_file.side_effect = read_or_404
+
+    service = ExportService()
+    output = b"".join(service.stream_markdown(PROJECT_ID, include_titles=False, separator="\n***\n")).decode("utf-8")
+
+    assert "### " not in output
+    assert "First scene.\n***\n\n\n## End" in output
+
+
+def test_stream_zip_one_file_per_chapter(export_mocks):
+    service = ExportService()
+    data = b"".join(service.stream_zip(PROJECT_ID))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ["01-beginning.md", "02-end.md"]
+        assert archive.read("01-beginning.md").decode("utf-8") == "## Scene One\n\nFirst scene.\n\n---\n\n## Scene Two\n\nSecond scene."
+        assert archive.read("02-end.md").decode("utf-8") == "## Scene Three\n\nThird scene."
+
+
+def test_scene_read_ahead_is_bounded(export_mocks, monkeypatch):
+    """Consuming one scene must not trigger reads beyond the configured read-ahead window."""
+    monkeypatch.setattr("app.services.export_service.settings.EXPORT_READ_AHEAD", 2)
+    read_paths = []
+    export_mocks.read_text_file.side_effect = lambda path: read_paths.append(path) or path.name
+
+    service = ExportService()
+    paths = [Path(f"ch/s{i}.md") for i in range(10)]
+    contents = service._iter_scene_contents(paths)
+
+    assert next(contents) == "s0.md"
+    assert len(read_paths) <= 3
+    assert list(contents) == [f"s{i}.md" for i in range(1, 10)]
+
+
+def test_stream_markdown_project_not_found(export_mocks):
+    with patch("app.services.export_service.project_service") as mock_project_service:
+        mock_project_service.get_by_id.side_effect = HTTPException(status_code=404, detail="Project not found")
+        with pytest.raises(HTTPException) as exc_info:
+            ExportService().stream_markdown(PROJECT_ID)
+    assert exc_info.value.status_code == 404
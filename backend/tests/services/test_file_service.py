@@ -146,6 +146,72 @@ def test_write_read_text_file_no_trigger(mock_index_mgr: MagicMock, temp_project
         file_service.file_service.read_text_file(non_existent_path)
     assert exc_info.value.status_code == 404
 
+# --- ADDED: Encoding detection and caching ---
+def test_read_text_file_utf16_bom(temp_project_dir: Path, monkeypatch):
+    monkeypatch.setattr(file_service, 'BASE_PROJECT_DIR', temp_project_dir)
+    file_path = temp_project_dir / "legacy_note.md"
+    content = "Дух и детализация\nLegacy note"
+    file_path.write_bytes(b'\xff\xfe' + content.encode('utf-16-le'))
+    assert file_service.file_service.read_text_file(file_path) == content
+    # File is left as-is unless normalization is enabled
+    assert file_path.read_bytes().startswith(b'\xff\xfe')
+
+def test_read_text_file_latin1_fallback(temp_project_dir: Path, monkeypatch):
+    monkeypatch.setattr(file_service, 'BASE_PROJECT_DIR', temp_project_dir)
+    file_path = temp_project_dir / "latin1.md"
+    file_path.write_bytes("café".encode('latin-1') + b'\xff')
+    assert file_service.file_service.read_text_file(file_path) == "café\xff"
+    assert file_service.file_service._encoding_cache[str(file_path)][1] == 'latin-1'
+
+def test_normalize_legacy_encodings_converts_utf16_to_utf8(temp_project_dir: Path, monkeypatch):
+    monkeypatch.setattr(file_service, 'BASE_PROJECT_DIR', temp_project_dir)
+    monkeypatch.setattr(file_service.settings, 'FILE_NORMALIZE_LEGACY_ENCODINGS', True)
+    file_path = temp_project_dir / "notes" / "legacy_note.md"
+    file_path.parent.mkdir(parents=True)
+    content = "Normalize me"
+    file_path.write_bytes(b'\xff\xfe' + content.encode('utf-16-le'))
+    latin1_path = temp_project_dir / "latin1.md"
+    latin1_path.write_bytes("café".encode('latin-1'))
+    # Reads never rewrite the file
+    assert file_service.file_service.read_text_file(file_path) == content
+    assert file_path.read_bytes().startswith(b'\xff\xfe')
+
+    assert file_service.file_service.normalize_legacy_encodings(temp_project_dir) == [file_path]
+
+    assert file_path.read_bytes() == content.encode('utf-8')
+    assert latin1_path.read_bytes() == "café".encode('latin-1')
+    assert file_service.file_service.read_text_file(file_path) == content
+    assert not list(temp_project_dir.rglob("*.tmp"))
+
+def test_normalize_legacy_encodings_skips_files_changed_meanwhile(temp_project_dir: Path):
+    file_path = temp_project_dir / "legacy_note.md"
+    file_path.write_bytes(b'\xff\xfe' + "Old".encode('utf-16-le'))
+    stale_version = (file_path.stat().st_mtime_ns, file_path.stat().st_size)
+    file_service.file_service.write_text_file(file_path, "Newer save")
+
+    assert not file_service.file_service._replace_if_unchanged(file_path, "Old", stale_version)
+    assert file_path.read_text(encoding='utf-8') == "Newer save"
+    assert not list(temp_project_dir.glob("*.tmp"))
+
+def test_read_text_file_content_cache(temp_project_dir: Path, monkeypatch):
+    monkeypatch.setattr(file_service, 'BASE_PROJECT_DIR', temp_project_dir)
+    monkeypatch.setattr(file_service.settings, 'FILE_CONTENT_CACHE_SIZE', 1)
+    fs = file_service.FileService()
+    plan_path = temp_project_dir / "plan.md"
+    synopsis_path = temp_project_dir / "synopsis.md"
+    fs.write_text_file(plan_path, "Plan v1")
+    fs.write_text_file(synopsis_path, "Synopsis")
+    assert fs.read_text_file(plan_path) == "Plan v1"
+    assert list(fs._content_cache) == [str(plan_path)]
+    # Writes through the service invalidate the cached entry
+    fs.write_text_file(plan_path, "Plan v2")
+    assert str(plan_path) not in fs._content_cache
+    assert fs.read_text_file(plan_path) == "Plan v2"
+    # LRU bound evicts the oldest entry
+    assert fs.read_text_file(synopsis_path) == "Synopsis"
+    assert list(fs._content_cache) == [str(synopsis_path)]
+# --- END ADDED ---
+
 # --- MODIFIED: Test JSON read/write with 'notes' key ---
 @patch('app.rag.index_manager.index_manager', autospec=True)
 def test_write_read_json_file(mock_index_mgr: MagicMock, temp_project_dir: Path, monkeypatch):
@@ -288,9 +354,9 @@ def test_delete_directory_triggers_index_delete(mock_index_mgr: MagicMock, temp_
     assert sub_scene_path.exists()
     file_service.file_service.delete_directory(dir_path)
     assert not dir_path.exists()
-    expected_calls = [call(scene1_path), call(scene2_path), call(sub_scene_path)]
-    mock_index_mgr.delete_doc.assert_has_calls(expected_calls, any_order=True)
-    assert mock_index_mgr.delete_doc.call_count == len(expected_calls)
+    # One bulk index deletion for the directory instead of one delete_doc per file
+    mock_index_mgr.delete_directory_docs.assert_called_once_with(dir_path)
+    mock_index_mgr.delete_doc.assert_not_called()
 
 # --- Listing and Setup Methods ---
 def test_list_subdirectories(temp_project_dir: Path, monkeypatch):
@@ -0,0 +1,141 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.job import JobStatus
+from app.services.job_service import JobService, INTERRUPTED_MESSAGE
+
+
+async def _wait_finished(service: JobService, job_id: str, timeout: float = 5.0):
+    async with asyncio.timeout(timeout):
+        while not service.get(job_id).status.finished:
+            await asyncio.sleep(0.01)
+    return service.get(job_id)
+
+
+async def test_job_reports_progress_and_result(tmp_path):
+    service = JobService(tmp_path, max_workers=2, retention_hours=1)
+
+    async def handler(context):
+        context.report(0.5, "Halfway")
+        await asyncio.sleep(0)
+        await asyncio.to_thread(context.report, 0.9, "From a thread")
+        return {"answer": 42}
+
+    job = service.submit("test", handler, project_id="p1")
+    updates = [update async for update in service.subscribe(job.id)]
+
+    assert updates[-1].status == JobStatus.SUCCEEDED
+    assert updates[-1].result == {"answer": 42} and updates[-1].progress == 1.0
+    assert "Halfway" in [update.message for update in updates]
+    assert service.list_jobs(project_id="p1")[0].id == job.id
+    assert (tmp_path / f"{job.id}.json").is_file()
+
+
+async def test_failures_and_cancellation(tmp_path):
+    service = JobService(tmp_path, max_workers=1, retention_hours=1)
+    started = asyncio.Event()
+
+    async def failing(context):
+        raise HTTPException(status_code=404, detail="Project missing")
+
+    async def slow(context):
+        started.set()
+        await asyncio.sleep(60)
+
+    failed = await _wait_finished(service, service.submit("test", failing).id)
+    assert failed.status == JobStatus.FAILED and failed.error == "Project missing"
+
+    running = service.submit("test", slow)
+    queued = service.submit("test", slow)
+    await started.wait()
+    assert service.get(queued.id).status == JobStatus.QUEUED # Only one worker slot
+
+    assert service.cancel(queued.id).status == JobStatus.CANCELLED
+    service.cancel(running.id)
+    assert (await _wait_finished(service, running.id)).status == JobStatus.CANCELLED
+    with pytest.raises(HTTPException):
+        service.get("missing")
+
+
+async def test_cooperative_cancel_waits_for_the_worker_thread(tmp_path):
+    service = JobService(tmp_path, max_workers=2, retention_hours=1)
+    started, release = threading.Event(), threading.Event()
+
+    def work(context):
+        started.set()
+        release.wait(5)
+        context.raise_if_cancelled()
+        return "finished"
+
+    async def handler(context):
+        return await asyncio.to_thread(work, context)
+
+    job = service.submit("rebuild", handler, project_id="p1", cooperative_cancel=True, exclusive=True)
+    await asyncio.to_thread(started.wait, 5)
+    with pytest.raises(HTTPException) as exc_info:
+        service.submit("rebuild", handler, project_id="p1", exclusive=True)
+    assert exc_info.value.status_code == 409
+
+    service.cancel(job.id)
+    await asyncio.sleep(0.05)
+    cancelling = service.get(job.id)
+    assert cancelling.status == JobStatus.RUNNING and cancelling.message == "Cancelling" # The thread is still working
+
+    release.set()
+    assert (await _wait_finished(service, job.id)).status == JobStatus.CANCELLED
+    service.submit("rebuild", lambda context: asyncio.sleep(0), project_id="p1", exclusive=True) # Accepted again
+
+
+async def test_unfinished_jobs_are_failed_after_restart(tmp_path):
+    service = JobService(tmp_path, max_workers=1, retention_hours=1)
+
+    async def slow(context):
+        await asyncio.sleep(60)
+
+    done = await _wait_finished(service, service.submit("test", lambda context: asyncio.sleep(0, result="ok")).id)
+    running = service.submit("test", slow)
+    await asyncio.sleep(0)
+
+    restarted = JobService(tmp_path, max_workers=1, retention_hours=1)
+    assert restarted.get(done.id).result == "ok"
+    interrupted = restarted.get(running.id)
+    assert interrupted.status == JobStatus.FAILED and interrupted.error == INTERRUPTED_MESSAGE
+    service.cancel(running.id)
+
+
+async def test_expired_jobs_are_pruned_while_running(tmp_path):
+    service = JobService(tmp_path, max_workers=1, retention_hours=1)
+
+    async def export(context):
+        context.output_path(".zip").write_bytes(b"PK")
+        return {"file": f"{context.job_id}.zip"}
+
+    old_job = await _wait_finished(service, service.submit("export", export).id)
+    assert (tmp_path / f"{old_job.id}.zip").is_file()
+    old_job.finished_at -= timedelta(hours=2)
+
+    new_job = await _wait_finished(service, service.submit("export", export).id)
+
+    assert [job.id for job in service.list_jobs()] == [new_job.id]
+    assert not list(tmp_path.glob(f"{old_job.id}*"))
+    assert (tmp_path / f"{new_job.id}.zip").is_file()
+    with pytest.raises(HTTPException):
+        service.get(old_job.id)
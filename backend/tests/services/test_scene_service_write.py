@@ -30,7 +30,7 @@ from app.services.chapter_service import ChapterService
 from app.rag.index_manager import IndexManager
 # --- END ADDED ---
 # Import models used
-from app.models.scene import SceneCreate, SceneUpdate, SceneRead, SceneList
+from app.models.scene import SceneCreate, SceneUpdate, SceneRead, SceneList, SceneBatchCreate
 from app.models.chapter import ChapterRead # Needed for mocking chapter_service.get_by_id
 
 # --- Test SceneService Write Methods ---
@@ -178,6 +178,71 @@ def test_create_scene_order_conflict(scene_service_with_mocks):
     mock_file_service.read_chapter_metadata.assert_called_once_with(project_id, chapter_id)
     mock_file_service.write_chapter_metadata.assert_not_called()
 
+# --- ADDED: Tests for create_batch ---
+def test_create_scenes_batch_success(scene_service_with_mocks):
+    """Test batch creation appends scenes after the existing max order, writes metadata once and indexes once."""
+    service, mock_file_service, mock_chapter_service, mock_index_manager = scene_service_with_mocks
+    project_id = "proj-batch-scene"
+    chapter_id = "chap-batch-scene"
+    batch_in = SceneBatchCreate(scenes=[
+        SceneCreate(title="Split One", content="First part."),
+        SceneCreate(title="Split Two", content="Second part."),
+    ])
+    mock_chapter_metadata = {"scenes": {"existing-scene": {"title": "Existing", "order": 3}}}
+
+    mock_chapter_service.get_by_id.return_value = ChapterRead(id=chapter_id, project_id=project_id, title="Batch Chapter", order=1)
+    mock_file_service._get_scene_path.side_effect = lambda p, c, s: Path(f"user_projects/{p}/chapters/{c}/{s}.md")
+    mock_file_service.path_exists.return_value = False
+    mock_file_service.read_chapter_metadata.return_value = mock_chapter_metadata
+
+    with patch('app.services.scene_service.generate_uuid', side_effect=["scene-a", "scene-b"]):
+        result = service.create_batch(project_id, chapter_id, batch_in)
+
+    assert isinstance(result, SceneList)
+    assert [(s.id, s.title, s.order) for s in result.scenes] == [("scene-a", "Split One", 4), ("scene-b", "Split Two", 5)]
+
+    mock_chapter_service.get_by_id.assert_called_once_with(project_id, chapter_id)
+    mock_file_service.write_chapter_metadata.assert_called_once_with(project_id, chapter_id, {
+        "scenes": {
+            "existing-scene": {"title": "Existing", "order": 3},
+            "scene-a": {"title": "Split One", "order": 4},
+            "scene-b": {"title": "Split Two", "order": 5},
+        }
+    })
+    path_a = Path(f"user_projects/{project_id}/chapters/{chapter_id}/scene-a.md")
+    path_b = Path(f"user_projects/{project_id}/chapters/{chapter_id}/scene-b.md")
+    mock_file_service.write_text_file.assert_has_calls([
+        call(path_a, "First part.", trigger_index=False),
+        call(path_b, "Second part.", trigger_index=False),
+    ])
+    mock_index_manager.index_file.assert_not_called()
+    mock_index_manager.index_files.assert_called_once_with([path_a, path_b], preloaded_metadata={
+        path_a: {"document_type": "Scene", "document_title": "Split One", "chapter_id": chapter_id, "chapter_title": "Batch Chapter"},
+        path_b: {"document_type": "Scene", "document_title": "Split Two", "chapter_id": chapter_id, "chapter_title": "Batch Chapter"},
+    })
+
+def test_create_scenes_batch_order_conflict_within_batch(scene_service_with_mocks):
+    """Test batch creation rejects duplicate explicit orders before writing anything."""
+    service, mock_file_service, mock_chapter_service, mock_index_manager = scene_service_with_mocks
+    project_id = "proj-batch-conflict"
+    chapter_id = "chap-batch-conflict"
+    batch_in = SceneBatchCreate(scenes=[
+        SceneCreate(title="A", order=2, content=""),
+        SceneCreate(title="B", order=2, content=""),
+    ])
+    mock_chapter_service.get_by_id.return_value = ChapterRead(id=chapter_id, project_id=project_id, title="Chapter", order=1)
+    mock_file_service.read_chapter_metadata.return_value = {"scenes": {}}
+
+    with pytest.raises(HTTPException) as exc_info:
+        service.create_batch(project_id, chapter_id, batch_in)
+
+    assert exc_info.value.status_code == 409
+    assert "Scene order 2 already exists" in exc_info.value.detail
+    mock_file_service.write_chapter_metadata.assert_not_called()
+    mock_file_service.write_text_file.assert_not_called()
+    mock_index_manager.index_files.assert_not_called()
+# --- END ADDED ---
+
 # --- Tests for update ---
 
 # Call order tracking helper class
@@ -43,6 +43,7 @@ export const deleteChapter = (projectId, chapterId) => apiClient.delete(`/projec
 // --- Scene Endpoints ---
 export const listScenes = (projectId, chapterId) => apiClient.get(`/projects/${projectId}/chapters/${chapterId}/scenes/`);
 export const createScene = (projectId, chapterId, data) => apiClient.post(`/projects/${projectId}/chapters/${chapterId}/scenes/`, data); // data: { title: "...", order: ..., content: "..." }
+export const createScenesBatch = (projectId, chapterId, scenes) => apiClient.post(`/projects/${projectId}/chapters/${chapterId}/scenes/batch`, { scenes }); // scenes: [{ title, content, order? }]
 export const getScene = (projectId, chapterId, sceneId) => apiClient.get(`/projects/${projectId}/chapters/${chapterId}/scenes/${sceneId}`);
 export const updateScene = (projectId, chapterId, sceneId, data) => apiClient.patch(`/projects/${projectId}/chapters/${chapterId}/scenes/${sceneId}`, data);
 export const deleteScene = (projectId, chapterId, sceneId) => apiClient.delete(`/projects/${projectId}/chapters/${chapterId}/scenes/${sceneId}`);
@@ -166,6 +167,7 @@ export const splitChapterIntoScenes = (projectId, chapterId, requestData = {}) =
     return apiClient.post(`/ai/split/chapter/${projectId}/${chapterId}`, requestData);
 };
 export const rebuildProjectIndex = (projectId) => apiClient.post(`/ai/rebuild_index/${projectId}`);
+export const getSourceNode = (projectId, nodeId) => apiClient.get(`/ai/source_node/${projectId}/${nodeId}`); // Full text of a lean source node reference
 
 // --- Chat History & Session Endpoints ---
 
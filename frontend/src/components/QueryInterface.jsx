@@ -17,6 +17,7 @@
 import React, { useState, useRef, useEffect, useCallback } from 'react';
 import PropTypes from 'prop-types';
 import { queryProjectContext, getChatHistory, updateChatHistory } from '../api/codexApi';
+import SourceNodeText from './SourceNodeText';
 
 // Basic styling
 const styles = {
@@ -145,7 +146,7 @@ const styles = {
 };
 
 // --- Helper Component for Rendering a Single History Entry ---
-const HistoryEntry = ({ entry }) => {
+const HistoryEntry = ({ entry, projectId }) => {
     // --- MODIFIED: Helper to get display title/filename ---
     const getSourceDisplay = (metadata) => {
         if (!metadata) return 'Unknown Source';
@@ -247,7 +248,7 @@ const HistoryEntry = ({ entry }) => {
                                             {/* --- MODIFIED: Use getSourceDisplay --- */}
                                             <strong>Source:</strong> {getSourceDisplay(node.metadata)} (Score: {node.score?.toFixed(3) ?? 'N/A'})
                                             {/* --- END MODIFIED --- */}
-                                            <pre style={styles.sourceNodeText}><code>{node.text}</code></pre>
+                                            <SourceNodeText projectId={projectId} node={node} textStyle={styles.sourceNodeText} />
                                         </div>
                                     ))}
                                 </div>
@@ -280,6 +281,7 @@ HistoryEntry.propTypes = {
         error: PropTypes.string,
         isLoading: PropTypes.bool,
     }).isRequired,
+    projectId: PropTypes.string,
 };
 // --- End Helper Component ---
 
@@ -404,7 +406,7 @@ function QueryInterface({ projectId, activeSessionId }) {
             {!isLoadingHistory && !historyError && history.length > 0 && (
                 <div style={styles.historyArea} data-testid={historyAreaId}>
                     {history.map(entry => (
-                        <HistoryEntry key={entry.id} entry={entry} />
+                        <HistoryEntry key={entry.id} entry={entry} projectId={projectId} />
                     ))}
                     <div ref={historyEndRef} /> {/* For scrolling */}
                 </div>
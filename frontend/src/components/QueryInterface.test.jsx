@@ -24,12 +24,13 @@ vi.mock('../api/codexApi', () => ({
   queryProjectContext: vi.fn(),
   getChatHistory: vi.fn(),
   updateChatHistory: vi.fn(),
+  getSourceNode: vi.fn(),
 }));
 
 // Import the component *after* mocks
 import QueryInterface from './QueryInterface';
 // Import mocked API function
-import { queryProjectContext, getChatHistory, updateChatHistory } from '../api/codexApi';
+import { queryProjectContext, getChatHistory, updateChatHistory, getSourceNode } from '../api/codexApi';
 
 const TEST_PROJECT_ID = 'query-proj-1';
 const TEST_SESSION_ID = 'session-abc'; // Default active session for tests
@@ -383,6 +384,35 @@ describe('QueryInterface Component with History & Sessions', () => {
     });
   });
 
+  it('fetches the full text of a saved source node reference on demand', async () => {
+    const referenceNodes = [
+      { id: 'ref-1', text: null, snippet: 'The dragon sleeps…', score: 0.9, title: 'Dragons',
+        metadata: { document_type: 'Note', document_title: 'Dragons', file_path: 'user_projects/query-proj-1/notes/n1.md' } },
+      { id: 'ref-gone', text: null, snippet: 'Old chunk…', score: 0.5, title: 'Plan',
+        metadata: { document_type: 'Plan', document_title: 'Project Plan' } },
+    ];
+    getChatHistory.mockResolvedValue({ data: { history: [
+      { id: 0, query: 'Where is the dragon?', response: { answer: 'Under the mountain.', source_nodes: referenceNodes, direct_sources: null }, error: null },
+    ] } });
+    getSourceNode.mockImplementation((projectId, nodeId) => nodeId === 'ref-1'
+      ? Promise.resolve({ data: { id: 'ref-1', text: 'The dragon sleeps under the mountain, dreaming of gold.' } })
+      : Promise.reject({ response: { status: 404, data: { detail: 'Source node ref-gone not found' } } }));
+
+    renderQueryInterface();
+    await screen.findByText('You: Where is the dragon?');
+    await user.click(screen.getByText(/retrieved context snippets/i));
+    expect(screen.getByText('The dragon sleeps…')).toBeInTheDocument();
+
+    await user.click(screen.getByTestId('show-full-source-ref-1'));
+    expect(await screen.findByText('The dragon sleeps under the mountain, dreaming of gold.')).toBeInTheDocument();
+    expect(getSourceNode).toHaveBeenCalledWith(TEST_PROJECT_ID, 'ref-1');
+    expect(screen.queryByTestId('show-full-source-ref-1')).not.toBeInTheDocument();
+
+    await user.click(screen.getByTestId('show-full-source-ref-gone'));
+    expect(await screen.findByTestId('source-error-ref-gone')).toHaveTextContent(/no longer in the index/i);
+    expect(screen.getByText('Old chunk…')).toBeInTheDocument();
+  });
+
   // --- ADDED: Test for displaying chapter title in source nodes ---
   it('displays chapter title for scene source nodes', async () => {
     const queryText = 'Tell me about the first scene';
@@ -0,0 +1,94 @@
+/*
+ * Copyright 2025 Antimortine
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import React, { useState } from 'react';
+import PropTypes from 'prop-types';
+import { getSourceNode } from '../api/codexApi';
+
+const styles = {
+    showFullButton: {
+        marginTop: '4px',
+        padding: '2px 8px',
+        fontSize: '0.8em',
+        cursor: 'pointer',
+    },
+    error: {
+        color: 'red',
+        fontSize: '0.85em',
+        margin: '4px 0 0 0',
+    },
+};
+
+/**
+ * Text of a retrieved source node. Lean source nodes (and those saved in chat history) only carry a
+ * snippet; their full text is fetched from the backend on demand.
+ */
+function SourceNodeText({ projectId, node, textStyle }) {
+    const [fullText, setFullText] = useState(null);
+    const [isLoading, setIsLoading] = useState(false);
+    const [error, setError] = useState(null);
+
+    const text = node.text ?? fullText ?? node.snippet;
+    const canShowFull = node.text == null && fullText == null && Boolean(projectId);
+
+    const handleShowFull = async () => {
+        setIsLoading(true);
+        setError(null);
+        try {
+            const response = await getSourceNode(projectId, node.id);
+            setFullText(response.data.text ?? '');
+        } catch (err) {
+            console.error(`[SourceNodeText] Error loading source node ${node.id}:`, err);
+            if (err.response?.status === 404) {
+                setError('This source is no longer in the index (the project was re-indexed since).');
+            } else {
+                setError(`Failed to load the full source: ${err.response?.data?.detail || err.message}`);
+            }
+        } finally {
+            setIsLoading(false);
+        }
+    };
+
+    return (
+        <>
+            <pre style={textStyle}><code>{text}</code></pre>
+            {canShowFull && (
+                <button
+                    type="button"
+                    onClick={handleShowFull}
+                    disabled={isLoading}
+                    style={styles.showFullButton}
+                    data-testid={`show-full-source-${node.id}`}
+                >
+                    {isLoading ? 'Loading...' : 'Show full source'}
+                </button>
+            )}
+            {error && <p style={styles.error} data-testid={`source-error-${node.id}`}>{error}</p>}
+        </>
+    );
+}
+
+SourceNodeText.propTypes = {
+    projectId: PropTypes.string,
+    node: PropTypes.shape({
+        id: PropTypes.string.isRequired,
+        text: PropTypes.string,
+        snippet: PropTypes.string,
+    }).isRequired,
+    textStyle: PropTypes.object,
+};
+
+export default SourceNodeText;
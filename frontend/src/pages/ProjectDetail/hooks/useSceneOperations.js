@@ -19,6 +19,7 @@ import { useNavigate } from 'react-router-dom';
 import {
     listScenes,
     createScene,
+    createScenesBatch,
     deleteScene,
     generateSceneDraft
 } from '../../../api/codexApi';
@@ -381,16 +382,14 @@ export function useSceneOperations(projectId, chapters) {
         let isComponentMounted = isMounted.current; let overallSuccess = true; const errorKey = `split_create_${chapterId}`;
         setIsCreatingSceneFromDraft(true); setSceneErrors(prev => { const n = { ...prev }; delete n[errorKey]; return n; });
         try {
-            let currentOrder = 1;
-            const creationPromises = proposedSplits.map(async (splitScene, index) => {
-                return createScene( projectId, chapterId, { title: splitScene.title || `Scene ${index + 1}`, content: splitScene.content || '', order: currentOrder++ }); });
-            const results = await Promise.allSettled(creationPromises);
+            // One request: the backend allocates orders, writes chapter metadata once and indexes all scenes in one batch
+            const scenesToCreate = proposedSplits.map((splitScene, index) => ({ title: splitScene.title || `Scene ${index + 1}`, content: splitScene.content || '' }));
+            let batchError = null;
+            try { await createScenesBatch(projectId, chapterId, scenesToCreate); } catch (createErr) { batchError = createErr; }
             if (isComponentMounted && isMounted.current) {
-                 const failedCreations = results.filter(r => r.status === 'rejected');
-                 if (failedCreations.length > 0) {
-                     console.error('Some scenes failed to create from splits:', failedCreations);
-                     const firstReason = failedCreations[0]?.reason;
-                     setSceneErrors(prev => ({ ...prev, [errorKey]: getApiErrorMessage(firstReason, `Failed to create ${failedCreations.length} scene(s) from split.`) }));
+                 if (batchError) {
+                     console.error('Failed to create scenes from splits:', batchError);
+                     setSceneErrors(prev => ({ ...prev, [errorKey]: getApiErrorMessage(batchError, `Failed to create ${scenesToCreate.length} scene(s) from split.`) }));
                      overallSuccess = false;
                  }
                  try {
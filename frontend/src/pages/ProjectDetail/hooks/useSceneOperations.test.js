@@ -33,6 +33,7 @@ vi.mock('react-router-dom', () => ({
 vi.mock('../../../api/codexApi', () => ({
   listScenes: vi.fn(),
   createScene: vi.fn(),
+  createScenesBatch: vi.fn(),
   deleteScene: vi.fn(),
   generateSceneDraft: vi.fn()
 }));
@@ -133,6 +133,7 @@ function ProjectDetailPage() {
             {/* Modals */}
             {sceneOps.showGeneratedSceneModal && (
                 <GeneratedSceneModal
+                    projectId={projectId}
                     sceneTitle={sceneOps.generatedSceneTitle} sceneContent={sceneOps.generatedSceneContent}
                     onTitleChange={sceneOps.setGeneratedSceneTitle} onContentChange={sceneOps.setGeneratedSceneContent}
                     onSave={sceneOps.handleCreateSceneFromDraft} onClose={sceneOps.handleCloseGeneratedSceneModal}
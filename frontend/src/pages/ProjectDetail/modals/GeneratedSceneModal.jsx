@@ -17,6 +17,7 @@
 import React from 'react';
 import PropTypes from 'prop-types';
 import Modal from '../../../components/Modal';
+import SourceNodeText from '../../../components/SourceNodeText';
 
 // Styles for the modal components
 const styles = {
@@ -115,6 +116,7 @@ const styles = {
  * Modal component for creating a scene from AI-generated content
  */
 function GeneratedSceneModal({
+    projectId,
     sceneTitle,
     sceneContent,
     onTitleChange,
@@ -217,7 +219,7 @@ function GeneratedSceneModal({
                                         <div key={index} style={styles.sourceItem}>
                                             <strong>Source:</strong> {node.metadata?.document_title || node.metadata?.document_type || node.metadata?.file_path?.split('/').pop() || 'Unknown'}
                                             {node.score !== undefined && ` (Score: ${node.score.toFixed(3)})`}
-                                            <pre style={styles.sourceNodeText}><code>{node.text}</code></pre>
+                                            <SourceNodeText projectId={projectId} node={node} textStyle={styles.sourceNodeText} />
                                         </div>
                                     ))}
                                 </div>
@@ -256,6 +258,7 @@ function GeneratedSceneModal({
 }
 
 GeneratedSceneModal.propTypes = {
+    projectId: PropTypes.string,
     sceneTitle: PropTypes.string.isRequired,
     sceneContent: PropTypes.string.isRequired,
     onTitleChange: PropTypes.func.isRequired,
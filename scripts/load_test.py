@@ -0,0 +1,360 @@
+# Copyright 2025 Antimortine (antimortine@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# Load generator for the backend's HTTP API: simulates concurrent authors working in synthetic projects and
+# reports throughput, latency percentiles and error rates per route. Usage (from the repository root):
+#   python scripts/load_test.py --users 20 --duration 60
+#   python scripts/load_test.py --users 50 --duration 120 --mix autosave_scene=70,edit_note=20,chat_query=10
+#   python scripts/load_test.py --base-url http://localhost:8000 --users 10   # against a running backend
+#
+# Without --base-url a backend is started with uvicorn in a throwaway working directory (projects, Chroma
+# store, jobs), with the offline stub LLM and stub embeddings (LLM_PROVIDER=stub, EMBEDDING_BACKEND=stub),
+# so no network access or API key is needed. Other settings from the environment are passed through, e.g.
+# STUB_LLM_LATENCY_MS=800 STUB_LLM_RATE_LIMIT_RATE=0.05 for a realistic LLM, or RAG_HYBRID_RETRIEVAL=true.
+# Against a running backend, the synthetic projects are created there (and left in place).
+#
+# Each virtual user owns one scene and one note of a project and repeats actions picked from the mix:
+#   autosave_scene  PATCH of the scene's content (the editor's autosave; re-indexes the scene)
+#   edit_note       note tree fetch, then an edit or a move of the note to another folder
+#   chat_query      /ai/query, then the PUT of the session's chat history (as the chat panel does)
+#   rephrase        /ai/edit/rephrase of a sentence of the scene
+#   generate_scene  /ai/generate/scene for the user's chapter
+# with an exponentially distributed think time between actions.
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = REPO_ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.synthetic import SCALES, TextGenerator, create_project  # noqa: E402
+
+API = "/api/v1"
+DEFAULT_MIX = {"autosave_scene": 50, "edit_note": 20, "chat_query": 15, "rephrase": 10, "generate_scene": 5}
+_ID_SEGMENT = re.compile(r"/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?=/|$)")
+
+
+def route_of(method: str, path: str) -> str:
+    """Groups requests by route: "PATCH /api/v1/projects/{id}/chapters/{id}/scenes/{id}"."""
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (same definition as the benchmarks' p95)."""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for entry in spec.split(","):
+        name, _, weight = entry.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown action '{name.strip()}' in --mix; expected some of {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# --- Measurements ---
+@dataclass
+class RouteStats:
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+class Recorder:
+    def __init__(self):
+        self.routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    def record(self, route: str, duration_ms: float, status: str, error: bool):
+        stats = self.routes[route]
+        stats.latencies_ms.append(duration_ms)
+        stats.statuses[status] += 1
+        if error:
+            stats.errors += 1
+
+    def summary(self) -> Dict:
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        routes = {}
+        all_latencies, all_errors = [], 0
+        for route, stats in sorted(self.routes.items()):
+            ordered = sorted(stats.latencies_ms)
+            all_latencies.extend(ordered)
+            all_errors += stats.errors
+            routes[route] = {
+                "requests": len(ordered),
+                "throughput_rps": round(len(ordered) / elapsed, 3),
+                "errors": stats.errors,
+                "error_rate": round(stats.errors / len(ordered), 4),
+                "p50_ms": round(percentile(ordered, 0.50), 1),
+                "p95_ms": round(percentile(ordered, 0.95), 1),
+                "p99_ms": round(percentile(ordered, 0.99), 1),
+                "max_ms": round(ordered[-1], 1),
+                "statuses": dict(stats.statuses),
+            }
+        all_latencies.sort()
+        total = {
+            "requests": len(all_latencies),
+            "throughput_rps": round(len(all_latencies) / elapsed, 3),
+            "errors": all_errors,
+            "error_rate": round(all_errors / len(all_latencies), 4) if all_latencies else 0.0,
+        }
+        if all_latencies:
+            total.update(p50_ms=round(percentile(all_latencies, 0.50), 1), p95_ms=round(percentile(all_latencies, 0.95), 1),
+                         p99_ms=round(percentile(all_latencies, 0.99), 1), max_ms=round(all_latencies[-1], 1))
+        return {"elapsed_s": round(elapsed, 2), "total": total, "routes": routes}
+
+
+# --- Virtual users ---
+class VirtualUser:
+    def __init__(self, number: int, client: httpx.AsyncClient, recorder: Recorder, project: Dict, scene: Tuple[str, str], seed: int):
+        self.number = number
+        self.client = client
+        self.recorder = recorder
+        self.project = project
+        self.chapter_id, self.scene_id = scene
+        self.rng = random.Random(seed)
+        self.text = TextGenerator(seed, project["languages"])
+        self.note_id: Optional[str] = None
+        self.session_id: Optional[str] = None
+        self.history: List[Dict] = []
+
+    @property
+    def base(self) -> str:
+        return f"{API}/projects/{self.project['project_id']}"
+
+    async def request(self, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        """Sends one request and records it; returns None for transport errors and error statuses."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(route_of(method, path), (time.perf_counter() - started) * 1000, type(e).__name__, error=True)
+            return None
+        failed = response.status_code >= 400
+        self.recorder.record(route_of(method, path), (time.perf_counter() - started) * 1000, str(response.status_code), error=failed)
+        return None if failed else response
+
+    async def autosave_scene(self):
+        content = self.text.paragraphs(self.rng.randint(4, 10))
+        await self.request("PATCH", f"{self.base}/chapters/{self.chapter_id}/scenes/{self.scene_id}", json={"content": content})
+
+    async def edit_note(self):
+        await self.request("GET", f"{self.base}/notes/tree")
+        if self.note_id is None:
+            response = await self.request("POST", f"{self.base}/notes/", json={
+                "title": f"Load note {self.number}", "content": self.text.paragraphs(3), "folder_path": f"/Load/User {self.number}"})
+            if response is not None:
+                self.note_id = response.json()["id"]
+            return
+        if self.rng.random() < 0.25:
+            update = {"folder_path": f"/Load/User {self.number}/{self.text.title()}"}
+        else:
+            update = {"content": self.text.paragraphs(self.rng.randint(2, 6))}
+        await self.request("PATCH", f"{self.base}/notes/{self.note_id}", json=update)
+
+    async def chat_query(self):
+        if self.session_id is None:
+            response = await self.request("POST", f"{self.base}/chat_sessions", json={"name": f"Load user {self.number}"})
+            if response is None:
+                return
+            self.session_id = response.json()["id"]
+        query = self.rng.choice(self.project["queries"])
+        response = await self.request("POST", f"{API}/ai/query/{self.project['project_id']}", json={"query": query})
+        entry = {"id": len(self.history) + 1, "query": query}
+        if response is not None:
+            entry["response"] = response.json()
+        else:
+            entry["error"] = "Query failed"
+        self.history.append(entry)
+        await self.request("PUT", f"{self.base}/chat_history/{self.session_id}", json={"history": self.history})
+
+    async def rephrase(self):
+        await self.request("POST", f"{API}/ai/edit/rephrase/{self.project['project_id']}", json={
+            "text_to_rephrase": self.text.paragraph(1), "context_before": self.text.paragraph(), "context_after": self.text.paragraph()})
+
+    async def generate_scene(self):
+        await self.request("POST", f"{API}/ai/generate/scene/{self.project['project_id']}/{self.chapter_id}",
+                           json={"prompt_summary": self.rng.choice(self.project["queries"])})
+
+    async def run(self, mix: Dict[str, float], deadline: float, think_time_ms: float, start_delay: float):
+        await asyncio.sleep(start_delay)
+        actions, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(actions, weights)[0])()
+            if think_time_ms > 0:
+                await asyncio.sleep(min(self.rng.expovariate(1000 / think_time_ms), max(0.0, deadline - time.perf_counter())))
+
+
+# --- Backend and corpus ---
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(workdir: Path, args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(BASE_PROJECT_DIR=str(workdir / "user_projects"), LLM_PROVIDER="stub", EMBEDDING_POOL_ENABLED="false")
+    env.setdefault("EMBEDDING_BACKEND", "stub")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", str(BACKEND_DIR), "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    log_file = open(workdir / "backend.log", "w", encoding="utf-8")
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited during startup (code {process.returncode}); see {workdir / 'backend.log'}")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"Backend did not start within {args.startup_timeout}s; see {workdir / 'backend.log'}")
+
+
+def create_corpus(base_url: str, args: argparse.Namespace) -> List[Dict]:
+    """Creates the synthetic projects and lists their scenes (the virtual users' autosave targets)."""
+    scale = SCALES[args.scale]
+    projects = []
+    with httpx.Client(base_url=base_url, timeout=300) as client:
+        for offset in range(args.projects):
+            project = create_project(client, scale, seed=args.seed + offset, name=f"Load test {offset + 1}")
+            project["languages"] = scale.languages
+            project["scenes"] = []
+            for chapter_id in project["chapter_ids"]:
+                response = client.get(f"{API}/projects/{project['project_id']}/chapters/{chapter_id}/scenes/")
+                response.raise_for_status()
+                project["scenes"].extend((chapter_id, scene["id"]) for scene in response.json()["scenes"])
+            if not project["scenes"]:
+                raise SystemExit("The synthetic projects need scenes; use a scale with scenes_per_chapter > 0.")
+            projects.append(project)
+    return projects
+
+
+# --- Reporting ---
+def print_report(summary: Dict):
+    header = f"{'route':<62} {'reqs':>7} {'req/s':>8} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in summary["routes"].items():
+        print(f"{route[:62]:<62} {stats['requests']:>7} {stats['throughput_rps']:>8.2f} {stats['error_rate'] * 100:>6.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    total = summary["total"]
+    print("-" * len(header))
+    if total["requests"]:
+        print(f"{'total':<62} {total['requests']:>7} {total['throughput_rps']:>8.2f} {total['error_rate'] * 100:>6.1f} "
+              f"{total['p50_ms']:>9.1f} {total['p95_ms']:>9.1f} {total['p99_ms']:>9.1f}")
+    for route, stats in summary["routes"].items():
+        failures = {code: count for code, count in stats["statuses"].items() if not code.startswith(("1", "2", "3"))}
+        if failures:
+            print(f"  {route}: {failures}")
+
+
+async def run_load(base_url: str, projects: List[Dict], mix: Dict[str, float], args: argparse.Namespace) -> Dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        users = []
+        for number in range(args.users):
+            project = projects[number % len(projects)]
+            scene = project["scenes"][(number // len(projects)) % len(project["scenes"])]
+            users.append(VirtualUser(number + 1, client, recorder, project, scene, seed=args.seed * 1000 + number))
+        recorder.started_at = time.perf_counter()
+        deadline = recorder.started_at + args.duration
+        ramp_step = args.ramp_up / args.users if args.users else 0
+        await asyncio.gather(*(user.run(mix, deadline, args.think_time_ms, start_delay=index * ramp_step) for index, user in enumerate(users)))
+        recorder.finished_at = time.perf_counter()
+    return recorder.summary()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the Codex AI backend with concurrent simulated authors.")
+    parser.add_argument("--base-url", help="Backend to test (e.g. http://localhost:8000). Default: start one with the offline stubs.")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load (after the corpus is created).")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds over which the users start.")
+    parser.add_argument("--think-time-ms", type=float, default=1000, help="Mean pause between a user's actions (exponentially distributed).")
+    parser.add_argument("--mix", help=f"Action weights, e.g. 'autosave_scene=60,chat_query=40'. Default: {','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())}")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Size preset of the synthetic projects.")
+    parser.add_argument("--projects", type=int, default=2, help="Synthetic projects; users are spread over them.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes of the started backend.")
+    parser.add_argument("--startup-timeout", type=float, default=180, help="Seconds to wait for the started backend.")
+    parser.add_argument("--output", type=Path, help="Also write the results as JSON.")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the started backend's working directory.")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    workdir = process = None
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            workdir = Path(tempfile.mkdtemp(prefix="codex-ai-load-"))
+            print(f"Starting backend with the offline stubs (workdir: {workdir})...")
+            process, base_url = start_backend(workdir, args)
+        setup_start = time.perf_counter()
+        projects = create_corpus(base_url, args)
+        print(f"Created {len(projects)} synthetic project(s) in {time.perf_counter() - setup_start:.1f}s; "
+              f"running {args.users} user(s) for {args.duration:.0f}s...")
+        summary = asyncio.run(run_load(base_url, projects, mix, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if workdir is not None and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary["config"] = {"users": args.users, "duration_s": args.duration, "ramp_up_s": args.ramp_up, "think_time_ms": args.think_time_ms,
+                         "mix": mix, "scale": args.scale, "projects": args.projects, "base_url": args.base_url or "spawned (offline stubs)"}
+    print_report(summary)
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+    return 1 if summary["total"]["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())